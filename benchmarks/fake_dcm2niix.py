@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+"""
+Stub `dcm2niix` executable used by the benchmarks. It accepts the options used by the MNI 7T DICOM
+to BIDS converter and writes small but valid NIfTI and JSON files with the names that `dcm2niix`
+would generate for the synthetic DICOM series:
+- `_e<N>` suffixes for multi-echo series,
+- `_ph` suffixes for phase series,
+- `.bval` and `.bvec` files for diffusion and MP2RAGE series,
+- `_ROI1` files for maximum intensity projection series.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import struct
+import sys
+from collections import defaultdict
+
+import pydicom
+
+fake_dcm2niix_version = 'v1.0.20240202-fake'
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='dcm2niix')
+    parser.add_argument('-z', default='n')
+    parser.add_argument('-b', default='y')
+    parser.add_argument('-o', dest='output_dir_path', default='.')
+    parser.add_argument('-f', dest='file_name', default='%f')
+    parser.add_argument('-v', '--version', action='store_true')
+    parser.add_argument('dicom_dir_path', nargs='?')
+    args, _ = parser.parse_known_args()
+
+    print(f"Chris Rorden's dcm2niiX version {fake_dcm2niix_version}")
+
+    if args.version or args.dicom_dir_path is None:
+        return
+
+    # Group the DICOM files by echo number.
+    echo_dicoms: dict[int, list[pydicom.Dataset]] = defaultdict(list)
+    for dir_entry in sorted(os.scandir(args.dicom_dir_path), key=lambda dir_entry: dir_entry.name):
+        dicom = pydicom.dcmread(dir_entry.path)  # type: ignore
+        echo_dicoms[int(dicom.get('EchoNumbers', 1))].append(dicom)
+
+    if echo_dicoms == {}:
+        print("No valid DICOM images were found", file=sys.stderr)
+        sys.exit(2)
+
+    extension = '.nii.gz' if args.z == 'y' else '.nii'
+
+    for echo_number, dicoms in sorted(echo_dicoms.items()):
+        first_dicom = dicoms[0]
+        description = str(first_dicom.SeriesDescription)
+
+        base_name = args.file_name
+        if len(echo_dicoms) > 1:
+            base_name += f'_e{echo_number}'
+
+        if 'P' in first_dicom.ImageType:
+            base_name += '_ph'
+
+        base_path = os.path.join(args.output_dir_path, base_name)
+        print(f"Convert {len(dicoms)} DICOM as {base_path} ({first_dicom.Columns}x{first_dicom.Rows}x{len(dicoms)})")
+
+        pixel_data = b''.join(dicom.PixelData for dicom in dicoms)
+        _write_nifti(base_path + extension, first_dicom.Columns, first_dicom.Rows, len(dicoms), pixel_data)
+
+        if args.b == 'y':
+            _write_sidecar(base_path + '.json', first_dicom, echo_number)
+
+        if 'dwi' in description or 'mp2rage' in description:
+            with open(base_path + '.bval', 'w') as file:
+                file.write('0\n')
+
+            with open(base_path + '.bvec', 'w') as file:
+                file.write('0\n0\n0\n')
+
+        if 'MIP' in description:
+            roi_path = os.path.join(args.output_dir_path, args.file_name + '_ROI1' + extension)
+            _write_nifti(roi_path, first_dicom.Columns, first_dicom.Rows, 1, b'\0' * len(first_dicom.PixelData))
+
+
+def _write_nifti(file_path: str, columns: int, rows: int, slices: int, pixel_data: bytes):
+    """
+    Write a 16-bit NIfTI-1 file, compressed if its path ends with `.gz`.
+    """
+
+    header = bytearray(352)
+    struct.pack_into('<i', header, 0, 348)
+    struct.pack_into('<8h', header, 40, 3, columns, rows, slices, 1, 1, 1, 1)
+    # Unsigned 16-bit integer data type.
+    struct.pack_into('<2h', header, 70, 512, 16)
+    struct.pack_into('<8f', header, 76, 1.0, 1.0, 1.0, 1.0, 1.0, 0.0, 0.0, 0.0)
+    struct.pack_into('<2f', header, 108, 352.0, 1.0)
+    # Millimeters and seconds units.
+    struct.pack_into('<B', header, 123, 10)
+    # Scanner anatomical sform with an identity affine.
+    struct.pack_into('<2h', header, 252, 0, 1)
+    struct.pack_into('<12f', header, 280, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+    header[344:348] = b'n+1\0'
+
+    if file_path.endswith('.gz'):
+        with gzip.open(file_path, 'wb', compresslevel=1) as file:
+            file.write(bytes(header) + pixel_data)
+    else:
+        with open(file_path, 'wb') as file:
+            file.write(bytes(header) + pixel_data)
+
+
+def _write_sidecar(file_path: str, dicom: pydicom.Dataset, echo_number: int):
+    """
+    Write a JSON sidecar file with the fields that `dcm2niix` extracts from the DICOM headers.
+    """
+
+    sidecar = {
+        'Modality'                  : str(dicom.Modality),
+        'Manufacturer'              : str(dicom.get('Manufacturer', '')),
+        'SeriesDescription'         : str(dicom.SeriesDescription),
+        'SeriesNumber'              : int(dicom.SeriesNumber),
+        'ImageType'                 : list(dicom.ImageType),
+        'EchoNumber'                : echo_number,
+        'EchoTime'                  : float(dicom.get('EchoTime', 0)) / 1000,
+        'ConversionSoftware'        : 'dcm2niix',
+        'ConversionSoftwareVersion' : fake_dcm2niix_version,
+    }
+
+    with open(file_path, 'w') as file:
+        json.dump(sidecar, file, indent='\t')
+
+
+if __name__ == '__main__':
+    main()
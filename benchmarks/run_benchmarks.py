@@ -0,0 +1,389 @@
+"""
+Benchmark the MNI 7T DICOM to BIDS converter end-to-end on a synthetic DICOM study, using a stub
+`dcm2niix` executable so that the benchmarks run offline and measure the converter itself.
+
+The synthetic study only depends on the benchmark parameters, so results obtained with the same
+parameters on different commits can be compared using the `--compare` option.
+
+Usage (from the project root directory, with the project installed):
+
+    python -m benchmarks.run_benchmarks --series 20 --files 40 --output results.json
+    python -m benchmarks.run_benchmarks --series 20 --files 40 --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import stat
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from collections.abc import Generator
+from contextlib import contextmanager
+from typing import Any
+
+from benchmarks.synthetic_study import SyntheticStudyMix, plan_synthetic_study, write_synthetic_study
+
+# Version of the benchmark results format, to increment when the format changes in an incompatible
+# way.
+results_format_version = 1
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='run_benchmarks',
+        description="Benchmark the MNI 7T DICOM to BIDS converter on a synthetic DICOM study.",
+    )
+
+    parser.add_argument('--series', type=int, default=20,
+        help="Number of DICOM series of the synthetic study.")
+
+    parser.add_argument('--files', type=int, default=40,
+        help="Number of DICOM files per DICOM series of the synthetic study.")
+
+    parser.add_argument('--matrix', type=int, default=64,
+        help="Number of rows and columns of the synthetic DICOM images.")
+
+    parser.add_argument('--mix', type=float, nargs=3, default=[0.8, 0.1, 0.1], metavar=('MAPPED', 'IGNORED', 'UNKNOWN'),
+        help="Proportions of mapped, ignored and unknown DICOM series in the synthetic study.")
+
+    parser.add_argument('--seed', type=int, default=0,
+        help="Seed of the synthetic study generation.")
+
+    parser.add_argument('--repeat', type=int, default=3,
+        help="Number of times each benchmark is run.")
+
+    parser.add_argument('--work-dir',
+        help="Directory in which to generate the synthetic study and BIDS datasets (default: temporary directory).")
+
+    parser.add_argument('--output',
+        help="Write the benchmark results to this JSON file path.")
+
+    parser.add_argument('--compare',
+        help="Compare the benchmark results with the results of this JSON file path.")
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir_path:
+        results = run_benchmarks(args, work_dir_path)
+
+    print_results(results)
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            print_comparison(json.load(file), results)
+
+
+def run_benchmarks(args: argparse.Namespace, work_dir_path: str) -> dict[str, Any]:
+    """
+    Generate the synthetic study and run the benchmarks on it.
+    """
+
+    mix = SyntheticStudyMix(*args.mix)
+
+    print("Generating synthetic DICOM study...")
+
+    study_dir_path = os.path.join(work_dir_path, 'dicom')
+    series_list = plan_synthetic_study(args.series, args.files, mix, args.seed)
+    write_synthetic_study(study_dir_path, series_list, args.matrix, args.seed)
+
+    install_fake_dicom_to_niix(os.path.join(work_dir_path, 'bin'))
+
+    samples: dict[str, list[float]] = defaultdict(list)
+
+    for repeat in range(args.repeat):
+        print(f"Running benchmarks ({repeat + 1} / {args.repeat})...")
+
+        samples['startup.help'].append(benchmark_startup())
+
+        benchmark_scan(study_dir_path, samples)
+
+        benchmark_headers(study_dir_path, samples)
+
+        bids_dir_path = os.path.join(work_dir_path, f'bids_{repeat}')
+        profile_path = os.path.join(work_dir_path, f'profile_{repeat}.json')
+        benchmark_conversion(study_dir_path, bids_dir_path, profile_path, samples)
+
+        bids_dir_path = os.path.join(work_dir_path, f'bids_minimized_{repeat}')
+        profile_path = os.path.join(work_dir_path, f'profile_minimized_{repeat}.json')
+        benchmark_conversion(study_dir_path, bids_dir_path, profile_path, samples, minimize_metadata_ops=True)
+
+        bids_dir_path = os.path.join(work_dir_path, f'bids_pipeline_{repeat}')
+        profile_path = os.path.join(work_dir_path, f'profile_pipeline_{repeat}.json')
+        benchmark_conversion(study_dir_path, bids_dir_path, profile_path, samples, pipeline=True)
+
+        # The first conversion fills the conversion cache, and the second one reuses it.
+        cache_dir_path = os.path.join(work_dir_path, f'cache_{repeat}')
+        for cache_run in ['miss', 'hit']:
+            bids_dir_path = os.path.join(work_dir_path, f'bids_cache_{cache_run}_{repeat}')
+            profile_path = os.path.join(work_dir_path, f'profile_cache_{cache_run}_{repeat}.json')
+            benchmark_conversion(study_dir_path, bids_dir_path, profile_path, samples, cache_dir_path=cache_dir_path)
+
+    return {
+        'format_version' : results_format_version,
+        'commit'         : get_git_commit(),
+        'python_version' : platform.python_version(),
+        'parameters'     : {
+            'series' : args.series,
+            'files'  : sum(series.files_count for series in series_list),
+            'matrix' : args.matrix,
+            'mix'    : args.mix,
+            'seed'   : args.seed,
+            'repeat' : args.repeat,
+        },
+        'metrics': {name: summarize_samples(values) for name, values in sorted(samples.items())},
+    }
+
+
+def install_fake_dicom_to_niix(bin_dir_path: str):
+    """
+    Install the stub `dcm2niix` executable in a directory and add this directory at the start of
+    the `PATH` of the benchmark process and its children.
+    """
+
+    os.makedirs(bin_dir_path, exist_ok=True)
+
+    fake_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_dcm2niix.py')
+    wrapper_path = os.path.join(bin_dir_path, 'dcm2niix')
+    with open(wrapper_path, 'w') as file:
+        file.write(f'#!/bin/sh\nexec "{sys.executable}" "{fake_path}" "$@"\n')
+
+    os.chmod(wrapper_path, os.stat(wrapper_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    os.environ['PATH'] = bin_dir_path + os.pathsep + os.environ['PATH']
+
+
+def benchmark_startup() -> float:
+    """
+    Measure the time taken by the converter command line to display its help.
+    """
+
+    command = [sys.executable, '-m', 'mni_7t_dicom_to_bids.scripts.run_mni7t_dcm2bids', '--help']
+
+    start_time = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start_time
+
+
+def benchmark_scan(study_dir_path: str, samples: dict[str, list[float]]):
+    """
+    Measure the peak Python memory usage of the DICOM study scan, which holds the DICOM file paths
+    of all the DICOM series.
+    """
+
+    from mni_7t_dicom_to_bids.profiler import Profiler
+    from mni_7t_dicom_to_bids.sort_dicom_series import sort_dicom_series
+
+    tracemalloc.start()
+    try:
+        with silence_stdout():
+            dicom_series_list = sort_dicom_series(study_dir_path, Profiler())
+
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples['scan.peak_memory'].append(peak_memory)
+    samples['scan.series_count'].append(len(dicom_series_list))
+
+
+def benchmark_headers(study_dir_path: str, samples: dict[str, list[float]]):
+    """
+    Measure the time taken to read the DICOM headers of all the DICOM files of the study with pydicom
+    and with the fast DICOM tag reader, and check that both readers return the same headers.
+    """
+
+    from bic_util.fs import iter_all_dir_files
+
+    from mni_7t_dicom_to_bids.dicom_header import read_dicom_file_header
+
+    dicom_file_paths = [
+        os.path.join(study_dir_path, file_rel_path) for file_rel_path in iter_all_dir_files(study_dir_path)
+    ]
+
+    headers_list = []
+    for name, fast in [('pydicom', False), ('fast', True)]:
+        start_time = time.perf_counter()
+        headers_list.append([read_dicom_file_header(file_path, fast) for file_path in dicom_file_paths])
+        samples[f'headers.{name}'].append(time.perf_counter() - start_time)
+
+    if headers_list[0] != headers_list[1]:
+        raise Exception("The fast DICOM tag reader and pydicom returned different DICOM headers.")
+
+
+def benchmark_conversion(
+    study_dir_path: str,
+    bids_dir_path: str,
+    profile_path: str,
+    samples: dict[str, list[float]],
+    minimize_metadata_ops: bool = False,
+    pipeline: bool = False,
+    cache_dir_path: str | None = None,
+):
+    """
+    Convert the synthetic study in-process with the profiler enabled and add the measures of the
+    profile report to the benchmark samples. The conversions with minimized metadata operations,
+    with the conversion pipeline or with the conversion cache only add their total time and metadata
+    operations count to the samples.
+    """
+
+    from mni_7t_dicom_to_bids.args import process_args
+    from mni_7t_dicom_to_bids.pipeline import mni_7t_dicom_to_bids
+    from mni_7t_dicom_to_bids.scripts.run_mni7t_dcm2bids import get_argument_parser
+
+    os.makedirs(bids_dir_path)
+
+    args = process_args(get_argument_parser().parse_args([
+        study_dir_path,
+        bids_dir_path,
+        '--subject', 'bench',
+        '--session', '01',
+        '--skip-unknowns',
+        '--dataset-files',
+        '--quiet',
+        '--no-history',
+        '--profile', profile_path,
+        *(['--minimize-metadata-ops'] if minimize_metadata_ops else []),
+        *(['--pipeline'] if pipeline else []),
+        *(['--cache', '--cache-dir', cache_dir_path] if cache_dir_path is not None else []),
+    ]))
+
+    if minimize_metadata_ops:
+        prefix = 'conversion_minimized_metadata'
+    elif pipeline:
+        prefix = 'conversion_pipeline'
+    elif cache_dir_path is not None:
+        prefix = 'conversion_cache_hit' if os.path.isdir(cache_dir_path) else 'conversion_cache_miss'
+    else:
+        prefix = 'conversion'
+
+    start_time = time.perf_counter()
+    with silence_stdout():
+        mni_7t_dicom_to_bids(args)
+
+    samples[f'{prefix}.total'].append(time.perf_counter() - start_time)
+
+    with open(profile_path) as file:
+        profile = json.load(file)
+
+    samples[f'{prefix}.metadata_ops_count'].append(sum(stage['metadata_ops'] for stage in profile['stages']))
+
+    if minimize_metadata_ops or pipeline or cache_dir_path is not None:
+        return
+
+    samples['conversion.peak_rss'].append(profile['peak_rss'])
+
+    for stage in profile['stages']:
+        samples[f'stage.{stage["name"]}'].append(stage['wall_time'])
+
+    # Sum the steps of all the DICOM series.
+    series_step_times: dict[str, float] = defaultdict(float)
+    for series in profile['series']:
+        for stage in series['stages']:
+            series_step_times[stage['name']] += stage['wall_time']
+
+    for name, wall_time in series_step_times.items():
+        samples[f'series.{name}'].append(wall_time)
+
+
+@contextmanager
+def silence_stdout() -> Generator[None]:
+    """
+    Redirect the standard output of the process and its children to `/dev/null`.
+    """
+
+    sys.stdout.flush()
+    stdout_fd = os.dup(1)
+    devnull_fd = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull_fd, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(stdout_fd, 1)
+        os.close(stdout_fd)
+        os.close(devnull_fd)
+
+
+def summarize_samples(values: list[float]) -> dict[str, float]:
+    """
+    Summarize the samples of a benchmark metric.
+    """
+
+    return {
+        'median' : statistics.median(values),
+        'min'    : min(values),
+        'max'    : max(values),
+    }
+
+
+def get_git_commit() -> str | None:
+    """
+    Get the current Git commit of the project if available.
+    """
+
+    try:
+        process = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return process.stdout.strip()
+
+
+def print_results(results: dict[str, Any]):
+    """
+    Print the benchmark results to the user.
+    """
+
+    print(f"Benchmark results (commit: {results['commit']}):")
+    for name, summary in results['metrics'].items():
+        print(f"- {name}: {_format_metric(name, summary['median'])}"
+            f" (min: {_format_metric(name, summary['min'])}, max: {_format_metric(name, summary['max'])})")
+
+
+def print_comparison(baseline: dict[str, Any], results: dict[str, Any]):
+    """
+    Print the comparison of the benchmark results with baseline benchmark results to the user.
+    """
+
+    if baseline['parameters'] != results['parameters']:
+        print("Warning: the baseline results were obtained with different benchmark parameters.")
+
+    print(f"Comparison with baseline (commit: {baseline['commit']}):")
+    for name, summary in results['metrics'].items():
+        baseline_summary = baseline['metrics'].get(name)
+        if baseline_summary is None or baseline_summary['median'] == 0:
+            print(f"- {name}: {_format_metric(name, summary['median'])} (no baseline)")
+            continue
+
+        ratio = summary['median'] / baseline_summary['median']
+        print(
+            f"- {name}: {_format_metric(name, baseline_summary['median'])}"
+            f" -> {_format_metric(name, summary['median'])} ({ratio:.2f}x)"
+        )
+
+
+def _format_metric(name: str, value: float) -> str:
+    """
+    Format the value of a benchmark metric for display.
+    """
+
+    if name.endswith(('rss', 'memory')):
+        return f"{value / 2**20:.1f} MiB"
+
+    if name.endswith('count'):
+        return f"{value:.0f}"
+
+    return f"{value * 1000:.1f} ms"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+import os
+import random
+from dataclasses import dataclass
+
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, MRImageStorage, generate_uid
+
+from mni_7t_dicom_to_bids.variables import bids_dicom_ignores, bids_dicom_mappings
+
+# Prefix of the UIDs generated for the synthetic studies.
+uid_prefix = '1.2.826.0.1.3680043.10.1471.'
+
+
+@dataclass
+class SyntheticSeriesInfo:
+    """
+    Information about a synthetic DICOM series.
+    """
+
+    description: str
+    """
+    The DICOM series description.
+    """
+
+    number: int
+    """
+    The DICOM series number.
+    """
+
+    files_count: int
+    """
+    The number of DICOM files of the series.
+    """
+
+    echoes_count: int
+    """
+    The number of echoes of the series.
+    """
+
+    phase: bool
+    """
+    Whether the series contains phase images.
+    """
+
+    orientation: tuple[float, float, float, float, float, float] = (1, 0, 0, 0, 1, 0)
+    """
+    The DICOM image orientation of the series, the slices being stacked along its normal.
+    """
+
+    bits_stored: int = 16
+    """
+    The number of bits of the pixel values of the series.
+    """
+
+
+@dataclass
+class SyntheticStudyMix:
+    """
+    The proportions of mapped, ignored and unknown DICOM series in a synthetic study.
+    """
+
+    mapped: float = 0.8
+    """
+    The proportion of DICOM series mapped to a BIDS acquisition.
+    """
+
+    ignored: float = 0.1
+    """
+    The proportion of ignored DICOM series.
+    """
+
+    unknown: float = 0.1
+    """
+    The proportion of unknown DICOM series.
+    """
+
+
+def get_mapped_series_descriptions() -> list[str]:
+    """
+    Get concrete DICOM series descriptions that match the BIDS mappings of the converter, the
+    wildcards of the mapping patterns being removed.
+    """
+
+    descriptions: list[str] = []
+    for bids_dicom_mapping in bids_dicom_mappings.values():
+        for bids_dicom_series_descriptions in bids_dicom_mapping.values():
+            if isinstance(bids_dicom_series_descriptions, str):
+                bids_dicom_series_descriptions = [bids_dicom_series_descriptions]
+
+            for bids_dicom_series_description in bids_dicom_series_descriptions:
+                description = bids_dicom_series_description.replace('*', '')
+                if description not in descriptions:
+                    descriptions.append(description)
+
+    return descriptions
+
+
+def plan_synthetic_study(
+    series_count: int,
+    files_per_series: int,
+    mix: SyntheticStudyMix,
+    seed: int,
+) -> list[SyntheticSeriesInfo]:
+    """
+    Plan the DICOM series of a synthetic study. The plan only depends on its arguments so that the
+    same study can be generated again to compare benchmark results.
+    """
+
+    rng = random.Random(seed)
+
+    mapped_descriptions = get_mapped_series_descriptions()
+
+    total = mix.mapped + mix.ignored + mix.unknown
+    series_list: list[SyntheticSeriesInfo] = []
+    number = 1
+    while len(series_list) < series_count:
+        draw = rng.random() * total
+        if draw < mix.mapped:
+            description = rng.choice(mapped_descriptions)
+        elif draw < mix.mapped + mix.ignored:
+            description = rng.choice(bids_dicom_ignores)
+        else:
+            description = f'unknown_series_{number}'
+
+        echoes_count = _get_echoes_count(description)
+        files_count = max(files_per_series // echoes_count, 1) * echoes_count
+
+        series_list.append(SyntheticSeriesInfo(description, number, files_count, echoes_count, False))
+        number += 1
+
+        # Some acquisitions are followed by a second DICOM series with the same description, which
+        # is a phase series for the functional and diffusion acquisitions.
+        if _has_second_series(description) and len(series_list) < series_count:
+            phase = not description.startswith('fmap-b1')
+            series_list.append(SyntheticSeriesInfo(description, number, files_count, echoes_count, phase))
+            number += 1
+
+    return series_list
+
+
+def write_synthetic_study(
+    study_dir_path: str,
+    series_list: list[SyntheticSeriesInfo],
+    matrix_size: int,
+    seed: int,
+):
+    """
+    Write the DICOM files of a synthetic study in a directory, with one sub-directory per DICOM
+    series as in a scanner export.
+    """
+
+    rng = random.Random(seed)
+
+    study_uid = generate_uid(uid_prefix, [str(seed), 'study'])
+
+    for series in series_list:
+        series_dir_path = os.path.join(study_dir_path, f'{series.number:04d}')
+        os.makedirs(series_dir_path, exist_ok=True)
+
+        series_uid = generate_uid(uid_prefix, [str(seed), 'series', str(series.number)])
+        slices_count = series.files_count // series.echoes_count
+
+        for index in range(series.files_count):
+            echo_number = index // slices_count + 1
+            slice_number = index % slices_count
+            # The entropy sources of a UID are concatenated, so the series number and index are
+            # separated to avoid collisions between for instance series 1 index 11 and series 11 index 1.
+            dicom = _create_dicom(
+                study_uid,
+                series_uid,
+                generate_uid(uid_prefix, [str(seed), 'instance', f'{series.number}.{index}']),
+                series,
+                index + 1,
+                echo_number,
+                slice_number,
+                matrix_size,
+                _get_pixel_data(rng, matrix_size, series.bits_stored),
+            )
+
+            dicom.ImagesInAcquisition = slices_count
+
+            dicom.save_as(os.path.join(series_dir_path, f'IM_{index + 1:05d}.dcm'), enforce_file_format=True)
+
+
+def _create_dicom(
+    study_uid: str,
+    series_uid: str,
+    instance_uid: str,
+    series: SyntheticSeriesInfo,
+    instance_number: int,
+    echo_number: int,
+    slice_number: int,
+    matrix_size: int,
+    pixel_data: bytes,
+) -> FileDataset:
+    """
+    Create a synthetic MR DICOM file dataset.
+    """
+
+    file_meta = FileMetaDataset()
+    file_meta.MediaStorageSOPClassUID    = MRImageStorage
+    file_meta.MediaStorageSOPInstanceUID = instance_uid
+    file_meta.TransferSyntaxUID          = ExplicitVRLittleEndian
+
+    dicom = FileDataset('', {}, file_meta=file_meta, preamble=b'\0' * 128)
+
+    dicom.ImageType         = ['DERIVED' if series.phase else 'ORIGINAL', 'PRIMARY', 'P' if series.phase else 'M']
+    dicom.SOPClassUID       = MRImageStorage
+    dicom.SOPInstanceUID    = instance_uid
+    dicom.Modality          = 'MR'
+    dicom.Manufacturer      = 'SIEMENS'
+    dicom.ManufacturerModelName = 'MAGNETOM Terra'
+    dicom.InstitutionName   = 'Montreal Neurological Institute'
+    dicom.StationName       = 'MNI7T'
+    dicom.SoftwareVersions  = 'syngo MR XA60'
+    dicom.MagneticFieldStrength = '7'
+    dicom.ImagingFrequency  = '297.2'
+    dicom.SeriesDescription = series.description
+    dicom.ProtocolName      = series.description
+    dicom.BodyPartExamined  = 'BRAIN'
+    dicom.PatientPosition   = 'HFS'
+    dicom.MRAcquisitionType = '3D'
+    dicom.ScanningSequence  = ['GR', 'IR']
+    dicom.SequenceVariant   = ['SK', 'SP', 'MP']
+    dicom.SequenceName      = '*tfl3d1_16'
+    dicom.StudyDate         = '20260101'
+    dicom.AcquisitionDate   = '20260101'
+    dicom.AcquisitionTime   = f'{10 + series.number // 60:02d}{series.number % 60:02d}00.000000'
+    dicom.AcquisitionNumber = 1
+    dicom.PatientName       = 'Synthetic^Subject'
+    dicom.PatientID         = 'SYNTHETIC'
+    dicom.PatientBirthDate  = '19900101'
+    dicom.PatientSex        = 'O'
+    dicom.PatientAge        = '035Y'
+    dicom.PatientSize       = '1.75'
+    dicom.PatientWeight     = '70'
+    dicom.SliceThickness    = '1'
+    dicom.EchoTime          = str(2 * echo_number)
+    dicom.RepetitionTime    = '5000'
+    dicom.FlipAngle         = '4'
+    dicom.EchoNumbers       = echo_number
+    dicom.StudyInstanceUID  = study_uid
+    dicom.SeriesInstanceUID = series_uid
+    dicom.SeriesNumber      = series.number
+    dicom.InstanceNumber    = instance_number
+    dicom.ImagePositionPatient    = [f'{slice_number * axis:g}' for axis in _get_slice_normal(series.orientation)]
+    dicom.ImageOrientationPatient = [f'{cosine:g}' for cosine in series.orientation]
+    dicom.SamplesPerPixel           = 1
+    dicom.PhotometricInterpretation = 'MONOCHROME2'
+    dicom.Rows                      = matrix_size
+    dicom.Columns                   = matrix_size
+    dicom.PixelSpacing              = ['1', '1']
+    dicom.BitsAllocated             = 16
+    dicom.BitsStored                = series.bits_stored
+    dicom.HighBit                   = series.bits_stored - 1
+    dicom.PixelRepresentation       = 0
+    dicom.PixelData                 = pixel_data
+
+    return dicom
+
+
+def _get_pixel_data(rng: random.Random, matrix_size: int, bits_stored: int) -> bytes:
+    """
+    Get random little endian 16 bits pixel data whose values fit in a number of bits.
+    """
+
+    pixel_data = rng.randbytes(matrix_size * matrix_size * 2)
+    if bits_stored >= 16:
+        return pixel_data
+
+    # Clear the high bits of the second byte of each little endian pixel value.
+    mask = (1 << (bits_stored - 8)) - 1 if bits_stored > 8 else 0
+    return bytes(byte & mask if index % 2 else byte for index, byte in enumerate(pixel_data))
+
+
+def _get_slice_normal(orientation: tuple[float, float, float, float, float, float]) -> tuple[float, float, float]:
+    """
+    Get the normal of the slices of a DICOM image orientation.
+    """
+
+    row_x, row_y, row_z, column_x, column_y, column_z = orientation
+    return (
+        row_y * column_z - row_z * column_y,
+        row_z * column_x - row_x * column_z,
+        row_x * column_y - row_y * column_x,
+    )
+
+
+def _get_echoes_count(description: str) -> int:
+    """
+    Get the number of echoes of a synthetic DICOM series from its description.
+    """
+
+    if 'me_gre' in description:
+        return 5
+
+    if '_ME_' in description:
+        return 3
+
+    return 1
+
+
+def _has_second_series(description: str) -> bool:
+    """
+    Check whether a synthetic DICOM series is followed by a second DICOM series with the same
+    description, which is the case of the functional, diffusion and B1 map acquisitions.
+    """
+
+    return description.startswith(('func-', 'fmap-b1')) or 'dwi_acq' in description
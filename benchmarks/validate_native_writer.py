@@ -0,0 +1,342 @@
+"""
+Validate the in-process NIfTI writer of the MNI 7T DICOM to BIDS converter against `dcm2niix` on a
+synthetic DICOM study. Each DICOM series of the study is converted by both the native writer and
+the `dcm2niix` executable found on the `PATH`, which must be a real `dcm2niix` and not the stub of
+the benchmarks. The volumes are compared in the same RAS orientation, along with their data types,
+scalings, affines, and the JSON sidecar fields written by the native writer.
+
+The study contains DICOM series in several orientations and pixel value ranges, as well as phase
+and multi-echo DICOM series that the native writer must reject.
+
+Usage (from the project root directory, with the project installed):
+
+    python -m benchmarks.validate_native_writer
+"""
+
+import argparse
+import gzip
+import json
+import math
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+import numpy as np
+
+from benchmarks.synthetic_study import SyntheticSeriesInfo, write_synthetic_study
+from mni_7t_dicom_to_bids.dataclass import DicomSeriesInfo
+from mni_7t_dicom_to_bids.native_writer import (
+    UnsupportedDicomSeriesError,
+    read_native_dicom_series,
+    write_native_nifti,
+)
+from mni_7t_dicom_to_bids.profiler import Profiler
+from mni_7t_dicom_to_bids.sort_dicom_series import sort_dicom_series
+
+# Orientations of the synthetic DICOM series.
+orientations: dict[str, tuple[float, float, float, float, float, float]] = {
+    'axial'    : (1, 0, 0, 0, 1, 0),
+    'sagittal' : (0, 1, 0, 0, 0, -1),
+    'coronal'  : (1, 0, 0, 0, 0, -1),
+    'oblique'  : (0.866025, 0.5, 0, -0.5, 0.866025, 0),
+}
+
+# Sidecar fields that differ by design between the native writer and `dcm2niix`.
+ignored_sidecar_fields = {'ConversionSoftware', 'ConversionSoftwareVersion'}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='validate_native_writer',
+        description="Validate the in-process NIfTI writer against dcm2niix on a synthetic DICOM study.",
+    )
+
+    parser.add_argument('--files', type=int, default=24,
+        help="Number of DICOM files per DICOM series of the synthetic study.")
+
+    parser.add_argument('--matrix', type=int, default=64,
+        help="Number of rows and columns of the synthetic DICOM images.")
+
+    parser.add_argument('--seed', type=int, default=0,
+        help="Seed of the synthetic study generation.")
+
+    parser.add_argument('--work-dir',
+        help="Directory in which to generate the synthetic study and the outputs (default: temporary directory).")
+
+    args = parser.parse_args()
+
+    if shutil.which('dcm2niix') is None:
+        print("`dcm2niix` is not accessible on this machine.")
+        sys.exit(2)
+
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir_path:
+        failures = validate_native_writer(args, work_dir_path)
+
+    if failures != 0:
+        print(f"{failures} DICOM series differ between the native writer and dcm2niix.")
+        sys.exit(1)
+
+    print("The native writer output matches dcm2niix.")
+
+
+def validate_native_writer(args: argparse.Namespace, work_dir_path: str) -> int:
+    """
+    Generate the synthetic study, convert its DICOM series with both converters, print the
+    comparison of each DICOM series, and return the number of failed comparisons.
+    """
+
+    study_dir_path = os.path.join(work_dir_path, 'dicom')
+    series_list = plan_validation_study(args.files)
+    write_synthetic_study(study_dir_path, series_list, args.matrix, args.seed)
+
+    failures = 0
+    for dicom_series in sort_dicom_series(study_dir_path, Profiler()):
+        expect_native = 'fallback' not in dicom_series.description
+        output_dir_path = os.path.join(work_dir_path, f'{dicom_series.number:04d}')
+        native_dir_path = os.path.join(output_dir_path, 'native')
+        dicom_to_niix_dir_path = os.path.join(output_dir_path, 'dcm2niix')
+        os.makedirs(native_dir_path)
+        os.makedirs(dicom_to_niix_dir_path)
+
+        start_time = time.perf_counter()
+        try:
+            datasets = read_native_dicom_series(dicom_series)
+            write_native_nifti(datasets, native_dir_path, 'series')
+        except UnsupportedDicomSeriesError as error:
+            if expect_native:
+                failures += 1
+                print(f"FAIL {dicom_series.description}: rejected by the native writer: {error}")
+            else:
+                print(f"OK   {dicom_series.description}: rejected by the native writer: {error}")
+
+            continue
+
+        native_time = time.perf_counter() - start_time
+
+        if not expect_native:
+            failures += 1
+            print(f"FAIL {dicom_series.description}: not rejected by the native writer")
+            continue
+
+        start_time = time.perf_counter()
+        run_dicom_to_niix(dicom_series, dicom_to_niix_dir_path)
+        dicom_to_niix_time = time.perf_counter() - start_time
+
+        differences = compare_outputs(native_dir_path, dicom_to_niix_dir_path)
+        timings = f"(native {native_time * 1000:.1f} ms, dcm2niix {dicom_to_niix_time * 1000:.1f} ms)"
+        if differences != []:
+            failures += 1
+            print(f"FAIL {dicom_series.description} {timings}:")
+            for difference in differences:
+                print(f"     - {difference}")
+        else:
+            print(f"OK   {dicom_series.description} {timings}")
+
+    return failures
+
+
+def plan_validation_study(files_count: int) -> list[SyntheticSeriesInfo]:
+    """
+    Plan the DICOM series of the validation study, the DICOM series that must be rejected by the
+    native writer having 'fallback' in their description.
+    """
+
+    series_list: list[SyntheticSeriesInfo] = []
+    for orientation_name, orientation in orientations.items():
+        for bits_stored in (12, 16):
+            series_list.append(SyntheticSeriesInfo(
+                description  = f'anat-T1w_acq-mp2rage_07mm_CSptx_UNI-DEN_{orientation_name}_{bits_stored}bits',
+                number       = len(series_list) + 1,
+                files_count  = files_count,
+                echoes_count = 1,
+                phase        = False,
+                orientation  = orientation,
+                bits_stored  = bits_stored,
+            ))
+
+    series_list.append(SyntheticSeriesInfo(
+        'anat-T1w_acq-mp2rage_07mm_CSptx_T1_Images_single_slice', len(series_list) + 1, 1, 1, False,
+    ))
+
+    series_list.append(SyntheticSeriesInfo(
+        'Romeo_Mask_fallback_phase', len(series_list) + 1, files_count, 1, True,
+    ))
+
+    series_list.append(SyntheticSeriesInfo(
+        'anat-T2star_acq-me_gre_fallback_multi_echo', len(series_list) + 1, files_count * 2, 2, False,
+    ))
+
+    return series_list
+
+
+def run_dicom_to_niix(dicom_series: DicomSeriesInfo, output_dir_path: str):
+    """
+    Convert a DICOM series with `dcm2niix` using the converter options.
+    """
+
+    with tempfile.TemporaryDirectory() as dicom_dir_path:
+        for dicom_file_path in dicom_series.file_paths:
+            shutil.copy(dicom_file_path, dicom_dir_path)
+
+        subprocess.run(
+            ['dcm2niix', '-z', 'y', '-b', 'y', '-o', output_dir_path, '-f', 'series', dicom_dir_path],
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+
+
+def compare_outputs(native_dir_path: str, dicom_to_niix_dir_path: str) -> list[str]:
+    """
+    Compare the outputs of the native writer and `dcm2niix` for a DICOM series, and return the
+    list of their differences.
+    """
+
+    file_names = sorted(os.listdir(dicom_to_niix_dir_path))
+    if file_names != ['series.json', 'series.nii.gz']:
+        return [f"dcm2niix wrote the files {', '.join(file_names)}"]
+
+    differences: list[str] = []
+
+    native_header, native_data = read_nifti(os.path.join(native_dir_path, 'series.nii.gz'))
+    expected_header, expected_data = read_nifti(os.path.join(dicom_to_niix_dir_path, 'series.nii.gz'))
+
+    for field in ('datatype', 'scl_slope', 'scl_inter', 'qform_code', 'sform_code'):
+        if native_header[field] != expected_header[field]:
+            differences.append(f"header {field}: {native_header[field]} != {expected_header[field]}")
+
+    native_data, native_affine = reorient_to_ras(native_data, native_header['affine'])
+    expected_data, expected_affine = reorient_to_ras(expected_data, expected_header['affine'])
+
+    if native_data.shape != expected_data.shape:
+        differences.append(f"shape: {native_data.shape} != {expected_data.shape}")
+    elif not np.array_equal(native_data, expected_data):
+        differences.append("voxel data differ")
+
+    if not np.allclose(native_affine, expected_affine, atol=1e-3):
+        differences.append(f"affine:\n{native_affine}\n!=\n{expected_affine}")
+
+    if not np.allclose(native_header['qform'], native_header['affine'], atol=1e-3):
+        differences.append("the qform of the native writer does not match its sform")
+
+    with open(os.path.join(native_dir_path, 'series.json')) as file:
+        native_sidecar = json.load(file)
+
+    with open(os.path.join(dicom_to_niix_dir_path, 'series.json')) as file:
+        expected_sidecar = json.load(file)
+
+    for field, value in native_sidecar.items():
+        if field in ignored_sidecar_fields:
+            continue
+
+        if field not in expected_sidecar:
+            differences.append(f"sidecar field {field} is not written by dcm2niix")
+        elif not values_equal(value, expected_sidecar[field]):
+            differences.append(f"sidecar field {field}: {value!r} != {expected_sidecar[field]!r}")
+
+    return differences
+
+
+def read_nifti(nifti_file_path: str) -> tuple[dict[str, Any], np.ndarray[Any, np.dtype[Any]]]:
+    """
+    Read the header fields and the voxel data of a compressed NIfTI-1 file, the data being indexed
+    by voxel coordinates.
+    """
+
+    with gzip.open(nifti_file_path, 'rb') as file:
+        content = file.read()
+
+    dims = struct.unpack_from('<8h', content, 40)
+    datatype, = struct.unpack_from('<h', content, 70)
+    pixdim = struct.unpack_from('<8f', content, 76)
+    vox_offset, scl_slope, scl_inter = struct.unpack_from('<3f', content, 108)
+    qform_code, sform_code = struct.unpack_from('<2h', content, 252)
+    quatern = struct.unpack_from('<6f', content, 256)
+    srows = struct.unpack_from('<12f', content, 280)
+
+    dtype = {2: '<u1', 4: '<i2', 512: '<u2', 8: '<i4', 16: '<f4'}[datatype]
+    shape = tuple(dims[1:dims[0] + 1])
+    data = np.frombuffer(content, dtype=dtype, offset=int(vox_offset), count=math.prod(shape))
+    data = data.reshape(shape[::-1]).transpose()
+    data = data.reshape(data.shape[:3])
+
+    affine = np.eye(4)
+    affine[:3, :] = np.array(srows).reshape(3, 4)
+
+    header = {
+        'datatype'   : datatype,
+        'scl_slope'  : scl_slope,
+        'scl_inter'  : scl_inter,
+        'qform_code' : qform_code,
+        'sform_code' : sform_code,
+        'affine'     : affine,
+        'qform'      : get_qform_affine(quatern, pixdim),
+    }
+
+    return header, data
+
+
+def get_qform_affine(quatern: tuple[float, ...], pixdim: tuple[float, ...]) -> np.ndarray[Any, np.dtype[np.float64]]:
+    """
+    Get the affine described by the quaternion parameters of a NIfTI header.
+    """
+
+    b, c, d, x, y, z = quatern
+    a = math.sqrt(max(1 - (b * b + c * c + d * d), 0))
+    rotation = np.array([
+        [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+        [2 * (b * c + a * d), a * a + c * c - b * b - d * d, 2 * (c * d - a * b)],
+        [2 * (b * d - a * c), 2 * (c * d + a * b), a * a + d * d - c * c - b * b],
+    ])
+
+    qfac = -1 if pixdim[0] < 0 else 1
+    affine = np.eye(4)
+    affine[:3, :3] = rotation * np.array([pixdim[1], pixdim[2], pixdim[3] * qfac])
+    affine[:3, 3] = [x, y, z]
+    return affine
+
+
+def reorient_to_ras(
+    data: np.ndarray[Any, np.dtype[Any]],
+    affine: np.ndarray[Any, np.dtype[np.float64]],
+) -> tuple[np.ndarray[Any, np.dtype[Any]], np.ndarray[Any, np.dtype[np.float64]]]:
+    """
+    Flip and transpose a volume so that its voxel axes are the closest to the RAS axes, and return
+    the reoriented volume and affine.
+    """
+
+    affine = affine.copy()
+    for axis in range(3):
+        world_axis = int(np.argmax(np.abs(affine[:3, axis])))
+        if affine[world_axis, axis] < 0:
+            data = np.flip(data, axis)
+            affine[:, 3] += affine[:, axis] * (data.shape[axis] - 1)
+            affine[:, axis] *= -1
+
+    order = np.argsort([int(np.argmax(np.abs(affine[:3, axis]))) for axis in range(3)])
+    data = data.transpose(order)
+    affine[:, :3] = affine[:, order]
+
+    return data, affine
+
+
+def values_equal(value: Any, expected: Any) -> bool:
+    """
+    Compare two JSON values, the numbers being compared with a relative tolerance.
+    """
+
+    if isinstance(value, list) and isinstance(expected, list):
+        return len(value) == len(expected) and all(map(values_equal, value, expected))  # type: ignore
+
+    if isinstance(value, int | float) and isinstance(expected, int | float):
+        return math.isclose(value, expected, rel_tol=1e-5, abs_tol=1e-6)
+
+    return value == expected
+
+
+if __name__ == '__main__':
+    main()
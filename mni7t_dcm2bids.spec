@@ -1,38 +1,50 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# Names of the executables and the scripts of the command line entry points of the converter, each
+# entry point is compiled into its own executable.
+entry_points = [
+    ('mni7t_dcm2bids',         'src/mni_7t_dicom_to_bids/scripts/run_mni7t_dcm2bids.py'),
+    ('mni7t_dcm2bids_watch',   'src/mni_7t_dicom_to_bids/scripts/run_mni7t_dcm2bids_watch.py'),
+    ('mni7t_dcm2bids_receive', 'src/mni_7t_dicom_to_bids/scripts/run_mni7t_dcm2bids_receive.py'),
+    ('mni7t_dcm2bids_migrate', 'src/mni_7t_dicom_to_bids/scripts/run_mni7t_dcm2bids_migrate.py'),
+    ('mni7t_dcm2bids_catalog', 'src/mni_7t_dicom_to_bids/scripts/run_mni7t_dcm2bids_catalog.py'),
+    ('mni7t_dcm2bids_serve',   'src/mni_7t_dicom_to_bids/scripts/run_mni7t_dcm2bids_serve.py'),
+    ('mni7t_dcm2bids_submit',  'src/mni_7t_dicom_to_bids/scripts/run_mni7t_dcm2bids_submit.py'),
+]
 
-a = Analysis(
-    ['src/mni_7t_dicom_to_bids/scripts/run_mni7t_dcm2bids.py'],
-    pathex=[],
-    binaries=[],
-    datas=[('src/mni_7t_dicom_to_bids/assets', 'mni_7t_dicom_to_bids/assets')],
-    hiddenimports=[],
-    hookspath=[],
-    hooksconfig={},
-    runtime_hooks=[],
-    excludes=[],
-    noarchive=False,
-    optimize=0,
-)
-pyz = PYZ(a.pure)
+for name, script_path in entry_points:
+    a = Analysis(
+        [script_path],
+        pathex=[],
+        binaries=[],
+        datas=[('src/mni_7t_dicom_to_bids/assets', 'mni_7t_dicom_to_bids/assets')],
+        hiddenimports=[],
+        hookspath=[],
+        hooksconfig={},
+        runtime_hooks=[],
+        excludes=[],
+        noarchive=False,
+        optimize=0,
+    )
+    pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='mni7t_dcm2bids',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=True,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name=name,
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
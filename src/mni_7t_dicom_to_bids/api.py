@@ -0,0 +1,155 @@
+"""
+Library API of the MNI 7T DICOM to BIDS converter, which can be used to convert DICOM studies from
+a Python program without running the converter command line in a subprocess. Unlike the command
+line, the API raises a `ConversionError` when a conversion cannot be done instead of exiting the
+process, and returns the outcome of each DICOM series conversion.
+
+The converter configuration (quiet mode, events) is global to the process, so the sessions must be
+converted one at a time.
+"""
+
+import os
+
+from mni_7t_dicom_to_bids.args import (
+    AbortUnknownsArg,
+    Args,
+    CacheArg,
+    ConversionFiltersArg,
+    ConvertUnknownsArg,
+    DicomToNiixLimitsArg,
+    IncludeErrorsArg,
+    PipelineArg,
+    SkipErrorsArg,
+    SkipUnknownsArg,
+    UnknownsArg,
+)
+from mni_7t_dicom_to_bids.dataclass import DicomSeriesInfo
+from mni_7t_dicom_to_bids.errors import (
+    ConversionError,
+    DatasetFileConflictError,
+    DicomReadError,
+    DicomToNiixError,
+    DicomToNiixNotFoundError,
+    DicomToNiixTimeoutError,
+    ExistingBidsFilesError,
+    InsufficientDiskSpaceError,
+    InvalidArgumentsError,
+    UnknownDicomSeriesError,
+)
+from mni_7t_dicom_to_bids.pipeline import mni_7t_dicom_to_bids
+from mni_7t_dicom_to_bids.result import SeriesResult, SessionResult
+
+__all__ = [
+    'AbortUnknownsArg',
+    'CacheArg',
+    'ConversionError',
+    'ConversionFiltersArg',
+    'ConvertUnknownsArg',
+    'DatasetFileConflictError',
+    'DicomReadError',
+    'DicomSeriesInfo',
+    'DicomToNiixError',
+    'DicomToNiixLimitsArg',
+    'DicomToNiixNotFoundError',
+    'DicomToNiixTimeoutError',
+    'ExistingBidsFilesError',
+    'InsufficientDiskSpaceError',
+    'InvalidArgumentsError',
+    'PipelineArg',
+    'SeriesResult',
+    'SessionResult',
+    'SkipUnknownsArg',
+    'UnknownDicomSeriesError',
+    'convert_session',
+]
+
+
+def convert_session(
+    dicom_study_path: str,
+    bids_dataset_path: str,
+    subject: str,
+    session: str,
+    *,
+    unknowns: UnknownsArg | None = None,
+    include_errors: bool = False,
+    overwrite: bool = False,
+    dataset_files: bool = False,
+    keep_duplicates: bool = False,
+    fast_headers: bool = False,
+    auto_skip: bool = True,
+    skip_incomplete: bool = False,
+    filters: ConversionFiltersArg | None = None,
+    native_writer: bool = False,
+    dcm2niix_limits: DicomToNiixLimitsArg | None = None,
+    history_path: str | None = None,
+    longest_first: bool = False,
+    pipeline: PipelineArg | None = None,
+    cache: CacheArg | None = None,
+    catalog_path: str | None = None,
+    scratch_dir_paths: list[str] | None = None,
+    disk_check: bool = True,
+    qc: bool = True,
+    minimize_metadata_ops: bool = False,
+    quiet: bool = True,
+    profile: str | None = None,
+    events_fd: int | None = None,
+    progress_interval: float = 1.0,
+    dicom_series_list: list[DicomSeriesInfo] | None = None,
+) -> SessionResult:
+    """
+    Convert a DICOM study to a BIDS session and return the outcome of the conversion. The options
+    are those of the converter command line, the unknown DICOM series aborting the conversion by
+    default, the runtime history being only used if a history path is given, and the conversion
+    pipeline, cache and scan catalog being only used if their settings are given.
+    Raise a `ConversionError` if the conversion cannot be done. The failed conversions of individual DICOM
+    series do not raise an error but are recorded in the result.
+    """
+
+    if not os.path.isdir(dicom_study_path):
+        raise InvalidArgumentsError(f"DICOM study directory '{dicom_study_path}' does not exist.")
+
+    if subject == '' or session == '':
+        raise InvalidArgumentsError("The BIDS subject and session labels must not be empty.")
+
+    if unknowns is None:
+        unknowns = AbortUnknownsArg()
+
+    os.makedirs(bids_dataset_path, exist_ok=True)
+
+    if isinstance(unknowns, ConvertUnknownsArg):
+        os.makedirs(unknowns.dir_path, exist_ok=True)
+        if os.listdir(unknowns.dir_path) != []:
+            raise InvalidArgumentsError(f"Unknown DICOM series directory '{unknowns.dir_path}' is not empty.")
+
+    args = Args(
+        dicom_study_path      = os.path.normpath(dicom_study_path),
+        bids_dataset_path     = os.path.normpath(bids_dataset_path),
+        subject               = subject,
+        session               = session,
+        unknowns              = unknowns,
+        errors                = IncludeErrorsArg() if include_errors else SkipErrorsArg(),
+        overwrite             = overwrite,
+        dataset_files         = dataset_files,
+        keep_duplicates       = keep_duplicates,
+        fast_headers          = fast_headers,
+        auto_skip             = auto_skip,
+        skip_incomplete       = skip_incomplete,
+        filters               = filters,
+        native_writer         = native_writer,
+        dcm2niix_limits       = dcm2niix_limits if dcm2niix_limits is not None else DicomToNiixLimitsArg(),
+        history_path          = history_path,
+        longest_first         = longest_first,
+        pipeline              = pipeline,
+        cache                 = cache,
+        catalog_path          = catalog_path,
+        scratch_dir_paths     = scratch_dir_paths if scratch_dir_paths is not None else [],
+        disk_check            = disk_check,
+        qc                    = qc,
+        minimize_metadata_ops = minimize_metadata_ops,
+        profile               = profile,
+        quiet                 = quiet,
+        events_fd             = events_fd,
+        progress_interval     = progress_interval,
+    )
+
+    return mni_7t_dicom_to_bids(args, dicom_series_list)
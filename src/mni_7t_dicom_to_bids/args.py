@@ -1,9 +1,15 @@
 import os
+import re
+import shutil
 from argparse import Namespace
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import cast
 
 from bic_util.print import print_error_exit
 
+from mni_7t_dicom_to_bids.errors import InvalidArgumentsError
+from mni_7t_dicom_to_bids.variables import bids_dicom_mappings
+
 
 @dataclass
 class AbortUnknownsArg:
@@ -36,6 +42,113 @@ class IncludeErrorsArg:
 ErrorsArg = SkipErrorsArg | IncludeErrorsArg
 
 
+@dataclass
+class DicomToNiixLimitsArg:
+    """
+    The watchdog timeout, resource limits and scheduling priority of the `dcm2niix` processes.
+    """
+
+    timeout: float | None = None
+    """
+    The base timeout of a `dcm2niix` process in seconds, or `None` if `dcm2niix` has no timeout.
+    """
+
+    timeout_per_mb: float = 1.0
+    """
+    The time in seconds added to the timeout for each megabyte of DICOM files of the DICOM series.
+    """
+
+    memory_limit: int | None = None
+    """
+    The maximum address space of a `dcm2niix` process in megabytes if there is one.
+    """
+
+    cpu_limit: int | None = None
+    """
+    The maximum CPU time of a `dcm2niix` process in seconds if there is one.
+    """
+
+    nice: int = 0
+    """
+    The niceness increment of the `dcm2niix` processes.
+    """
+
+    ionice: str | None = None
+    """
+    The I/O scheduling class of the `dcm2niix` processes (`idle` or `best-effort`) if there is one.
+    """
+
+
+@dataclass
+class PipelineArg:
+    """
+    The bounds of the conversion pipeline, which stages the DICOM files of the next DICOM series and
+    moves the output files of the previous DICOM series while the current DICOM series is converted.
+    """
+
+    scratch_limit: int = 4096
+    """
+    The maximum size in megabytes of the DICOM files of the current and next DICOM series staged in
+    the scratch directory at the same time. If staging the next DICOM series in advance would exceed
+    this size, its DICOM files are only read ahead.
+    """
+
+    readahead_limit: int = 512
+    """
+    The maximum size in megabytes of the DICOM files of the next DICOM series that the kernel is
+    asked to read ahead in the page cache.
+    """
+
+
+@dataclass
+class CacheArg:
+    """
+    The location and size limit of the conversion cache, which stores the `dcm2niix` conversions
+    by content of their DICOM files to reuse them when the same DICOM series is converted again.
+    """
+
+    dir_path: str
+    """
+    The path of the conversion cache directory.
+    """
+
+    size_limit: int = 20480
+    """
+    The maximum size in megabytes of the cached conversions, the least recently used conversions
+    being evicted above this size.
+    """
+
+
+@dataclass
+class ConversionFiltersArg:
+    """
+    The filters that select the DICOM series to convert for a partial conversion of a session. A
+    DICOM series is converted if it matches at least one value of each non-empty filter.
+    """
+
+    data_types: list[str] = field(default_factory=list[str])
+    """
+    The BIDS data types of the DICOM series to convert, such as `dwi` or `func`.
+    """
+
+    acquisition_patterns: list[str] = field(default_factory=list[str])
+    """
+    The glob patterns of the BIDS acquisition names of the DICOM series to convert, such as
+    `task-audiobook*_bold`.
+    """
+
+    series_numbers: list[int] = field(default_factory=list[int])
+    """
+    The DICOM series numbers of the DICOM series to convert.
+    """
+
+    mapping_patterns: list[str] = field(default_factory=list[str])
+    """
+    The DICOM series description patterns of the BIDS mapping entries of the DICOM series to convert,
+    as written in the BIDS mappings.
+    """
+
+
 @dataclass
 class Args:
     dicom_study_path: str
@@ -46,6 +159,26 @@ class Args:
     errors: ErrorsArg
     overwrite: bool
     dataset_files: bool
+    keep_duplicates: bool
+    fast_headers: bool
+    auto_skip: bool
+    skip_incomplete: bool
+    filters: ConversionFiltersArg | None
+    native_writer: bool
+    dcm2niix_limits: DicomToNiixLimitsArg
+    history_path: str | None
+    longest_first: bool
+    pipeline: PipelineArg | None
+    cache: CacheArg | None
+    catalog_path: str | None
+    scratch_dir_paths: list[str]
+    disk_check: bool
+    qc: bool
+    minimize_metadata_ops: bool
+    profile: str | None
+    quiet: bool
+    events_fd: int | None
+    progress_interval: float
 
 
 def process_args(args: Namespace) -> Args:
@@ -54,6 +187,18 @@ def process_args(args: Namespace) -> Args:
     an error if the arguments provided are incorrect.
     """
 
+    try:
+        return get_converter_args(args)
+    except InvalidArgumentsError as error:
+        print_error_exit(str(error))
+
+
+def get_converter_args(args: Namespace) -> Args:
+    """
+    Get the structured arguments given to the MNI 7T DICOM to BIDS converter. Raise an invalid
+    arguments error if the arguments provided are incorrect.
+    """
+
     match args.skip_unknowns, args.convert_unknowns:
         case False, None:
             unknowns_arg = AbortUnknownsArg()
@@ -62,20 +207,359 @@ def process_args(args: Namespace) -> Args:
         case False, _:
             unknowns_arg = ConvertUnknownsArg(args.convert_unknowns)
         case _:
-            print_error_exit("Options --skip-unknowns and --convert-unknowns cannot be used at the same time.")
+            raise InvalidArgumentsError(
+                "Options --skip-unknowns and --convert-unknowns cannot be used at the same time."
+            )
 
     if args.include_errors:
         errors_arg = IncludeErrorsArg()
     else:
         errors_arg = SkipErrorsArg()
 
+    if args.dcm2niix_timeout is not None and args.dcm2niix_timeout <= 0:
+        raise InvalidArgumentsError("Option --dcm2niix-timeout must be positive.")
+
+    if args.dcm2niix_timeout_per_mb < 0:
+        raise InvalidArgumentsError("Option --dcm2niix-timeout-per-mb must not be negative.")
+
+    if (args.dcm2niix_memory_limit is not None and args.dcm2niix_memory_limit <= 0) \
+            or (args.dcm2niix_cpu_limit is not None and args.dcm2niix_cpu_limit <= 0):
+        raise InvalidArgumentsError("Options --dcm2niix-memory-limit and --dcm2niix-cpu-limit must be positive.")
+
+    if not 0 <= args.nice <= 19:
+        raise InvalidArgumentsError("Option --nice must be between 0 and 19.")
+
+    if args.ionice is not None and shutil.which('ionice') is None:
+        raise InvalidArgumentsError(
+            "Option --ionice requires the `ionice` command, which is not accessible on this machine."
+        )
+
+    if args.pipeline_scratch_limit <= 0 or args.pipeline_readahead_limit <= 0:
+        raise InvalidArgumentsError("Options --pipeline-scratch-limit and --pipeline-readahead-limit must be positive.")
+
+    if args.cache_size_limit <= 0:
+        raise InvalidArgumentsError("Option --cache-size-limit must be positive.")
+
+    filters_arg = ConversionFiltersArg(
+        data_types           = args.only_data_type or [],
+        acquisition_patterns = args.only_acquisition or [],
+        series_numbers       = args.only_series or [],
+        mapping_patterns     = args.only_mapping or [],
+    )
+
+    for data_type in filters_arg.data_types:
+        if data_type not in bids_dicom_mappings:
+            raise InvalidArgumentsError(
+                f"Option --only-data-type must be one of {', '.join(bids_dicom_mappings)}, found '{data_type}'."
+            )
+
+    mapping_patterns = get_bids_mapping_patterns()
+    for mapping_pattern in filters_arg.mapping_patterns:
+        if mapping_pattern not in mapping_patterns:
+            raise InvalidArgumentsError(
+                f"Option --only-mapping must be a DICOM series description pattern of the BIDS mappings, found"
+                f" '{mapping_pattern}'."
+            )
+
+    scratch_dir_paths = cast(list[str] | None, args.scratch_dir) or []
+    for scratch_dir_path in scratch_dir_paths:
+        if not os.path.isdir(scratch_dir_path) or not os.access(scratch_dir_path, os.W_OK):
+            raise InvalidArgumentsError(f"Scratch directory '{scratch_dir_path}' does not exist or is not writable.")
+
     return Args(
-        dicom_study_path  = os.path.normpath(args.dicom_study_path),
+        dicom_study_path      = os.path.normpath(args.dicom_study_path),
+        bids_dataset_path     = os.path.normpath(args.bids_dataset_path),
+        subject               = args.subject,
+        session               = args.session,
+        unknowns              = unknowns_arg,
+        errors                = errors_arg,
+        overwrite             = args.overwrite,
+        dataset_files         = args.dataset_files,
+        keep_duplicates       = args.keep_duplicates,
+        fast_headers          = args.fast_headers,
+        auto_skip             = not args.no_auto_skip,
+        skip_incomplete       = args.skip_incomplete,
+        filters               = filters_arg if filters_arg != ConversionFiltersArg() else None,
+        native_writer         = args.native_writer,
+        dcm2niix_limits       = DicomToNiixLimitsArg(
+            timeout        = args.dcm2niix_timeout,
+            timeout_per_mb = args.dcm2niix_timeout_per_mb,
+            memory_limit   = args.dcm2niix_memory_limit,
+            cpu_limit      = args.dcm2niix_cpu_limit,
+            nice           = args.nice,
+            ionice         = args.ionice,
+        ),
+        history_path          = None if args.no_history else args.history or get_default_history_path(),
+        longest_first         = args.longest_first,
+        pipeline              = PipelineArg(
+            scratch_limit   = args.pipeline_scratch_limit,
+            readahead_limit = args.pipeline_readahead_limit,
+        ) if args.pipeline else None,
+        cache                 = CacheArg(
+            dir_path   = args.cache_dir or get_default_cache_dir_path(),
+            size_limit = args.cache_size_limit,
+        ) if args.cache else None,
+        catalog_path          = args.catalog,
+        scratch_dir_paths     = scratch_dir_paths,
+        disk_check            = not args.no_disk_check,
+        qc                    = not args.no_qc,
+        minimize_metadata_ops = args.minimize_metadata_ops,
+        profile               = args.profile,
+        quiet                 = args.quiet,
+        events_fd             = args.events_fd,
+        progress_interval     = args.progress_interval,
+    )
+
+
+def get_bids_mapping_patterns() -> set[str]:
+    """
+    Get the DICOM series description patterns of all the BIDS mapping entries.
+    """
+
+    return {
+        pattern
+        for bids_dicom_mapping in bids_dicom_mappings.values()
+        for patterns in bids_dicom_mapping.values()
+        for pattern in ([patterns] if isinstance(patterns, str) else patterns)
+    }
+
+
+def get_default_history_path() -> str:
+    """
+    Get the default path of the runtime history database, which is in the user cache directory.
+    """
+
+    cache_dir_path = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_dir_path, 'mni_7t_dicom_to_bids', 'runtime_history.sqlite')
+
+
+def get_default_cache_dir_path() -> str:
+    """
+    Get the default path of the conversion cache directory, which is in the user cache directory.
+    """
+
+    cache_dir_path = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_dir_path, 'mni_7t_dicom_to_bids', 'conversion_cache')
+
+
+def get_default_socket_path() -> str:
+    """
+    Get the default path of the socket of the conversion daemon, which is in the user runtime
+    directory, or in the user cache directory if there is no runtime directory.
+    """
+
+    runtime_dir_path = os.environ.get('XDG_RUNTIME_DIR') \
+        or os.environ.get('XDG_CACHE_HOME') \
+        or os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(runtime_dir_path, 'mni_7t_dicom_to_bids', 'daemon.sock')
+
+
+@dataclass
+class WatchArgs:
+    drop_dir_path: str
+    bids_dataset_path: str
+    study_pattern: re.Pattern[str]
+    stable_time: float
+    poll_interval: float
+    once: bool
+    converter_options: list[str]
+
+
+def process_watch_args(args: Namespace, converter_options: list[str]) -> WatchArgs:
+    """
+    Get the structured arguments given to the MNI 7T DICOM to BIDS watch command. Exit the program
+    with an error if the arguments provided are incorrect.
+    """
+
+    try:
+        study_pattern = re.compile(args.study_pattern)
+    except re.error as error:
+        print_error_exit(f"Option --study-pattern is not a valid regular expression: {error}.")
+
+    if not {'subject', 'session'} <= set(study_pattern.groupindex):
+        print_error_exit("Option --study-pattern must have a 'subject' and a 'session' named group.")
+
+    if args.stable_time < 0 or args.poll_interval <= 0:
+        print_error_exit("Options --stable-time and --poll-interval must be positive.")
+
+    for option in converter_options:
+        if option.split('=')[0] in ('--subject', '--session'):
+            print_error_exit(f"Option {option} cannot be used with the watch command, use --study-pattern instead.")
+
+    return WatchArgs(
+        drop_dir_path     = os.path.normpath(args.drop_dir_path),
+        bids_dataset_path = os.path.normpath(args.bids_dataset_path),
+        study_pattern     = study_pattern,
+        stable_time       = args.stable_time,
+        poll_interval     = args.poll_interval,
+        once              = args.once,
+        converter_options = converter_options,
+    )
+
+
+@dataclass
+class MigrateArgs:
+    bids_dataset_path: str
+    subject: str | None
+    session: str | None
+    dry_run: bool
+
+
+def process_migrate_args(args: Namespace) -> MigrateArgs:
+    """
+    Get the structured arguments given to the MNI 7T DICOM to BIDS migrate command. Exit the program
+    with an error if the arguments provided are incorrect.
+    """
+
+    if args.subject == '' or args.session == '':
+        print_error_exit("Options --subject and --session must not be empty.")
+
+    return MigrateArgs(
         bids_dataset_path = os.path.normpath(args.bids_dataset_path),
         subject           = args.subject,
         session           = args.session,
-        unknowns          = unknowns_arg,
-        errors            = errors_arg,
-        overwrite         = args.overwrite,
-        dataset_files     = args.dataset_files,
+        dry_run           = args.dry_run,
+    )
+
+
+@dataclass
+class CatalogArgs:
+    catalog_path: str
+    with_patterns: list[str]
+    without_patterns: list[str]
+    subjects: bool
+    export_path: str | None
+
+
+def process_catalog_args(args: Namespace) -> CatalogArgs:
+    """
+    Get the structured arguments given to the MNI 7T DICOM to BIDS catalog command. Exit the program
+    with an error if the arguments provided are incorrect.
+    """
+
+    if args.export is not None and not args.export.endswith(('.csv', '.parquet')):
+        print_error_exit(f"Option --export must be a '.csv' or '.parquet' file path, found '{args.export}'.")
+
+    if args.export is not None and (args.with_patterns or args.without_patterns or args.subjects):
+        print_error_exit("Option --export cannot be used with the --with, --without and --subjects options.")
+
+    return CatalogArgs(
+        catalog_path     = args.catalog_path,
+        with_patterns    = args.with_patterns or [],
+        without_patterns = args.without_patterns or [],
+        subjects         = args.subjects,
+        export_path      = args.export,
+    )
+
+
+@dataclass
+class ReceiveArgs:
+    spool_dir_path: str
+    bids_dataset_path: str
+    address: str
+    port: int
+    ae_title: str
+    subject_attribute: str
+    session_attribute: str
+    stable_time: float
+    keep_duplicates: bool
+    converter_options: list[str]
+
+
+def process_receive_args(args: Namespace, converter_options: list[str]) -> ReceiveArgs:
+    """
+    Get the structured arguments given to the MNI 7T DICOM to BIDS receive command. Exit the program
+    with an error if the arguments provided are incorrect.
+    """
+
+    if not 0 <= args.port <= 65535:
+        print_error_exit(f"Option --port must be a valid port number, found {args.port}.")
+
+    if not 0 < len(args.ae_title) <= 16:
+        print_error_exit("Option --ae-title must have between 1 and 16 characters.")
+
+    if args.stable_time < 0:
+        print_error_exit("Option --stable-time must be positive.")
+
+    for option in converter_options:
+        if option.split('=')[0] in ('--subject', '--session'):
+            print_error_exit(
+                f"Option {option} cannot be used with the receive command, use --subject-attribute or"
+                " --session-attribute instead."
+            )
+
+    return ReceiveArgs(
+        spool_dir_path    = os.path.normpath(args.spool_dir_path),
+        bids_dataset_path = os.path.normpath(args.bids_dataset_path),
+        address           = args.address,
+        port              = args.port,
+        ae_title          = args.ae_title,
+        subject_attribute = args.subject_attribute,
+        session_attribute = args.session_attribute,
+        stable_time       = args.stable_time,
+        keep_duplicates   = '--keep-duplicates' in converter_options,
+        converter_options = converter_options,
+    )
+
+
+@dataclass
+class ServeArgs:
+    socket_path: str
+    workers: int
+
+
+def process_serve_args(args: Namespace) -> ServeArgs:
+    """
+    Get the structured arguments given to the MNI 7T DICOM to BIDS serve command. Exit the program
+    with an error if the arguments provided are incorrect.
+    """
+
+    if args.workers < 1:
+        print_error_exit(f"Option --workers must be at least 1, found {args.workers}.")
+
+    return ServeArgs(
+        socket_path = args.socket or get_default_socket_path(),
+        workers     = args.workers,
+    )
+
+
+@dataclass
+class SubmitArgs:
+    socket_path: str
+    priority: int
+    wait: bool
+    status_job_id: int | None
+    cancel_job_id: int | None
+    list_jobs: bool
+    converter_options: list[str]
+
+
+def process_submit_args(args: Namespace, converter_options: list[str]) -> SubmitArgs:
+    """
+    Get the structured arguments given to the MNI 7T DICOM to BIDS submit command. Exit the program
+    with an error if the arguments provided are incorrect.
+    """
+
+    queries_count = sum((args.status is not None, args.cancel is not None, args.list))
+    if queries_count > 1:
+        print_error_exit("Options --status, --cancel and --list cannot be used together.")
+
+    if queries_count == 1 and converter_options != []:
+        print_error_exit("Options --status, --cancel and --list cannot be used with converter options.")
+
+    if queries_count == 0 and converter_options == []:
+        print_error_exit(
+            "The converter options of the job are required, such as '<dicom_study_path> <bids_dataset_path>"
+            " --subject <subject> --session <session>'."
+        )
+
+    return SubmitArgs(
+        socket_path       = args.socket or get_default_socket_path(),
+        priority          = args.priority,
+        wait              = not args.no_wait,
+        status_job_id     = args.status,
+        cancel_job_id     = args.cancel,
+        list_jobs         = args.list,
+        converter_options = converter_options,
     )
@@ -0,0 +1,326 @@
+"""
+Scan catalog of the MNI 7T DICOM to BIDS converter. The catalog records the inventory of the DICOM
+series of each scanned DICOM study (description, number, series instance UIDs, files count, size,
+mapped BIDS acquisition and status) in a SQLite database that can be shared by several datasets and
+converter processes. The catalog can be queried to find the sessions that have or lack a BIDS
+acquisition across thousands of studies without reading the DICOM files again, and can be exported
+to CSV or Parquet.
+"""
+
+import csv
+import importlib
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any
+
+from bic_util.print import print_warning
+
+from mni_7t_dicom_to_bids.args import CatalogArgs
+from mni_7t_dicom_to_bids.convert_dicom_series import get_dicom_series_bytes_count
+from mni_7t_dicom_to_bids.dataclass import BidsSessionInfo, DicomBidsMapping, DicomSeriesInfo
+from mni_7t_dicom_to_bids.errors import ConversionError
+
+# Columns of the exported catalog, which has one row per DICOM series.
+catalog_export_columns = [
+    'subject',
+    'session',
+    'dicom_study_path',
+    'scanned_at',
+    'description',
+    'number',
+    'series_instance_uids',
+    'files_count',
+    'bytes',
+    'status',
+    'data_type',
+    'acquisition',
+    'run_number',
+    'skip_reason',
+]
+
+# Integer columns of the exported catalog, the other columns being strings.
+catalog_export_integer_columns = ('number', 'files_count', 'bytes', 'run_number')
+
+
+class ScanCatalog:
+    """
+    Scan catalog database. The inventory of a DICOM study replaces the previous inventory of its BIDS
+    session in a single transaction, so that the catalog can be shared by several converter
+    processes.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    @staticmethod
+    def open(catalog_path: str) -> 'ScanCatalog':
+        """
+        Open the scan catalog database, and create it if it does not exist. Raise an OS or SQLite
+        error if the database cannot be opened.
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(catalog_path)), exist_ok=True)
+        connection = sqlite3.connect(catalog_path, timeout=10)
+        connection.execute('PRAGMA foreign_keys = ON')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            '    subject TEXT NOT NULL,'
+            '    session TEXT NOT NULL,'
+            '    dicom_study_path TEXT NOT NULL,'
+            '    scanned_at TEXT NOT NULL,'
+            '    PRIMARY KEY (subject, session)'
+            ')'
+        )
+
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS series ('
+            '    subject TEXT NOT NULL,'
+            '    session TEXT NOT NULL,'
+            '    description TEXT NOT NULL,'
+            '    number INTEGER NOT NULL,'
+            '    series_instance_uids TEXT NOT NULL,'
+            '    files_count INTEGER NOT NULL,'
+            '    bytes INTEGER NOT NULL,'
+            '    status TEXT NOT NULL,'
+            '    data_type TEXT,'
+            '    acquisition TEXT,'
+            '    run_number INTEGER,'
+            '    skip_reason TEXT,'
+            '    PRIMARY KEY (subject, session, description, number),'
+            '    FOREIGN KEY (subject, session) REFERENCES sessions (subject, session) ON DELETE CASCADE'
+            ')'
+        )
+
+        connection.execute('CREATE INDEX IF NOT EXISTS series_acquisition ON series (data_type, acquisition)')
+
+        connection.commit()
+
+        return ScanCatalog(connection)
+
+    def record(
+        self,
+        bids_session: BidsSessionInfo,
+        dicom_study_path: str,
+        dicom_bids_mapping: DicomBidsMapping,
+    ):
+        """
+        Record the inventory of the DICOM series of a scanned DICOM study in the catalog, replacing
+        the previous inventory of its BIDS session. The sizes of the DICOM series are computed from
+        the sizes of their files, which are not read.
+        """
+
+        # The run numbers are assigned as in the conversion plan.
+        rows: list[tuple[Any, ...]] = []
+
+        for bids_acquisition, dicom_series_list in dicom_bids_mapping.bids_dicom_series_dict.items():
+            for run_number, dicom_series in enumerate(dicom_series_list, 1):
+                rows.append(get_series_row(
+                    bids_session,
+                    dicom_series,
+                    'mapped',
+                    bids_acquisition.scan_type,
+                    bids_acquisition.file_name,
+                    run_number if len(dicom_series_list) > 1 else None,
+                ))
+
+        for dicom_series in dicom_bids_mapping.ignored_dicom_series_list:
+            rows.append(get_series_row(bids_session, dicom_series, 'ignored', None, None, None))
+
+        for dicom_series in dicom_bids_mapping.unknown_dicom_series_list:
+            rows.append(get_series_row(bids_session, dicom_series, 'unknown', None, None, None))
+
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM sessions WHERE subject = ? AND session = ?',
+                (bids_session.subject, bids_session.session),
+            )
+
+            self.connection.execute(
+                'INSERT INTO sessions VALUES (?, ?, ?, ?)',
+                (
+                    bids_session.subject,
+                    bids_session.session,
+                    os.path.abspath(dicom_study_path),
+                    datetime.now().isoformat(timespec='seconds'),
+                ),
+            )
+
+            self.connection.executemany(f'INSERT INTO series VALUES ({", ".join("?" * 12)})', rows)
+
+    def find_sessions(self, with_patterns: list[str], without_patterns: list[str]) -> list[BidsSessionInfo]:
+        """
+        Find the sessions that have a DICOM series mapped to a BIDS acquisition matching each of the
+        `with` glob patterns, and none matching the `without` glob patterns. The BIDS acquisitions
+        are matched by their name `<data_type>/<acquisition>`, such as `anat/T1w` or `dwi/*`.
+        """
+
+        rows = self._find('subject, session', 'series.session = sessions.session', with_patterns, without_patterns)
+        return [BidsSessionInfo(subject, session) for subject, session in rows]
+
+    def find_subjects(self, with_patterns: list[str], without_patterns: list[str]) -> list[str]:
+        """
+        Find the subjects that have, in any of their sessions, a DICOM series mapped to a BIDS
+        acquisition matching each of the `with` glob patterns, and none matching the `without` glob
+        patterns in all of their sessions.
+        """
+
+        rows = self._find('subject', '1', with_patterns, without_patterns)
+        return [subject for subject, in rows]
+
+    def _find(
+        self,
+        columns: str,
+        session_condition: str,
+        with_patterns: list[str],
+        without_patterns: list[str],
+    ) -> list[tuple[str, ...]]:
+        """
+        Find the distinct values of some columns of the sessions that match some acquisition
+        patterns, the DICOM series being searched in the sessions that satisfy a session condition.
+        """
+
+        series_query = (
+            'EXISTS (SELECT 1 FROM series'
+            f' WHERE series.subject = sessions.subject AND {session_condition}'
+            " AND series.status = 'mapped' AND series.data_type || '/' || series.acquisition GLOB ?)"
+        )
+
+        conditions = [series_query] * len(with_patterns) + [f'NOT {series_query}'] * len(without_patterns)
+
+        return self.connection.execute(
+            f'SELECT DISTINCT {columns} FROM sessions'
+            f' WHERE {" AND ".join(conditions) or "1"}'
+            f' ORDER BY {columns}',
+            (*with_patterns, *without_patterns),
+        ).fetchall()
+
+    def get_rows(self) -> list[dict[str, Any]]:
+        """
+        Get all the DICOM series of the catalog with their session, as rows of the exported catalog.
+        """
+
+        cursor = self.connection.execute(
+            f'SELECT {", ".join(catalog_export_columns)} FROM series JOIN sessions USING (subject, session)'
+            ' ORDER BY subject, session, description, number'
+        )
+
+        return [dict(zip(catalog_export_columns, row, strict=True)) for row in cursor]
+
+    def export(self, export_path: str):
+        """
+        Export the DICOM series of the catalog to a CSV file, or to a Parquet file if the export path
+        has a `.parquet` extension, which requires the `pyarrow` package.
+        """
+
+        rows = self.get_rows()
+
+        if export_path.endswith('.parquet'):
+            write_parquet_file(rows, export_path)
+            return
+
+        with open(export_path, 'w', newline='') as export_file:
+            writer = csv.DictWriter(export_file, catalog_export_columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def close(self):
+        """
+        Close the scan catalog database.
+        """
+
+        self.connection.close()
+
+
+def query_scan_catalog(args: CatalogArgs):
+    """
+    Print the sessions or subjects of a scan catalog that match the acquisition patterns of the
+    catalog command, or export the catalog.
+    """
+
+    if not os.path.isfile(args.catalog_path):
+        raise ConversionError(f"Scan catalog '{args.catalog_path}' does not exist.")
+
+    try:
+        catalog = ScanCatalog.open(args.catalog_path)
+        try:
+            if args.export_path is not None:
+                catalog.export(args.export_path)
+                print(f"Exported the scan catalog to '{args.export_path}'.")
+            elif args.subjects:
+                for subject in catalog.find_subjects(args.with_patterns, args.without_patterns):
+                    print(f'sub-{subject}')
+            else:
+                for bids_session in catalog.find_sessions(args.with_patterns, args.without_patterns):
+                    print(f'sub-{bids_session.subject} ses-{bids_session.session}')
+        finally:
+            catalog.close()
+    except (OSError, sqlite3.Error) as error:
+        raise ConversionError(f"Cannot query the scan catalog '{args.catalog_path}': {error}")
+
+
+def write_parquet_file(rows: list[dict[str, Any]], export_path: str):
+    """
+    Write the rows of the exported catalog to a Parquet file, which requires the `pyarrow` package.
+    """
+
+    # Imported lazily so that `pyarrow` is only required for the Parquet exports. The modules are
+    # typed as `Any` as `pyarrow` is an optional dependency that may not be installed.
+    pyarrow: Any = importlib.import_module('pyarrow')
+    pyarrow_parquet: Any = importlib.import_module('pyarrow.parquet')
+
+    schema = pyarrow.schema([
+        (column, pyarrow.int64() if column in catalog_export_integer_columns else pyarrow.string())
+        for column in catalog_export_columns
+    ])
+
+    pyarrow_parquet.write_table(pyarrow.Table.from_pylist(rows, schema=schema), export_path)
+
+
+def get_series_row(
+    bids_session: BidsSessionInfo,
+    dicom_series: DicomSeriesInfo,
+    status: str,
+    data_type: str | None,
+    acquisition: str | None,
+    run_number: int | None,
+) -> tuple[Any, ...]:
+    """
+    Get the catalog row of a DICOM series of a scanned DICOM study.
+    """
+
+    return (
+        bids_session.subject,
+        bids_session.session,
+        dicom_series.description,
+        dicom_series.number,
+        '\\'.join(dicom_series.series_instance_uids),
+        len(dicom_series.file_paths),
+        get_dicom_series_bytes_count(dicom_series),
+        status,
+        data_type,
+        acquisition,
+        run_number,
+        dicom_series.skip_reason,
+    )
+
+
+def record_scan_catalog(
+    catalog_path: str,
+    bids_session: BidsSessionInfo,
+    dicom_study_path: str,
+    dicom_bids_mapping: DicomBidsMapping,
+):
+    """
+    Record the inventory of a scanned DICOM study in the scan catalog. Print a warning if the
+    catalog cannot be updated, as the catalog is not required by the conversion.
+    """
+
+    try:
+        catalog = ScanCatalog.open(catalog_path)
+        try:
+            catalog.record(bids_session, dicom_study_path, dicom_bids_mapping)
+        finally:
+            catalog.close()
+    except (OSError, sqlite3.Error) as error:
+        print_warning(f"Cannot record the DICOM study in the scan catalog '{catalog_path}': {error}")
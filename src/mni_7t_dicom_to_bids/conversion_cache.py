@@ -0,0 +1,258 @@
+"""
+Local content-addressed cache of the `dcm2niix` conversions, which can be shared by several BIDS
+datasets and converter processes. A cached conversion is identified by a digest of the content of
+the DICOM files of its DICOM series, of the `dcm2niix` version and of the `dcm2niix` options, so
+that the same DICOM series converted again, into the same or another BIDS dataset, reuses the files
+generated by `dcm2niix` instead of running it again.
+
+The cached files are stored with the BIDS file name given to `dcm2niix` replaced by a placeholder,
+so that they can be restored under any BIDS file name before the post processing. The NIfTI files
+are hard linked between the cache and the scratch directory when they are on the same filesystem,
+and the other files are copied as they are patched in place after the conversion. The hard linked
+files are copied when they are moved from the scratch directory to the BIDS dataset, so that the
+BIDS files never share their content with the cache. The least recently used conversions are
+evicted once the size of the cache exceeds its limit.
+"""
+
+import contextlib
+import hashlib
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from collections.abc import Iterable
+
+from bic_util.print import print_warning
+
+from mni_7t_dicom_to_bids.output_files import get_file_digest
+
+# Version of the layout of the conversion cache, which is part of the keys of the conversions.
+cache_format_version = 1
+
+# Name that replaces the BIDS file name given to `dcm2niix` in the names of the cached files.
+cached_base_name = 'output'
+
+# Extensions of the cached files that are hard linked rather than copied, as they are never modified
+# in place by the converter.
+linked_extensions = ('.nii', '.nii.gz')
+
+
+class ConversionCache:
+    """
+    Content-addressed cache of the `dcm2niix` conversions, whose entries are directories of cached
+    files indexed in a SQLite database with their size and last use time.
+    """
+
+    def __init__(self, dir_path: str, size_limit: int, connection: sqlite3.Connection, converter_version: str):
+        self.dir_path = dir_path
+        self.size_limit = size_limit
+        self.connection = connection
+        self.converter_version = converter_version
+
+    @staticmethod
+    def open(dir_path: str, size_limit: int) -> 'ConversionCache | None':
+        """
+        Open the conversion cache with a size limit in bytes, and create it if it does not exist.
+        Print a warning and return `None` if the cache cannot be opened or if the `dcm2niix` version
+        cannot be determined, as the cache is not required by the conversion.
+        """
+
+        converter_version = get_dicom_to_niix_version()
+        if converter_version is None:
+            print_warning("Cannot determine the version of `dcm2niix`, the conversion cache will not be used.")
+            return None
+
+        try:
+            os.makedirs(os.path.join(dir_path, 'entries'), exist_ok=True)
+            connection = sqlite3.connect(os.path.join(dir_path, 'index.sqlite'), timeout=10, check_same_thread=False)
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                '    key TEXT PRIMARY KEY,'
+                '    bytes INTEGER NOT NULL,'
+                '    last_used_at REAL NOT NULL'
+                ')'
+            )
+
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_last_used_at ON entries (last_used_at)')
+
+            connection.commit()
+        except (OSError, sqlite3.Error) as error:
+            print_warning(f"Cannot open the conversion cache '{dir_path}', it will not be used: {error}")
+            return None
+
+        return ConversionCache(dir_path, size_limit, connection, converter_version)
+
+    def get_key(self, dicom_file_paths: Iterable[str], options: list[str]) -> str:
+        """
+        Get the key of the conversion of DICOM files with some `dcm2niix` options. The key does not
+        depend on the paths or the order of the DICOM files.
+        """
+
+        hasher = hashlib.blake2b(digest_size=32)
+        hasher.update(f'{cache_format_version}\0{self.converter_version}\0{" ".join(options)}\0'.encode())
+
+        for file_digest in sorted(get_file_digest(dicom_file_path) for dicom_file_path in dicom_file_paths):
+            hasher.update(file_digest)
+
+        return hasher.hexdigest()
+
+    def restore(self, key: str, output_dir_path: str, file_name: str) -> list[str] | None:
+        """
+        Restore the files of a cached conversion in an output directory with a BIDS file name, and
+        return their names, or `None` if the conversion is not cached.
+        """
+
+        entry_dir_path = self._get_entry_dir_path(key)
+
+        output_file_names: list[str] = []
+        try:
+            entry_bytes_count = 0
+            for cached_file in os.scandir(entry_dir_path):
+                output_file_name = file_name + cached_file.name[len(cached_base_name):]
+                link_or_copy_file(cached_file.path, os.path.join(output_dir_path, output_file_name))
+                output_file_names.append(output_file_name)
+                entry_bytes_count += cached_file.stat().st_size
+        except OSError:
+            # The conversion is not cached, or was evicted by another process while being restored.
+            for output_file_name in output_file_names:
+                os.remove(os.path.join(output_dir_path, output_file_name))
+
+            return None
+
+        self._record(key, entry_bytes_count)
+
+        return output_file_names
+
+    def store(self, key: str, output_dir_path: str, file_name: str) -> bool:
+        """
+        Store the files generated by `dcm2niix` with a BIDS file name in the cache, and evict the
+        least recently used conversions if the cache exceeds its size limit. Return whether the
+        conversion was stored, which is not the case if a file is not named after the BIDS file name
+        or if the files exceed the size limit of the cache.
+        """
+
+        output_files = list(os.scandir(output_dir_path))
+        if not all(output_file.name.startswith(file_name) for output_file in output_files):
+            return False
+
+        entry_bytes_count = sum(output_file.stat().st_size for output_file in output_files)
+        if entry_bytes_count > self.size_limit:
+            return False
+
+        entry_dir_path = self._get_entry_dir_path(key)
+        if os.path.isdir(entry_dir_path):
+            return False
+
+        # The files are stored in a temporary directory that is renamed once complete, so that a
+        # partially stored conversion is never restored, even by another process.
+        try:
+            tmp_entry_dir_path = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.join(self.dir_path, 'entries'))
+        except OSError:
+            return False
+
+        try:
+            for output_file in output_files:
+                cached_file_name = cached_base_name + output_file.name[len(file_name):]
+                link_or_copy_file(output_file.path, os.path.join(tmp_entry_dir_path, cached_file_name))
+
+            os.makedirs(os.path.dirname(entry_dir_path), exist_ok=True)
+            os.rename(tmp_entry_dir_path, entry_dir_path)
+        except OSError:
+            shutil.rmtree(tmp_entry_dir_path, ignore_errors=True)
+            return False
+
+        self._record(key, entry_bytes_count)
+        self._evict()
+
+        return True
+
+    def close(self):
+        """
+        Close the index of the conversion cache.
+        """
+
+        self.connection.close()
+
+    def _get_entry_dir_path(self, key: str) -> str:
+        """
+        Get the path of the directory of a cached conversion.
+        """
+
+        return os.path.join(self.dir_path, 'entries', key[:2], key)
+
+    def _record(self, key: str, bytes_count: int):
+        """
+        Record a cached conversion as used now in the index.
+        """
+
+        try:
+            with self.connection:
+                self.connection.execute(
+                    'INSERT INTO entries VALUES (?, ?, ?)'
+                    ' ON CONFLICT (key) DO UPDATE SET last_used_at = excluded.last_used_at',
+                    (key, bytes_count, time.time()),
+                )
+        except sqlite3.Error as error:
+            print_warning(f"Cannot record the conversion in the conversion cache: {error}")
+
+    def _evict(self):
+        """
+        Delete the least recently used conversions until the size of the cache is within its limit.
+        """
+
+        try:
+            with self.connection:
+                total_bytes_count = self.connection.execute('SELECT COALESCE(SUM(bytes), 0) FROM entries').fetchone()[0]
+                if total_bytes_count <= self.size_limit:
+                    return
+
+                rows = self.connection.execute('SELECT key, bytes FROM entries ORDER BY last_used_at').fetchall()
+                for key, bytes_count in rows:
+                    if total_bytes_count <= self.size_limit:
+                        break
+
+                    entry_dir_path = self._get_entry_dir_path(key)
+                    shutil.rmtree(entry_dir_path, ignore_errors=True)
+                    with contextlib.suppress(OSError):
+                        os.rmdir(os.path.dirname(entry_dir_path))
+
+                    self.connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+                    total_bytes_count -= bytes_count
+        except sqlite3.Error as error:
+            print_warning(f"Cannot evict the old conversions from the conversion cache: {error}")
+
+
+def get_dicom_to_niix_version() -> str | None:
+    """
+    Get the version line printed by `dcm2niix`, or `None` if it cannot be determined.
+    """
+
+    try:
+        # Some `dcm2niix` versions exit with a non-zero exit code after printing their version.
+        process = subprocess.run(['dcm2niix', '--version'], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+    for line in (process.stdout + process.stderr).splitlines():
+        if 'version' in line:
+            return line.strip()
+
+    return None
+
+
+def link_or_copy_file(source_path: str, target_path: str):
+    """
+    Hard link a NIfTI file between the cache and the scratch directory if they are on the same
+    filesystem, or copy it otherwise. The other files are always copied.
+    """
+
+    if source_path.endswith(linked_extensions):
+        try:
+            os.link(source_path, target_path)
+            return
+        except OSError:
+            pass
+
+    shutil.copyfile(source_path, target_path)
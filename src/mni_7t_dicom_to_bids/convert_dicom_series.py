@@ -1,179 +1,707 @@
+import contextlib
+import fnmatch
+import json
 import os
 import re
+import resource
 import shutil
+import signal
 import subprocess
 import tempfile
-import pydicom
-import json
 from collections.abc import Callable
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 from shlex import quote
 
-from bic_util.print import print_error, print_error_exit, print_warning, with_print_subscript
+from bic_util.print import print_error, print_warning, with_print_subscript
 
-from mni_7t_dicom_to_bids.args import Args, ConvertUnknownsArg, IncludeErrorsArg, SkipErrorsArg
+from mni_7t_dicom_to_bids.args import (
+    Args,
+    ConversionFiltersArg,
+    ConvertUnknownsArg,
+    DicomToNiixLimitsArg,
+    IncludeErrorsArg,
+    SkipErrorsArg,
+)
+from mni_7t_dicom_to_bids.conversion_cache import ConversionCache
 from mni_7t_dicom_to_bids.dataclass import (
     BidsAcquisitionInfo,
     BidsName,
     BidsSessionInfo,
     DicomBidsMapping,
+    DicomSeriesConversion,
     DicomSeriesConversionsCounter,
     DicomSeriesInfo,
 )
+from mni_7t_dicom_to_bids.errors import DicomToNiixError, DicomToNiixNotFoundError, DicomToNiixTimeoutError
+from mni_7t_dicom_to_bids.events import ProgressReporter, emit_event, is_quiet, print_info
+from mni_7t_dicom_to_bids.history import RuntimeHistory
+from mni_7t_dicom_to_bids.map_dicom_series import find_bids_dicom_mapping
+from mni_7t_dicom_to_bids.output_dirs import OutputDirectories
+from mni_7t_dicom_to_bids.output_files import get_file_digest
 from mni_7t_dicom_to_bids.post_process import post_process
-from mni_7t_dicom_to_bids.print import print_existing_bids_files
+from mni_7t_dicom_to_bids.print import print_existing_bids_files, print_unchanged_bids_files
+from mni_7t_dicom_to_bids.profiler import Profiler, SeriesProfile
+from mni_7t_dicom_to_bids.readahead import advise_readahead
+from mni_7t_dicom_to_bids.result import SeriesResult
+
+# Options given to `dcm2niix`, which are part of the keys of the cached conversions.
+dicom_to_niix_options = ['-z', 'y', '-b', 'y']
 
 
 def check_dicom_to_niix():
     """
-    Check that the `dcm2niix` command is accessible, or exit the program with an error if that is
-    not the case.
+    Check that the `dcm2niix` command is accessible, or raise an error if that is not the case.
     """
 
     if shutil.which('dcm2niix') is None:
-        print_error_exit(
+        raise DicomToNiixNotFoundError(
             "`dcm2niix` does not look installed or accessible on this machine. Please install"
             " `dcm2niix` before running the MNI 7T DICOM to BIDS converter."
         )
 
 
-def convert_dicom_series(bids_session: BidsSessionInfo, dicom_bids_mapping: DicomBidsMapping, args: Args):
+class DicomSeriesInput:
     """
-    Convert the mapped BIDS acquisitions and DICOM series to NIfTI.
+    The DICOM files of a DICOM series being converted, which are only copied to a temporary input
+    directory if the conversion runs `dcm2niix`. In the conversion pipeline, these files can be
+    staged in advance in a background thread.
     """
 
-    counter = get_conversions_counter(dicom_bids_mapping, args)
+    def __init__(self, dicom_series: DicomSeriesInfo, tmp_dicom_dir_path: str, profiler: Profiler):
+        self.dicom_series = dicom_series
+        self.tmp_dicom_dir_path = tmp_dicom_dir_path
+        self.profiler = profiler
+        self.staged = False
+        self.prefetch_future: Future[None] | None = None
+
+    def prefetch(self, executor: Executor, series_profile: SeriesProfile, stage_files: bool, readahead_bytes: int):
+        """
+        Ask the kernel to read the DICOM files of the DICOM series ahead in a background thread, and
+        stage them in the temporary input directory if requested.
+        """
+
+        def prefetch_files():
+            with self.profiler.bind_series(series_profile):
+                if stage_files:
+                    self.stage_files(readahead_bytes)
+                else:
+                    with self.profiler.stage('readahead') as stage:
+                        advise_readahead(self.dicom_series.file_paths, readahead_bytes)
+                        stage.files_count = len(self.dicom_series.file_paths)
+
+        future = executor.submit(prefetch_files)
+        if stage_files:
+            self.prefetch_future = future
+
+    def get_staged_dir_path(self) -> str:
+        """
+        Copy the DICOM files of the DICOM series in the temporary input directory if that is not
+        already done, and return the path of that directory.
+        """
+
+        # Wait for the DICOM files staged in the background, which raises the staging error if there
+        # is one.
+        if self.prefetch_future is not None:
+            with self.profiler.stage('wait_inputs'):
+                self.prefetch_future.result()
+
+        if not self.staged:
+            self.stage_files()
+
+        return self.tmp_dicom_dir_path
+
+    def stage_files(self, readahead_bytes: int = 0):
+        """
+        Copy the DICOM files of the DICOM series in the temporary input directory, after asking the
+        kernel to read them ahead if a readahead size is given.
+        """
+
+        with self.profiler.stage('stage_inputs') as stage:
+            if readahead_bytes > 0:
+                advise_readahead(self.dicom_series.file_paths, readahead_bytes)
+
+            for dicom_file_path in self.dicom_series.file_paths:
+                shutil.copy(dicom_file_path, self.tmp_dicom_dir_path)
+                stage.bytes_read += os.path.getsize(dicom_file_path)
+
+            stage.bytes_written = stage.bytes_read
+            stage.files_count = len(self.dicom_series.file_paths)
+
+        self.staged = True
+
+
+class PipelinedDicomSeries:
+    """
+    A DICOM series conversion in the conversion pipeline. Its temporary directories and its result
+    outlive the conversion in the main thread, as its DICOM files are staged before and its output
+    files are moved after this conversion in background threads.
+    """
 
-    for bids_acquisition, dicom_series_list in dicom_bids_mapping.bids_dicom_series_dict.items():
-        for run_number, dicom_series in enumerate(dicom_series_list, 1):
-            print(
-                f"Processing BIDS acquisition '{bids_acquisition.scan_type}/{bids_acquisition.file_name}'"
-                f" ({counter.count} / {counter.total})."
-            )
+    def __init__(self, conversion: DicomSeriesConversion, scratch_dir_path: str | None, profiler: Profiler):
+        self.conversion = conversion
+        self.series_result = SeriesResult(conversion.dicom_series, conversion.acquisition_name, conversion.run_number)
+        self.series_profile = SeriesProfile.from_dicom_series(conversion.dicom_series, conversion.acquisition_name)
+        self.tmp_dicom_dir = tempfile.TemporaryDirectory(dir=scratch_dir_path)
+        self.tmp_output_dir = tempfile.TemporaryDirectory(dir=scratch_dir_path)
+        self.dicom_input = DicomSeriesInput(conversion.dicom_series, self.tmp_dicom_dir.name, profiler)
+        self.output_dir_path: str | None = None
+
+    def move_outputs(self, output_dirs: OutputDirectories, profiler: Profiler):
+        """
+        Patch and move the output files of the converted DICOM series to their final directory, and
+        record the error of this step in the series result if there is one.
+        """
+
+        assert self.output_dir_path is not None
+
+        with profiler.bind_series(self.series_profile):
+            try:
+                move_output_files(
+                    self.tmp_output_dir.name, self.output_dir_path, output_dirs, self.series_result, profiler
+                )
+            except Exception as error:
+                self.series_result.error = error
 
-            if len(dicom_series_list) == 1:
-                run_number = None
-
-            bids_data_type_path = get_bids_data_type_dir_path(args.bids_dataset_path, bids_session, bids_acquisition)
-
-            ML=run_conversion_function(
-                dicom_series,
-                bids_data_type_path,
-                counter,
-                lambda tmp_dicom_dir_path, tmp_output_path: convert_bids_dicom_series(
-                    bids_session,
-                    bids_acquisition,
-                    bids_data_type_path,
-                    run_number,
-                    args,
-                    tmp_dicom_dir_path,
-                    tmp_output_path,
-                )   
-            ) 
-            
-            if ML is not None:
-              bidsin = [x for x in ML if x[-5:]==".json"]
-              for fnum in bidsin:
-               print(f"This is working file {fnum}")   
-               patchjson(bids_data_type_path, fnum, dicom_series, run_number)
-                       
-    if isinstance(args.unknowns, ConvertUnknownsArg):
-        for unknown_dicom_series in dicom_bids_mapping.unknown_dicom_series_list:
-            print(
-                f"Processing unknown DICOM series '{unknown_dicom_series.description}'"
-                f" ({counter.count} / {counter.total})."
+    def cleanup(self):
+        """
+        Delete the temporary directories of the DICOM series conversion.
+        """
+
+        self.tmp_dicom_dir.cleanup()
+        self.tmp_output_dir.cleanup()
+
+
+def convert_dicom_series(
+    bids_session: BidsSessionInfo,
+    conversions: list[DicomSeriesConversion],
+    scratch_dir_path: str | None,
+    output_dirs: OutputDirectories,
+    args: Args,
+    profiler: Profiler,
+) -> list[SeriesResult]:
+    """
+    Convert the planned DICOM series conversions to NIfTI, using temporary directories in the
+    scratch directory if one is given, and return the outcome of the conversion of each DICOM
+    series.
+    """
+
+    history = RuntimeHistory.open(args.history_path) if args.history_path is not None else None
+    cache = ConversionCache.open(args.cache.dir_path, args.cache.size_limit * 1024 * 1024) \
+        if args.cache is not None else None
+    if history is not None:
+        estimated_time = estimate_conversion_times(conversions, history)
+        if estimated_time is not None:
+            print_info(f"Estimated conversion time from the runtime history: {estimated_time:.0f} seconds.")
+    else:
+        estimated_time = None
+
+    # The conversion plan is sorted by decreasing cost for a longest-first conversion order, the
+    # run numbers of the DICOM series being already attributed.
+    if args.longest_first:
+        conversions.sort(key=get_conversion_cost, reverse=True)
+
+    counter = DicomSeriesConversionsCounter(len(conversions))
+
+    progress = ProgressReporter(
+        'convert',
+        counter.total,
+        total_cost=sum(get_conversion_cost(conversion) for conversion in conversions),
+        estimated_time=estimated_time,
+        in_place=False,
+    )
+
+    series_results: list[SeriesResult] = []
+
+    def record_result(conversion: DicomSeriesConversion, series_result: SeriesResult):
+        series_results.append(series_result)
+
+        if history is not None:
+            history.record(
+                get_history_acquisition(conversion),
+                len(conversion.dicom_series.file_paths),
+                conversion.bytes_count,
+                series_result.wall_time,
+                series_result.success,
             )
 
-            run_conversion_function(
-                unknown_dicom_series,
-                args.unknowns.dir_path,
-                counter,
-                lambda tmp_dicom_dir_path, tmp_ouput_dir_path: convert_unknown_dicom_series(
-                    unknown_dicom_series, tmp_dicom_dir_path, tmp_ouput_dir_path, args
-                ),
+        progress.update(cost=get_conversion_cost(conversion))
+
+    if args.pipeline is not None:
+        convert_pipelined_dicom_series(
+            bids_session, conversions, scratch_dir_path, output_dirs, cache, counter, args, profiler, record_result
+        )
+    else:
+        for conversion in conversions:
+            series_result = convert_planned_dicom_series(
+                bids_session, conversion, scratch_dir_path, output_dirs, cache, counter, args, profiler
             )
-             
-            if ML is not None:
-              bidsin = [x for x in ML if x[-5:]==".json"]
-              for fnum in bidsin:
-               print(f"This is working file {fnum}")   
-               patchjson(bids_data_type_path, fnum, dicom_series, run_number)
-    print(
+
+            record_result(conversion, series_result)
+
+    progress.close()
+
+    if history is not None:
+        history.close()
+
+    if cache is not None:
+        cache.close()
+
+    emit_event('conversion_end', total=counter.total, successes=counter.successes, errors=counter.errors)
+
+    print_info(
         f"Processed {counter.total} DICOM series, including {counter.successes} successful conversions to BIDS and"
         f" {counter.errors} errors."
     )
-    
 
-def get_conversions_counter(dicom_bids_mapping: DicomBidsMapping, args: Args) -> DicomSeriesConversionsCounter:
+    unchanged_files_count = sum(len(series_result.unchanged_file_paths) for series_result in series_results)
+    if unchanged_files_count != 0:
+        output_files_count = sum(len(series_result.output_file_paths) for series_result in series_results)
+        print_info(
+            f"Wrote {output_files_count - unchanged_files_count} new or changed files, and left"
+            f" {unchanged_files_count} identical files untouched."
+        )
+
+    return series_results
+
+
+def plan_dicom_series_conversions(dicom_bids_mapping: DicomBidsMapping, args: Args) -> list[DicomSeriesConversion]:
     """
-    Get the total number of conversions needed to convert the BIDS acquisitions to NIfTI.
+    Get the list of the DICOM series conversions needed to convert the BIDS acquisitions to NIfTI,
+    and the unknown DICOM series if the converter is configured to convert them, in the default
+    conversion order. The incomplete DICOM series are left out if the converter is configured to
+    skip them, as well as the DICOM series that do not match the conversion filters.
     """
 
-    total = 0
+    conversions: list[DicomSeriesConversion] = []
 
-    # Add the count of DICOM series for each BIDS acquisition.
-    for dicom_series_list in dicom_bids_mapping.bids_dicom_series_dict.values():
-        total += len(dicom_series_list)
+    for bids_acquisition, dicom_series_list in dicom_bids_mapping.bids_dicom_series_dict.items():
+        for run_number, dicom_series in enumerate(dicom_series_list, 1):
+            # The incomplete and filtered out DICOM series are skipped after their run number is
+            # assigned so that the run numbers of the other DICOM series of the BIDS acquisition do
+            # not change.
+            if args.skip_incomplete and dicom_series.incomplete_reason is not None:
+                continue
+
+            if args.filters is not None and not is_filtered_dicom_series(args.filters, dicom_series, bids_acquisition):
+                continue
+
+            conversions.append(DicomSeriesConversion(
+                dicom_series     = dicom_series,
+                bids_acquisition = bids_acquisition,
+                run_number       = run_number if len(dicom_series_list) > 1 else None,
+                bytes_count      = get_dicom_series_bytes_count(dicom_series),
+            ))
 
     # Add the unrecognized DICOM series if the script is configured to convert them.
     if isinstance(args.unknowns, ConvertUnknownsArg):
-        total += len(dicom_bids_mapping.unknown_dicom_series_list)
+        for unknown_dicom_series in dicom_bids_mapping.unknown_dicom_series_list:
+            if args.skip_incomplete and unknown_dicom_series.incomplete_reason is not None:
+                continue
+
+            if args.filters is not None and not is_filtered_dicom_series(args.filters, unknown_dicom_series, None):
+                continue
+
+            conversions.append(DicomSeriesConversion(
+                dicom_series     = unknown_dicom_series,
+                bids_acquisition = None,
+                run_number       = None,
+                bytes_count      = get_dicom_series_bytes_count(unknown_dicom_series),
+            ))
+
+    return conversions
+
+
+def is_filtered_dicom_series(
+    filters: ConversionFiltersArg,
+    dicom_series: DicomSeriesInfo,
+    bids_acquisition: BidsAcquisitionInfo | None,
+) -> bool:
+    """
+    Check whether a DICOM series, mapped to a BIDS acquisition or unknown, matches the conversion
+    filters. The unknown DICOM series can only match the DICOM series number filter.
+    """
+
+    if filters.series_numbers != [] and dicom_series.number not in filters.series_numbers:
+        return False
+
+    if filters.data_types == [] and filters.acquisition_patterns == [] and filters.mapping_patterns == []:
+        return True
+
+    if bids_acquisition is None:
+        return False
+
+    if filters.data_types != [] and bids_acquisition.scan_type not in filters.data_types:
+        return False
+
+    if filters.acquisition_patterns != [] and not any(
+        fnmatch.fnmatchcase(bids_acquisition.file_name, acquisition_pattern)
+        for acquisition_pattern in filters.acquisition_patterns
+    ):
+        return False
+
+    if filters.mapping_patterns != []:
+        bids_dicom_mapping = find_bids_dicom_mapping(dicom_series.description)
+        if bids_dicom_mapping is None or bids_dicom_mapping[1] not in filters.mapping_patterns:
+            return False
+
+    return True
+
+
+def get_dicom_series_bytes_count(dicom_series: DicomSeriesInfo) -> int:
+    """
+    Get the total size of the DICOM files of a DICOM series in bytes.
+    """
+
+    return sum(os.path.getsize(dicom_file_path) for dicom_file_path in dicom_series.file_paths)
+
+
+def get_history_acquisition(conversion: DicomSeriesConversion) -> str:
+    """
+    Get the name under which a DICOM series conversion is recorded in the runtime history, which is
+    its BIDS acquisition, or `unknown` for the unknown DICOM series.
+    """
+
+    return conversion.acquisition_name or 'unknown'
+
+
+def estimate_conversion_times(conversions: list[DicomSeriesConversion], history: RuntimeHistory) -> float | None:
+    """
+    Estimate the duration of the DICOM series conversions from the runtime history, and return the
+    estimated total duration, or `None` if some conversions cannot be estimated.
+    """
+
+    for conversion in conversions:
+        conversion.estimated_time = history.predict(get_history_acquisition(conversion), conversion.bytes_count)
+
+    if any(conversion.estimated_time is None for conversion in conversions):
+        return None
 
-    return DicomSeriesConversionsCounter(total)
+    return sum(conversion.estimated_time or 0.0 for conversion in conversions)
+
+
+def get_conversion_cost(conversion: DicomSeriesConversion) -> float:
+    """
+    Get the relative cost of a DICOM series conversion, which is its estimated duration if the
+    runtime history provides one, or the size of its DICOM files otherwise.
+    """
+
+    if conversion.estimated_time is not None:
+        return conversion.estimated_time
+
+    return conversion.bytes_count
+
+
+def convert_planned_dicom_series(
+    bids_session: BidsSessionInfo,
+    conversion: DicomSeriesConversion,
+    scratch_dir_path: str | None,
+    output_dirs: OutputDirectories,
+    cache: ConversionCache | None,
+    counter: DicomSeriesConversionsCounter,
+    args: Args,
+    profiler: Profiler,
+) -> SeriesResult:
+    """
+    Convert a planned DICOM series conversion to NIfTI, and return the outcome of this conversion.
+    """
+
+    dicom_series = conversion.dicom_series
+
+    output_dir_path, convert = get_conversion_function(
+        bids_session, conversion, counter.count, counter.total, output_dirs, cache, args, profiler
+    )
+
+    series_result = SeriesResult(dicom_series, conversion.acquisition_name, conversion.run_number)
+    with profiler.series(SeriesProfile.from_dicom_series(dicom_series, conversion.acquisition_name)) as series_profile:
+        run_conversion_function(
+            dicom_series, output_dir_path, scratch_dir_path, output_dirs, counter, profiler, series_result, convert
+        )
+
+        series_profile.success = series_result.success
+
+    series_result.profile = series_profile
+
+    return series_result
+
+
+def convert_pipelined_dicom_series(
+    bids_session: BidsSessionInfo,
+    conversions: list[DicomSeriesConversion],
+    scratch_dir_path: str | None,
+    output_dirs: OutputDirectories,
+    cache: ConversionCache | None,
+    counter: DicomSeriesConversionsCounter,
+    args: Args,
+    profiler: Profiler,
+    record_result: Callable[[DicomSeriesConversion, SeriesResult], None],
+):
+    """
+    Convert the planned DICOM series conversions with a double-buffered pipeline: while a DICOM
+    series is converted in the main thread, the DICOM files of the next DICOM series are staged in a
+    background thread, and the output files of the previous DICOM series are patched and moved in
+    another background thread. The outcomes of the conversions are recorded in the conversion order.
+    """
+
+    # Each background thread processes one DICOM series at a time, which bounds the pipeline to one
+    # DICOM series staged ahead and one DICOM series being moved.
+    stage_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stage_inputs')
+    move_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='move_outputs')
+
+    series: PipelinedDicomSeries | None = None
+    next_series: PipelinedDicomSeries | None = None
+    moved_series: tuple[PipelinedDicomSeries, Future[None]] | None = None
+
+    def complete_series(series: PipelinedDicomSeries):
+        series.cleanup()
+
+        series_result = series.series_result
+        if series_result.error is None:
+            assert series.output_dir_path is not None
+            print_unchanged_bids_files(series_result.unchanged_file_paths, series.output_dir_path)
+            counter.successes += 1
+        else:
+            counter.errors += 1
+
+        # The series profile is closed once the DICOM series is converted, but its success also
+        # depends on the move of its output files.
+        series.series_profile.success = series_result.success
+        series_result.profile = series.series_profile
+
+        record_result(series.conversion, series_result)
+
+    def complete_moved_series(series: PipelinedDicomSeries, future: Future[None]):
+        future.result()
+        if series.series_result.error is not None:
+            print_error(str(series.series_result.error))
+
+        complete_series(series)
+
+    try:
+        for index, conversion in enumerate(conversions):
+            series = next_series or PipelinedDicomSeries(conversion, scratch_dir_path, profiler)
+
+            # Prefetch the next DICOM series while this DICOM series is converted.
+            if index + 1 < len(conversions):
+                next_series = PipelinedDicomSeries(conversions[index + 1], scratch_dir_path, profiler)
+                prefetch_dicom_series(next_series, conversion, stage_executor, args)
+            else:
+                next_series = None
+
+            with profiler.series(series.series_profile):
+                try:
+                    series.output_dir_path, convert = get_conversion_function(
+                        bids_session, conversion, index + 1, counter.total, output_dirs, cache, args, profiler
+                    )
+
+                    series.series_result.post_processed_file_names = convert(
+                        series.dicom_input, series.tmp_output_dir.name
+                    )
+                except Exception as error:
+                    print_error(str(error))
+                    series.series_result.error = error
+
+                series.series_profile.success = series.series_result.success
+
+            # The staged DICOM files are not needed once the DICOM series is converted.
+            series.tmp_dicom_dir.cleanup()
+
+            # The output files of the previous DICOM series are moved before those of this DICOM
+            # series so that the outcomes are recorded in order.
+            if moved_series is not None:
+                complete_moved_series(*moved_series)
+                moved_series = None
+
+            if series.series_result.error is None:
+                moved_series = series, move_executor.submit(series.move_outputs, output_dirs, profiler)
+            else:
+                complete_series(series)
+
+        if moved_series is not None:
+            complete_moved_series(*moved_series)
+            moved_series = None
+    finally:
+        stage_executor.shutdown(cancel_futures=True)
+        move_executor.shutdown(cancel_futures=True)
+
+        # Delete the temporary directories of the DICOM series left in the pipeline if the conversion
+        # is interrupted.
+        for pipelined_series in [series, next_series, moved_series[0] if moved_series is not None else None]:
+            if pipelined_series is not None:
+                pipelined_series.cleanup()
+
+
+def prefetch_dicom_series(
+    series: PipelinedDicomSeries,
+    current_conversion: DicomSeriesConversion,
+    executor: Executor,
+    args: Args,
+):
+    """
+    Prefetch the DICOM files of the next DICOM series of the conversion pipeline in a background
+    thread. These files are staged if the DICOM series may be converted with `dcm2niix` and if the
+    DICOM files of the current and next DICOM series fit in the scratch bound of the pipeline, and
+    are only read ahead otherwise. With the conversion cache, the DICOM files are only read ahead to
+    compute the cache key, as they are not staged if the conversion is cached.
+    """
+
+    assert args.pipeline is not None
+
+    stage_files = args.cache is None and current_conversion.bytes_count + series.conversion.bytes_count \
+        <= args.pipeline.scratch_limit * 1024 * 1024
+
+    if stage_files and args.native_writer:
+        # Imported lazily so that `numpy` is only required if the native writer is enabled.
+        from mni_7t_dicom_to_bids.native_writer import is_native_writer_candidate
+
+        stage_files = not is_native_writer_candidate(series.conversion.dicom_series)
+
+    series.dicom_input.prefetch(
+        executor, series.series_profile, stage_files, args.pipeline.readahead_limit * 1024 * 1024
+    )
+
+
+def get_conversion_function(
+    bids_session: BidsSessionInfo,
+    conversion: DicomSeriesConversion,
+    position: int,
+    total: int,
+    output_dirs: OutputDirectories,
+    cache: ConversionCache | None,
+    args: Args,
+    profiler: Profiler,
+) -> tuple[str, Callable[[DicomSeriesInput, str], dict[str, str | None]]]:
+    """
+    Print the DICOM series conversion being processed, and get its output directory and the function
+    that converts its DICOM series to NIfTI in a temporary output directory.
+    """
+
+    dicom_series = conversion.dicom_series
+    bids_acquisition = conversion.bids_acquisition
+    run_number = conversion.run_number
+
+    if bids_acquisition is not None:
+        print_info(
+            f"Processing BIDS acquisition '{bids_acquisition.scan_type}/{bids_acquisition.file_name}'"
+            f" ({position} / {total})."
+        )
+
+        output_dir_path = get_bids_data_type_dir_path(
+            args.bids_dataset_path, bids_session, bids_acquisition, output_dirs
+        )
+
+        def convert(dicom_input: DicomSeriesInput, tmp_output_dir_path: str) -> dict[str, str | None]:
+            return convert_bids_dicom_series(
+                bids_session,
+                bids_acquisition,
+                output_dir_path,
+                output_dirs,
+                cache,
+                run_number,
+                args,
+                profiler,
+                dicom_input,
+                tmp_output_dir_path,
+            )
+    else:
+        print_info(
+            f"Processing unknown DICOM series '{dicom_series.description}'"
+            f" ({position} / {total})."
+        )
+
+        assert isinstance(args.unknowns, ConvertUnknownsArg)
+        output_dir_path = args.unknowns.dir_path
+
+        def convert(dicom_input: DicomSeriesInput, tmp_output_dir_path: str) -> dict[str, str | None]:
+            return convert_unknown_dicom_series(
+                dicom_series, dicom_input, tmp_output_dir_path, cache, args, profiler
+            )
+
+    return output_dir_path, convert
+
+
+def patch_json_files(tmp_output_dir_path: str, series_result: SeriesResult, profiler: Profiler):
+    """
+    Add the DICOM fields ignored by `dcm2niix` to the JSON sidecar files of a converted DICOM
+    series, before they are moved to their final directory.
+    """
+
+    with profiler.stage('patch_json') as stage:
+        for file in os.scandir(tmp_output_dir_path):
+            if file.name.endswith('.json'):
+                stage.files_count += 1
+                patchjson(
+                    tmp_output_dir_path,
+                    file.name,
+                    series_result.dicom_series,
+                    series_result.run_number,
+                )
 
 
 def convert_bids_dicom_series(
     bids_session: BidsSessionInfo,
     bids_acquisition: BidsAcquisitionInfo,
     bids_data_type_path: str,
+    output_dirs: OutputDirectories,
+    cache: ConversionCache | None,
     run_number: int | None,
     args: Args,
-    tmp_dicom_dir_path: str,
+    profiler: Profiler,
+    dicom_input: DicomSeriesInput,
     tmp_output_dir_path: str,
-):
+) -> dict[str, str | None]:
     """
-    Convert a known DICOM series to NIfTI.
+    Convert a known DICOM series to NIfTI, and return the new name of each file written by `dcm2niix`
+    or the native writer after the post processing, or `None` for the deleted files.
     """
 
     file_name = get_bids_acquisition_file_name(bids_session, bids_acquisition.file_name, run_number)
 
-    run_dicom_to_niix(tmp_dicom_dir_path, tmp_output_dir_path, file_name, args)
+    run_nifti_conversion(dicom_input, tmp_output_dir_path, file_name, cache, args, profiler)
 
-    post_process(tmp_output_dir_path)
+    with profiler.stage('post_process'):
+        post_processed_file_names = post_process(tmp_output_dir_path)
 
     # Check if the files already exist in the target directory.
 
-    existing_file_paths = get_existing_bids_file_paths(tmp_output_dir_path, bids_data_type_path)
+    existing_file_paths = get_existing_bids_file_paths(tmp_output_dir_path, bids_data_type_path, output_dirs)
 
+    # The existing files are only replaced when the output files are moved, and only if their
+    # content differs.
     print_existing_bids_files(existing_file_paths, bids_data_type_path, args.overwrite)
 
-    for existing_file_path in existing_file_paths:
-        os.remove(existing_file_path)
+    return post_processed_file_names
 
 
-def get_existing_bids_file_paths(tmp_output_dir_path: str, bids_data_type_path: str) -> list[str]:
+def get_existing_bids_file_paths(
+    tmp_output_dir_path: str,
+    bids_data_type_path: str,
+    output_dirs: OutputDirectories,
+) -> list[str]:
     """
-    Get the paths of the files from a completedDICOM series conversion that already exist in the
+    Get the paths of the files from a completed DICOM series conversion that already exist in the
     BIDS dataset.
     """
 
     existing_file_paths: list[str] = []
 
     for file in os.scandir(tmp_output_dir_path):
-        output_file_path = os.path.join(bids_data_type_path, file.name)
-        if os.path.exists(output_file_path):
-            existing_file_paths.append(output_file_path)
+        if output_dirs.file_exists(bids_data_type_path, file.name):
+            existing_file_paths.append(os.path.join(bids_data_type_path, file.name))
 
     return existing_file_paths
 
 
 def convert_unknown_dicom_series(
     unknown_dicom_series: DicomSeriesInfo,
-    tmp_dicom_dir_path: str,
+    dicom_input: DicomSeriesInput,
     tmp_output_dir_path: str,
+    cache: ConversionCache | None,
     args: Args,
-):
+    profiler: Profiler,
+) -> dict[str, str | None]:
     """
-    Convert an unknown DICOM series to NIfTI.
+    Convert an unknown DICOM series to NIfTI. The output files of an unknown DICOM series are not
+    post-processed.
     """
 
     file_name = unknown_dicom_series.description
@@ -185,85 +713,306 @@ def convert_unknown_dicom_series(
     # Prepend series number to disambiguate series runs.
     file_name = f'{unknown_dicom_series.number}_{file_name}'
 
-    run_dicom_to_niix(tmp_dicom_dir_path, tmp_output_dir_path, file_name, args)
+    run_nifti_conversion(dicom_input, tmp_output_dir_path, file_name, cache, args, profiler)
+
+    return {}
 
 
 def run_conversion_function(
     dicom_series: DicomSeriesInfo,
     output_dir_path: str,
+    scratch_dir_path: str | None,
+    output_dirs: OutputDirectories,
     counter: DicomSeriesConversionsCounter,
-    convert: Callable[[str, str], None],
+    profiler: Profiler,
+    series_result: SeriesResult,
+    convert: Callable[[DicomSeriesInput, str], dict[str, str | None]],
 ):
     """
-    Run the DICOM to NIfTI conversion function with temporary input and output directories, handle
-    file copies, and recover from errors.
+    Run the DICOM to NIfTI conversion function with temporary input and output directories in the
+    scratch directory, handle file copies, and recover from errors. The output files that are
+    identical to existing files are not moved, so that the existing files are left untouched. The
+    output file paths or the error of the conversion are recorded in the series result.
     """
 
     try:
-        ML=[]
-        with tempfile.TemporaryDirectory() as tmp_dicom_dir_path:
-            # Copy the DICOM files of the DICOM series in the temporary input directory.
-            for dicom_file_path in dicom_series.file_paths:
-                shutil.copy(dicom_file_path, tmp_dicom_dir_path)
-
-            with tempfile.TemporaryDirectory() as tmp_output_dir_path:
-                convert(tmp_dicom_dir_path, tmp_output_dir_path)
-
-                # Move the output files to their final directory.
-                for file in os.scandir(tmp_output_dir_path):
-                    shutil.move(file.path, output_dir_path)
-                    #breakpoint()
-                    ML.append(str(file.name))
-                    
-            counter.successes += 1
-            return ML # list of json paths to read elsewhere for patching. APB
-            
+        with tempfile.TemporaryDirectory(dir=scratch_dir_path) as tmp_dicom_dir_path:
+            dicom_input = DicomSeriesInput(dicom_series, tmp_dicom_dir_path, profiler)
+
+            with tempfile.TemporaryDirectory(dir=scratch_dir_path) as tmp_output_dir_path:
+                series_result.post_processed_file_names = convert(dicom_input, tmp_output_dir_path)
+
+                move_output_files(tmp_output_dir_path, output_dir_path, output_dirs, series_result, profiler)
+
+                print_unchanged_bids_files(series_result.unchanged_file_paths, output_dir_path)
+
+        counter.successes += 1
     except Exception as error:
         print_error(str(error))
+        series_result.error = error
         counter.errors += 1
 
 
-def run_dicom_to_niix(dicom_dir_path: str, output_dir_path: str, file_name: str, args: Args):
+def move_output_files(
+    tmp_output_dir_path: str,
+    output_dir_path: str,
+    output_dirs: OutputDirectories,
+    series_result: SeriesResult,
+    profiler: Profiler,
+):
+    """
+    Patch the JSON files of a converted DICOM series and move its output files to their final
+    directory, except the output files that are identical to existing files. The output file paths
+    are recorded in the series result.
+    """
+
+    patch_json_files(tmp_output_dir_path, series_result, profiler)
+
+    with profiler.stage('move_outputs') as stage:
+        for file in os.scandir(tmp_output_dir_path):
+            output_file_path = os.path.join(output_dir_path, file.name)
+            series_result.output_file_paths.append(output_file_path)
+            stage.files_count += 1
+
+            # Compare the output file with the existing file by size and then by content.
+            file_stat = file.stat()
+            file_size = file_stat.st_size
+            if output_dirs.file_exists(output_dir_path, file.name) \
+                    and output_dirs.get_file_size(output_dir_path, file.name) == file_size:
+                stage.bytes_read += 2 * file_size
+                if get_file_digest(file.path) == get_file_digest(output_file_path):
+                    series_result.unchanged_file_paths.append(output_file_path)
+                    continue
+
+            # The output files restored from or stored in the conversion cache are hard linked with
+            # the cached files, they are copied so that the BIDS files never share their content
+            # with the cache.
+            stage.bytes_written += file_size
+            output_dirs.move_file(file.path, output_dir_path, file.name, copy=file_stat.st_nlink > 1)
+
+
+def run_nifti_conversion(
+    dicom_input: DicomSeriesInput,
+    output_dir_path: str,
+    file_name: str,
+    cache: ConversionCache | None,
+    args: Args,
+    profiler: Profiler,
+):
+    """
+    Convert a DICOM series to NIfTI with the in-process writer if it is enabled and supports that
+    DICOM series, or with `dcm2niix` otherwise. If the conversion cache is enabled, the files of a
+    previous `dcm2niix` conversion of the same DICOM files are restored instead of running
+    `dcm2niix`, and the successful `dcm2niix` conversions are stored in the cache.
+    """
+
+    if args.native_writer:
+        # Imported lazily so that `numpy` is only required if the native writer is enabled.
+        from mni_7t_dicom_to_bids.native_writer import (
+            UnsupportedDicomSeriesError,
+            is_native_writer_candidate,
+            read_native_dicom_series,
+            write_native_nifti,
+        )
+
+        if is_native_writer_candidate(dicom_input.dicom_series):
+            try:
+                with profiler.stage('native_writer') as stage:
+                    datasets = read_native_dicom_series(dicom_input.dicom_series)
+                    stage.bytes_read = sum(os.path.getsize(path) for path in dicom_input.dicom_series.file_paths)
+                    output_file_paths = write_native_nifti(datasets, output_dir_path, file_name)
+                    stage.bytes_written = sum(os.path.getsize(path) for path in output_file_paths)
+                    stage.files_count = len(output_file_paths)
+            except UnsupportedDicomSeriesError as error:
+                print_info(f"Cannot convert the DICOM series in-process, falling back to dcm2niix: {error}")
+            else:
+                print_info("Converted the DICOM series in-process and generated the following files:")
+                for output_file_path in output_file_paths:
+                    print_info(f"- {quote(os.path.basename(output_file_path))}")
+
+                return
+
+    if cache is None:
+        run_dicom_to_niix(dicom_input.get_staged_dir_path(), output_dir_path, file_name, args, profiler)
+        return
+
+    # The DICOM files are only staged if the conversion is not cached.
+    with profiler.stage('cache_lookup') as stage:
+        cache_key = cache.get_key(dicom_input.dicom_series.file_paths, dicom_to_niix_options)
+        stage.bytes_read = sum(os.path.getsize(path) for path in dicom_input.dicom_series.file_paths)
+        output_file_names = cache.restore(cache_key, output_dir_path, file_name)
+        if output_file_names is not None:
+            stage.files_count = len(output_file_names)
+
+    if output_file_names is not None:
+        print_info("Restored the following files from the conversion cache:")
+        for output_file_name in output_file_names:
+            print_info(f"- {quote(output_file_name)}")
+
+        return
+
+    success = run_dicom_to_niix(dicom_input.get_staged_dir_path(), output_dir_path, file_name, args, profiler)
+
+    # The conversions that failed are not cached, even if their files are included.
+    if success:
+        with profiler.stage('cache_store') as stage:
+            if cache.store(cache_key, output_dir_path, file_name):
+                stage.files_count = len(os.listdir(output_dir_path))
+
+
+def run_dicom_to_niix(
+    dicom_dir_path: str,
+    output_dir_path: str,
+    file_name: str,
+    args: Args,
+    profiler: Profiler,
+) -> bool:
     """
-    Run `dcm2niix` on a DICOM series run the post-processings on the result.
+    Run `dcm2niix` on a DICOM series run the post-processings on the result, and return whether
+    `dcm2niix` succeeded.
     """
 
     command = [
         'dcm2niix',
-        '-z', 'y', '-b', 'y', 
+        *dicom_to_niix_options,
         '-o', output_dir_path,
         '-f', file_name,
         dicom_dir_path,
     ]
             
    #command = ['dcm2niix','-b','y','-ba','y','z','y','f', file_name, '-o', output_dir_path, dicom_dir_path] #Jonahs settings
-    print(f"Running dcm2niix with command: '{' '.join(command)}'.")
 
-    process = with_print_subscript(lambda: subprocess.run(command))
+    match args.dcm2niix_limits.ionice:
+        case 'idle':
+            command = ['ionice', '-c', '3', *command]
+        case 'best-effort':
+            command = ['ionice', '-c', '2', '-n', '7', *command]
+        case _:
+            pass
+
+    if args.dcm2niix_limits.nice != 0:
+        command = ['nice', '-n', str(args.dcm2niix_limits.nice), *command]
+
+    print_info(f"Running dcm2niix with command: '{' '.join(command)}'.")
+
+    timeout = get_dicom_to_niix_timeout(args.dcm2niix_limits, dicom_dir_path)
+
+    with profiler.stage('dcm2niix') as stage:
+        # In quiet mode, the output of dcm2niix is only printed if the conversion fails.
+        try:
+            if is_quiet():
+                process = run_limited_process(command, args.dcm2niix_limits, timeout, capture_output=True)
+            else:
+                process = with_print_subscript(lambda: run_limited_process(command, args.dcm2niix_limits, timeout))
+        except subprocess.TimeoutExpired as error:
+            if is_quiet() and error.output:
+                print(error.output, end='')
+
+            raise DicomToNiixTimeoutError(
+                f"dcm2niix was killed after exceeding its timeout of {timeout:.0f} seconds. Files will not be copied"
+                " to the BIDS dataset.",
+                error.timeout,
+            ) from None
+
+        output_file_names: list[str] = []
+        for file in os.scandir(output_dir_path):
+            stage.bytes_written += file.stat().st_size
+            stage.files_count += 1
+            output_file_names.append(file.name)
 
     if process.returncode != 0:
+        if is_quiet():
+            print(process.stdout, end='')
+
+        if process.returncode < 0:
+            failure = f"dcm2niix was killed by the signal {signal.Signals(-process.returncode).name}"
+        else:
+            failure = f"dcm2niix exited with the non-zero exit code {process.returncode}"
+
         match args.errors:
             case SkipErrorsArg():
-                raise Exception(
-                    f"dcm2niix exited with the non-zero exit code {process.returncode}. Files will not be copied to the"
-                    " BIDS dataset."
+                raise DicomToNiixError(
+                    f"{failure}. Files will not be copied to the BIDS dataset.",
+                    process.returncode,
                 )
             case IncludeErrorsArg():
-                print_warning(
-                    f"dcm2niix exited with the non-zero exit code {process.returncode}. Files will nonetheless be"
-                    " copied to the BIDS dataset."
-                )
+                print_warning(f"{failure}. Files will nonetheless be copied to the BIDS dataset.")
 
-    print("Generated the following files for this series:")
+    print_info("Generated the following files for this series:")
 
-    for file in os.scandir(output_dir_path):
-        print(f"- {quote(file.name)}")
+    for output_file_name in output_file_names:
+        print_info(f"- {quote(output_file_name)}")
+
+    return process.returncode == 0
+
+
+def get_dicom_to_niix_timeout(limits: DicomToNiixLimitsArg, dicom_dir_path: str) -> float | None:
+    """
+    Get the timeout of the `dcm2niix` conversion of a staged DICOM series, which is scaled by the
+    size of its DICOM files, or `None` if `dcm2niix` has no timeout.
+    """
+
+    if limits.timeout is None:
+        return None
+
+    dicom_bytes = sum(file.stat().st_size for file in os.scandir(dicom_dir_path))
+    return limits.timeout + limits.timeout_per_mb * dicom_bytes / (1024 * 1024)
+
+
+def run_limited_process(
+    command: list[str],
+    limits: DicomToNiixLimitsArg,
+    timeout: float | None,
+    capture_output: bool = False,
+) -> subprocess.CompletedProcess[str]:
+    """
+    Run a `dcm2niix` process with the configured resource limits, the niceness and I/O priority
+    being applied by the command prefixes. The process runs in its own process group so that it is
+    killed along with its children (such as `pigz`) if it exceeds its timeout, in which case a
+    `subprocess.TimeoutExpired` error is raised.
+    """
+
+    def limit_process():
+        if limits.memory_limit is not None:
+            memory_limit = limits.memory_limit * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+        if limits.cpu_limit is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, (limits.cpu_limit, limits.cpu_limit))
+
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE if capture_output else None,
+        stderr=subprocess.STDOUT if capture_output else None,
+        text=True,
+        start_new_session=True,
+        # A pre-exec function is unsafe in a process with threads and disables the fast spawn path,
+        # so it is only used to set the resource limits.
+        preexec_fn=limit_process if limits.memory_limit is not None or limits.cpu_limit is not None else None,
+    )
+
+    try:
+        stdout, _ = process.communicate(timeout=timeout)
+    except BaseException as error:
+        # Kill the process group on a timeout, and also on an interruption since the process group
+        # does not receive the terminal signals.
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+
+        stdout, _ = process.communicate()
+        if isinstance(error, subprocess.TimeoutExpired):
+            error.output = stdout
+
+        raise
+
+    return subprocess.CompletedProcess(command, process.returncode, stdout)
 
 
 def get_bids_data_type_dir_path(
     bids_dataset_path: str,
     bids_session: BidsSessionInfo,
     bids_acquisition: BidsAcquisitionInfo,
+    output_dirs: OutputDirectories,
 ) -> str:
     """
     Get the path of a BIDS data type directory, and create this directory if it does not already
@@ -277,7 +1026,7 @@ def get_bids_data_type_dir_path(
         bids_acquisition.scan_type
     )
 
-    os.makedirs(bids_data_type_path, exist_ok=True)
+    output_dirs.make_dir(bids_data_type_path)
     return bids_data_type_path
 
 
@@ -349,16 +1098,14 @@ def addfields2json(jsonfile, Patient_Age, Patient_Birth, Patient_Sex, Patient_He
    # Save the modified JSON data back to the file
     with open(jsonfile, 'w') as f:
      json.dump(data, f, indent=4)
-
-    print(f"JSON data in '{jsonfile}' updated successfully.")
     
 # Patch-Json
 #def patchjson(bids_data_type_path, bids_acquisition, bids_session, dicom_series, run_number):
 def patchjson(bids_data_type_path,bidsin, dicom_series, run_number):
-    
+    # Imported lazily so that importing the conversion stage does not load `pydicom`.
+    import pydicom
+
     if 'neuromelaninMTw' in bidsin:
-     print(f"Neuromelanin MPN Series found in: {bidsin} and run: {run_number}")
-     
      FLA=find_string_in_file(dicom_series.file_paths[0], 'sWipMemBlock.adFree[2]')
      mtFlip_Angle=str(re.findall(r'\d+\.\d+', FLA[0])[0])
     else:
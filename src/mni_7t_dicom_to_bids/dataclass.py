@@ -1,11 +1,103 @@
 import re
 from collections import defaultdict
+from collections.abc import Sequence
 from dataclasses import dataclass, field
 from re import Match, Pattern
 
 from mni_7t_dicom_to_bids.variables import bids_label_order
 
 
+@dataclass
+class DicomFileHeader:
+    """
+    The header fields of a DICOM file that are used to sort the DICOM files of a DICOM study.
+    """
+
+    series_description: str
+    """
+    The DICOM series description.
+    """
+
+    series_number: int
+    """
+    The DICOM series number.
+    """
+
+    series_instance_uid: str | None
+    """
+    The DICOM series instance UID if there is one.
+    """
+
+    sop_instance_uid: str | None
+    """
+    The DICOM SOP instance UID if there is one.
+    """
+
+    instance_number: int | None
+    """
+    The DICOM instance number if there is one.
+    """
+
+    acquisition_time: str | None
+    """
+    The DICOM acquisition time if there is one.
+    """
+
+    skip_reason: str | None = None
+    """
+    The reason why the DICOM file cannot or need not be converted to NIfTI according to its SOP
+    class, modality or image type, if there is one.
+    """
+
+    echo_number: int | None = None
+    """
+    The DICOM echo number if there is one.
+    """
+
+    images_in_acquisition: int | None = None
+    """
+    The DICOM number of images in the acquisition of the file if there is one.
+    """
+
+    mosaic: bool = False
+    """
+    Whether the DICOM file is a Siemens mosaic, which contains all the slices of a volume.
+    """
+
+
+@dataclass
+class DicomSeriesDuplicates:
+    """
+    Information about the duplicate DICOM files of a DICOM series that were dropped while sorting
+    the DICOM study.
+    """
+
+    instance_files_count: int = 0
+    """
+    The number of DICOM files dropped because their SOP instance UID was already found in another
+    DICOM file.
+    """
+
+    series_instance_uids: list[str] = field(default_factory=list[str])
+    """
+    The series instance UIDs of the DICOM series dropped because they duplicate another DICOM series
+    with the same description and number.
+    """
+
+    series_files_count: int = 0
+    """
+    The number of DICOM files of the dropped duplicate DICOM series.
+    """
+
+    @property
+    def files_count(self) -> int:
+        """
+        The total number of dropped DICOM files.
+        """
+
+        return self.instance_files_count + self.series_files_count
+
+
 @dataclass(frozen=True, order=True)
 class DicomSeriesInfo:
     """
@@ -22,9 +114,32 @@ class DicomSeriesInfo:
     The DICOM series number.
     """
 
-    file_paths: list[str] = field(compare=False)
+    file_paths: Sequence[str] = field(compare=False)
+    """
+    The paths of the DICOM files of the series, which are stored in a compact `DicomFilePaths` when
+    the series is found by the converter.
+    """
+
+    duplicates: DicomSeriesDuplicates = field(default_factory=DicomSeriesDuplicates, compare=False)
     """
-    The paths of the DICOM files of the series.
+    The duplicate DICOM files of the series that were dropped.
+    """
+
+    skip_reason: str | None = field(default=None, compare=False)
+    """
+    The reason why the DICOM series cannot or need not be converted to NIfTI, if all its DICOM files
+    share one.
+    """
+
+    series_instance_uids: list[str] = field(default_factory=list[str], compare=False)
+    """
+    The DICOM series instance UIDs of the DICOM files of the series.
+    """
+
+    incomplete_reason: str | None = field(default=None, compare=False)
+    """
+    The reason why the DICOM series seems to be missing some DICOM files according to the headers
+    of its DICOM files, if it does.
     """
 
 
@@ -88,6 +203,50 @@ class DicomBidsMapping:
     """
 
 
+@dataclass
+class DicomSeriesConversion:
+    """
+    A planned conversion of a DICOM series to BIDS.
+    """
+
+    dicom_series: DicomSeriesInfo
+    """
+    The DICOM series to convert.
+    """
+
+    bids_acquisition: BidsAcquisitionInfo | None
+    """
+    The BIDS acquisition of the DICOM series, or `None` if the DICOM series is unknown.
+    """
+
+    run_number: int | None
+    """
+    The BIDS run number of the DICOM series if its BIDS acquisition has several DICOM series.
+    """
+
+    bytes_count: int
+    """
+    The total size of the DICOM files of the DICOM series in bytes.
+    """
+
+    estimated_time: float | None = None
+    """
+    The duration of the conversion estimated from the runtime history in seconds if there is one.
+    """
+
+    @property
+    def acquisition_name(self) -> str | None:
+        """
+        The name of the BIDS acquisition of the DICOM series, or `None` if the DICOM series is
+        unknown.
+        """
+
+        if self.bids_acquisition is None:
+            return None
+
+        return f'{self.bids_acquisition.scan_type}/{self.bids_acquisition.file_name}'
+
+
 @dataclass
 class DicomSeriesConversionsCounter:
     """
@@ -6,21 +6,30 @@ from datetime import datetime
 from importlib.abc import Traversable
 from importlib.resources import as_file, files
 
-from bic_util.print import print_error_exit, print_warning
+from bic_util.print import print_warning
 
 from mni_7t_dicom_to_bids.dataclass import BidsSessionInfo
-
-
-def add_dataset_files(bids_dataset_path: str, bids_session: BidsSessionInfo, dicom_study_path: str, overwrite: bool):
+from mni_7t_dicom_to_bids.errors import DatasetFileConflictError
+from mni_7t_dicom_to_bids.events import print_info
+from mni_7t_dicom_to_bids.output_dirs import OutputDirectories
+
+
+def add_dataset_files(
+    bids_dataset_path: str,
+    bids_session: BidsSessionInfo,
+    dicom_study_path: str,
+    overwrite: bool,
+    output_dirs: OutputDirectories,
+):
     """
     Add the auxiliary dataset files to the output BIDS directory.
     """
 
-    print("Creating auxiliary files...")
+    print_info("Creating auxiliary files...")
 
     add_static_dataset_files(bids_dataset_path, overwrite)
 
-    add_participants_7t_to_bids_json_file(bids_dataset_path, bids_session, dicom_study_path)
+    add_participants_7t_to_bids_json_file(bids_dataset_path, bids_session, dicom_study_path, output_dirs)
 
     add_participants_tsv_file(bids_dataset_path, bids_session)
 
@@ -30,8 +39,8 @@ def add_dataset_files(bids_dataset_path: str, bids_session: BidsSessionInfo, dic
 def add_static_dataset_files(bids_dir_path: str, overwrite: bool):
     """
     Copy the static dataset files into the BIDS directory. The files are copied only if they do not
-    exist in the BIDS directory, or if they exist and are changed but can be overwritten. Exit the
-    program with an error if some file exists and is changed but cannot be overwritten.
+    exist in the BIDS directory, or if they exist and are changed but can be overwritten. Raise an
+    error if some file exists and is changed but cannot be overwritten.
     """
 
     # Copy the static dataset files.
@@ -40,10 +49,10 @@ def add_static_dataset_files(bids_dir_path: str, overwrite: bool):
             old_file_path = os.path.join(bids_dir_path, file_name)
 
             if not os.path.exists(old_file_path):
-                print(f"File '{file_name}' does not exist in the BIDS directory. Creating...")
+                print_info(f"File '{file_name}' does not exist in the BIDS directory. Creating...")
             else:
                 if filecmp.cmp(old_file_path, new_file_path, shallow=False):
-                    print(f"File '{file_name}' already exists in the BIDS directory and is unchanged. Skipping.")
+                    print_info(f"File '{file_name}' already exists in the BIDS directory and is unchanged. Skipping.")
                     continue
 
                 if overwrite:
@@ -51,33 +60,39 @@ def add_static_dataset_files(bids_dir_path: str, overwrite: bool):
                         f"File '{file_name}' already exists in the BIDS directory and is changed. Overwriting..."
                     )
                 else:
-                    print_error_exit(
+                    raise DatasetFileConflictError(
                         f"File '{file_name}' already exists in the BIDS directory and is changed, use the option"
-                        " '--overwrite' to overwrite it."
+                        " '--overwrite' to overwrite it.",
+                        old_file_path,
                     )
 
             shutil.copyfile(new_file_path, old_file_path)
 
 
-def add_participants_7t_to_bids_json_file(bids_dataset_path: str, bids_session: BidsSessionInfo, dicom_study_path: str):
+def add_participants_7t_to_bids_json_file(
+    bids_dataset_path: str,
+    bids_session: BidsSessionInfo,
+    dicom_study_path: str,
+    output_dirs: OutputDirectories,
+):
     """
     Create or update the `participants_7t_to_bids.tsv` file.
     """
 
     file_path = os.path.join(bids_dataset_path, 'participants_7t_to_bids.tsv')
     if os.path.exists(file_path):
-        print("File 'participants_7t_to_bids.tsv' already exists.")
+        print_info("File 'participants_7t_to_bids.tsv' already exists.")
     else:
-        print("Creating file 'participants_7t_to_bids.tsv'...")
+        print_info("Creating file 'participants_7t_to_bids.tsv'...")
         with open(file_path, 'w') as file:
             file.write("sub\tses\tdate\tN.anat\tN.dwi\tN.func\tN.fmap\tdicoms\tuser\n")
 
-    anat_count = _count_nifti_files(bids_dataset_path, bids_session, 'anat')
-    dwi_count  = _count_nifti_files(bids_dataset_path, bids_session, 'dwi')
-    func_count = _count_nifti_files(bids_dataset_path, bids_session, 'func')
-    fmap_count = _count_nifti_files(bids_dataset_path, bids_session, 'fmap')
+    anat_count = _count_nifti_files(bids_dataset_path, bids_session, 'anat', output_dirs)
+    dwi_count  = _count_nifti_files(bids_dataset_path, bids_session, 'dwi', output_dirs)
+    func_count = _count_nifti_files(bids_dataset_path, bids_session, 'func', output_dirs)
+    fmap_count = _count_nifti_files(bids_dataset_path, bids_session, 'fmap', output_dirs)
 
-    print("Appending session to file 'participants_7t_to_bids.tsv'...")
+    print_info("Appending session to file 'participants_7t_to_bids.tsv'...")
 
     time = os.path.getmtime(bids_dataset_path)
     date_string = datetime.fromtimestamp(time).strftime('%Y-%m-%d')
@@ -96,13 +111,13 @@ def add_participants_tsv_file(bids_dataset_path: str, bids_session: BidsSessionI
 
     file_path = os.path.join(bids_dataset_path, 'participants.tsv')
     if os.path.exists(file_path):
-        print("File 'participants.tsv' already exists.")
+        print_info("File 'participants.tsv' already exists.")
     else:
-        print("Creating file 'participants.tsv'...")
+        print_info("Creating file 'participants.tsv'...")
         with open(file_path, 'w') as file:
             file.write("participant_id\tsite\n")
 
-    print("Appending session to file 'participants.tsv'...")
+    print_info("Appending session to file 'participants.tsv'...")
 
     with open(file_path, 'a') as file:
         file.write(f"sub-{bids_session.subject}\tMontreal_SiemmensTerra7T\n")
@@ -117,13 +132,13 @@ def add_sessions_tsv_file(bids_dataset_path: str, bids_session: BidsSessionInfo)
     file_path = os.path.join(bids_dataset_path, f'sub-{bids_session.subject}', file_name)
 
     if os.path.exists(file_path):
-        print(f"File '{file_name}' already exists.")
+        print_info(f"File '{file_name}' already exists.")
     else:
-        print(f"Creating file '{file_name}'...")
+        print_info(f"Creating file '{file_name}'...")
         with open(file_path, 'w') as file:
             file.write('session_id\n')
 
-    print(f"Appending session to file '{file_name}'...")
+    print_info(f"Appending session to file '{file_name}'...")
 
     with open(file_path, 'a') as file:
         file.write(f'ses-{bids_session.session}\n')
@@ -138,9 +153,15 @@ def _resolve_asset_file_path(file_name: str) -> Traversable:
     return files('mni_7t_dicom_to_bids').joinpath(rel_file_path)
 
 
-def _count_nifti_files(bids_dataset_path: str, bids_session: BidsSessionInfo, scan_type_name: str) -> int:
+def _count_nifti_files(
+    bids_dataset_path: str,
+    bids_session: BidsSessionInfo,
+    scan_type_name: str,
+    output_dirs: OutputDirectories,
+) -> int:
     """
-    Count the NIfTI files in a directory.
+    Count the NIfTI files in a directory, using the listing of the output directories if they were
+    already listed during the conversion.
     """
 
     bids_scan_type_path = os.path.join(
@@ -150,13 +171,4 @@ def _count_nifti_files(bids_dataset_path: str, bids_session: BidsSessionInfo, sc
         scan_type_name,
     )
 
-    if not os.path.exists(bids_scan_type_path):
-        return 0
-
-    count = 0
-
-    for file in os.scandir(bids_scan_type_path):
-        if file.name.endswith('.nii.gz'):
-            count += 1
-
-    return count
+    return sum(1 for file_name in output_dirs.list_files(bids_scan_type_path) if file_name.endswith('.nii.gz'))
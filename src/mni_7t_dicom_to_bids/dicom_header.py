@@ -0,0 +1,271 @@
+import pydicom
+from pydicom.errors import InvalidDicomError
+
+from mni_7t_dicom_to_bids.dataclass import DicomFileHeader
+from mni_7t_dicom_to_bids.dicom_tag_reader import read_dicom_tags
+from mni_7t_dicom_to_bids.errors import DicomReadError
+from mni_7t_dicom_to_bids.variables import dicom_skip_image_types, dicom_skip_modalities, dicom_skip_sop_class_uids
+
+# Tags of the DICOM attributes read by the fast DICOM header reader.
+_specific_character_set_tag = 0x00080005
+_image_type_tag             = 0x00080008
+_sop_class_uid_tag          = 0x00080016
+_sop_instance_uid_tag       = 0x00080018
+_acquisition_time_tag       = 0x00080032
+_modality_tag               = 0x00080060
+_series_description_tag     = 0x0008103E
+_series_instance_uid_tag    = 0x0020000E
+_series_number_tag          = 0x00200011
+_echo_numbers_tag           = 0x00180086
+_instance_number_tag        = 0x00200013
+_images_in_acquisition_tag  = 0x00201002
+
+_fast_header_tags = {
+    _specific_character_set_tag,
+    _image_type_tag,
+    _sop_class_uid_tag,
+    _sop_instance_uid_tag,
+    _acquisition_time_tag,
+    _modality_tag,
+    _series_description_tag,
+    _series_instance_uid_tag,
+    _series_number_tag,
+    _echo_numbers_tag,
+    _instance_number_tag,
+    _images_in_acquisition_tag,
+}
+
+# Python encodings of the DICOM character sets supported by the fast DICOM header reader. The
+# default character set is decoded as Latin-1 like pydicom does.
+_fast_header_encodings = {
+    ''           : 'latin_1',
+    'ISO_IR 6'   : 'latin_1',
+    'ISO_IR 100' : 'latin_1',
+    'ISO_IR 192' : 'utf_8',
+}
+
+
+def read_dicom_file_header(dicom_file_path: str, fast: bool = False) -> DicomFileHeader:
+    """
+    Read the header fields of a DICOM file that are used to sort the DICOM study, using the fast
+    DICOM header reader first if requested, and pydicom otherwise or if the fast reader does not
+    support the file. Raise an error if the file is not a DICOM file or lacks a series description
+    or number.
+    """
+
+    if fast:
+        header = read_fast_dicom_file_header(dicom_file_path)
+        if header is not None:
+            return header
+
+    try:
+        dicom = pydicom.dcmread(dicom_file_path, stop_before_pixels=True)  # type: ignore
+    except InvalidDicomError:
+        raise DicomReadError(
+            f"Could not read file '{dicom_file_path}', this file may not be a DICOM file.",
+            dicom_file_path,
+        ) from None
+
+    return get_dicom_file_header(dicom, dicom_file_path)
+
+
+def get_dicom_file_header(dicom: pydicom.Dataset, dicom_file_path: str) -> DicomFileHeader:
+    """
+    Get the header fields used to sort the DICOM study from a DICOM dataset. Raise an error if the
+    dataset lacks a series description or number.
+    """
+
+    try:
+        series_description = dicom.SeriesDescription
+    except AttributeError:
+        raise DicomReadError(
+            f"Could not read series description of DICOM file '{dicom_file_path}', this file may be incorrect.",
+            dicom_file_path,
+        ) from None
+
+    try:
+        series_number = dicom.SeriesNumber
+    except AttributeError:
+        raise DicomReadError(
+            f"Could not read series number of DICOM file '{dicom_file_path}', this file may be incorrect.",
+            dicom_file_path,
+        ) from None
+
+    instance_number = dicom.get('InstanceNumber')
+
+    return DicomFileHeader(
+        series_description    = series_description,
+        series_number         = series_number,
+        series_instance_uid   = _get_optional_string(dicom, 'SeriesInstanceUID'),
+        sop_instance_uid      = _get_optional_string(dicom, 'SOPInstanceUID'),
+        instance_number       = int(instance_number) if instance_number is not None else None,
+        acquisition_time      = _get_optional_string(dicom, 'AcquisitionTime'),
+        skip_reason           = get_dicom_skip_reason(dicom),
+        echo_number           = _get_optional_integer(dicom, 'EchoNumbers'),
+        images_in_acquisition = _get_optional_integer(dicom, 'ImagesInAcquisition'),
+        mosaic                = 'MOSAIC' in _get_image_type_values(dicom),
+    )
+
+
+def read_fast_dicom_file_header(dicom_file_path: str) -> DicomFileHeader | None:
+    """
+    Read the header fields of a DICOM file that are used to sort the DICOM study with the minimal
+    DICOM tag reader, which is faster than pydicom. Return `None` if the file is not supported by
+    this reader or lacks a series description or number, so that it is read with pydicom.
+    """
+
+    try:
+        values = read_dicom_tags(dicom_file_path, _fast_header_tags, _images_in_acquisition_tag)
+    except (OSError, ValueError):
+        return None
+
+    if values is None:
+        return None
+
+    # The values that cannot be decoded, including the non-ASCII values of ASCII attributes, are
+    # left to pydicom.
+    try:
+        encoding = _fast_header_encodings.get(_decode_text(values.get(_specific_character_set_tag, b''), 'ascii'))
+        if encoding is None:
+            return None
+
+        series_description = _decode_text(values[_series_description_tag], encoding, strip_leading=False)
+        series_number = _decode_integer(values[_series_number_tag])
+        instance_number = _decode_integer(values.get(_instance_number_tag, b''))
+        echo_number = _decode_integer(values.get(_echo_numbers_tag, b''))
+        images_in_acquisition = _decode_integer(values.get(_images_in_acquisition_tag, b''))
+        image_type = _decode_text(values.get(_image_type_tag, b''), 'ascii')
+        series_instance_uid = _decode_optional_text(values.get(_series_instance_uid_tag))
+        sop_instance_uid = _decode_optional_text(values.get(_sop_instance_uid_tag))
+        acquisition_time = _decode_optional_text(values.get(_acquisition_time_tag))
+        sop_class_uid = _decode_optional_text(values.get(_sop_class_uid_tag))
+        modality = _decode_optional_text(values.get(_modality_tag))
+    except (KeyError, UnicodeDecodeError, ValueError):
+        return None
+
+    # Multi-valued series descriptions and empty series numbers are left to pydicom.
+    if '\\' in series_description or series_number is None:
+        return None
+
+    image_type_values = [value.strip() for value in image_type.split('\\')] if image_type != '' else []
+
+    return DicomFileHeader(
+        series_description    = series_description,
+        series_number         = series_number,
+        series_instance_uid   = series_instance_uid,
+        sop_instance_uid      = sop_instance_uid,
+        instance_number       = instance_number,
+        acquisition_time      = acquisition_time,
+        skip_reason           = get_skip_reason(sop_class_uid, modality, image_type_values),
+        echo_number           = echo_number,
+        images_in_acquisition = images_in_acquisition,
+        mosaic                = 'MOSAIC' in image_type_values,
+    )
+
+
+def get_dicom_skip_reason(dicom: pydicom.Dataset) -> str | None:
+    """
+    Get the reason why a DICOM dataset cannot or need not be converted to NIfTI, or `None` if it
+    can be converted.
+    """
+
+    return get_skip_reason(
+        _get_optional_string(dicom, 'SOPClassUID'),
+        _get_optional_string(dicom, 'Modality'),
+        _get_image_type_values(dicom),
+    )
+
+
+def _get_image_type_values(dicom: pydicom.Dataset) -> list[str]:
+    """
+    Get the values of the image type of a DICOM dataset, which are empty if it has no image type.
+    """
+
+    image_type = dicom.get('ImageType')
+    if image_type is None:
+        return []
+    elif isinstance(image_type, str):
+        return [image_type]
+    else:
+        return list(image_type)
+
+
+def get_skip_reason(sop_class_uid: str | None, modality: str | None, image_type: list[str]) -> str | None:
+    """
+    Get the reason why a DICOM file cannot or need not be converted to NIfTI from its SOP class UID,
+    modality and image type values, or `None` if it can be converted.
+    """
+
+    if sop_class_uid is not None:
+        for skip_sop_class_uid, reason in dicom_skip_sop_class_uids.items():
+            if sop_class_uid == skip_sop_class_uid or sop_class_uid.startswith(skip_sop_class_uid + '.'):
+                return reason
+
+    if modality is not None and modality in dicom_skip_modalities:
+        return dicom_skip_modalities[modality]
+
+    for image_type_value in image_type:
+        if image_type_value in dicom_skip_image_types:
+            return dicom_skip_image_types[image_type_value]
+
+    return None
+
+
+def _get_optional_string(dicom: pydicom.Dataset, keyword: str) -> str | None:
+    """
+    Get the string value of an optional DICOM attribute, or `None` if the attribute is absent or
+    empty.
+    """
+
+    value = dicom.get(keyword)
+    if value is None or value == '':
+        return None
+
+    return str(value)
+
+
+def _get_optional_integer(dicom: pydicom.Dataset, keyword: str) -> int | None:
+    """
+    Get the integer value of an optional DICOM integer string attribute, or `None` if the attribute
+    is absent, empty, multi-valued or invalid.
+    """
+
+    value = dicom.get(keyword)
+    if value is None or value == '':
+        return None
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _decode_text(value: bytes, encoding: str, strip_leading: bool = True) -> str:
+    """
+    Decode a raw DICOM text value, removing its padding like pydicom does.
+    """
+
+    text = value.decode(encoding).rstrip('\0 ')
+    return text.lstrip() if strip_leading else text
+
+
+def _decode_optional_text(value: bytes | None) -> str | None:
+    """
+    Decode a raw optional DICOM ASCII value (UI, CS, TM), or return `None` if the attribute is
+    absent or empty.
+    """
+
+    if value is None:
+        return None
+
+    text = _decode_text(value, 'ascii')
+    return text if text != '' else None
+
+
+def _decode_integer(value: bytes) -> int | None:
+    """
+    Decode a raw DICOM integer string (IS) value, or return `None` if the value is empty.
+    """
+
+    text = _decode_text(value, 'ascii')
+    return int(text) if text != '' else None
@@ -0,0 +1,182 @@
+"""
+Minimal DICOM tag reader, which reads the raw values of a few attributes at the start of a DICOM
+file without parsing the whole file with pydicom. The file is memory-mapped so that only the pages
+of the file preamble and of the first attributes are read. Only the little-endian transfer syntaxes
+(explicit or implicit VR) are supported, the reader returning `None` for the other transfer
+syntaxes or unusual files so that the caller can fall back to pydicom.
+"""
+
+import mmap
+import os
+import struct
+
+# Transfer syntax UID of the implicit VR little-endian transfer syntax.
+implicit_vr_little_endian = '1.2.840.10008.1.2'
+
+# Transfer syntax UIDs whose data set is not encoded in little-endian or is compressed as a whole.
+unsupported_transfer_syntaxes = {
+    '1.2.840.10008.1.2.1.99',  # Deflated explicit VR little-endian
+    '1.2.840.10008.1.2.2',     # Explicit VR big-endian
+}
+
+# Explicit VRs whose value length is encoded on 4 bytes after 2 reserved bytes.
+_long_length_vrs = {b'OB', b'OD', b'OF', b'OL', b'OV', b'OW', b'SQ', b'SV', b'UC', b'UN', b'UR', b'UT', b'UV'}
+
+_item_tag = 0xFFFEE000
+_item_delimitation_tag = 0xFFFEE00D
+_sequence_delimitation_tag = 0xFFFEE0DD
+_undefined_length = 0xFFFFFFFF
+_transfer_syntax_tag = 0x00020010
+
+_tag_struct = struct.Struct('<HH')
+_item_struct = struct.Struct('<HHI')
+_uint16_struct = struct.Struct('<H')
+_uint32_struct = struct.Struct('<I')
+
+
+class _UnsupportedEncodingError(Exception):
+    """
+    Error raised while parsing a DICOM file that the reader does not support.
+    """
+
+
+def read_dicom_tags(dicom_file_path: str, tags: set[int], last_tag: int) -> dict[int, bytes] | None:
+    """
+    Read the raw values of some top-level attributes of a DICOM file, given as `group << 16 | element`
+    tags, stopping at the first attribute after the last tag. Return `None` if the file is not a
+    DICOM file with a preamble, uses an unsupported transfer syntax, or has an unusual encoding.
+    """
+
+    with open(dicom_file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < 132:
+            return None
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[128:132] != b'DICM':
+                return None
+
+            try:
+                return _read_data_set_tags(data, size, tags, last_tag)
+            except (_UnsupportedEncodingError, struct.error):
+                return None
+
+
+def _read_data_set_tags(data: mmap.mmap, size: int, tags: set[int], last_tag: int) -> dict[int, bytes]:
+    """
+    Read the file meta information and the requested attributes of the data set of a DICOM file.
+    """
+
+    # The file meta information is always encoded in explicit VR little-endian.
+    offset = 132
+    transfer_syntax = None
+    while offset + 8 <= size:
+        tag, value_offset, length = _read_element_header(data, offset, False)
+        if tag >> 16 != 0x0002:
+            break
+
+        _check_defined_length(length, value_offset, size)
+        if tag == _transfer_syntax_tag:
+            transfer_syntax = data[value_offset:value_offset + length].rstrip(b'\0 ').decode('ascii')
+
+        offset = value_offset + length
+
+    if transfer_syntax is None or transfer_syntax in unsupported_transfer_syntaxes:
+        raise _UnsupportedEncodingError()
+
+    implicit = transfer_syntax == implicit_vr_little_endian
+
+    values: dict[int, bytes] = {}
+    while offset + 8 <= size:
+        tag, value_offset, length = _read_element_header(data, offset, implicit)
+        if tag > last_tag:
+            break
+
+        if length == _undefined_length:
+            offset = _skip_undefined_length_sequence(data, size, value_offset, implicit)
+            continue
+
+        _check_defined_length(length, value_offset, size)
+        if tag in tags:
+            values[tag] = data[value_offset:value_offset + length]
+
+        offset = value_offset + length
+
+    return values
+
+
+def _read_element_header(data: mmap.mmap, offset: int, implicit: bool) -> tuple[int, int, int]:
+    """
+    Read the header of a data element, and return its tag, the offset of its value and its value
+    length.
+    """
+
+    group, element = _tag_struct.unpack_from(data, offset)
+    tag = group << 16 | element
+
+    # The items and delimiters have no VR in all the transfer syntaxes.
+    if implicit or group == 0xFFFE:
+        return tag, offset + 8, _uint32_struct.unpack_from(data, offset + 4)[0]
+
+    vr = data[offset + 4:offset + 6]
+    if vr in _long_length_vrs:
+        length = _uint32_struct.unpack_from(data, offset + 8)[0]
+        # An undefined length is only supported for sequences, as other VRs (such as UN) may contain
+        # data encoded in another transfer syntax.
+        if length == _undefined_length and vr != b'SQ':
+            raise _UnsupportedEncodingError()
+
+        return tag, offset + 12, length
+
+    return tag, offset + 8, _uint16_struct.unpack_from(data, offset + 6)[0]
+
+
+def _skip_undefined_length_sequence(data: mmap.mmap, size: int, offset: int, implicit: bool) -> int:
+    """
+    Skip the items of a sequence of undefined length, and return the offset following its sequence
+    delimitation item.
+    """
+
+    while True:
+        if offset + 8 > size:
+            raise _UnsupportedEncodingError()
+
+        group, element, length = _item_struct.unpack_from(data, offset)
+        tag = group << 16 | element
+        offset += 8
+
+        if tag == _sequence_delimitation_tag:
+            return offset
+
+        if tag != _item_tag:
+            raise _UnsupportedEncodingError()
+
+        if length != _undefined_length:
+            _check_defined_length(length, offset, size)
+            offset += length
+            continue
+
+        # Skip the elements of an item of undefined length up to its item delimitation item.
+        while True:
+            if offset + 8 > size:
+                raise _UnsupportedEncodingError()
+
+            tag, value_offset, length = _read_element_header(data, offset, implicit)
+            if tag == _item_delimitation_tag:
+                offset = value_offset
+                break
+
+            if length == _undefined_length:
+                offset = _skip_undefined_length_sequence(data, size, value_offset, implicit)
+            else:
+                _check_defined_length(length, value_offset, size)
+                offset = value_offset + length
+
+
+def _check_defined_length(length: int, value_offset: int, size: int):
+    """
+    Check that a value of defined length does not exceed the end of the file.
+    """
+
+    if length == _undefined_length or value_offset + length > size:
+        raise _UnsupportedEncodingError()
@@ -0,0 +1,94 @@
+class ConversionError(Exception):
+    """
+    Base class of the errors that stop the conversion of a DICOM study to BIDS.
+    """
+
+
+class InvalidArgumentsError(ConversionError):
+    """
+    Error raised when the arguments given to the converter are incorrect.
+    """
+
+
+class DicomReadError(ConversionError):
+    """
+    Error raised when a file of the DICOM study is not a DICOM file or lacks a required attribute.
+    """
+
+    def __init__(self, message: str, file_path: str):
+        super().__init__(message)
+        self.file_path = file_path
+
+
+class UnknownDicomSeriesError(ConversionError):
+    """
+    Error raised when the DICOM study contains unknown DICOM series and the converter is not
+    configured to skip or convert them.
+    """
+
+    def __init__(self, message: str, descriptions: list[str]):
+        super().__init__(message)
+        self.descriptions = descriptions
+
+
+class DicomToNiixNotFoundError(ConversionError):
+    """
+    Error raised when the `dcm2niix` command is not accessible.
+    """
+
+
+class DicomToNiixError(ConversionError):
+    """
+    Error raised when `dcm2niix` fails to convert a DICOM series. This error is recorded in the
+    result of the DICOM series and does not stop the conversion of the other DICOM series.
+    """
+
+    def __init__(self, message: str, return_code: int):
+        super().__init__(message)
+        self.return_code = return_code
+
+
+class DicomToNiixTimeoutError(ConversionError):
+    """
+    Error raised when `dcm2niix` is killed because the conversion of a DICOM series exceeds its
+    timeout. This error is recorded in the result of the DICOM series and does not stop the
+    conversion of the other DICOM series.
+    """
+
+    def __init__(self, message: str, timeout: float):
+        super().__init__(message)
+        self.timeout = timeout
+
+
+class ExistingBidsFilesError(ConversionError):
+    """
+    Error raised when the files of a converted DICOM series already exist in the BIDS dataset and
+    cannot be overwritten. This error is recorded in the result of the DICOM series and does not
+    stop the conversion of the other DICOM series.
+    """
+
+    def __init__(self, message: str, file_paths: list[str]):
+        super().__init__(message)
+        self.file_paths = file_paths
+
+
+class DatasetFileConflictError(ConversionError):
+    """
+    Error raised when a static dataset file already exists in the BIDS dataset with a different
+    content and cannot be overwritten.
+    """
+
+    def __init__(self, message: str, file_path: str):
+        super().__init__(message)
+        self.file_path = file_path
+
+
+class InsufficientDiskSpaceError(ConversionError):
+    """
+    Error raised before the conversion when the estimated disk usage of the conversion exceeds the
+    free space of the scratch or output filesystems.
+    """
+
+    def __init__(self, message: str, dir_paths: list[str]):
+        super().__init__(message)
+        self.dir_paths = dir_paths
@@ -0,0 +1,190 @@
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, TextIO
+
+
+class _EventsConfig:
+    """
+    Configuration of the progress and event reporting of the MNI 7T DICOM to BIDS converter.
+    """
+
+    quiet: bool = False
+    """
+    Whether the informative messages and the progress are not printed.
+    """
+
+    progress_interval: float = 1.0
+    """
+    The minimum time between two progress updates in seconds.
+    """
+
+    events_file: TextIO | None = None
+    """
+    The file to which the JSON-lines events are written if there is one.
+    """
+
+    progress_line_open: bool = False
+    """
+    Whether a progress line updated in place on the terminal has not been ended yet.
+    """
+
+
+_config = _EventsConfig()
+
+# Lock that prevents the events written by the threads of the conversion pipeline from interleaving.
+_events_lock = threading.Lock()
+
+
+def configure_events(quiet: bool, events_fd: int | None, progress_interval: float):
+    """
+    Configure the progress and event reporting of the converter. If a file descriptor is given,
+    structured events are written to it as JSON lines.
+    """
+
+    _config.quiet = quiet
+    _config.progress_interval = progress_interval
+
+    if events_fd is not None:
+        _config.events_file = os.fdopen(events_fd, 'w', buffering=1, closefd=False)
+    else:
+        _config.events_file = None
+
+
+def is_quiet() -> bool:
+    """
+    Check whether the converter is configured not to print informative messages.
+    """
+
+    return _config.quiet
+
+
+def print_info(message: str):
+    """
+    Print an informative message to the user, unless the converter is in quiet mode.
+    """
+
+    if not _config.quiet:
+        end_progress_line()
+        print(message)
+
+
+def end_progress_line():
+    """
+    End the progress line updated in place on the terminal if there is one, so that the next output
+    is printed on its own line.
+    """
+
+    if _config.progress_line_open:
+        sys.stdout.write('\n')
+        sys.stdout.flush()
+        _config.progress_line_open = False
+
+
+def emit_event(event: str, **fields: Any):
+    """
+    Write a structured event to the events file descriptor if there is one.
+    """
+
+    if _config.events_file is None:
+        return
+
+    line = json.dumps({'event': event, 'time': time.time(), **fields}) + '\n'
+    with _events_lock:
+        _config.events_file.write(line)
+
+
+class ProgressReporter:
+    """
+    Reporter of the progress of a stage of the converter. The progress is printed and emitted as an
+    event at most once per progress interval, so that it can be updated for each processed file
+    with a negligible overhead.
+
+    If the items have different costs, the total cost of the items can be given so that the ETA is
+    computed from the processed cost rather than the processed count, as well as an estimated
+    duration of the stage that is used as the ETA until the first item is processed.
+
+    On a terminal, the progress is updated in place on a single line, unless the stage prints other
+    output (such as the `dcm2niix` output) in which case one line is printed per report.
+    """
+
+    def __init__(
+        self,
+        stage: str,
+        total: int,
+        total_cost: float | None = None,
+        estimated_time: float | None = None,
+        in_place: bool = True,
+    ):
+        self.stage = stage
+        self.total = total
+        self.count = 0
+        self.total_cost = total_cost
+        self.cost = 0.0
+        self.estimated_time = estimated_time
+        self.in_place = in_place
+        self.start_time = time.monotonic()
+        self.next_report_time = self.start_time + _config.progress_interval
+
+    def update(self, count: int = 1, cost: float = 0.0):
+        """
+        Add processed items to the progress, and report it if the progress interval has elapsed.
+        """
+
+        self.count += count
+        self.cost += cost
+
+        now = time.monotonic()
+        if now >= self.next_report_time:
+            self.next_report_time = now + _config.progress_interval
+            self._report(now)
+
+    def close(self):
+        """
+        Report the final progress of the stage.
+        """
+
+        self._report(time.monotonic(), final=True)
+
+    def get_eta(self, now: float) -> float | None:
+        """
+        Get the estimated remaining time of the stage in seconds based on the progress so far.
+        """
+
+        elapsed_time = now - self.start_time
+
+        if self.count == 0 or (self.total_cost is not None and self.cost <= 0):
+            if self.estimated_time is None:
+                return None
+
+            return max(self.estimated_time - elapsed_time, 0.0)
+
+        if self.total_cost is not None:
+            return elapsed_time / self.cost * max(self.total_cost - self.cost, 0.0)
+
+        return elapsed_time / self.count * (self.total - self.count)
+
+    def _report(self, now: float, final: bool = False):
+        eta = self.get_eta(now)
+
+        emit_event('progress', stage=self.stage, count=self.count, total=self.total, eta=eta)
+
+        if _config.quiet:
+            return
+
+        message = f"{self.stage}: {self.count} / {self.total}"
+        if eta is not None and not final:
+            message += f" (ETA: {eta:.0f}s)"
+
+        # Update the progress line in place on a terminal, print one line per report otherwise.
+        if self.in_place and sys.stdout.isatty():
+            sys.stdout.write(f"\r\033[K{message}")
+            sys.stdout.flush()
+            _config.progress_line_open = True
+            if final:
+                end_progress_line()
+        else:
+            end_progress_line()
+            print(message)
@@ -0,0 +1,95 @@
+import os
+from array import array
+from collections.abc import Iterator, Sequence
+from typing import overload
+
+
+class DirectoryTable:
+    """
+    Table of interned directory paths, shared by the DICOM file path lists of a DICOM study so that
+    each directory path is only stored once.
+    """
+
+    def __init__(self):
+        self.dir_paths: list[str] = []
+        self._dir_indices: dict[str, int] = {}
+
+    def get_index(self, dir_path: str) -> int:
+        """
+        Get the index of a directory path in the table, adding the directory path to the table if
+        it is not already present.
+        """
+
+        index = self._dir_indices.get(dir_path)
+        if index is None:
+            index = len(self.dir_paths)
+            self.dir_paths.append(dir_path)
+            self._dir_indices[dir_path] = index
+
+        return index
+
+
+class DicomFilePaths(Sequence[str]):
+    """
+    Memory-compact list of DICOM file paths. Each file path is stored as the index of its directory
+    in a shared directory table and its file name in a byte buffer, which uses a fraction of the
+    memory of a list of path strings for large DICOM studies. The file paths are rebuilt when they
+    are accessed.
+    """
+
+    def __init__(self, directory_table: DirectoryTable):
+        self._directory_table = directory_table
+        self._dir_indices = array('I')
+        self._name_ends = array('Q')
+        self._names = bytearray()
+
+    def append(self, file_path: str):
+        """
+        Add a file path at the end of the list.
+        """
+
+        dir_path, file_name = os.path.split(file_path)
+        self._dir_indices.append(self._directory_table.get_index(dir_path))
+        self._names += os.fsencode(file_name)
+        self._name_ends.append(len(self._names))
+
+    def __len__(self) -> int:
+        return len(self._dir_indices)
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        if isinstance(index, slice):
+            return [self._get_file_path(i) for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError('DICOM file path index out of range')
+
+        return self._get_file_path(index)
+
+    def __iter__(self) -> Iterator[str]:
+        dir_paths = self._directory_table.dir_paths
+        name_start = 0
+        for dir_index, name_end in zip(self._dir_indices, self._name_ends, strict=True):
+            yield os.path.join(dir_paths[dir_index], os.fsdecode(bytes(self._names[name_start:name_end])))
+            name_start = name_end
+
+    def __repr__(self) -> str:
+        return f'DicomFilePaths({list(self)!r})'
+
+    def _get_file_path(self, index: int) -> str:
+        """
+        Rebuild the file path at a given non-negative index of the list.
+        """
+
+        name_start = self._name_ends[index - 1] if index > 0 else 0
+        name_end = self._name_ends[index]
+        dir_path = self._directory_table.dir_paths[self._dir_indices[index]]
+        return os.path.join(dir_path, os.fsdecode(bytes(self._names[name_start:name_end])))
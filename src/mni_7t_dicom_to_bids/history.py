@@ -0,0 +1,118 @@
+"""
+Local runtime history of the MNI 7T DICOM to BIDS converter. The history records the cost (file
+count, bytes and seconds) of each DICOM series conversion in a SQLite database, and predicts the
+duration of the future conversions of the same BIDS acquisitions from it. These predictions are
+used for the conversion ETA and the longest-first conversion order.
+"""
+
+import os
+import sqlite3
+import statistics
+import time
+
+from bic_util.print import print_warning
+
+# Number of most recent conversions of a BIDS acquisition used to predict its duration.
+acquisition_history_size = 20
+
+# Number of most recent conversions of any BIDS acquisition used to predict the duration of a BIDS
+# acquisition that has no history yet.
+global_history_size = 200
+
+
+class RuntimeHistory:
+    """
+    Runtime history database of the DICOM series conversions. The database can be shared by
+    several converter processes, each conversion being recorded in its own transaction.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    @staticmethod
+    def open(history_path: str) -> 'RuntimeHistory | None':
+        """
+        Open the runtime history database, and create it if it does not exist. Print a warning and
+        return `None` if the database cannot be opened, as the history is not required by the
+        conversion.
+        """
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(history_path)), exist_ok=True)
+            connection = sqlite3.connect(history_path, timeout=10, check_same_thread=False)
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS conversions ('
+                '    acquisition TEXT NOT NULL,'
+                '    files_count INTEGER NOT NULL,'
+                '    bytes INTEGER NOT NULL,'
+                '    seconds REAL NOT NULL,'
+                '    success INTEGER NOT NULL,'
+                '    recorded_at REAL NOT NULL'
+                ')'
+            )
+
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS conversions_acquisition ON conversions (acquisition, recorded_at)'
+            )
+
+            connection.commit()
+        except (OSError, sqlite3.Error) as error:
+            print_warning(f"Cannot open the runtime history '{history_path}', it will not be used: {error}")
+            return None
+
+        return RuntimeHistory(connection)
+
+    def record(self, acquisition: str, files_count: int, bytes_count: int, seconds: float, success: bool):
+        """
+        Record the cost of a DICOM series conversion in the history.
+        """
+
+        try:
+            with self.connection:
+                self.connection.execute(
+                    'INSERT INTO conversions VALUES (?, ?, ?, ?, ?, ?)',
+                    (acquisition, files_count, bytes_count, seconds, int(success), time.time()),
+                )
+        except sqlite3.Error as error:
+            print_warning(f"Cannot record the conversion in the runtime history: {error}")
+
+    def predict(self, acquisition: str, bytes_count: int) -> float | None:
+        """
+        Predict the duration in seconds of the conversion of a DICOM series of a BIDS acquisition
+        from the median conversion rate of the recent conversions of this acquisition, or of any
+        acquisition if this one has no history. Return `None` if the history is empty.
+        """
+
+        rates = self._get_rates(
+            'WHERE acquisition = ? AND success = 1', (acquisition,), acquisition_history_size
+        ) or self._get_rates(
+            'WHERE success = 1', (), global_history_size
+        )
+
+        if rates == []:
+            return None
+
+        return statistics.median(rates) * bytes_count
+
+    def close(self):
+        """
+        Close the runtime history database.
+        """
+
+        self.connection.close()
+
+    def _get_rates(self, condition: str, parameters: tuple[str, ...], limit: int) -> list[float]:
+        """
+        Get the conversion rates in seconds per byte of the most recent conversions that match a
+        condition.
+        """
+
+        try:
+            rows = self.connection.execute(
+                f'SELECT seconds, bytes FROM conversions {condition} ORDER BY recorded_at DESC LIMIT ?',
+                (*parameters, limit),
+            ).fetchall()
+        except sqlite3.Error:
+            return []
+
+        return [seconds / max(bytes_count, 1) for seconds, bytes_count in rows]
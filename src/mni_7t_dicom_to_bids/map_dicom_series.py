@@ -2,10 +2,12 @@ from mni_7t_dicom_to_bids.dataclass import BidsAcquisitionInfo, DicomBidsMapping
 from mni_7t_dicom_to_bids.variables import bids_dicom_ignores, bids_dicom_mappings
 import fnmatch
 
-def map_bids_dicom_series(dicom_series_list: list[DicomSeriesInfo]) -> DicomBidsMapping:
+def map_bids_dicom_series(dicom_series_list: list[DicomSeriesInfo], auto_skip: bool = True) -> DicomBidsMapping:
     """
     Map the DICOM series of a DICOM study to BIDS acquisition mappings and unknown DICOM series
-    according to the MNI 7T DICOM to BIDS converter configuration.
+    according to the MNI 7T DICOM to BIDS converter configuration. If auto-skip is enabled, the
+    DICOM series that are not mapped to a BIDS acquisition and cannot or need not be converted
+    according to their DICOM headers are ignored instead of being unknown.
     """
 
     dicom_bids_mapping = DicomBidsMapping()
@@ -20,6 +22,10 @@ def map_bids_dicom_series(dicom_series_list: list[DicomSeriesInfo]) -> DicomBids
             dicom_bids_mapping.bids_dicom_series_dict[bids_acquisition].append(dicom_series)
             continue
 
+        if auto_skip and dicom_series.skip_reason is not None:
+            dicom_bids_mapping.ignored_dicom_series_list.append(dicom_series)
+            continue
+
         dicom_bids_mapping.unknown_dicom_series_list.append(dicom_series)
 
     sort_dicom_bids_mapping(dicom_bids_mapping)
@@ -32,8 +38,17 @@ def ignore_dicom_series(dicom_series: DicomSeriesInfo) -> bool:
     Check if a DICOM series should be ignored as per the MNI 7T DICOM to BIDS converter parameters.
     """
 
+    return ignore_dicom_series_description(dicom_series.description)
+
+
+def ignore_dicom_series_description(description: str) -> bool:
+    """
+    Check if the DICOM series with a given description should be ignored as per the MNI 7T DICOM to
+    BIDS converter parameters.
+    """
+
     for bids_dicom_ignore in bids_dicom_ignores:
-        if dicom_series.description == bids_dicom_ignore:
+        if description == bids_dicom_ignore:
             return True
 
     return False
@@ -45,6 +60,20 @@ def get_bids_acquisition_info(dicom_series: DicomSeriesInfo) -> BidsAcquisitionI
     conversion parameters.
     """
 
+    bids_dicom_mapping = find_bids_dicom_mapping(dicom_series.description)
+    if bids_dicom_mapping is None:
+        return None
+
+    bids_acquisition, _ = bids_dicom_mapping
+    return bids_acquisition
+
+
+def find_bids_dicom_mapping(description: str) -> tuple[BidsAcquisitionInfo, str] | None:
+    """
+    Find the BIDS acquisition to which the DICOM series with a given description is mapped, and
+    return it with the DICOM series description pattern of the mapping that matched.
+    """
+
     for bids_scan_type, bids_dicom_mapping in bids_dicom_mappings.items():
         for bids_file_name, bids_dicom_series_descriptions in bids_dicom_mapping.items():
             if isinstance(bids_dicom_series_descriptions, str):
@@ -52,13 +81,15 @@ def get_bids_acquisition_info(dicom_series: DicomSeriesInfo) -> BidsAcquisitionI
 
             for bids_dicom_series_description in bids_dicom_series_descriptions:
                 
-                if fnmatch.fnmatch(dicom_series.description,bids_dicom_series_description): # Wildcard field match implementation APB
+                if fnmatch.fnmatch(description,bids_dicom_series_description): # Wildcard field match implementation APB
                 #if dicom_series.description == bids_dicom_series_description: # Does literal equality and therefore ignores wildcard APB
-                    return BidsAcquisitionInfo(
+                    bids_acquisition = BidsAcquisitionInfo(
                         scan_type = bids_scan_type,
                         file_name = bids_file_name,
                     )
 
+                    return bids_acquisition, bids_dicom_series_description
+
     return None
 
 
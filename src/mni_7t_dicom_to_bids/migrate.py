@@ -0,0 +1,465 @@
+"""
+Migration of the BIDS files of a dataset when the BIDS mappings of the converter change. The DICOM
+series recorded in the provenance files of the dataset are mapped again with the current BIDS
+mappings, and the files of the DICOM series whose BIDS name changed are renamed and their JSON
+sidecar files patched, which gives the same files as a new conversion without running `dcm2niix`.
+The DICOM series whose files cannot be derived from their current files must be converted again.
+"""
+
+import json
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+from mni_7t_dicom_to_bids.args import MigrateArgs
+from mni_7t_dicom_to_bids.convert_dicom_series import get_bids_acquisition_file_name
+from mni_7t_dicom_to_bids.dataclass import BidsAcquisitionInfo
+from mni_7t_dicom_to_bids.errors import ConversionError
+from mni_7t_dicom_to_bids.map_dicom_series import find_bids_dicom_mapping, ignore_dicom_series_description
+from mni_7t_dicom_to_bids.post_process import get_json_patch, get_post_processed_file_name
+from mni_7t_dicom_to_bids.provenance import (
+    OutputProvenance,
+    SeriesProvenance,
+    SessionProvenance,
+    get_bids_session_dir_path,
+    list_provenance_files,
+    read_provenance_file,
+    write_provenance_file,
+)
+
+# Suffix of the temporary names of the files being renamed.
+tmp_file_suffix = '.mni7t_migrate'
+
+
+@dataclass
+class FileMigration:
+    """
+    The renaming of an output file of a DICOM series, and the patch of its JSON sidecar fields.
+    """
+
+    old_path: str
+    """
+    The current path of the file relative to the BIDS session directory.
+    """
+
+    new_path: str
+    """
+    The new path of the file relative to the BIDS session directory.
+    """
+
+    source_name: str
+    """
+    The name that `dcm2niix` or the native writer would give to the file with the new BIDS name.
+    """
+
+    removed_fields: list[str] = field(default_factory=list[str])
+    """
+    The fields removed from the file if it is a JSON sidecar file.
+    """
+
+    added_fields: dict[str, Any] = field(default_factory=dict[str, Any])
+    """
+    The fields added to or changed in the file if it is a JSON sidecar file.
+    """
+
+    @property
+    def patched(self) -> bool:
+        """
+        Whether the fields of the file are patched.
+        """
+
+        return self.removed_fields != [] or self.added_fields != {}
+
+
+@dataclass
+class SeriesMigration:
+    """
+    The migration of the BIDS files of a DICOM series. The action of the migration is one of:
+    - `unchanged`: the BIDS files of the DICOM series do not change.
+    - `rename`: the BIDS files of the DICOM series are renamed or patched.
+    - `convert`: the DICOM series was not converted and is now mapped to a BIDS acquisition.
+    - `reconvert`: the BIDS files of the DICOM series cannot be renamed and the DICOM series must be
+      converted again.
+    - `orphan`: the DICOM series is no longer mapped to a BIDS acquisition, its files are left in
+      place.
+    - `conflict`: the BIDS files of the DICOM series cannot be renamed because of the existing files.
+    """
+
+    series: SeriesProvenance
+    """
+    The current provenance record of the DICOM series.
+    """
+
+    action: str
+    """
+    The action of the migration.
+    """
+
+    reason: str | None = None
+    """
+    The reason of the action if the DICOM series is not renamed.
+    """
+
+    new_series: SeriesProvenance | None = None
+    """
+    The provenance record of the DICOM series after the migration if it is mapped to a BIDS
+    acquisition.
+    """
+
+    files: list[FileMigration] = field(default_factory=list[FileMigration])
+    """
+    The renamings of the output files of the DICOM series.
+    """
+
+
+def migrate_bids_dataset(args: MigrateArgs):
+    """
+    Migrate the BIDS files of the sessions of a BIDS dataset that have a provenance file to the
+    current BIDS mappings, and print the migration of each DICOM series. Nothing is changed in a dry
+    run.
+    """
+
+    provenance_file_paths = list_provenance_files(args.bids_dataset_path)
+    if provenance_file_paths == []:
+        raise ConversionError(f"No provenance file found in BIDS dataset '{args.bids_dataset_path}'.")
+
+    sessions_count = 0
+    migrations: list[SeriesMigration] = []
+    for provenance_file_path in provenance_file_paths:
+        provenance = read_provenance_file(provenance_file_path)
+        if args.subject is not None and provenance.subject != args.subject:
+            continue
+
+        if args.session is not None and provenance.session != args.session:
+            continue
+
+        sessions_count += 1
+        session_migrations = plan_session_migration(args.bids_dataset_path, provenance)
+        print_session_migration(provenance, session_migrations)
+
+        if not args.dry_run:
+            apply_session_migration(args.bids_dataset_path, provenance, session_migrations)
+
+        migrations.extend(session_migrations)
+
+    if sessions_count == 0:
+        raise ConversionError("No provenance file found for the given subject and session.")
+
+    print_migration_summary(migrations, args.dry_run)
+
+
+def plan_session_migration(bids_dataset_path: str, provenance: SessionProvenance) -> list[SeriesMigration]:
+    """
+    Plan the migration of the BIDS files of a session to the current BIDS mappings.
+    """
+
+    bids_session = provenance.bids_session
+
+    # Map the recorded DICOM series with the current BIDS mappings. The run numbers are attributed
+    # as in a conversion, in the order of the DICOM series descriptions and numbers.
+    bids_dicom_mappings: dict[tuple[str, int], tuple[BidsAcquisitionInfo, str]] = {}
+    bids_acquisition_series: defaultdict[BidsAcquisitionInfo, list[SeriesProvenance]] = defaultdict(list)
+    for series in sorted(provenance.series, key=lambda series: series.key):
+        if ignore_dicom_series_description(series.description):
+            continue
+
+        bids_dicom_mapping = find_bids_dicom_mapping(series.description)
+        if bids_dicom_mapping is not None:
+            bids_dicom_mappings[series.key] = bids_dicom_mapping
+            bids_acquisition_series[bids_dicom_mapping[0]].append(series)
+
+    run_numbers: dict[tuple[str, int], int | None] = {}
+    for series_list in bids_acquisition_series.values():
+        for run_number, series in enumerate(series_list, 1):
+            run_numbers[series.key] = run_number if len(series_list) > 1 else None
+
+    migrations: list[SeriesMigration] = []
+    for series in provenance.series:
+        bids_dicom_mapping = bids_dicom_mappings.get(series.key)
+        if bids_dicom_mapping is None:
+            if series.outputs != []:
+                migrations.append(SeriesMigration(series, 'orphan', "No longer mapped to a BIDS acquisition."))
+            else:
+                migrations.append(SeriesMigration(series, 'unchanged'))
+
+            continue
+
+        bids_acquisition, mapping_pattern = bids_dicom_mapping
+        run_number = run_numbers[series.key]
+        new_series = replace(series,
+            data_type       = bids_acquisition.scan_type,
+            mapping_name    = bids_acquisition.file_name,
+            mapping_pattern = mapping_pattern,
+            run_number      = run_number,
+            base_name       = get_bids_acquisition_file_name(bids_session, bids_acquisition.file_name, run_number),
+            outputs         = [],
+        )
+
+        if series.outputs == []:
+            migrations.append(SeriesMigration(series, 'convert', "Now mapped to a BIDS acquisition.", new_series))
+            continue
+
+        migrations.append(get_series_migration(series, new_series))
+
+    check_migration_conflicts(bids_dataset_path, provenance, migrations)
+
+    return migrations
+
+
+def get_series_migration(series: SeriesProvenance, new_series: SeriesProvenance) -> SeriesMigration:
+    """
+    Get the migration of the BIDS files of a converted DICOM series to its new BIDS name. The new
+    files are derived from the names given by `dcm2niix` or the native writer, which only depend on
+    the BIDS name given to them, and from the post processing of these names.
+    """
+
+    assert new_series.data_type is not None and new_series.base_name is not None
+
+    old_base_name = series.base_name
+    new_base_name = new_series.base_name
+
+    if old_base_name is None:
+        return SeriesMigration(series, 'reconvert', "The BIDS name of the conversion is unknown.", new_series)
+
+    # The files deleted by the post processing cannot be recovered if they are kept with the new
+    # BIDS name.
+    for deleted_source_name in series.deleted_source_names:
+        if get_post_processed_file_name(new_base_name + deleted_source_name[len(old_base_name):]) is not None:
+            return SeriesMigration(series, 'reconvert', f"File '{deleted_source_name}' was deleted.", new_series)
+
+    files: list[FileMigration] = []
+    for output in series.outputs:
+        old_file_name = os.path.basename(output.path)
+        if output.source_name is None or not output.source_name.startswith(old_base_name):
+            return SeriesMigration(
+                series, 'reconvert', f"The converted name of file '{old_file_name}' is unknown.", new_series
+            )
+
+        source_name = new_base_name + output.source_name[len(old_base_name):]
+        new_file_name = get_post_processed_file_name(source_name)
+        if new_file_name is None:
+            return SeriesMigration(
+                series, 'reconvert', f"File '{old_file_name}' is deleted with the new BIDS name.", new_series
+            )
+
+        # The neuromelanin flip angle is read from the DICOM files when the JSON sidecar files are
+        # patched (see `patchjson`).
+        if has_dicom_flip_angle(old_file_name) != has_dicom_flip_angle(new_file_name):
+            return SeriesMigration(
+                series, 'reconvert', f"The flip angle of file '{old_file_name}' must be read again.", new_series
+            )
+
+        file = FileMigration(output.path, os.path.join(new_series.data_type, new_file_name), source_name)
+
+        if new_file_name.endswith('.json'):
+            old_patch = get_json_patch(old_file_name)
+            new_patch = get_json_patch(new_file_name)
+            file.removed_fields = [key for key in old_patch if key not in new_patch]
+            file.added_fields = {key: value for key, value in new_patch.items() if old_patch.get(key) != value}
+
+        files.append(file)
+
+    new_series.outputs = [OutputProvenance(file.new_path, file.source_name) for file in files]
+    new_series.deleted_source_names = [
+        new_base_name + deleted_source_name[len(old_base_name):]
+        for deleted_source_name in series.deleted_source_names
+    ]
+
+    if all(file.old_path == file.new_path and not file.patched for file in files):
+        return SeriesMigration(series, 'unchanged', None, new_series, files)
+
+    return SeriesMigration(series, 'rename', None, new_series, files)
+
+
+def has_dicom_flip_angle(file_name: str) -> bool:
+    """
+    Check if the JSON sidecar file with a given name has a flip angle read from the DICOM files.
+    """
+
+    return file_name.endswith('.json') and 'neuromelaninMTw' in file_name
+
+
+def check_migration_conflicts(bids_dataset_path: str, provenance: SessionProvenance, migrations: list[SeriesMigration]):
+    """
+    Mark the renamings of DICOM series that conflict with other files as conflicts, which is the
+    case if a file to rename is missing, or if a new file path is already used by a file that is not
+    renamed or by the file of another DICOM series.
+    """
+
+    session_dir_path = get_bids_session_dir_path(bids_dataset_path, provenance.bids_session)
+
+    # A conflict frees the new file paths of its DICOM series but keeps its current files in place,
+    # which may create other conflicts.
+    conflicts = True
+    while conflicts:
+        conflicts = False
+
+        renamed_paths = {
+            file.old_path
+            for migration in migrations if migration.action == 'rename'
+            for file in migration.files
+        }
+
+        new_paths: set[str] = set()
+        for migration in migrations:
+            if migration.action != 'rename':
+                continue
+
+            reason = get_migration_conflict(session_dir_path, migration, renamed_paths, new_paths)
+            if reason is not None:
+                migration.action = 'conflict'
+                migration.reason = reason
+                conflicts = True
+                break
+
+            new_paths.update(file.new_path for file in migration.files)
+
+
+def get_migration_conflict(
+    session_dir_path: str,
+    migration: SeriesMigration,
+    renamed_paths: set[str],
+    new_paths: set[str],
+) -> str | None:
+    """
+    Get the reason why the renaming of a DICOM series conflicts with other files, or `None` if
+    there is no conflict.
+    """
+
+    for file in migration.files:
+        if not os.path.exists(os.path.join(session_dir_path, file.old_path)):
+            return f"File '{file.old_path}' does not exist."
+
+        if file.new_path in new_paths:
+            return f"File '{file.new_path}' is also the new file of another DICOM series."
+
+        if file.new_path not in renamed_paths and os.path.lexists(os.path.join(session_dir_path, file.new_path)):
+            return f"File '{file.new_path}' already exists."
+
+    return None
+
+
+def apply_session_migration(bids_dataset_path: str, provenance: SessionProvenance, migrations: list[SeriesMigration]):
+    """
+    Rename and patch the BIDS files of a session, and update its provenance file. The files are
+    first moved to temporary names so that the files of several DICOM series can exchange their
+    names.
+    """
+
+    session_dir_path = get_bids_session_dir_path(bids_dataset_path, provenance.bids_session)
+
+    files = [
+        file
+        for migration in migrations if migration.action == 'rename'
+        for file in migration.files
+    ]
+
+    renamed_files = [file for file in files if file.old_path != file.new_path]
+    for file in renamed_files:
+        old_file_path = os.path.join(session_dir_path, file.old_path)
+        os.rename(old_file_path, old_file_path + tmp_file_suffix)
+
+    for file in renamed_files:
+        new_file_path = os.path.join(session_dir_path, file.new_path)
+        os.makedirs(os.path.dirname(new_file_path), exist_ok=True)
+        os.rename(os.path.join(session_dir_path, file.old_path) + tmp_file_suffix, new_file_path)
+
+    for file in files:
+        if file.patched:
+            patch_json_file(os.path.join(session_dir_path, file.new_path), file)
+
+    # Remove the data type directories emptied by the renamings.
+    old_dir_paths = {os.path.dirname(os.path.join(session_dir_path, file.old_path)) for file in renamed_files}
+    for data_type_dir_path in old_dir_paths:
+        if os.path.isdir(data_type_dir_path) and os.listdir(data_type_dir_path) == []:
+            os.rmdir(data_type_dir_path)
+
+    provenance.series = [
+        migration.new_series if migration.action in ('unchanged', 'rename') and migration.new_series is not None
+        else migration.series
+        for migration in migrations
+    ]
+
+    write_provenance_file(bids_dataset_path, provenance)
+
+
+def patch_json_file(json_file_path: str, file: FileMigration):
+    """
+    Remove and add the fields of a renamed JSON sidecar file.
+    """
+
+    with open(json_file_path) as json_file:
+        data = json.load(json_file)
+
+    for key in file.removed_fields:
+        data.pop(key, None)
+
+    data.update(file.added_fields)
+
+    with open(json_file_path, 'w') as json_file:
+        json.dump(data, json_file, indent=4)
+
+
+def print_session_migration(provenance: SessionProvenance, migrations: list[SeriesMigration]):
+    """
+    Print the migration of the DICOM series of a session whose BIDS files change.
+    """
+
+    print(f"Session 'sub-{provenance.subject}_ses-{provenance.session}':")
+
+    changes_count = 0
+    for migration in migrations:
+        if migration.action == 'unchanged':
+            continue
+
+        changes_count += 1
+        series = migration.series
+        new_series = migration.new_series
+        print(f"  {migration.action.capitalize()} DICOM series '{series.description}' ({series.number}):")
+
+        old_acquisition = f"{series.data_type}/{series.base_name}" if series.data_type is not None else None
+        new_acquisition = f"{new_series.data_type}/{new_series.base_name}" if new_series is not None else None
+        print(f"    Acquisition: {old_acquisition or 'none'} -> {new_acquisition or 'none'}")
+
+        if migration.reason is not None:
+            print(f"    {migration.reason}")
+
+        if migration.action == 'rename':
+            for file in migration.files:
+                if file.old_path != file.new_path:
+                    print(f"    {file.old_path} -> {file.new_path}")
+                if file.patched:
+                    fields = [f"remove '{key}'" for key in file.removed_fields] \
+                        + [f"set '{key}'" for key in file.added_fields]
+                    print(f"    Patch {file.new_path}: {', '.join(fields)}")
+        elif migration.action in ('reconvert', 'orphan', 'conflict'):
+            for output in series.outputs:
+                print(f"    Left in place: {output.path}")
+
+    if changes_count == 0:
+        print("  No changes.")
+
+
+def print_migration_summary(migrations: list[SeriesMigration], dry_run: bool):
+    """
+    Print the number of renamed files and the DICOM series that must be converted again.
+    """
+
+    files = [file for migration in migrations if migration.action == 'rename' for file in migration.files]
+    renamed_count = sum(1 for file in files if file.old_path != file.new_path)
+    patched_count = sum(1 for file in files if file.patched)
+
+    verb = "would be" if dry_run else "were"
+    print(f"{renamed_count} files {verb} renamed and {patched_count} JSON sidecar files {verb} patched.")
+
+    conversions_count = sum(1 for migration in migrations if migration.action in ('convert', 'reconvert'))
+    if conversions_count != 0:
+        print(
+            f"{conversions_count} DICOM series must be converted with the current BIDS mappings, their previous"
+            " files being left in place."
+        )
+
+    conflicts_count = sum(1 for migration in migrations if migration.action == 'conflict')
+    if conflicts_count != 0:
+        print(f"{conflicts_count} DICOM series could not be renamed because of conflicting files.")
@@ -0,0 +1,548 @@
+"""
+In-process DICOM to NIfTI writer of the MNI 7T DICOM to BIDS converter. This writer converts the
+simple derived DICOM series of the protocol, which are stacks of single-frame 2D slices, without
+staging the DICOM files and running `dcm2niix`. Its output follows the conventions of `dcm2niix`:
+the rows of the images are flipped, the NIfTI orientation is stored in both the qform and the
+sform, and the JSON sidecar contains the fields that `dcm2niix` derives from the standard DICOM
+attributes. The Siemens private fields (CSA headers) and the `dcm2niix` heuristics such as
+`BidsGuess` are not reproduced.
+
+The DICOM series that are not a simple stack of slices (multi-frame, mosaic, diffusion,
+multi-echo, phase, compressed, or with an irregular geometry) are rejected with an
+`UnsupportedDicomSeriesError` so that they are converted with `dcm2niix` instead.
+"""
+
+import fnmatch
+import gzip
+import json
+import math
+import os
+import struct
+from typing import Any
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset
+from pydicom.multival import MultiValue
+
+from mni_7t_dicom_to_bids.dataclass import DicomSeriesInfo
+from mni_7t_dicom_to_bids.variables import native_writer_dicom_series
+
+# Name written in the `ConversionSoftware` field of the JSON sidecars.
+native_writer_name = 'mni7t_dcm2bids'
+
+# Version of the writer, to be increased when its output changes.
+native_writer_version = '1'
+
+# Maximum deviation in millimeters tolerated between the DICOM slice positions and a regular grid.
+slice_position_tolerance = 0.01
+
+# Maximum deviation tolerated between the image orientation cosines of two DICOM files.
+orientation_tolerance = 1e-4
+
+# DICOM attributes that must have the same value in all the files of a DICOM series.
+_series_keywords = [
+    'Rows',
+    'Columns',
+    'BitsAllocated',
+    'BitsStored',
+    'PixelRepresentation',
+    'ImageType',
+    'EchoTime',
+    'EchoNumbers',
+    'RescaleSlope',
+    'RescaleIntercept',
+]
+
+# Image type values for which `dcm2niix` adds a suffix to the output file name.
+_suffixed_image_types = {'P', 'PHASE', 'REAL', 'IMAGINARY', 'MOSAIC', 'DIFFUSION'}
+
+# NIfTI-1 header layout, without the four extension bytes that end the header of a `.nii` file.
+_nifti_header_struct = struct.Struct('<i10s18sihbb8h3fhhhh8ffffhbbffffii80s24shh6f12f16s4s')
+
+_nifti_datatypes: dict[str, tuple[int, int]] = {
+    'uint8':  (2, 8),
+    'int16':  (4, 16),
+    'uint16': (512, 16),
+}
+
+
+class UnsupportedDicomSeriesError(Exception):
+    """
+    Error raised when a DICOM series cannot be converted by the native writer and must be
+    converted by `dcm2niix`.
+    """
+
+
+def is_native_writer_candidate(dicom_series: DicomSeriesInfo) -> bool:
+    """
+    Check whether the description of a DICOM series matches the DICOM series that the native writer
+    may convert, which are then checked further when their files are read.
+    """
+
+    return any(
+        fnmatch.fnmatch(dicom_series.description, native_writer_description)
+        for native_writer_description in native_writer_dicom_series
+    )
+
+
+def read_native_dicom_series(dicom_series: DicomSeriesInfo) -> list[Dataset]:
+    """
+    Read the DICOM files of a DICOM series and return their datasets sorted along the slice normal.
+    Raise an `UnsupportedDicomSeriesError` if the DICOM series is not a simple stack of slices.
+    """
+
+    # The signature of `dcmread` is partially unknown in the pydicom stubs (`PathLike[Unknown]`).
+    datasets: list[Dataset] = [
+        pydicom.dcmread(file_path)  # pyright: ignore[reportUnknownMemberType]
+        for file_path in dicom_series.file_paths
+    ]
+    if datasets == []:
+        raise UnsupportedDicomSeriesError("The DICOM series has no files.")
+
+    for dataset in datasets:
+        _check_native_dataset(dataset)
+
+    first = datasets[0]
+    first_values = {keyword: _get_value(first, keyword) for keyword in _series_keywords}
+    first_pixel_spacing = _get_floats(first, 'PixelSpacing')
+    first_orientation = _get_floats(first, 'ImageOrientationPatient')
+
+    for dataset in datasets[1:]:
+        for keyword in _series_keywords:
+            if _get_value(dataset, keyword) != first_values[keyword]:
+                raise UnsupportedDicomSeriesError(f"The DICOM files have different {keyword} values.")
+
+        if not np.allclose(_get_floats(dataset, 'PixelSpacing'), first_pixel_spacing):
+            raise UnsupportedDicomSeriesError("The DICOM files have different pixel spacings.")
+
+        orientation = _get_floats(dataset, 'ImageOrientationPatient')
+        if not np.allclose(orientation, first_orientation, atol=orientation_tolerance):
+            raise UnsupportedDicomSeriesError("The DICOM files have different image orientations.")
+
+    normal = _get_slice_normal(first)
+    datasets.sort(key=lambda dataset: float(np.dot(_get_floats(dataset, 'ImagePositionPatient'), normal)))
+    _get_slice_spacing(datasets)
+
+    return datasets
+
+
+def write_native_nifti(datasets: list[Dataset], output_dir_path: str, file_name: str) -> list[str]:
+    """
+    Write the compressed NIfTI file and the JSON sidecar of a DICOM series read by
+    `read_native_dicom_series`, and return the paths of the written files.
+    """
+
+    first = datasets[0]
+
+    volume = np.stack([_get_pixel_values(dataset) for dataset in datasets])
+    # `dcm2niix` flips the rows of the images so that the first voxel is at the bottom left.
+    volume = volume[:, ::-1, :]
+
+    if volume.dtype == np.uint16 and (volume.size == 0 or int(volume.max()) <= np.iinfo(np.int16).max):
+        volume = volume.astype(np.int16)
+
+    if volume.dtype.name not in _nifti_datatypes:
+        raise UnsupportedDicomSeriesError(f"The DICOM pixel data type '{volume.dtype.name}' is not supported.")
+
+    affine = get_native_affine(datasets)
+
+    nifti_file_path = os.path.join(output_dir_path, f'{file_name}.nii.gz')
+    # The gzip modification time is zeroed so that two conversions of a DICOM series are identical.
+    with gzip.GzipFile(nifti_file_path, 'wb', compresslevel=6, mtime=0) as nifti_file:
+        nifti_file.write(_get_nifti_header(first, volume, affine))
+        nifti_file.write(np.ascontiguousarray(volume, dtype=volume.dtype.newbyteorder('<')).tobytes())
+
+    json_file_path = os.path.join(output_dir_path, f'{file_name}.json')
+    with open(json_file_path, 'w') as json_file:
+        json.dump(get_native_sidecar(datasets), json_file, indent='\t')
+        json_file.write('\n')
+
+    return [nifti_file_path, json_file_path]
+
+
+def get_native_affine(datasets: list[Dataset]) -> np.ndarray[Any, np.dtype[np.float64]]:
+    """
+    Get the RAS voxel to world affine of the NIfTI volume of a sorted DICOM series, the rows of the
+    images being flipped as in the NIfTI volume.
+    """
+
+    first = datasets[0]
+
+    orientation = _get_floats(first, 'ImageOrientationPatient')
+    row_spacing, column_spacing = _get_floats(first, 'PixelSpacing')
+    rows = int(first.Rows)
+
+    affine = np.eye(4)
+    affine[:3, 0] = orientation[:3] * column_spacing
+    affine[:3, 1] = -orientation[3:] * row_spacing
+    affine[:3, 2] = _get_slice_normal(first) * _get_slice_spacing(datasets)
+    affine[:3, 3] = _get_floats(first, 'ImagePositionPatient') + orientation[3:] * row_spacing * (rows - 1)
+
+    # Convert the DICOM LPS coordinates to the NIfTI RAS coordinates.
+    affine[:2, :] *= -1
+
+    return affine
+
+
+def get_native_sidecar(datasets: list[Dataset]) -> dict[str, Any]:
+    """
+    Get the JSON sidecar of a sorted DICOM series, with the fields that `dcm2niix` derives from the
+    standard DICOM attributes.
+    """
+
+    first = datasets[0]
+
+    sidecar: dict[str, Any] = {}
+
+    def add_field(field: str, value: Any):
+        if value is not None and value != '':
+            sidecar[field] = value
+
+    add_field('Modality', _get_string(first, 'Modality'))
+    add_field('MagneticFieldStrength', _get_number(first, 'MagneticFieldStrength'))
+    add_field('ImagingFrequency', _get_number(first, 'ImagingFrequency'))
+    add_field('Manufacturer', _get_manufacturer(first))
+    add_field('ManufacturersModelName', _get_string(first, 'ManufacturerModelName'))
+    add_field('InstitutionName', _get_string(first, 'InstitutionName'))
+    add_field('InstitutionalDepartmentName', _get_string(first, 'InstitutionalDepartmentName'))
+    add_field('InstitutionAddress', _get_string(first, 'InstitutionAddress'))
+    add_field('DeviceSerialNumber', _get_string(first, 'DeviceSerialNumber'))
+    add_field('StationName', _get_string(first, 'StationName'))
+    add_field('BodyPart', _get_string(first, 'BodyPartExamined'))
+    add_field('PatientPosition', _get_string(first, 'PatientPosition'))
+    add_field('ProcedureStepDescription', _get_string(first, 'PerformedProcedureStepDescription'))
+    add_field('SoftwareVersions', _get_string(first, 'SoftwareVersions'))
+    add_field('MRAcquisitionType', _get_string(first, 'MRAcquisitionType'))
+    add_field('SeriesDescription', _get_string(first, 'SeriesDescription'))
+    add_field('ProtocolName', _get_string(first, 'ProtocolName') or _get_string(first, 'SeriesDescription'))
+    add_field('ScanningSequence', _get_string(first, 'ScanningSequence'))
+    add_field('SequenceVariant', _get_string(first, 'SequenceVariant'))
+    add_field('ScanOptions', _get_string(first, 'ScanOptions'))
+    add_field('SequenceName', _get_string(first, 'SequenceName'))
+    add_field('ImageType', [str(value) for value in _get_values(first, 'ImageType')] or None)
+    add_field('SeriesNumber', _get_number(first, 'SeriesNumber'))
+    add_field('AcquisitionTime', _get_acquisition_time(datasets))
+    add_field('AcquisitionNumber', _get_number(first, 'AcquisitionNumber'))
+    add_field('SliceThickness', _get_number(first, 'SliceThickness'))
+    add_field('SpacingBetweenSlices', _get_number(first, 'SpacingBetweenSlices'))
+    add_field('SAR', _get_number(first, 'SAR'))
+    add_field('EchoTime', _get_seconds(first, 'EchoTime'))
+    add_field('RepetitionTime', _get_seconds(first, 'RepetitionTime'))
+    add_field('InversionTime', _get_seconds(first, 'InversionTime'))
+    add_field('FlipAngle', _get_number(first, 'FlipAngle'))
+    add_field('PercentPhaseFOV', _get_number(first, 'PercentPhaseFieldOfView'))
+    add_field('PixelBandwidth', _get_number(first, 'PixelBandwidth'))
+    add_field('ImageOrientationPatientDICOM', [
+        _get_json_number(cosine) for cosine in _get_floats(first, 'ImageOrientationPatient')
+    ])
+    add_field('InPlanePhaseEncodingDirectionDICOM', _get_string(first, 'InPlanePhaseEncodingDirection'))
+    add_field('ConversionSoftware', native_writer_name)
+    add_field('ConversionSoftwareVersion', native_writer_version)
+
+    return sidecar
+
+
+def _check_native_dataset(dataset: Dataset):
+    """
+    Check that a DICOM dataset is a single-frame uncompressed monochrome image that the native
+    writer can convert, or raise an `UnsupportedDicomSeriesError`.
+    """
+
+    if 'PixelData' not in dataset:
+        raise UnsupportedDicomSeriesError("A DICOM file has no pixel data.")
+
+    if dataset.file_meta.TransferSyntaxUID.is_compressed:
+        raise UnsupportedDicomSeriesError("A DICOM file has compressed pixel data.")
+
+    if int(dataset.get('NumberOfFrames') or 1) != 1:
+        raise UnsupportedDicomSeriesError("A DICOM file has several frames.")
+
+    if int(dataset.get('SamplesPerPixel', 1)) != 1 or dataset.get('PhotometricInterpretation') != 'MONOCHROME2':
+        raise UnsupportedDicomSeriesError("A DICOM file is not a MONOCHROME2 image.")
+
+    if int(dataset.get('BitsAllocated', 0)) not in (8, 16):
+        raise UnsupportedDicomSeriesError("A DICOM file is not an 8 or 16 bits image.")
+
+    image_types = {str(value).upper() for value in _get_values(dataset, 'ImageType')}
+    if image_types & _suffixed_image_types:
+        raise UnsupportedDicomSeriesError(
+            f"A DICOM file has the image type {', '.join(sorted(image_types & _suffixed_image_types))}."
+        )
+
+    if 'DiffusionBValue' in dataset or (0x0019, 0x100C) in dataset:
+        raise UnsupportedDicomSeriesError("A DICOM file is a diffusion image.")
+
+    if len(_get_floats(dataset, 'ImageOrientationPatient')) != 6 or len(_get_floats(dataset, 'PixelSpacing')) != 2:
+        raise UnsupportedDicomSeriesError("A DICOM file lacks an image orientation or a pixel spacing.")
+
+    if len(_get_floats(dataset, 'ImagePositionPatient')) != 3:
+        raise UnsupportedDicomSeriesError("A DICOM file lacks an image position.")
+
+
+def _get_pixel_values(dataset: Dataset) -> np.ndarray[Any, np.dtype[Any]]:
+    """
+    Get the pixel values of an uncompressed single-frame DICOM dataset. The pixel data is read
+    directly rather than with `Dataset.pixel_array`, whose generic decoding is slower than the
+    writing of the NIfTI file for small images.
+    """
+
+    rows = int(dataset.Rows)
+    columns = int(dataset.Columns)
+    bits_allocated = int(dataset.BitsAllocated)
+    bits_stored = int(dataset.get('BitsStored') or bits_allocated)
+    signed = int(dataset.get('PixelRepresentation') or 0) == 1
+
+    # The values of signed pixels stored on fewer bits than allocated must be sign-extended.
+    if signed and bits_stored < bits_allocated:
+        return dataset.pixel_array  # type: ignore
+
+    byte_order = '<' if dataset.file_meta.TransferSyntaxUID.is_little_endian else '>'
+    dtype = np.dtype(f"{byte_order}{'i' if signed else 'u'}{bits_allocated // 8}")
+    values = np.frombuffer(dataset.PixelData, dtype=dtype, count=rows * columns).reshape(rows, columns)
+
+    if bits_stored < bits_allocated:
+        values = values & ((1 << bits_stored) - 1)
+
+    return values.astype(dtype.newbyteorder('='), copy=False)
+
+
+def _get_slice_normal(dataset: Dataset) -> np.ndarray[Any, np.dtype[np.float64]]:
+    """
+    Get the normal of the slice of a DICOM dataset in the DICOM LPS coordinates.
+    """
+
+    orientation = _get_floats(dataset, 'ImageOrientationPatient')
+    return np.cross(orientation[:3], orientation[3:])
+
+
+def _get_slice_spacing(datasets: list[Dataset]) -> float:
+    """
+    Get the spacing between the slices of a sorted DICOM series. Raise an
+    `UnsupportedDicomSeriesError` if the slices are not regularly spaced along their normal.
+    """
+
+    first = datasets[0]
+
+    if len(datasets) == 1:
+        spacing = _get_number(first, 'SpacingBetweenSlices') or _get_number(first, 'SliceThickness') or 1
+        return float(spacing)
+
+    normal = _get_slice_normal(first)
+    first_position = _get_floats(first, 'ImagePositionPatient')
+    last_position = _get_floats(datasets[-1], 'ImagePositionPatient')
+    spacing = float(np.dot(last_position - first_position, normal)) / (len(datasets) - 1)
+
+    if spacing < slice_position_tolerance:
+        raise UnsupportedDicomSeriesError("Several DICOM files have the same slice position.")
+
+    for index, dataset in enumerate(datasets):
+        expected_position = first_position + normal * spacing * index
+        if np.abs(_get_floats(dataset, 'ImagePositionPatient') - expected_position).max() > slice_position_tolerance:
+            raise UnsupportedDicomSeriesError("The DICOM slices are not regularly spaced along their normal.")
+
+    return spacing
+
+
+def _get_nifti_header(
+    dataset: Dataset,
+    volume: np.ndarray[Any, np.dtype[Any]],
+    affine: np.ndarray[Any, np.dtype[np.float64]],
+) -> bytes:
+    """
+    Get the NIfTI-1 header of a volume, its orientation being stored in the qform and the sform as
+    done by `dcm2niix`.
+    """
+
+    datatype, bitpix = _nifti_datatypes[volume.dtype.name]
+    slices, rows, columns = volume.shape
+
+    voxel_sizes = np.linalg.norm(affine[:3, :3], axis=0)
+    qfac, quatern_b, quatern_c, quatern_d = _get_quaternion(affine[:3, :3] / voxel_sizes)
+
+    slope = _get_number(dataset, 'RescaleSlope')
+    intercept = _get_number(dataset, 'RescaleIntercept')
+    repetition_time = _get_seconds(dataset, 'RepetitionTime') or 0
+    echo_time = _get_number(dataset, 'EchoTime')
+    description = f'TE={echo_time:g}' if echo_time is not None else ''
+
+    header = _nifti_header_struct.pack(
+        348, b'', b'', 0, 0, ord('r'), 0,
+        3, columns, rows, slices, 1, 1, 1, 1,
+        0.0, 0.0, 0.0,
+        0, datatype, bitpix, 0,
+        qfac, *voxel_sizes, repetition_time, 0.0, 0.0, 0.0,
+        352.0,
+        float(slope if slope is not None else 1), float(intercept if intercept is not None else 0),
+        0, 0, 10,
+        0.0, 0.0, 0.0, 0.0, 0, 0,
+        description.encode()[:79], b'',
+        1, 1,
+        quatern_b, quatern_c, quatern_d, *affine[:3, 3],
+        *affine[:3, :].flatten(),
+        b'', b'n+1\0',
+    )
+
+    return header + b'\0' * 4
+
+
+def _get_quaternion(rotation: np.ndarray[Any, np.dtype[np.float64]]) -> tuple[float, float, float, float]:
+    """
+    Get the NIfTI qfac and quaternion parameters of a rotation matrix, as computed by the NIfTI
+    reference implementation.
+    """
+
+    rotation = rotation.copy()
+    qfac = 1.0
+    if np.linalg.det(rotation) < 0:
+        rotation[:, 2] *= -1
+        qfac = -1.0
+
+    (r11, r12, r13), (r21, r22, r23), (r31, r32, r33) = rotation
+
+    a = r11 + r22 + r33 + 1
+    if a > 0.5:
+        a = 0.5 * math.sqrt(a)
+        b = 0.25 * (r32 - r23) / a
+        c = 0.25 * (r13 - r31) / a
+        d = 0.25 * (r21 - r12) / a
+    else:
+        xd = 1 + r11 - (r22 + r33)
+        yd = 1 + r22 - (r11 + r33)
+        zd = 1 + r33 - (r11 + r22)
+        if xd > 1:
+            b = 0.5 * math.sqrt(xd)
+            c = 0.25 * (r12 + r21) / b
+            d = 0.25 * (r13 + r31) / b
+            a = 0.25 * (r32 - r23) / b
+        elif yd > 1:
+            c = 0.5 * math.sqrt(yd)
+            b = 0.25 * (r12 + r21) / c
+            d = 0.25 * (r23 + r32) / c
+            a = 0.25 * (r13 - r31) / c
+        else:
+            d = 0.5 * math.sqrt(zd)
+            b = 0.25 * (r13 + r31) / d
+            c = 0.25 * (r23 + r32) / d
+            a = 0.25 * (r21 - r12) / d
+
+        if a < 0:
+            b, c, d = -b, -c, -d
+
+    return qfac, b, c, d
+
+
+def _get_acquisition_time(datasets: list[Dataset]) -> str | None:
+    """
+    Get the earliest acquisition time of a DICOM series in the `dcm2niix` format, which is only
+    written if the DICOM files have an acquisition date.
+    """
+
+    if _get_string(datasets[0], 'AcquisitionDate') is None:
+        return None
+
+    times = [time for dataset in datasets if (time := _get_string(dataset, 'AcquisitionTime')) is not None]
+    if times == []:
+        return None
+
+    time = min(times)
+    seconds = float(time[4:] or 0)
+    return f'{time[0:2]}:{time[2:4]}:{seconds:09.6f}'
+
+
+def _get_manufacturer(dataset: Dataset) -> str | None:
+    """
+    Get the manufacturer of a DICOM dataset, with the capitalization used by `dcm2niix`.
+    """
+
+    manufacturer = _get_string(dataset, 'Manufacturer')
+    if manufacturer is None:
+        return None
+
+    for name in ('Siemens', 'GE', 'Philips', 'Canon', 'Toshiba', 'Hitachi', 'UIH', 'Bruker'):
+        if manufacturer.upper().startswith(name.upper()):
+            return name
+
+    return manufacturer
+
+
+def _get_values(dataset: Dataset, keyword: str) -> list[Any]:
+    """
+    Get the values of a DICOM attribute as a list, which is empty if the attribute is absent.
+    """
+
+    value = dataset.get(keyword)
+    if value is None or value == '':
+        return []
+
+    if isinstance(value, MultiValue):
+        return list(value)  # type: ignore
+
+    return [value]
+
+
+def _get_value(dataset: Dataset, keyword: str) -> Any:
+    """
+    Get the comparable value of a DICOM attribute, or `None` if the attribute is absent.
+    """
+
+    values = _get_values(dataset, keyword)
+    return tuple(str(value) for value in values) if values != [] else None
+
+
+def _get_floats(dataset: Dataset, keyword: str) -> np.ndarray[Any, np.dtype[np.float64]]:
+    """
+    Get the values of a numeric DICOM attribute as an array of floats.
+    """
+
+    return np.array([float(value) for value in _get_values(dataset, keyword)], dtype=np.float64)
+
+
+def _get_string(dataset: Dataset, keyword: str) -> str | None:
+    """
+    Get the value of a DICOM attribute as a string, the values of a multi-valued attribute being
+    separated by backslashes, or `None` if the attribute is absent or empty.
+    """
+
+    values = _get_values(dataset, keyword)
+    if values == []:
+        return None
+
+    return '\\'.join(str(value).strip() for value in values)
+
+
+def _get_number(dataset: Dataset, keyword: str) -> int | float | None:
+    """
+    Get the value of a numeric DICOM attribute, or `None` if the attribute is absent or empty.
+    """
+
+    values = _get_values(dataset, keyword)
+    if values == []:
+        return None
+
+    return _get_json_number(float(values[0]))
+
+
+def _get_seconds(dataset: Dataset, keyword: str) -> int | float | None:
+    """
+    Get the value of a DICOM time attribute in milliseconds converted to seconds, or `None` if the
+    attribute is absent or empty.
+    """
+
+    milliseconds = _get_number(dataset, keyword)
+    if milliseconds is None:
+        return None
+
+    return _get_json_number(round(milliseconds / 1000, 8))
+
+
+def _get_json_number(value: float) -> int | float:
+    """
+    Get a number as an integer if it has no fractional part, as written by `dcm2niix`.
+    """
+
+    value = float(value)
+    if value.is_integer():
+        return int(value)
+
+    return value
@@ -0,0 +1,150 @@
+"""
+Access to the output directories of the MNI 7T DICOM to BIDS converter (BIDS data type and unknown
+DICOM series directories), which counts the metadata operations made on these directories. On
+parallel filesystems such as Lustre or NFS, metadata operations are more expensive than data reads,
+so these operations can be minimized by listing each output directory once per session and keeping
+its file names in memory.
+"""
+
+import errno
+import os
+import shutil
+import threading
+
+
+class OutputDirectories:
+    """
+    Output directories of a conversion session. If the metadata operations are minimized, each
+    directory is created and listed at most once, and the existence of the output files is checked
+    in memory. This assumes that no other process writes in the output directories of the session
+    during the conversion.
+
+    The output directories can be accessed by the main thread and the move thread of the conversion
+    pipeline at the same time, so the counter and the listings are protected by a lock, but the
+    file operations themselves run outside of this lock.
+    """
+
+    def __init__(self, minimize_metadata_ops: bool = False):
+        self.minimize_metadata_ops = minimize_metadata_ops
+
+        # The number of metadata operations (directory creations, listings, existence checks,
+        # stats and renames) made on the output directories.
+        self.metadata_ops = 0
+
+        # The file names of the listed output directories.
+        self._listings: dict[str, set[str]] = {}
+
+        # The output directories created during the session.
+        self._created_dir_paths: set[str] = set()
+
+        self._lock = threading.Lock()
+
+    def make_dir(self, dir_path: str):
+        """
+        Create an output directory and its parents if it does not already exist.
+        """
+
+        with self._lock:
+            if self.minimize_metadata_ops and dir_path in self._created_dir_paths:
+                return
+
+            self.metadata_ops += 1
+
+        os.makedirs(dir_path, exist_ok=True)
+
+        with self._lock:
+            self._created_dir_paths.add(dir_path)
+
+    def file_exists(self, dir_path: str, file_name: str) -> bool:
+        """
+        Check whether a file exists in an output directory.
+        """
+
+        if self.minimize_metadata_ops:
+            return file_name in self._get_listing(dir_path)
+
+        self._count_op()
+        return os.path.exists(os.path.join(dir_path, file_name))
+
+    def list_files(self, dir_path: str) -> list[str]:
+        """
+        Get the names of the files of an output directory, or an empty list if the directory does
+        not exist.
+        """
+
+        if self.minimize_metadata_ops:
+            return sorted(self._get_listing(dir_path))
+
+        self._count_op()
+        try:
+            return sorted(os.listdir(dir_path))
+        except FileNotFoundError:
+            return []
+
+    def get_file_size(self, dir_path: str, file_name: str) -> int:
+        """
+        Get the size of a file of an output directory in bytes.
+        """
+
+        self._count_op()
+        return os.path.getsize(os.path.join(dir_path, file_name))
+
+    def move_file(self, file_path: str, dir_path: str, file_name: str, copy: bool = False):
+        """
+        Move a file to an output directory, replacing the file of that name if there is one. If
+        `copy` is set, the file is copied to a temporary file of the output directory that then
+        replaces the output file, so that the output file never shares its content with the links
+        of the moved file, and the moved file is removed.
+        """
+
+        output_file_path = os.path.join(dir_path, file_name)
+
+        self._count_op()
+        if copy:
+            tmp_output_file_path = os.path.join(dir_path, f'.{file_name}.tmp')
+            shutil.copyfile(file_path, tmp_output_file_path)
+            os.replace(tmp_output_file_path, output_file_path)
+            os.remove(file_path)
+        elif self.minimize_metadata_ops:
+            # Rename the file directly, which avoids the checks made by `shutil.move`, and only
+            # copy it if it is on another filesystem.
+            try:
+                os.replace(file_path, output_file_path)
+            except OSError as error:
+                if error.errno != errno.EXDEV:
+                    raise
+
+                shutil.move(file_path, output_file_path)
+        else:
+            shutil.move(file_path, output_file_path)
+
+        with self._lock:
+            if dir_path in self._listings:
+                self._listings[dir_path].add(file_name)
+
+    def _count_op(self):
+        """
+        Count a metadata operation made on the output directories.
+        """
+
+        with self._lock:
+            self.metadata_ops += 1
+
+    def _get_listing(self, dir_path: str) -> set[str]:
+        """
+        Get the file names of an output directory, listing that directory if it was not already
+        listed.
+        """
+
+        with self._lock:
+            listing: set[str] | None = self._listings.get(dir_path)
+            if listing is None:
+                self.metadata_ops += 1
+                try:
+                    listing = set[str](os.listdir(dir_path))
+                except FileNotFoundError:
+                    listing = set[str]()
+
+                self._listings[dir_path] = listing
+
+            return listing
@@ -0,0 +1,36 @@
+"""
+Comparison of the converted output files with the existing files of the BIDS dataset, so that the
+outputs that are identical to the existing files can be left untouched when a DICOM study is
+converted again, which preserves their modification times, backups, mirrors and annexes.
+"""
+
+import hashlib
+
+# Size of the chunks in which the files are read to compute their digests.
+digest_chunk_size = 1024 * 1024
+
+# Position of the modification time in the header of a gzip file, which is the only field of the
+# header that depends on the time of the conversion.
+gzip_magic = b'\x1f\x8b'
+gzip_mtime_slice = slice(4, 8)
+
+
+def get_file_digest(file_path: str) -> bytes:
+    """
+    Compute the digest of the content of a file by reading it in chunks. The modification time in
+    the header of the gzip files is ignored, as it differs between two conversions of the same
+    DICOM series when the compressor writes it.
+    """
+
+    hasher = hashlib.blake2b()
+
+    with open(file_path, 'rb') as file:
+        chunk = file.read(digest_chunk_size)
+        if file_path.endswith('.gz') and chunk[:2] == gzip_magic and len(chunk) >= gzip_mtime_slice.stop:
+            chunk = chunk[:gzip_mtime_slice.start] + bytes(4) + chunk[gzip_mtime_slice.stop:]
+
+        while chunk:
+            hasher.update(chunk)
+            chunk = file.read(digest_chunk_size)
+
+    return hasher.digest()
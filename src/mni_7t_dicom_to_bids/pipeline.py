@@ -1,44 +1,164 @@
 from mni_7t_dicom_to_bids.args import Args
-from mni_7t_dicom_to_bids.convert_dicom_series import check_dicom_to_niix, convert_dicom_series
-from mni_7t_dicom_to_bids.dataclass import BidsSessionInfo
+from mni_7t_dicom_to_bids.catalog import record_scan_catalog
+from mni_7t_dicom_to_bids.convert_dicom_series import (
+    check_dicom_to_niix,
+    convert_dicom_series,
+    plan_dicom_series_conversions,
+)
+from mni_7t_dicom_to_bids.dataclass import BidsSessionInfo, DicomSeriesInfo
 from mni_7t_dicom_to_bids.dataset_files import add_dataset_files
+from mni_7t_dicom_to_bids.events import configure_events, emit_event, print_info
 from mni_7t_dicom_to_bids.map_dicom_series import map_bids_dicom_series
+from mni_7t_dicom_to_bids.output_dirs import OutputDirectories
+from mni_7t_dicom_to_bids.preflight import check_disk_space
 from mni_7t_dicom_to_bids.print import (
+    print_filtered_dicom_series,
     print_found_dicom_series,
+    print_found_duplicate_dicom_files,
     print_found_ignored_dicom_series,
+    print_found_incomplete_dicom_series,
     print_found_mapped_bids_acquisitions,
     print_found_unknown_dicom_series,
 )
+from mni_7t_dicom_to_bids.profiler import Profiler
+from mni_7t_dicom_to_bids.provenance import record_session_provenance
+from mni_7t_dicom_to_bids.qc import check_session_outputs
+from mni_7t_dicom_to_bids.result import SessionResult
 from mni_7t_dicom_to_bids.sort_dicom_series import sort_dicom_series
+from mni_7t_dicom_to_bids.startup import get_startup_time
+
+
+def mni_7t_dicom_to_bids(
+    args: Args,
+    dicom_series_list: list[DicomSeriesInfo] | None = None,
+    dicom_to_niix_checked: bool = False,
+) -> SessionResult:
+    """
+    Convert a DICOM study to BIDS. If the DICOM series of the study are already known, for instance
+    because they were grouped while the DICOM files were received, they can be given so that the
+    DICOM study directory is not scanned. The `dcm2niix` check can be skipped if the caller has
+    already done it. Return the outcome of the conversion, or raise a conversion error if the
+    conversion cannot be done.
+    """
+
+    startup_time = get_startup_time()
+
+    configure_events(args.quiet, args.events_fd, args.progress_interval)
+
+    emit_event('session_start', subject=args.subject, session=args.session, dicom_study_path=args.dicom_study_path)
+
+    profiler = Profiler()
+
+    result = SessionResult(BidsSessionInfo(
+        subject = args.subject,
+        session = args.session,
+    ))
+
+    success = False
+    try:
+        _run_pipeline(args, profiler, result, dicom_series_list, dicom_to_niix_checked)
+        success = True
+    finally:
+        result.stages = profiler.stage_profiles
+
+        emit_event('session_end', subject=args.subject, session=args.session, success=success)
 
+        # Write the profile report even if the conversion failed to help diagnose the failure.
+        if args.profile is not None:
+            profiler.write_report(args.profile, startup_time)
 
-def mni_7t_dicom_to_bids(args: Args):
-    print("Checking `dcm2niix` availability...")
+    return result
 
-    check_dicom_to_niix()
 
-    print("Grouping DICOMs by DICOM series...")
+def _run_pipeline(
+    args: Args,
+    profiler: Profiler,
+    result: SessionResult,
+    dicom_series_list: list[DicomSeriesInfo] | None,
+    dicom_to_niix_checked: bool,
+):
+    if not dicom_to_niix_checked:
+        print_info("Checking `dcm2niix` availability...")
 
-    dicom_series_list = sort_dicom_series(args.dicom_study_path)
+        with profiler.stage('check_dcm2niix'):
+            check_dicom_to_niix()
+
+    if dicom_series_list is None:
+        print_info("Grouping DICOMs by DICOM series...")
+
+        dicom_series_list = sort_dicom_series(
+            args.dicom_study_path, profiler, args.keep_duplicates, args.fast_headers
+        )
+
+    result.dicom_series_list = dicom_series_list
 
     print_found_dicom_series(dicom_series_list)
 
-    dicom_bids_mapping = map_bids_dicom_series(dicom_series_list)
+    print_found_duplicate_dicom_files(dicom_series_list)
+
+    with profiler.stage('map'):
+        dicom_bids_mapping = map_bids_dicom_series(dicom_series_list, args.auto_skip)
+
+    result.ignored_dicom_series_list = dicom_bids_mapping.ignored_dicom_series_list
+    result.unknown_dicom_series_list = dicom_bids_mapping.unknown_dicom_series_list
+
+    # Record the inventory of the study before the unknown DICOM series can abort the conversion.
+    if args.catalog_path is not None:
+        with profiler.stage('catalog'):
+            record_scan_catalog(args.catalog_path, result.bids_session, args.dicom_study_path, dicom_bids_mapping)
 
     print_found_mapped_bids_acquisitions(dicom_bids_mapping)
 
     print_found_ignored_dicom_series(dicom_bids_mapping)
 
+    print_found_incomplete_dicom_series(dicom_bids_mapping, args.skip_incomplete)
+
     print_found_unknown_dicom_series(dicom_bids_mapping, args.unknowns)
 
-    print('Converting DICOM series to NIfTI...')
+    with profiler.stage('plan'):
+        conversions = plan_dicom_series_conversions(dicom_bids_mapping, args)
 
-    bids_session = BidsSessionInfo(
-        subject = args.subject,
-        session = args.session,
-    )
+    if args.filters is not None:
+        print_filtered_dicom_series(conversions)
+
+    # Check the disk space before any DICOM file is copied or converted.
+    if args.disk_check:
+        print_info("Checking disk space...")
+
+        with profiler.stage('preflight'):
+            scratch_dir_path = check_disk_space(conversions, args)
+    else:
+        # The scratch directories are only fallbacks of the default temporary directory, which
+        # cannot be chosen without the disk space check.
+        scratch_dir_path = None
+
+    print_info('Converting DICOM series to NIfTI...')
 
-    convert_dicom_series(bids_session, dicom_bids_mapping, args)
+    bids_session = result.bids_session
+
+    output_dirs = OutputDirectories(args.minimize_metadata_ops)
+
+    with profiler.stage('convert') as stage:
+        result.series_results = convert_dicom_series(
+            bids_session, conversions, scratch_dir_path, output_dirs, args, profiler
+        )
+
+        stage.metadata_ops = output_dirs.metadata_ops
+
+    with profiler.stage('provenance'):
+        record_session_provenance(args.bids_dataset_path, bids_session, dicom_series_list, result.series_results)
+
+    if args.qc:
+        print_info("Checking NIfTI files...")
+
+        with profiler.stage('qc'):
+            check_session_outputs(args.bids_dataset_path, bids_session, result.series_results)
 
     if args.dataset_files:
-        add_dataset_files(args.bids_dataset_path, bids_session, args.dicom_study_path, args.overwrite)
+        with profiler.stage('dataset_files') as stage:
+            convert_metadata_ops = output_dirs.metadata_ops
+            add_dataset_files(
+                args.bids_dataset_path, bids_session, args.dicom_study_path, args.overwrite, output_dirs
+            )
+
+            stage.metadata_ops = output_dirs.metadata_ops - convert_metadata_ops
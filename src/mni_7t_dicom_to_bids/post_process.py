@@ -1,40 +1,74 @@
+import fnmatch
 import json
 import math
 import os
-from pathlib import Path
+from typing import Any
 
 from bic_util.fs import rename_file
 
 from mni_7t_dicom_to_bids.dataclass import BidsName
 
+# Fields added to the JSON sidecar files whose name matches a pattern.
+json_patches: list[tuple[str, dict[str, Any]]] = [
+    # Add 'Units' to 'part-phase' scans.
+    ('*part-phase*.json', {'Units': 'rad'}),
+    # Add 'MTState' to 'mt-off' scans.
+    ('*mt-off*.json', {'MTState': False}),
+    # Add 'MTState' to 'mt-on' scans.
+    ('*mt-on*.json', {'MTState': True}),
+]
+
 
-def post_process(acquisition_path: str):
-    for file_name in os.scandir(acquisition_path):
-        file_path = os.path.join(acquisition_path, file_name)
-        post_process_file(file_path)
+def post_process(acquisition_path: str) -> dict[str, str | None]:
+    """
+    Apply MNI 7T BIDS post processing to the files of a converted acquisition, and return the new
+    name of each file by original file name, or `None` for the deleted files.
+    """
+
+    post_processed_file_names: dict[str, str | None] = {}
+    for file in os.scandir(acquisition_path):
+        post_processed_file_names[file.name] = post_process_file(file.path)
 
     post_process_json(acquisition_path)
 
+    return post_processed_file_names
+
 
-def post_process_file(file_path: str):
+def post_process_file(file_path: str) -> str | None:
     """
-    Apply MNI 7T BIDS post processing.
+    Apply MNI 7T BIDS post processing to a file, and return its new name, or `None` if the file is
+    deleted.
     """
 
     file_name = os.path.basename(file_path)
+    new_file_name = get_post_processed_file_name(file_name)
+
+    if new_file_name is None:
+        os.remove(file_path)
+        return None
+
+    # Rename the file on the system.
+    if new_file_name != file_name:
+        rename_file(file_path, new_file_name)
+
+    return new_file_name
+
+
+def get_post_processed_file_name(file_name: str) -> str | None:
+    """
+    Get the name of a converted file after the MNI 7T BIDS post processing, or `None` if the file is
+    deleted by the post processing.
+    """
+
     bids_name = BidsName.from_string(file_name)
 
     # Delete the bval and bvec files from MP2RAGE acquisitions.
     if bids_name.has('MP2RAGE') and (bids_name.extension == 'bval' or bids_name.extension == 'bvec'):
-        print(f"Remove MP2RAGE bval/bvec file '{file_name}'")
-        os.remove(file_path)
-        return
+        return None
 
     # Delete the 'ROI1' files.
     if bids_name.has('ROI1'):
-        print(f"Remove ROI file '{file_name}'")
-        os.remove(file_path)
-        return
+        return None
 
     # Replace 'e?' by 'echo-?'
     echo_match = bids_name.match(r'e(\d)')
@@ -83,12 +117,7 @@ def post_process_file(file_path: str):
         bids_name.add('acq', acquisition_name)
         bids_name.add('run', str(math.ceil(run_number / 2)))
 
-    new_file_name = str(bids_name)
-
-    # Rename the file on the system.
-    if new_file_name != file_name:
-        print(f"Renaming '{file_name}' to '{new_file_name}'.")
-        rename_file(file_path, new_file_name)
+    return str(bids_name)
 
 
 def post_process_json(acquisition_path: str):
@@ -96,33 +125,30 @@ def post_process_json(acquisition_path: str):
     Patch the generated BIDS JSON sidercar files with additional information.
     """
 
-    # Add 'Units' to 'part-phase' scans.
-    phase_paths = Path(acquisition_path).rglob('*part-phase*.json')
-    for phase_path in phase_paths:
-        with open(phase_path) as phase_file:
-            data = json.load(phase_file)
-
-        data['Units'] = 'rad'
+    # The files are listed once they are renamed.
+    for file_name in sorted(os.listdir(acquisition_path)):
+        patch = get_json_patch(file_name)
+        if patch == {}:
+            continue
 
-        with open(phase_path, 'w') as phase_file:
-            json.dump(data, phase_file, indent=4)
+        json_path = os.path.join(acquisition_path, file_name)
+        with open(json_path) as json_file:
+            data = json.load(json_file)
 
-    # Add 'MTState' to 'mt-off' scans.
-    for mt_off_path in Path(acquisition_path).rglob('*mt-off*.json'):
-        with open(mt_off_path) as mt_off_file:
-            data = json.load(mt_off_file)
+        data.update(patch)
 
-        data['MTState'] = False
+        with open(json_path, 'w') as json_file:
+            json.dump(data, json_file, indent=4)
 
-        with open(mt_off_path, 'w') as mt_off_file:
-            json.dump(data, mt_off_file, indent=4)
 
-    # Add 'MTState' to 'mt-on' scans.
-    for mt_on_path in Path(acquisition_path).rglob('*mt-on*.json'):
-        with open(mt_on_path) as mt_on_file:
-            data = json.load(mt_on_file)
+def get_json_patch(file_name: str) -> dict[str, Any]:
+    """
+    Get the fields added to a BIDS JSON sidecar file by the MNI 7T BIDS post processing.
+    """
 
-        data['MTState'] = True
+    patch: dict[str, Any] = {}
+    for pattern, fields in json_patches:
+        if fnmatch.fnmatch(file_name, pattern):
+            patch.update(fields)
 
-        with open(mt_on_path, 'w') as mt_on_file:
-            json.dump(data, mt_on_file, indent=4)
+    return patch
@@ -0,0 +1,238 @@
+"""
+Pre-flight disk space check of the MNI 7T DICOM to BIDS converter. Before any DICOM series is
+converted, the disk usage of the conversion is estimated from the size of the DICOM series and
+compared with the free space of the scratch, BIDS dataset and unknown DICOM series filesystems,
+so that a session does not fail halfway through because a filesystem is full.
+"""
+
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+
+from mni_7t_dicom_to_bids.args import Args, ConvertUnknownsArg
+from mni_7t_dicom_to_bids.dataclass import DicomSeriesConversion
+from mni_7t_dicom_to_bids.errors import InsufficientDiskSpaceError
+from mni_7t_dicom_to_bids.events import print_info
+
+# Ratio between the size of the compressed NIfTI files of a DICOM series and the size of its DICOM
+# files for each BIDS data type. The DICOM headers and the gzip compression usually make the NIfTI
+# files smaller than the DICOM files, these ratios being on the conservative side.
+output_size_ratios = {
+    'anat': 0.7,
+    'fmap': 0.7,
+    'func': 0.8,
+    'dwi':  0.8,
+}
+
+# Output size ratio of the unknown DICOM series and of the unlisted BIDS data types.
+default_output_size_ratio = 0.9
+
+# Ratio between the size of the uncompressed NIfTI files that `dcm2niix` may write before
+# compressing them and the size of the DICOM files.
+uncompressed_size_ratio = 1.0
+
+# Safety margin added to the estimated disk usage of each filesystem, as a ratio of the estimated
+# usage and as a number of bytes.
+safety_margin_ratio = 0.1
+safety_margin_bytes = 64 * 1024 * 1024
+
+
+@dataclass
+class SeriesDiskUsage:
+    """
+    The estimated disk usage of a DICOM series conversion.
+    """
+
+    staging_bytes: int
+    """
+    The size of the copy of the DICOM files in the temporary input directory in bytes.
+    """
+
+    output_bytes: int
+    """
+    The size of the NIfTI and JSON output files in bytes.
+    """
+
+    @property
+    def peak_scratch_bytes(self) -> int:
+        """
+        The peak usage of the scratch directory during the conversion in bytes, with the staged
+        DICOM files, the uncompressed NIfTI files and the compressed output files.
+        """
+
+        return self.staging_bytes + int(self.staging_bytes * uncompressed_size_ratio) + self.output_bytes
+
+
+@dataclass
+class DiskSpaceRequirement:
+    """
+    The estimated disk space required on a filesystem by the conversion.
+    """
+
+    path: str
+    """
+    The path of the first directory of the conversion found on the filesystem.
+    """
+
+    required_bytes: int
+    """
+    The estimated disk space required on the filesystem in bytes, including the safety margin.
+    """
+
+    free_bytes: int
+    """
+    The free disk space of the filesystem in bytes.
+    """
+
+    @property
+    def sufficient(self) -> bool:
+        """
+        Whether the filesystem has enough free space for the conversion.
+        """
+
+        return self.required_bytes <= self.free_bytes
+
+
+def estimate_series_disk_usage(conversion: DicomSeriesConversion) -> SeriesDiskUsage:
+    """
+    Estimate the disk usage of a DICOM series conversion from the size of its DICOM files and its
+    BIDS data type.
+    """
+
+    if conversion.bids_acquisition is not None:
+        ratio = output_size_ratios.get(conversion.bids_acquisition.scan_type, default_output_size_ratio)
+    else:
+        ratio = default_output_size_ratio
+
+    return SeriesDiskUsage(
+        staging_bytes = conversion.bytes_count,
+        output_bytes  = int(conversion.bytes_count * ratio),
+    )
+
+
+def check_disk_space(conversions: list[DicomSeriesConversion], args: Args) -> str:
+    """
+    Check that the scratch and output filesystems have enough free space for the DICOM series
+    conversions, and return the path of the scratch directory to use, which is the first candidate
+    scratch directory with enough free space. Raise an error if no scratch directory or an output
+    filesystem does not have enough free space.
+    """
+
+    bids_output_bytes = 0
+    unknowns_output_bytes = 0
+    peak_scratch_bytes = 0
+    max_staging_bytes = 0
+    max_output_bytes = 0
+
+    for conversion in conversions:
+        usage = estimate_series_disk_usage(conversion)
+        # The DICOM series are converted one at a time and their temporary directories are deleted
+        # after each conversion, so the scratch usage is the peak usage of the largest series.
+        peak_scratch_bytes = max(peak_scratch_bytes, usage.peak_scratch_bytes)
+        max_staging_bytes = max(max_staging_bytes, usage.staging_bytes)
+        max_output_bytes = max(max_output_bytes, usage.output_bytes)
+        if conversion.bids_acquisition is not None:
+            bids_output_bytes += usage.output_bytes
+        else:
+            unknowns_output_bytes += usage.output_bytes
+
+    # In the conversion pipeline, the next DICOM series may be staged and the output files of the
+    # previous DICOM series may not be moved yet while a DICOM series is converted.
+    if args.pipeline is not None and len(conversions) > 1:
+        peak_scratch_bytes += min(max_staging_bytes, args.pipeline.scratch_limit * 1024 * 1024) + max_output_bytes
+
+    output_usages = [(args.bids_dataset_path, bids_output_bytes)]
+    if isinstance(args.unknowns, ConvertUnknownsArg):
+        output_usages.append((args.unknowns.dir_path, unknowns_output_bytes))
+
+    scratch_dir_paths = get_scratch_dir_paths(args)
+
+    requirements_list: list[list[DiskSpaceRequirement]] = []
+    for scratch_dir_path in scratch_dir_paths:
+        requirements = get_disk_space_requirements([(scratch_dir_path, peak_scratch_bytes), *output_usages])
+        if all(requirement.sufficient for requirement in requirements):
+            print_info(
+                f"Estimated disk usage: {format_size(peak_scratch_bytes)} of scratch space in '{scratch_dir_path}',"
+                f" {format_size(bids_output_bytes + unknowns_output_bytes)} of output files."
+            )
+
+            return scratch_dir_path
+
+        requirements_list.append(requirements)
+
+    # Report the insufficient filesystems of the default scratch directory, and only report the
+    # scratch filesystems of the other candidates.
+    insufficient_requirements = [
+        requirement for requirement in requirements_list[0] if not requirement.sufficient
+    ] + [
+        requirements[0] for requirements in requirements_list[1:] if not requirements[0].sufficient
+    ]
+
+    raise InsufficientDiskSpaceError(
+        "Not enough free disk space to convert the DICOM study:\n" + '\n'.join(
+            f"- '{requirement.path}' requires {format_size(requirement.required_bytes)}"
+            f" but only has {format_size(requirement.free_bytes)} free."
+            for requirement in insufficient_requirements
+        ) + "\nFree some disk space, use another scratch directory with --scratch-dir, or skip this check with"
+        " --no-disk-check.",
+        [requirement.path for requirement in insufficient_requirements],
+    )
+
+
+def get_scratch_dir_paths(args: Args) -> list[str]:
+    """
+    Get the candidate scratch directories of the conversion, which are the default temporary
+    directory followed by the scratch directories given to the converter, in order of preference.
+    """
+
+    return [tempfile.gettempdir(), *args.scratch_dir_paths]
+
+
+def get_disk_space_requirements(usages: list[tuple[str, int]]) -> list[DiskSpaceRequirement]:
+    """
+    Get the disk space requirements of each filesystem from the estimated usage of each directory,
+    the usages of the directories that are on the same filesystem being added together.
+    """
+
+    requirements: dict[int, DiskSpaceRequirement] = {}
+
+    for dir_path, usage_bytes in usages:
+        existing_path = get_existing_parent_path(dir_path)
+        device = os.stat(existing_path).st_dev
+        required_bytes = int(usage_bytes * (1 + safety_margin_ratio))
+
+        if device in requirements:
+            requirements[device].required_bytes += required_bytes
+        else:
+            requirements[device] = DiskSpaceRequirement(
+                path           = dir_path,
+                required_bytes = required_bytes + safety_margin_bytes,
+                free_bytes     = shutil.disk_usage(existing_path).free,
+            )
+
+    return list(requirements.values())
+
+
+def get_existing_parent_path(path: str) -> str:
+    """
+    Get the closest existing directory of a path, which is the path itself if it exists, as the
+    output directories may not be created yet.
+    """
+
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+
+    return path
+
+
+def format_size(bytes_count: int) -> str:
+    """
+    Format a size in bytes as a human-readable size in megabytes or gigabytes.
+    """
+
+    if bytes_count >= 1024 ** 3:
+        return f'{bytes_count / 1024 ** 3:.1f} GB'
+
+    return f'{bytes_count / 1024 ** 2:.1f} MB'
@@ -1,10 +1,14 @@
 import os
+from datetime import datetime
 from shlex import quote
 
-from bic_util.print import print_error_exit, print_warning
+from bic_util.print import print_warning
 
 from mni_7t_dicom_to_bids.args import AbortUnknownsArg, ConvertUnknownsArg, SkipUnknownsArg, UnknownsArg
-from mni_7t_dicom_to_bids.dataclass import DicomBidsMapping, DicomSeriesInfo
+from mni_7t_dicom_to_bids.dataclass import DicomBidsMapping, DicomSeriesConversion, DicomSeriesInfo
+from mni_7t_dicom_to_bids.errors import ExistingBidsFilesError, UnknownDicomSeriesError
+from mni_7t_dicom_to_bids.events import print_info
+from mni_7t_dicom_to_bids.startup import ModuleImportTime
 
 
 def print_found_dicom_series(dicom_series_list: list[DicomSeriesInfo]):
@@ -12,26 +16,60 @@ def print_found_dicom_series(dicom_series_list: list[DicomSeriesInfo]):
     Print the DICOM series found in the DICOM study to the user.
     """
 
-    print(f"Found {len(dicom_series_list)} DICOM series:")
+    print_info(f"Found {len(dicom_series_list)} DICOM series:")
 
     for dicom_series in dicom_series_list:
-        print(
+        print_info(
             f"- {quote(dicom_series.description)}"
             f" (series number: {dicom_series.number})"
             f" ({len(dicom_series.file_paths)} files)"
         )
 
 
+def print_found_duplicate_dicom_files(dicom_series_list: list[DicomSeriesInfo]):
+    """
+    Print the duplicate DICOM files that were dropped from the DICOM series of the DICOM study to
+    the user.
+    """
+
+    duplicate_dicom_series_list = [
+        dicom_series for dicom_series in dicom_series_list if dicom_series.duplicates.files_count != 0
+    ]
+
+    if duplicate_dicom_series_list == []:
+        return
+
+    files_count = sum(dicom_series.duplicates.files_count for dicom_series in duplicate_dicom_series_list)
+
+    dicom_series_list_string = ""
+    for dicom_series in duplicate_dicom_series_list:
+        duplicates = dicom_series.duplicates
+        dicom_series_list_string += (
+            "\n"
+            f"- {quote(dicom_series.description)}"
+            f" (series number: {dicom_series.number})"
+            f" ({duplicates.instance_files_count} duplicate instance files)"
+            f" ({len(duplicates.series_instance_uids)} duplicate series instances"
+            f" with {duplicates.series_files_count} files)"
+        )
+
+    print_warning(
+        f"Found {files_count} duplicate DICOM files in {len(duplicate_dicom_series_list)} DICOM series, these files"
+        f" will be ignored, use option --keep-duplicates to convert them nonetheless.\n"
+        f"DICOM series with duplicates:{dicom_series_list_string}"
+    )
+
+
 def print_found_mapped_bids_acquisitions(dicom_bids_mapping: DicomBidsMapping):
     """
     Print the BIDS acquisition mappings found in the DICOM study to the user.
     """
 
-    print(f"Found {len(dicom_bids_mapping.bids_dicom_series_dict)} BIDS acquisitions:")
+    print_info(f"Found {len(dicom_bids_mapping.bids_dicom_series_dict)} BIDS acquisitions:")
 
     for bids_acquisition, dicom_series_list in dicom_bids_mapping.bids_dicom_series_dict.items():
         acquisition_name = f"{bids_acquisition.scan_type}/{bids_acquisition.file_name}"
-        print(
+        print_info(
             f"- {quote(acquisition_name)}"
             f" ({len(dicom_series_list)} DICOM series)"
         )
@@ -55,14 +93,77 @@ def print_found_ignored_dicom_series(dicom_bids_mapping: DicomBidsMapping):
             f" ({len(dicom_series.file_paths)} files)"
         )
 
-    print(
+        if dicom_series.skip_reason is not None:
+            dicom_series_list_string += f" ({dicom_series.skip_reason})"
+
+    print_info(
         f"Found {len(ignored_dicom_series_list)} ignored DICOM series. Ignored DICOM series:{dicom_series_list_string}"
     )
 
 
+def print_found_incomplete_dicom_series(dicom_bids_mapping: DicomBidsMapping, skip_incomplete: bool):
+    """
+    Print the mapped and unknown DICOM series of the DICOM study that seem to be missing some DICOM
+    files to the user.
+    """
+
+    incomplete_dicom_series_list = [
+        dicom_series
+        for dicom_series_list in (
+            *dicom_bids_mapping.bids_dicom_series_dict.values(),
+            dicom_bids_mapping.unknown_dicom_series_list,
+        )
+        for dicom_series in dicom_series_list
+        if dicom_series.incomplete_reason is not None
+    ]
+
+    if incomplete_dicom_series_list == []:
+        return
+
+    dicom_series_list_string = ""
+    for dicom_series in sorted(incomplete_dicom_series_list):
+        dicom_series_list_string += (
+            "\n"
+            f"- {quote(dicom_series.description)}"
+            f" (series number: {dicom_series.number})"
+            f" ({len(dicom_series.file_paths)} files)"
+            f" ({dicom_series.incomplete_reason})"
+        )
+
+    if skip_incomplete:
+        action_string = "these series will not be converted"
+    else:
+        action_string = "these series will be converted nonetheless, use option --skip-incomplete to skip them"
+
+    print_warning(
+        f"Found {len(incomplete_dicom_series_list)} incomplete DICOM series, {action_string}.\n"
+        f"Incomplete DICOM series:{dicom_series_list_string}"
+    )
+
+
+def print_filtered_dicom_series(conversions: list[DicomSeriesConversion]):
+    """
+    Print the DICOM series selected by the conversion filters to the user, or a warning if the
+    filters do not select any DICOM series.
+    """
+
+    if conversions == []:
+        print_warning("No DICOM series match the conversion filters, no DICOM series will be converted.")
+        return
+
+    print_info(f"Selected {len(conversions)} DICOM series with the conversion filters:")
+
+    for conversion in conversions:
+        print_info(
+            f"- {quote(conversion.dicom_series.description)}"
+            f" (series number: {conversion.dicom_series.number})"
+        )
+
+
 def print_found_unknown_dicom_series(dicom_bids_mapping: DicomBidsMapping, unknowns_arg: UnknownsArg):
     """
-    Print the unknown DICOM series found in the DICOM study to the user.
+    Print the unknown DICOM series found in the DICOM study to the user, or raise an error if the
+    converter is configured to abort on unknown DICOM series.
     """
 
     unknown_dicom_series_list = dicom_bids_mapping.unknown_dicom_series_list
@@ -81,9 +182,10 @@ def print_found_unknown_dicom_series(dicom_bids_mapping: DicomBidsMapping, unkno
 
     match unknowns_arg:
         case AbortUnknownsArg():
-            print_error_exit(
+            raise UnknownDicomSeriesError(
                 f"{dicom_series_count_string}, use option --skip-unknowns or --convert-unknowns to proceed"
-                f" nonetheless.\n{dicom_series_list_string}"
+                f" nonetheless.\n{dicom_series_list_string}",
+                [dicom_series.description for dicom_series in unknown_dicom_series_list],
             )
         case SkipUnknownsArg():
             print_warning(
@@ -116,8 +218,59 @@ def print_existing_bids_files(existing_file_paths: list[str], bids_data_type_pat
 
     if overwrite:
         print_warning(
-            f"Files already present in the BIDS directory, they will be overwritten.\nOverwritten BIDS files:"
-            f"{existing_files_string}"
+            f"Files already present in the BIDS directory, they will be overwritten if their content"
+            f" changed.\nExisting BIDS files:{existing_files_string}"
+        )
+    else:
+        raise ExistingBidsFilesError(f"Files already exist in directory:{existing_files_string}", existing_file_paths)
+
+
+def print_unchanged_bids_files(unchanged_file_paths: list[str], bids_data_type_path: str):
+    """
+    Print the paths of the existing BIDS files that were identical to the converted files and were
+    left untouched to the user if there are some.
+    """
+
+    if unchanged_file_paths == []:
+        return
+
+    unchanged_files_string = ""
+    for unchanged_file_path in unchanged_file_paths:
+        rel_file_path = os.path.relpath(unchanged_file_path, bids_data_type_path)
+        unchanged_files_string += (
+            "\n"
+            f"- {quote(rel_file_path)}"
         )
+
+    print_info(f"Left the following identical BIDS files untouched:{unchanged_files_string}")
+
+
+def print_startup_profile(startup_time: float | None, import_times: list[ModuleImportTime]):
+    """
+    Print the startup time of the converter and the import times of its stage modules to the user.
+    """
+
+    if startup_time is not None:
+        print(f"Startup time before argument parsing: {startup_time * 1000:.0f} ms")
     else:
-        raise Exception(f"Files already exist in directory:{existing_files_string}")
+        print("Startup time before argument parsing: unavailable on this system")
+
+    print(f"Imported {len(import_times)} stage modules:")
+
+    for import_time in import_times:
+        print(
+            f"- {import_time.name}"
+            f" ({import_time.duration * 1000:.1f} ms)"
+            f" ({import_time.modules_count} modules loaded)"
+        )
+
+    total_duration = sum(import_time.duration for import_time in import_times)
+    print(f"Total stage modules import time: {total_duration * 1000:.1f} ms")
+
+
+def print_timestamped(message: str):
+    """
+    Print a timestamped message of a long-running command to the user.
+    """
+
+    print(f"[{datetime.now().isoformat(sep=' ', timespec='seconds')}] {message}", flush=True)
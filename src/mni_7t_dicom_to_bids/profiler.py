@@ -0,0 +1,324 @@
+import json
+import platform
+import resource
+import socket
+import sys
+import threading
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from importlib.metadata import PackageNotFoundError, version
+
+from mni_7t_dicom_to_bids.dataclass import DicomSeriesInfo
+from mni_7t_dicom_to_bids.events import emit_event
+
+# Version of the profile report format, to increment when the format changes in an incompatible
+# way.
+profile_format_version = 1
+
+
+@dataclass
+class StageProfile:
+    """
+    Timing and resource usage of a stage of the MNI 7T DICOM to BIDS converter.
+    """
+
+    name: str
+    """
+    The name of the stage.
+    """
+
+    wall_time: float = 0.0
+    """
+    The wall time of the stage in seconds.
+    """
+
+    cpu_time: float = 0.0
+    """
+    The user and system CPU time of the converter process during the stage in seconds.
+    """
+
+    children_cpu_time: float = 0.0
+    """
+    The user and system CPU time of the child processes (such as `dcm2niix`) that terminated during
+    the stage in seconds.
+    """
+
+    bytes_read: int = 0
+    """
+    The number of bytes of the files read during the stage.
+    """
+
+    bytes_written: int = 0
+    """
+    The number of bytes of the files written during the stage.
+    """
+
+    files_count: int = 0
+    """
+    The number of files processed during the stage.
+    """
+
+    metadata_ops: int = 0
+    """
+    The number of metadata operations made on the output directories during the stage.
+    """
+
+    peak_rss: int = 0
+    """
+    The peak resident set size of the converter process at the end of the stage in bytes.
+    """
+
+    children_peak_rss: int = 0
+    """
+    The largest peak resident set size among the terminated child processes at the end of the
+    stage in bytes.
+    """
+
+
+@dataclass
+class SeriesProfile:
+    """
+    Timing and resource usage of the conversion of a DICOM series.
+    """
+
+    description: str
+    """
+    The DICOM series description.
+    """
+
+    number: int
+    """
+    The DICOM series number.
+    """
+
+    acquisition: str | None
+    """
+    The BIDS acquisition of the series, or `None` if the series is unknown.
+    """
+
+    files_count: int
+    """
+    The number of DICOM files of the series.
+    """
+
+    success: bool = False
+    """
+    Whether the series was successfully converted.
+    """
+
+    stages: list[StageProfile] = field(default_factory=list[StageProfile])
+    """
+    The stages of the conversion of the series.
+    """
+
+    @staticmethod
+    def from_dicom_series(dicom_series: DicomSeriesInfo, acquisition: str | None) -> 'SeriesProfile':
+        """
+        Create the profile of the conversion of a DICOM series, before any of its stages is run.
+        """
+
+        return SeriesProfile(
+            description = dicom_series.description,
+            number      = dicom_series.number,
+            acquisition = acquisition,
+            files_count = len(dicom_series.file_paths),
+        )
+
+    @property
+    def wall_time(self) -> float:
+        """
+        The wall time of the whole conversion of the series in seconds, which is only known once
+        the conversion is finished.
+        """
+
+        return sum(stage.wall_time for stage in self.stages if stage.name == 'total')
+
+
+@dataclass
+class _ResourceSnapshot:
+    """
+    Resource usage of the converter process at a given time.
+    """
+
+    wall_time: float
+    cpu_time: float
+    children_cpu_time: float
+    peak_rss: int
+    children_peak_rss: int
+
+
+class Profiler:
+    """
+    Recorder of the timing and resource usage of the stages of the MNI 7T DICOM to BIDS converter,
+    both for the whole session and for each converted DICOM series.
+
+    The DICOM series being profiled is tracked per thread, so that the stages of a DICOM series that
+    run in a background thread of the conversion pipeline are recorded in that DICOM series. The CPU
+    times and peak resident set sizes are those of the whole process, so they include the work of
+    the other threads when stages overlap.
+    """
+
+    def __init__(self):
+        self.start_date = datetime.now()
+        self.start = _get_resource_snapshot()
+        self.stage_profiles: list[StageProfile] = []
+        self.series_profiles: list[SeriesProfile] = []
+        self._thread_state = threading.local()
+
+    @contextmanager
+    def stage(self, name: str) -> Generator[StageProfile]:
+        """
+        Profile a stage of the converter. The stage is recorded in the DICOM series being profiled
+        if there is one, or in the session stages otherwise. The yielded stage profile can be used
+        to record the bytes and files processed during the stage.
+        """
+
+        stage = StageProfile(name)
+        current_series = self._get_current_series()
+        series_number = current_series.number if current_series is not None else None
+        emit_event('stage_start', stage=name, series=series_number)
+        start = _get_resource_snapshot()
+        try:
+            yield stage
+        finally:
+            end = _get_resource_snapshot()
+            stage.wall_time         = end.wall_time - start.wall_time
+            stage.cpu_time          = end.cpu_time - start.cpu_time
+            stage.children_cpu_time = end.children_cpu_time - start.children_cpu_time
+            stage.peak_rss          = end.peak_rss
+            stage.children_peak_rss = end.children_peak_rss
+
+            if current_series is not None:
+                current_series.stages.append(stage)
+            else:
+                self.stage_profiles.append(stage)
+
+            emit_event(
+                'stage_end',
+                stage       = name,
+                series      = series_number,
+                wall_time   = stage.wall_time,
+                files_count = stage.files_count,
+            )
+
+    @contextmanager
+    def series(self, series: SeriesProfile) -> Generator[SeriesProfile]:
+        """
+        Profile the conversion of a DICOM series, the stages profiled within this context are
+        recorded in that DICOM series. The caller sets the success of the conversion in the yielded
+        series profile.
+        """
+
+        emit_event(
+            'series_start',
+            description = series.description,
+            number      = series.number,
+            acquisition = series.acquisition,
+            files_count = series.files_count,
+        )
+
+        try:
+            with self.bind_series(series), self.stage('total'):
+                yield series
+        finally:
+            self.series_profiles.append(series)
+
+            emit_event(
+                'series_end',
+                description = series.description,
+                number      = series.number,
+                acquisition = series.acquisition,
+                success     = series.success,
+                wall_time   = series.wall_time,
+            )
+
+    @contextmanager
+    def bind_series(self, series: SeriesProfile) -> Generator[None]:
+        """
+        Record the stages profiled by the current thread within this context in a DICOM series,
+        which is used to profile the stages of a DICOM series that run in a background thread.
+        """
+
+        previous_series = self._get_current_series()
+        self._thread_state.series = series
+        try:
+            yield
+        finally:
+            self._thread_state.series = previous_series
+
+    def _get_current_series(self) -> SeriesProfile | None:
+        """
+        Get the DICOM series being profiled by the current thread if there is one.
+        """
+
+        return getattr(self._thread_state, 'series', None)
+
+    def write_report(self, file_path: str, startup_time: float | None):
+        """
+        Write the profile report of the converter as a JSON file.
+        """
+
+        end = _get_resource_snapshot()
+
+        report = {
+            'format_version'    : profile_format_version,
+            'converter_version' : _get_converter_version(),
+            'python_version'    : platform.python_version(),
+            'hostname'          : socket.gethostname(),
+            'start_date'        : self.start_date.isoformat(),
+            'startup_time'      : startup_time,
+            'wall_time'         : end.wall_time - self.start.wall_time,
+            'cpu_time'          : end.cpu_time - self.start.cpu_time,
+            'children_cpu_time' : end.children_cpu_time - self.start.children_cpu_time,
+            'peak_rss'          : end.peak_rss,
+            'children_peak_rss' : end.children_peak_rss,
+            'stages'            : [asdict(stage) for stage in self.stage_profiles],
+            'series'            : [asdict(series) for series in self.series_profiles],
+        }
+
+        with open(file_path, 'w') as file:
+            json.dump(report, file, indent=4)
+
+
+def _get_resource_snapshot() -> _ResourceSnapshot:
+    """
+    Get the current resource usage of the converter process and its terminated children.
+    """
+
+    self_usage     = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    return _ResourceSnapshot(
+        wall_time         = time.perf_counter(),
+        cpu_time          = self_usage.ru_utime + self_usage.ru_stime,
+        children_cpu_time = children_usage.ru_utime + children_usage.ru_stime,
+        peak_rss          = _get_rss_bytes(self_usage.ru_maxrss),
+        children_peak_rss = _get_rss_bytes(children_usage.ru_maxrss),
+    )
+
+
+def _get_rss_bytes(max_rss: int) -> int:
+    """
+    Convert a maximum resident set size returned by `getrusage` to bytes, which is given in bytes
+    on macOS and in kibibytes on other systems.
+    """
+
+    if sys.platform == 'darwin':
+        return max_rss
+
+    return max_rss * 1024
+
+
+def _get_converter_version() -> str | None:
+    """
+    Get the version of the installed MNI 7T DICOM to BIDS converter, or `None` if the package
+    metadata is not available (which is the case in a compiled executable).
+    """
+
+    try:
+        return version('mni_7t_dicom_to_bids')
+    except PackageNotFoundError:
+        return None
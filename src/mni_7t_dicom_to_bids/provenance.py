@@ -0,0 +1,361 @@
+"""
+Provenance records of the BIDS files written by the MNI 7T DICOM to BIDS converter, which link each
+DICOM series of a BIDS session to the BIDS mapping entry used to name it and to its output files.
+These records allow the migration of the existing BIDS files when the BIDS mappings change, by
+renaming the files instead of converting the DICOM series again.
+
+The records of a BIDS session are stored in a JSON file in the `sourcedata` directory of the BIDS
+dataset, which is ignored by the BIDS validator.
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, cast
+
+from bic_util.print import print_warning
+
+from mni_7t_dicom_to_bids.convert_dicom_series import get_bids_acquisition_file_name
+from mni_7t_dicom_to_bids.dataclass import BidsSessionInfo, DicomSeriesInfo
+from mni_7t_dicom_to_bids.errors import ConversionError
+from mni_7t_dicom_to_bids.map_dicom_series import find_bids_dicom_mapping
+from mni_7t_dicom_to_bids.result import SeriesResult
+
+# Version of the format of the provenance files.
+provenance_format_version = 1
+
+# Directory of the provenance files in the BIDS dataset.
+provenance_dir_rel_path = os.path.join('sourcedata', 'mni7t_dcm2bids')
+
+
+@dataclass
+class OutputProvenance:
+    """
+    The provenance of an output file of a DICOM series.
+    """
+
+    path: str
+    """
+    The path of the output file relative to the BIDS session directory.
+    """
+
+    source_name: str | None
+    """
+    The name given to the output file by `dcm2niix` or the native writer before the post processing,
+    if it is known.
+    """
+
+
+@dataclass
+class SeriesProvenance:
+    """
+    The provenance of the BIDS files of a DICOM series.
+    """
+
+    description: str
+    """
+    The DICOM series description.
+    """
+
+    number: int
+    """
+    The DICOM series number.
+    """
+
+    series_instance_uids: list[str]
+    """
+    The DICOM series instance UIDs of the DICOM files of the series.
+    """
+
+    data_type: str | None
+    """
+    The BIDS data type of the DICOM series, or `None` if the DICOM series was not mapped to a BIDS
+    acquisition.
+    """
+
+    mapping_name: str | None = None
+    """
+    The BIDS file name of the mapping entry of the DICOM series.
+    """
+
+    mapping_pattern: str | None = None
+    """
+    The DICOM series description pattern of the mapping entry that matched the DICOM series.
+    """
+
+    run_number: int | None = None
+    """
+    The BIDS run number of the DICOM series if its BIDS acquisition had several DICOM series.
+    """
+
+    base_name: str | None = None
+    """
+    The BIDS file name given to `dcm2niix` or the native writer for the DICOM series.
+    """
+
+    converted_at: str | None = None
+    """
+    The date and time of the conversion of the DICOM series in ISO format.
+    """
+
+    outputs: list[OutputProvenance] = field(default_factory=list[OutputProvenance])
+    """
+    The output files of the DICOM series, which are empty if the DICOM series was not converted.
+    """
+
+    deleted_source_names: list[str] = field(default_factory=list[str])
+    """
+    The names given by `dcm2niix` or the native writer to the files deleted by the post processing.
+    """
+
+    @property
+    def key(self) -> tuple[str, int]:
+        """
+        The DICOM series description and number, which identify the DICOM series in a session.
+        """
+
+        return self.description, self.number
+
+
+@dataclass
+class SessionProvenance:
+    """
+    The provenance of the BIDS files of a BIDS session.
+    """
+
+    subject: str
+    """
+    The BIDS subject label.
+    """
+
+    session: str
+    """
+    The BIDS session label.
+    """
+
+    series: list[SeriesProvenance] = field(default_factory=list[SeriesProvenance])
+    """
+    The provenance records of the DICOM series of the session, sorted by description and number.
+    """
+
+    @property
+    def bids_session(self) -> BidsSessionInfo:
+        """
+        The BIDS session of these records.
+        """
+
+        return BidsSessionInfo(
+            subject = self.subject,
+            session = self.session,
+        )
+
+
+def get_provenance_file_path(bids_dataset_path: str, bids_session: BidsSessionInfo) -> str:
+    """
+    Get the path of the provenance file of a BIDS session.
+    """
+
+    return os.path.join(
+        bids_dataset_path,
+        provenance_dir_rel_path,
+        f'sub-{bids_session.subject}_ses-{bids_session.session}_provenance.json',
+    )
+
+
+def get_bids_session_dir_path(bids_dataset_path: str, bids_session: BidsSessionInfo) -> str:
+    """
+    Get the path of the directory of a BIDS session.
+    """
+
+    return os.path.join(bids_dataset_path, f'sub-{bids_session.subject}', f'ses-{bids_session.session}')
+
+
+def list_provenance_files(bids_dataset_path: str) -> list[str]:
+    """
+    List the paths of the provenance files of a BIDS dataset.
+    """
+
+    provenance_dir_path = os.path.join(bids_dataset_path, provenance_dir_rel_path)
+    if not os.path.isdir(provenance_dir_path):
+        return []
+
+    return [
+        os.path.join(provenance_dir_path, file_name)
+        for file_name in sorted(os.listdir(provenance_dir_path))
+        if file_name.endswith('_provenance.json')
+    ]
+
+
+def read_provenance_file(provenance_file_path: str) -> SessionProvenance:
+    """
+    Read a provenance file, and raise a conversion error if it cannot be read or is malformed.
+    """
+
+    try:
+        with open(provenance_file_path) as provenance_file:
+            data = json.load(provenance_file)
+    except (OSError, json.JSONDecodeError) as error:
+        raise ConversionError(f"Cannot read provenance file '{provenance_file_path}': {error}")
+
+    if not isinstance(data, dict):
+        raise ConversionError(f"Provenance file '{provenance_file_path}' is not a JSON object.")
+
+    data = cast(dict[str, Any], data)
+
+    if data.get('format_version') != provenance_format_version:
+        raise ConversionError(
+            f"Provenance file '{provenance_file_path}' has unsupported format version"
+            f" {data.get('format_version')}."
+        )
+
+    # The file may have been edited by hand, so its records are only checked by the constructors.
+    try:
+        series_data_list: list[dict[str, Any]] = data['series']
+        return SessionProvenance(
+            subject = data['subject'],
+            session = data['session'],
+            series  = [get_series_provenance_from_data(series_data) for series_data in series_data_list],
+        )
+    except (KeyError, TypeError, AttributeError) as error:
+        raise ConversionError(f"Provenance file '{provenance_file_path}' is malformed: {error!r}.")
+
+
+def get_series_provenance_from_data(series_data: dict[str, Any]) -> SeriesProvenance:
+    """
+    Get the provenance of a DICOM series from its record in a provenance file. Raise a key, type or
+    attribute error if the record is malformed.
+    """
+
+    output_data_list: list[dict[str, Any]] = series_data['outputs']
+    fields: dict[str, Any] = {
+        **series_data,
+        'outputs': [OutputProvenance(**output_data) for output_data in output_data_list],
+    }
+
+    return SeriesProvenance(**fields)
+
+
+def write_provenance_file(bids_dataset_path: str, provenance: SessionProvenance):
+    """
+    Write the provenance file of a BIDS session. The file is replaced atomically so that an
+    interrupted write does not lose the previous records.
+    """
+
+    provenance_file_path = get_provenance_file_path(bids_dataset_path, provenance.bids_session)
+    os.makedirs(os.path.dirname(provenance_file_path), exist_ok=True)
+
+    data = {
+        'format_version': provenance_format_version,
+        **asdict(provenance),
+    }
+
+    tmp_provenance_file_path = f'{provenance_file_path}.tmp'
+    with open(tmp_provenance_file_path, 'w') as provenance_file:
+        json.dump(data, provenance_file, indent=4)
+
+    os.replace(tmp_provenance_file_path, provenance_file_path)
+
+
+def record_session_provenance(
+    bids_dataset_path: str,
+    bids_session: BidsSessionInfo,
+    dicom_series_list: list[DicomSeriesInfo],
+    series_results: list[SeriesResult],
+):
+    """
+    Record the provenance of the DICOM series of a converted BIDS session, merging these records
+    with the previous records of the session. The DICOM series whose conversion failed or that were
+    not converted keep their previous record if it has output files. The records are not written if
+    the previous records cannot be read, so that they are not lost.
+    """
+
+    provenance_file_path = get_provenance_file_path(bids_dataset_path, bids_session)
+    if os.path.exists(provenance_file_path):
+        try:
+            previous_provenance = read_provenance_file(provenance_file_path)
+        except ConversionError as error:
+            print_warning(f"{error} The provenance of the converted DICOM series is not recorded.")
+            return
+    else:
+        previous_provenance = SessionProvenance(bids_session.subject, bids_session.session)
+
+    records = {series.key: series for series in previous_provenance.series}
+
+    series_results_dict = {
+        (series_result.dicom_series.description, series_result.dicom_series.number): series_result
+        for series_result in series_results
+    }
+
+    session_dir_path = get_bids_session_dir_path(bids_dataset_path, bids_session)
+    converted_at = datetime.now().isoformat(timespec='seconds')
+
+    for dicom_series in dicom_series_list:
+        key = (dicom_series.description, dicom_series.number)
+        series_result = series_results_dict.get(key)
+        if series_result is not None and series_result.success and series_result.acquisition is not None:
+            records[key] = get_series_provenance(bids_session, series_result, session_dir_path, converted_at)
+        elif key not in records or records[key].outputs == []:
+            records[key] = SeriesProvenance(
+                description          = dicom_series.description,
+                number               = dicom_series.number,
+                series_instance_uids = dicom_series.series_instance_uids,
+                data_type            = None,
+            )
+
+    provenance = SessionProvenance(
+        subject = bids_session.subject,
+        session = bids_session.session,
+        series  = [records[key] for key in sorted(records)],
+    )
+
+    write_provenance_file(bids_dataset_path, provenance)
+
+
+def get_series_provenance(
+    bids_session: BidsSessionInfo,
+    series_result: SeriesResult,
+    session_dir_path: str,
+    converted_at: str,
+) -> SeriesProvenance:
+    """
+    Get the provenance record of a successfully converted DICOM series.
+    """
+
+    dicom_series = series_result.dicom_series
+
+    bids_dicom_mapping = find_bids_dicom_mapping(dicom_series.description)
+    assert bids_dicom_mapping is not None
+    bids_acquisition, mapping_pattern = bids_dicom_mapping
+
+    source_names: dict[str, str] = {}
+    deleted_source_names: list[str] = []
+    for source_name, file_name in series_result.post_processed_file_names.items():
+        if file_name is not None:
+            source_names[file_name] = source_name
+        else:
+            deleted_source_names.append(source_name)
+
+    outputs = [
+        OutputProvenance(
+            path        = os.path.relpath(output_file_path, session_dir_path),
+            source_name = source_names.get(os.path.basename(output_file_path)),
+        )
+        for output_file_path in sorted(series_result.output_file_paths)
+    ]
+
+    return SeriesProvenance(
+        description          = dicom_series.description,
+        number               = dicom_series.number,
+        series_instance_uids = dicom_series.series_instance_uids,
+        data_type            = bids_acquisition.scan_type,
+        mapping_name         = bids_acquisition.file_name,
+        mapping_pattern      = mapping_pattern,
+        run_number           = series_result.run_number,
+        base_name            = get_bids_acquisition_file_name(
+            bids_session, bids_acquisition.file_name, series_result.run_number
+        ),
+        converted_at         = converted_at,
+        outputs              = outputs,
+        deleted_source_names = sorted(deleted_source_names),
+    )
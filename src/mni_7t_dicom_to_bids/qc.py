@@ -0,0 +1,448 @@
+"""
+Post-conversion quality checks of the MNI 7T DICOM to BIDS converter. These checks detect the
+conversions that succeeded with wrong outputs, such as truncated runs or diffusion volumes that do
+not match their `bval` and `bvec` files, from the NIfTI headers only: the first bytes of each NIfTI
+file are decompressed, and the size of the image data is checked against the size stored at the
+end of the gzip file, so that the image data is never loaded.
+
+The results of the checks of a BIDS session are written to a QC summary file next to its provenance
+file in the `sourcedata` directory of the BIDS dataset.
+"""
+
+import gzip
+import json
+import math
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, cast
+
+from bic_util.print import print_warning
+
+from mni_7t_dicom_to_bids.dataclass import BidsSessionInfo
+from mni_7t_dicom_to_bids.events import print_info
+from mni_7t_dicom_to_bids.provenance import provenance_dir_rel_path
+from mni_7t_dicom_to_bids.result import SeriesResult
+
+# Size of a NIfTI-1 header followed by its four extension bytes.
+nifti_header_size = 352
+
+# Extensions of the NIfTI files checked after the conversion.
+nifti_extensions = ('.nii', '.nii.gz')
+
+# Maximum number of NIfTI files checked at the same time.
+qc_max_workers = 8
+
+
+@dataclass
+class NiftiHeaderInfo:
+    """
+    The fields of a NIfTI-1 header used by the quality checks.
+    """
+
+    shape: list[int]
+    """
+    The sizes of the dimensions of the image.
+    """
+
+    voxel_sizes: list[float]
+    """
+    The sizes of the voxels along the dimensions of the image.
+    """
+
+    bits_per_voxel: int
+    """
+    The number of bits of each voxel value.
+    """
+
+    data_offset: int
+    """
+    The offset of the image data in the NIfTI file.
+    """
+
+    @property
+    def slices_count(self) -> int:
+        """
+        The number of slices of each volume of the image.
+        """
+
+        return self.shape[2] if len(self.shape) >= 3 else 1
+
+    @property
+    def volumes_count(self) -> int:
+        """
+        The number of volumes of the image.
+        """
+
+        return self.shape[3] if len(self.shape) >= 4 else 1
+
+    @property
+    def file_size(self) -> int:
+        """
+        The size of the uncompressed NIfTI file described by this header.
+        """
+
+        return self.data_offset + math.prod(self.shape) * self.bits_per_voxel // 8
+
+
+@dataclass
+class FileQc:
+    """
+    The quality checks of a NIfTI file.
+    """
+
+    path: str
+    """
+    The path of the NIfTI file.
+    """
+
+    shape: list[int] | None = None
+    """
+    The sizes of the dimensions of the image, or `None` if the header cannot be read.
+    """
+
+    voxel_sizes: list[float] | None = None
+    """
+    The sizes of the voxels of the image, or `None` if the header cannot be read.
+    """
+
+    issues: list[str] = field(default_factory=list[str])
+    """
+    The issues found in the NIfTI file and its sidecar files.
+    """
+
+
+@dataclass
+class SeriesQc:
+    """
+    The quality checks of the NIfTI files of a converted DICOM series.
+    """
+
+    description: str
+    """
+    The DICOM series description.
+    """
+
+    number: int
+    """
+    The DICOM series number.
+    """
+
+    acquisition: str | None
+    """
+    The BIDS acquisition of the DICOM series, or `None` if the DICOM series is unknown.
+    """
+
+    dicom_files_count: int
+    """
+    The number of DICOM files of the DICOM series.
+    """
+
+    files: list[FileQc] = field(default_factory=list[FileQc])
+    """
+    The quality checks of the NIfTI files of the DICOM series.
+    """
+
+    issues: list[str] = field(default_factory=list[str])
+    """
+    The issues found across the NIfTI files of the DICOM series.
+    """
+
+    @property
+    def all_issues(self) -> list[str]:
+        """
+        The issues of the DICOM series and of its NIfTI files, prefixed by the NIfTI file name.
+        """
+
+        return self.issues + [
+            f'{os.path.basename(file_qc.path)}: {issue}' for file_qc in self.files for issue in file_qc.issues
+        ]
+
+
+def read_nifti_header(nifti_file_path: str) -> NiftiHeaderInfo:
+    """
+    Read the header of a NIfTI-1 file, only decompressing the beginning of the compressed files.
+    Raise an OS or value error if the header cannot be read.
+    """
+
+    if nifti_file_path.endswith('.gz'):
+        with gzip.open(nifti_file_path, 'rb') as nifti_file:
+            header = nifti_file.read(nifti_header_size)
+    else:
+        with open(nifti_file_path, 'rb') as nifti_file:
+            header = nifti_file.read(nifti_header_size)
+
+    if len(header) < 348:
+        raise ValueError("the NIfTI header is truncated")
+
+    for byte_order in '<>':
+        if struct.unpack_from(f'{byte_order}i', header, 0)[0] == 348:
+            break
+    else:
+        raise ValueError("the file is not a NIfTI-1 file")
+
+    if header[344:348] not in (b'n+1\0', b'ni1\0'):
+        raise ValueError("the NIfTI header has an invalid magic string")
+
+    dims = struct.unpack_from(f'{byte_order}8h', header, 40)
+    bits_per_voxel = struct.unpack_from(f'{byte_order}h', header, 72)[0]
+    pixdims = struct.unpack_from(f'{byte_order}8f', header, 76)
+    data_offset = struct.unpack_from(f'{byte_order}f', header, 108)[0]
+
+    if not 1 <= dims[0] <= 7:
+        raise ValueError(f"the NIfTI header has an invalid number of dimensions {dims[0]}")
+
+    return NiftiHeaderInfo(
+        shape          = list(dims[1:dims[0] + 1]),
+        voxel_sizes    = list(pixdims[1:dims[0] + 1]),
+        bits_per_voxel = bits_per_voxel,
+        data_offset    = int(data_offset),
+    )
+
+
+def get_gzip_uncompressed_size(file_path: str) -> int:
+    """
+    Get the uncompressed size of a gzip file modulo 2^32, which is stored at the end of the file.
+    """
+
+    with open(file_path, 'rb') as gzip_file:
+        gzip_file.seek(-4, os.SEEK_END)
+        return struct.unpack('<I', gzip_file.read(4))[0]
+
+
+def check_nifti_file(nifti_file_path: str) -> tuple[FileQc, NiftiHeaderInfo | None]:
+    """
+    Check the header, the data size and the sidecar files of a NIfTI file, and return the checks
+    with the NIfTI header if it can be read.
+    """
+
+    file_qc = FileQc(nifti_file_path)
+
+    try:
+        header = read_nifti_header(nifti_file_path)
+    except (OSError, EOFError, ValueError, gzip.BadGzipFile) as error:
+        file_qc.issues.append(f"Cannot read the NIfTI header: {error}.")
+        return file_qc, None
+
+    file_qc.shape = header.shape
+    file_qc.voxel_sizes = [round(voxel_size, 6) for voxel_size in header.voxel_sizes]
+
+    if any(dim_size <= 0 for dim_size in header.shape):
+        file_qc.issues.append(f"Invalid image dimensions {header.shape}.")
+        return file_qc, header
+
+    if any(not math.isfinite(voxel_size) or voxel_size <= 0 for voxel_size in header.voxel_sizes[:3]):
+        file_qc.issues.append(f"Invalid voxel sizes {header.voxel_sizes[:3]}.")
+
+    try:
+        if nifti_file_path.endswith('.gz'):
+            data_size = get_gzip_uncompressed_size(nifti_file_path)
+            expected_data_size = header.file_size % 2 ** 32
+        else:
+            data_size = os.path.getsize(nifti_file_path)
+            expected_data_size = header.file_size
+
+        if data_size != expected_data_size:
+            file_qc.issues.append(
+                f"The image data has {data_size} bytes instead of the {expected_data_size} bytes described by its"
+                " header, the file may be truncated."
+            )
+    except OSError as error:
+        file_qc.issues.append(f"Cannot read the size of the image data: {error}.")
+
+    base_path = nifti_file_path.removesuffix('.gz').removesuffix('.nii')
+    file_qc.issues.extend(check_gradient_files(base_path, header.volumes_count))
+    file_qc.issues.extend(check_sidecar_file(base_path + '.json', header))
+
+    return file_qc, header
+
+
+def check_gradient_files(base_path: str, volumes_count: int) -> list[str]:
+    """
+    Check that the `bval` and `bvec` files of a NIfTI file, if they exist, have one value for each
+    volume of the image.
+    """
+
+    issues: list[str] = []
+
+    for extension, rows_count in (('.bval', 1), ('.bvec', 3)):
+        try:
+            with open(base_path + extension) as gradient_file:
+                rows = [line.split() for line in gradient_file.read().splitlines() if line.strip() != '']
+        except FileNotFoundError:
+            continue
+        except OSError as error:
+            issues.append(f"Cannot read the {extension} file: {error}.")
+            continue
+
+        if len(rows) != rows_count or any(len(row) != volumes_count for row in rows):
+            issues.append(
+                f"The {extension} file does not have {rows_count} rows of {volumes_count} values, one for each volume"
+                " of the image."
+            )
+
+    return issues
+
+
+def check_sidecar_file(sidecar_file_path: str, header: NiftiHeaderInfo) -> list[str]:
+    """
+    Check that the JSON sidecar file of a NIfTI file, if it exists, can be read and has one slice
+    time for each slice of the image.
+    """
+
+    try:
+        with open(sidecar_file_path) as sidecar_file:
+            sidecar: dict[str, Any] = json.load(sidecar_file)
+    except FileNotFoundError:
+        return []
+    except (OSError, json.JSONDecodeError) as error:
+        return [f"Cannot read the JSON sidecar file: {error}."]
+
+    slice_timing = sidecar.get('SliceTiming')
+    if not isinstance(slice_timing, list):
+        return []
+
+    slice_times_count = len(cast(list[Any], slice_timing))
+    if slice_times_count != header.slices_count:
+        return [
+            f"The JSON sidecar file has {slice_times_count} slice times for an image with {header.slices_count}"
+            " slices."
+        ]
+
+    return []
+
+
+def check_dicom_instances_count(dicom_files_count: int, headers: list[NiftiHeaderInfo]) -> list[str]:
+    """
+    Check that the number of DICOM files of a DICOM series matches the number of volumes of its
+    NIfTI files, with either one DICOM file per volume (mosaic or multi-frame files) or one DICOM
+    file per slice. The DICOM series with a single DICOM file are enhanced multi-frame DICOM series
+    and are not checked.
+    """
+
+    if dicom_files_count == 1 or headers == []:
+        return []
+
+    volumes_count = sum(header.volumes_count for header in headers)
+    slices_count = sum(header.volumes_count * header.slices_count for header in headers)
+
+    if dicom_files_count in (volumes_count, slices_count):
+        return []
+
+    return [
+        f"The DICOM series has {dicom_files_count} DICOM files, but its NIfTI files have {volumes_count} volumes"
+        f" and {slices_count} slices."
+    ]
+
+
+def check_series_result(series_result: SeriesResult, executor: ThreadPoolExecutor) -> SeriesQc:
+    """
+    Check the NIfTI files of a converted DICOM series, the NIfTI files being checked in parallel.
+    """
+
+    dicom_series = series_result.dicom_series
+
+    series_qc = SeriesQc(
+        description       = dicom_series.description,
+        number            = dicom_series.number,
+        acquisition       = series_result.acquisition,
+        dicom_files_count = len(dicom_series.file_paths),
+    )
+
+    nifti_file_paths = sorted(
+        output_file_path
+        for output_file_path in series_result.output_file_paths
+        if output_file_path.endswith(nifti_extensions)
+    )
+
+    headers: list[NiftiHeaderInfo] = []
+    for file_qc, header in executor.map(check_nifti_file, nifti_file_paths):
+        series_qc.files.append(file_qc)
+        if header is not None:
+            headers.append(header)
+
+    series_qc.issues.extend(check_dicom_instances_count(series_qc.dicom_files_count, headers))
+
+    return series_qc
+
+
+def get_qc_file_path(bids_dataset_path: str, bids_session: BidsSessionInfo) -> str:
+    """
+    Get the path of the QC summary file of a BIDS session.
+    """
+
+    return os.path.join(
+        bids_dataset_path,
+        provenance_dir_rel_path,
+        f'sub-{bids_session.subject}_ses-{bids_session.session}_qc.json',
+    )
+
+
+def check_session_outputs(
+    bids_dataset_path: str,
+    bids_session: BidsSessionInfo,
+    series_results: list[SeriesResult],
+) -> list[SeriesQc]:
+    """
+    Check the NIfTI files of the successfully converted DICOM series of a BIDS session, print the
+    issues found, record them in the results of the DICOM series, and write the QC summary file of
+    the session.
+    """
+
+    with ThreadPoolExecutor(max_workers=qc_max_workers, thread_name_prefix='qc') as executor:
+        series_qcs = [
+            (series_result, check_series_result(series_result, executor))
+            for series_result in series_results
+            if series_result.success
+        ]
+
+    for series_result, series_qc in series_qcs:
+        series_result.qc_issues = series_qc.all_issues
+        if series_result.qc_issues != []:
+            print_warning(
+                f"Found {len(series_result.qc_issues)} QC issues in the NIfTI files of DICOM series"
+                f" '{series_qc.description}' (series number: {series_qc.number}):\n"
+                + '\n'.join(f'- {issue}' for issue in series_result.qc_issues)
+            )
+
+    files_count = sum(len(series_qc.files) for _, series_qc in series_qcs)
+    issues_count = sum(len(series_result.qc_issues) for series_result, _ in series_qcs)
+    print_info(f"Checked {files_count} NIfTI files, found {issues_count} QC issues.")
+
+    write_qc_file(bids_dataset_path, bids_session, [series_qc for _, series_qc in series_qcs])
+
+    return [series_qc for _, series_qc in series_qcs]
+
+
+def write_qc_file(bids_dataset_path: str, bids_session: BidsSessionInfo, series_qcs: list[SeriesQc]):
+    """
+    Write the QC summary file of a BIDS session. Print a warning if the file cannot be written, as
+    the summary is not required by the conversion.
+    """
+
+    qc_file_path = get_qc_file_path(bids_dataset_path, bids_session)
+
+    series_data_list = [asdict(series_qc) for series_qc in series_qcs]
+
+    # Write the NIfTI file paths relative to the BIDS dataset so that the summary can be moved with it.
+    for series_data in series_data_list:
+        file_data_list: list[dict[str, Any]] = series_data['files']
+        for file_data in file_data_list:
+            file_data['path'] = os.path.relpath(file_data['path'], bids_dataset_path)
+
+    data = {
+        'subject':      bids_session.subject,
+        'session':      bids_session.session,
+        'checked_at':   datetime.now().isoformat(timespec='seconds'),
+        'issues_count': sum(len(series_qc.all_issues) for series_qc in series_qcs),
+        'series':       series_data_list,
+    }
+
+    try:
+        os.makedirs(os.path.dirname(qc_file_path), exist_ok=True)
+        with open(qc_file_path, 'w') as qc_file:
+            json.dump(data, qc_file, indent=4)
+    except OSError as error:
+        print_warning(f"Cannot write the QC summary file '{qc_file_path}': {error}")
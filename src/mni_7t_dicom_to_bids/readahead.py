@@ -0,0 +1,42 @@
+"""
+Readahead hints for the DICOM files of the DICOM series that are about to be converted, which ask
+the kernel to read these files in the page cache in the background, so that they are read from
+memory when they are staged or converted. The hints are bounded in size so that prefetching a large
+DICOM series does not evict the files of the DICOM series being converted from the page cache.
+"""
+
+import os
+from collections.abc import Sequence
+
+
+def advise_readahead(file_paths: Sequence[str], limit_bytes: int) -> int:
+    """
+    Ask the kernel to read files in the page cache asynchronously, up to a total number of bytes,
+    and return the number of bytes covered by the hints. The hints are ignored on the systems that
+    do not support `posix_fadvise`.
+    """
+
+    if not hasattr(os, 'posix_fadvise'):
+        return 0
+
+    hinted_bytes = 0
+
+    for file_path in file_paths:
+        if hinted_bytes >= limit_bytes:
+            break
+
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            continue
+
+        try:
+            length = min(os.fstat(fd).st_size, limit_bytes - hinted_bytes)
+            os.posix_fadvise(fd, 0, length, os.POSIX_FADV_WILLNEED)
+            hinted_bytes += length
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    return hinted_bytes
@@ -0,0 +1,364 @@
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from bic_util.print import print_warning
+from pynetdicom import AE, AllStoragePresentationContexts, evt
+from pynetdicom.association import Association
+from pynetdicom.events import Event
+from pynetdicom.sop_class import Verification  # type: ignore
+
+from mni_7t_dicom_to_bids.args import ReceiveArgs, process_args
+from mni_7t_dicom_to_bids.dicom_header import get_dicom_file_header
+from mni_7t_dicom_to_bids.print import print_timestamped
+from mni_7t_dicom_to_bids.sort_dicom_series import DicomSeriesSorter
+
+# DIMSE status of a successful C-STORE request.
+status_success = 0x0000
+
+# DIMSE status of a C-STORE request whose dataset cannot be understood.
+status_cannot_understand = 0xC000
+
+# DIMSE status of a C-STORE request that failed because of a lack of resources.
+status_out_of_resources = 0xA700
+
+
+@dataclass
+class ReceivedStudy:
+    """
+    A DICOM study received in one or several associations, whose DICOM files are written to the
+    spool directory and grouped by DICOM series as they arrive.
+    """
+
+    study_instance_uid: str
+    """
+    The DICOM study instance UID.
+    """
+
+    spool_dir_path: str
+    """
+    The path of the spool directory of the DICOM study.
+    """
+
+    subject: str
+    """
+    The BIDS subject label of the DICOM study, which is empty if it could not be determined.
+    """
+
+    session: str
+    """
+    The BIDS session label of the DICOM study, which is empty if it could not be determined.
+    """
+
+    sorter: DicomSeriesSorter
+    """
+    The sorter of the received DICOM files.
+    """
+
+    files_count: int = 0
+    """
+    The number of received DICOM files.
+    """
+
+    associations_count: int = 0
+    """
+    The number of open associations in which DICOM files of the study were received.
+    """
+
+    last_received_at: float = 0.0
+    """
+    The monotonic time at which a DICOM file of the study was last received or at which one of its
+    associations was last released.
+    """
+
+    aborted: bool = False
+    """
+    Whether an association in which DICOM files of the study were received was aborted, in which
+    case the study may be incomplete and is not converted.
+    """
+
+
+class DicomReceiver:
+    """
+    DICOM storage SCP that writes the received DICOM files to a spool directory and groups them by
+    DICOM study and DICOM series in memory. The DICOM studies are accumulated across associations,
+    as some senders transfer each DICOM series in its own association. Once all the associations of
+    a DICOM study are released and no DICOM file of this study has been received for the stable
+    time, the study is converted to BIDS from its in-memory DICOM series, without rescanning the
+    spool directory. The conversions are run one at a time in a worker thread so that the
+    associations are not blocked.
+    """
+
+    def __init__(self, args: ReceiveArgs):
+        self.args = args
+        self._studies: dict[str, ReceivedStudy] = {}
+        self._association_studies: dict[Association, set[str]] = {}
+        self._condition = threading.Condition()
+        self._converted_study_instance_uids: set[str] = set()
+        self._stopping = False
+        self._stop_requested = threading.Event()
+
+    def serve(self):
+        """
+        Receive DICOM files until the process is interrupted or the receiver is stopped, and then
+        wait for the queued conversions to finish.
+        """
+
+        ae = AE(ae_title=self.args.ae_title)
+        ae.supported_contexts = AllStoragePresentationContexts
+        ae.add_supported_context(Verification)
+
+        worker = threading.Thread(target=self._run_conversions, name='conversions')
+        worker.start()
+
+        print_timestamped(
+            f"Receiving DICOM files as '{self.args.ae_title}' on {self.args.address}:{self.args.port}..."
+        )
+
+        # The server runs in its own thread, and is shut down once the receiver is stopped or the
+        # process is interrupted.
+        try:
+            ae.start_server(
+                (self.args.address, self.args.port),
+                block=False,
+                evt_handlers=[
+                    (evt.EVT_C_STORE, self._handle_store),
+                    (evt.EVT_RELEASED, self._handle_released),
+                    (evt.EVT_ABORTED, self._handle_aborted),
+                ],
+            )
+
+            self._stop_requested.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            ae.shutdown()
+            print_timestamped("Receiver stopped, waiting for the received DICOM studies to be converted...")
+            with self._condition:
+                self._stopping = True
+                self._condition.notify_all()
+
+            worker.join()
+
+    def stop(self):
+        """
+        Stop receiving DICOM files from another thread, which makes the receiver convert the
+        remaining received DICOM studies and return.
+        """
+
+        self._stop_requested.set()
+
+    def _handle_store(self, event: Event) -> int:
+        """
+        Write a received DICOM file to the spool directory and add it to its DICOM series.
+        """
+
+        dicom = event.dataset
+        if 'SeriesDescription' not in dicom or 'SeriesNumber' not in dicom:
+            print_warning(
+                f"Rejected DICOM instance '{dicom.get('SOPInstanceUID')}' without a series description or number."
+            )
+            return status_cannot_understand
+
+        with self._condition:
+            study = self._get_received_study(event)
+
+        series_dir_path = os.path.join(study.spool_dir_path, _get_uid_file_name(dicom.get('SeriesInstanceUID')))
+        dicom_file_path = os.path.join(series_dir_path, _get_uid_file_name(dicom.get('SOPInstanceUID')) + '.dcm')
+
+        try:
+            os.makedirs(series_dir_path, exist_ok=True)
+            with open(dicom_file_path, 'wb') as file:
+                # Write the encoded dataset as received rather than encoding the decoded dataset again.
+                file.write(event.encoded_dataset())
+        except OSError as error:
+            print_warning(f"Could not write DICOM file '{dicom_file_path}': {error}.")
+            return status_out_of_resources
+
+        dicom_file_header = get_dicom_file_header(dicom, dicom_file_path)
+
+        # The DICOM files of a study can be received in several associations at the same time.
+        with self._condition:
+            study.sorter.add_file(dicom_file_path, dicom_file_header)
+            study.files_count += 1
+            study.last_received_at = time.monotonic()
+
+        return status_success
+
+    def _get_received_study(self, event: Event) -> ReceivedStudy:
+        """
+        Get the received DICOM study of a C-STORE request, creating it if it is the first DICOM file
+        of this study, and record the association of the request in this study. Must be called with
+        the condition held.
+        """
+
+        dicom = event.dataset
+        study_instance_uid = str(dicom.get('StudyInstanceUID', 'unknown'))
+
+        study = self._studies.get(study_instance_uid)
+        if study is None:
+            if study_instance_uid in self._converted_study_instance_uids:
+                print_warning(
+                    f"Receiving DICOM files of DICOM study '{study_instance_uid}' after its conversion, these files"
+                    " will be converted separately, which may conflict with the converted files. The --stable-time"
+                    " option should be longer than the pauses of the sender."
+                )
+
+            study = ReceivedStudy(
+                study_instance_uid = study_instance_uid,
+                spool_dir_path     = os.path.join(self.args.spool_dir_path, _get_uid_file_name(study_instance_uid)),
+                subject            = _get_bids_label(dicom.get(self.args.subject_attribute)),
+                session            = _get_bids_label(dicom.get(self.args.session_attribute)),
+                sorter             = DicomSeriesSorter(self.args.keep_duplicates),
+            )
+
+            self._studies[study_instance_uid] = study
+
+        association_studies = self._association_studies.setdefault(event.assoc, set())
+        if study_instance_uid not in association_studies:
+            association_studies.add(study_instance_uid)
+            study.associations_count += 1
+
+        return study
+
+    def _handle_released(self, event: Event):
+        """
+        Record the release of an association in the DICOM studies received in this association,
+        which are converted once they have no open association and are stable.
+        """
+
+        self._close_association(event.assoc, False)
+
+    def _handle_aborted(self, event: Event):
+        """
+        Record the abort of an association in the DICOM studies received in this association, which
+        may be incomplete and are not converted.
+        """
+
+        self._close_association(event.assoc, True)
+
+    def _close_association(self, association: Association, aborted: bool):
+        """
+        Record the end of an association in the DICOM studies received in this association.
+        """
+
+        with self._condition:
+            for study_instance_uid in self._association_studies.pop(association, set()):
+                study = self._studies[study_instance_uid]
+                study.associations_count -= 1
+                study.last_received_at = time.monotonic()
+                study.aborted |= aborted
+
+            self._condition.notify_all()
+
+    def _run_conversions(self):
+        """
+        Convert the received DICOM studies one at a time once they are stable, until the receiver
+        is stopped and all the received DICOM studies are processed.
+        """
+
+        while (study := self._wait_stable_study()) is not None:
+            self._convert_study(study)
+
+    def _wait_stable_study(self) -> ReceivedStudy | None:
+        """
+        Wait for a received DICOM study that has no open association and has not received any DICOM
+        file for the stable time, and remove it from the received DICOM studies. Once the receiver is
+        stopped, the remaining DICOM studies are returned without waiting. Return `None` if the
+        receiver is stopped and there are no DICOM studies left.
+        """
+
+        with self._condition:
+            while True:
+                if self._stopping:
+                    if self._studies == {}:
+                        return None
+
+                    return self._studies.pop(next(iter(self._studies)))
+
+                now = time.monotonic()
+                wait_time: float | None = None
+                for study_instance_uid, study in self._studies.items():
+                    if study.associations_count > 0:
+                        continue
+
+                    stable_at = study.last_received_at + self.args.stable_time
+                    if stable_at <= now:
+                        self._converted_study_instance_uids.add(study_instance_uid)
+                        return self._studies.pop(study_instance_uid)
+
+                    wait_time = stable_at - now if wait_time is None else min(wait_time, stable_at - now)
+
+                self._condition.wait(wait_time)
+
+    def _convert_study(self, study: ReceivedStudy):
+        """
+        Convert a received DICOM study to BIDS using its in-memory DICOM series, unless it may be
+        incomplete or lacks a BIDS subject or session label.
+        """
+
+        if study.aborted or study.associations_count > 0:
+            print_warning(
+                f"An association was aborted or not finished while receiving DICOM study '{study.study_instance_uid}',"
+                f" its {study.files_count} received DICOM files are kept in '{study.spool_dir_path}' and will not be"
+                " converted."
+            )
+            return
+
+        if study.subject == '' or study.session == '':
+            print_warning(
+                f"Could not get the BIDS subject or session label of DICOM study '{study.study_instance_uid}' from"
+                f" the {self.args.subject_attribute} and {self.args.session_attribute} attributes, its DICOM files"
+                f" are kept in '{study.spool_dir_path}' and will not be converted."
+            )
+            return
+
+        print_timestamped(
+            f"Received {study.files_count} DICOM files of DICOM study '{study.study_instance_uid}', converting it"
+            f" to BIDS session 'sub-{study.subject}/ses-{study.session}'."
+        )
+
+        # Import the converter modules lazily to keep the receiver startup fast.
+        from mni_7t_dicom_to_bids.pipeline import mni_7t_dicom_to_bids
+        from mni_7t_dicom_to_bids.scripts.run_mni7t_dcm2bids import get_argument_parser
+
+        try:
+            args = process_args(get_argument_parser().parse_args([
+                study.spool_dir_path,
+                self.args.bids_dataset_path,
+                '--subject', study.subject,
+                '--session', study.session,
+                *self.args.converter_options,
+            ]))
+
+            mni_7t_dicom_to_bids(args, study.sorter.get_dicom_series())
+        except (Exception, SystemExit) as error:
+            # The errors of a conversion, including invalid converter options, must not stop the receiver.
+            print_warning(f"Conversion of DICOM study '{study.study_instance_uid}' failed: {error}")
+            return
+
+        print_timestamped(f"Converted DICOM study '{study.study_instance_uid}'.")
+
+
+def _get_uid_file_name(uid: object) -> str:
+    """
+    Get a file name from a DICOM UID, which may be absent or contain unexpected characters.
+    """
+
+    if uid is None or str(uid) == '':
+        return 'unknown'
+
+    return re.sub(r'[^0-9a-zA-Z.]', '_', str(uid))
+
+
+def _get_bids_label(value: object) -> str:
+    """
+    Get a BIDS label from a DICOM attribute value by removing its non-alphanumeric characters.
+    """
+
+    if value is None:
+        return ''
+
+    return re.sub(r'[^a-zA-Z0-9]', '', str(value))
@@ -0,0 +1,139 @@
+from dataclasses import dataclass, field
+
+from mni_7t_dicom_to_bids.dataclass import BidsSessionInfo, DicomSeriesInfo
+from mni_7t_dicom_to_bids.profiler import SeriesProfile, StageProfile
+
+
+@dataclass
+class SeriesResult:
+    """
+    The outcome of the conversion of a DICOM series.
+    """
+
+    dicom_series: DicomSeriesInfo
+    """
+    The converted DICOM series.
+    """
+
+    acquisition: str | None
+    """
+    The BIDS acquisition of the DICOM series, or `None` if the DICOM series is unknown.
+    """
+
+    run_number: int | None
+    """
+    The BIDS run number of the DICOM series if its BIDS acquisition has several DICOM series.
+    """
+
+    output_file_paths: list[str] = field(default_factory=list[str])
+    """
+    The paths of the files written for the DICOM series.
+    """
+
+    unchanged_file_paths: list[str] = field(default_factory=list[str])
+    """
+    The paths of the output files that were identical to existing files of the BIDS dataset, and
+    which were left untouched.
+    """
+
+    post_processed_file_names: dict[str, str | None] = field(default_factory=dict[str, str | None])
+    """
+    The names of the output files of a BIDS acquisition after the post processing, by name given by
+    `dcm2niix` or the native writer, or `None` for the files deleted by the post processing.
+    """
+
+    qc_issues: list[str] = field(default_factory=list[str])
+    """
+    The issues found by the quality checks of the NIfTI files of the DICOM series.
+    """
+
+    error: Exception | None = None
+    """
+    The error that made the conversion of the DICOM series fail if there is one.
+    """
+
+    profile: SeriesProfile | None = None
+    """
+    The timings and resource usage of the conversion of the DICOM series.
+    """
+
+    @property
+    def success(self) -> bool:
+        """
+        Whether the DICOM series was successfully converted.
+        """
+
+        return self.error is None
+
+    @property
+    def wall_time(self) -> float:
+        """
+        The wall time of the conversion of the DICOM series in seconds.
+        """
+
+        return self.profile.wall_time if self.profile is not None else 0.0
+
+
+@dataclass
+class SessionResult:
+    """
+    The outcome of the conversion of a DICOM study to a BIDS session.
+    """
+
+    bids_session: BidsSessionInfo
+    """
+    The BIDS session of the DICOM study.
+    """
+
+    dicom_series_list: list[DicomSeriesInfo] = field(default_factory=list[DicomSeriesInfo])
+    """
+    The DICOM series found in the DICOM study.
+    """
+
+    ignored_dicom_series_list: list[DicomSeriesInfo] = field(default_factory=list[DicomSeriesInfo])
+    """
+    The ignored DICOM series of the DICOM study.
+    """
+
+    unknown_dicom_series_list: list[DicomSeriesInfo] = field(default_factory=list[DicomSeriesInfo])
+    """
+    The unknown DICOM series of the DICOM study.
+    """
+
+    series_results: list[SeriesResult] = field(default_factory=list[SeriesResult])
+    """
+    The outcomes of the conversions of the DICOM series.
+    """
+
+    stages: list[StageProfile] = field(default_factory=list[StageProfile])
+    """
+    The timings and resource usage of the stages of the conversion.
+    """
+
+    @property
+    def successes(self) -> int:
+        """
+        The number of DICOM series that were successfully converted.
+        """
+
+        return sum(1 for series_result in self.series_results if series_result.success)
+
+    @property
+    def errors(self) -> int:
+        """
+        The number of DICOM series whose conversion failed.
+        """
+
+        return sum(1 for series_result in self.series_results if not series_result.success)
+
+    @property
+    def output_file_paths(self) -> list[str]:
+        """
+        The paths of the files written for all the DICOM series.
+        """
+
+        return [
+            output_file_path
+            for series_result in self.series_results
+            for output_file_path in series_result.output_file_paths
+        ]
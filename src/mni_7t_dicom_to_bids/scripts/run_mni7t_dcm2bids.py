@@ -1,18 +1,49 @@
 #!/usr/bin/env python
 
 import argparse
+import importlib.util
+from collections.abc import Sequence
+from typing import Any
 
 from bic_util.fs import require_empty_directory, require_output_directory, require_readable_directory
+from bic_util.print import print_error_exit
 
 from mni_7t_dicom_to_bids.args import ConvertUnknownsArg, process_args
-from mni_7t_dicom_to_bids.pipeline import mni_7t_dicom_to_bids
+from mni_7t_dicom_to_bids.errors import ConversionError
+from mni_7t_dicom_to_bids.print import print_startup_profile
+from mni_7t_dicom_to_bids.startup import get_startup_time, profile_stage_imports
 
 
-def main():
+class StartupProfileAction(argparse.Action):
+    """
+    Argument action that prints the startup profile of the converter and exits, similarly to the
+    `--help` action.
+    """
+
+    def __init__(self, option_strings: Sequence[str], dest: str, help: str | None = None):
+        super().__init__(option_strings, dest, nargs=0, default=argparse.SUPPRESS, help=help)
+
+    def __call__(
+        self,
+        parser: argparse.ArgumentParser,
+        namespace: argparse.Namespace,
+        values: str | Sequence[Any] | None,
+        option_string: str | None = None,
+    ):
+        startup_time = get_startup_time()
+        print_startup_profile(startup_time, profile_stage_imports())
+        parser.exit()
 
-    # Parse CLI arguments
 
-    parser = argparse.ArgumentParser(
+def get_argument_parser(
+    parser_class: type[argparse.ArgumentParser] = argparse.ArgumentParser,
+) -> argparse.ArgumentParser:
+    """
+    Get the command line argument parser of the MNI 7T DICOM to BIDS converter, which can be built
+    with another argument parser class to handle the argument errors differently.
+    """
+
+    parser = parser_class(
         prog='mni7t_dcm2bids',
         description="Convert a DICOM study to BIDS using the MNI 7T conversion configuration.",
     )
@@ -53,6 +84,256 @@ def main():
         action='store_true',
         help="Overwrite files in the BIDS dataset if they already exist.")
 
+    parser.add_argument('--keep-duplicates',
+        action='store_true',
+        help=(
+            "Keep the DICOM files whose SOP instance UID is already present in the study and the DICOM series"
+            " instances that duplicate another series instance, instead of dropping them before conversion."
+        ))
+
+    parser.add_argument('--fast-headers',
+        action='store_true',
+        help=(
+            "Read the DICOM headers used to group the DICOM files with a minimal memory-mapped reader instead of"
+            " pydicom, falling back to pydicom for the DICOM files that this reader does not support (big-endian,"
+            " deflated or unusual encodings)."
+        ))
+
+    parser.add_argument('--no-auto-skip',
+        action='store_true',
+        help=(
+            "Do not ignore the unmapped DICOM series detected as localizers, MPR reformats, secondary captures,"
+            " structured reports or other non-image objects from their DICOM headers, which are then unknown DICOM"
+            " series."
+        ))
+
+    parser.add_argument('--skip-incomplete',
+        action='store_true',
+        help=(
+            "Do not convert the DICOM series that seem to be missing some DICOM files according to their DICOM"
+            " headers (gaps in the instance numbers, echoes with different numbers of DICOM files, or numbers of"
+            " DICOM files that do not match the number of images in acquisition), which are only reported by"
+            " default. The run numbers of the other DICOM series are not changed."
+        ))
+
+    parser.add_argument('--only-data-type',
+        action='append',
+        metavar='DATA_TYPE',
+        help=(
+            "Only convert the DICOM series of this BIDS data type, such as 'dwi' or 'func'. Can be given several"
+            " times. The run numbers are the same as in a conversion of the whole session."
+        ))
+
+    parser.add_argument('--only-acquisition',
+        action='append',
+        metavar='PATTERN',
+        help=(
+            "Only convert the DICOM series whose BIDS acquisition name matches this glob pattern, such as"
+            " 'task-audiobook*_bold'. Can be given several times."
+        ))
+
+    parser.add_argument('--only-series',
+        action='append',
+        type=int,
+        metavar='NUMBER',
+        help="Only convert the DICOM series with this DICOM series number. Can be given several times.")
+
+    parser.add_argument('--only-mapping',
+        action='append',
+        metavar='PATTERN',
+        help=(
+            "Only convert the DICOM series mapped by the BIDS mapping entry with this DICOM series description"
+            " pattern, as written in the BIDS mappings. Can be given several times."
+        ))
+
+    parser.add_argument('--native-writer',
+        action='store_true',
+        help=(
+            "Convert the simple derived DICOM series (MIPs, masks, UNI-DEN and T1 maps) in-process instead of"
+            " with dcm2niix, falling back to dcm2niix for the DICOM series that are not a plain stack of slices."
+            " Requires the 'numpy' package."
+        ))
+
+    parser.add_argument('--dcm2niix-timeout',
+        type=float,
+        metavar='SECONDS',
+        help=(
+            "Kill dcm2niix if the conversion of a DICOM series takes longer than this base time in seconds plus"
+            " --dcm2niix-timeout-per-mb for each megabyte of DICOM files, and record the DICOM series as an error."
+        ))
+
+    parser.add_argument('--dcm2niix-timeout-per-mb',
+        type=float,
+        default=1.0,
+        metavar='SECONDS',
+        help="Time added to the dcm2niix timeout for each megabyte of DICOM files of a DICOM series (default: 1).")
+
+    parser.add_argument('--dcm2niix-memory-limit',
+        type=int,
+        metavar='MB',
+        help="Maximum address space of a dcm2niix process in megabytes.")
+
+    parser.add_argument('--dcm2niix-cpu-limit',
+        type=int,
+        metavar='SECONDS',
+        help="Maximum CPU time of a dcm2niix process in seconds.")
+
+    parser.add_argument('--nice',
+        type=int,
+        default=0,
+        help="Niceness increment of the dcm2niix processes, between 0 and 19 (default: 0).")
+
+    parser.add_argument('--ionice',
+        choices=['idle', 'best-effort'],
+        help=(
+            "I/O scheduling class of the dcm2niix processes, 'idle' only doing I/O when no other process does and"
+            " 'best-effort' using the lowest best-effort priority."
+        ))
+
+    parser.add_argument('--history',
+        metavar='PATH',
+        help=(
+            "Path of the runtime history database, which records the duration of each DICOM series conversion to"
+            " estimate the duration of the next conversions (default: runtime_history.sqlite in the"
+            " mni_7t_dicom_to_bids user cache directory)."
+        ))
+
+    parser.add_argument('--no-history',
+        action='store_true',
+        help="Do not read or update the runtime history database.")
+
+    parser.add_argument('--longest-first',
+        action='store_true',
+        help=(
+            "Convert the DICOM series from the longest to the shortest estimated conversion, using the runtime"
+            " history or the size of the DICOM series, instead of the BIDS acquisition order."
+        ))
+
+    parser.add_argument('--pipeline',
+        action='store_true',
+        help=(
+            "Stage the DICOM files of the next DICOM series and move the output files of the previous DICOM series"
+            " in background threads while the current DICOM series is converted."
+        ))
+
+    parser.add_argument('--pipeline-scratch-limit',
+        type=int,
+        default=4096,
+        metavar='MB',
+        help=(
+            "Maximum size in megabytes of the DICOM files of the current and next DICOM series staged at the same"
+            " time with --pipeline, the next DICOM series being only read ahead above this size (default: 4096)."
+        ))
+
+    parser.add_argument('--pipeline-readahead-limit',
+        type=int,
+        default=512,
+        metavar='MB',
+        help=(
+            "Maximum size in megabytes of the DICOM files of the next DICOM series read ahead in the page cache"
+            " with --pipeline (default: 512)."
+        ))
+
+    parser.add_argument('--cache',
+        action='store_true',
+        help=(
+            "Reuse the dcm2niix conversions of the DICOM series already converted with the same DICOM files,"
+            " dcm2niix version and options, in this or another BIDS dataset, from a local conversion cache."
+        ))
+
+    parser.add_argument('--cache-dir',
+        metavar='PATH',
+        help=(
+            "Path of the conversion cache directory used with --cache (default: conversion_cache in the"
+            " mni_7t_dicom_to_bids user cache directory)."
+        ))
+
+    parser.add_argument('--cache-size-limit',
+        type=int,
+        default=20480,
+        metavar='MB',
+        help=(
+            "Maximum size in megabytes of the conversion cache, the least recently used conversions being evicted"
+            " above this size (default: 20480)."
+        ))
+
+    parser.add_argument('--catalog',
+        metavar='PATH',
+        help=(
+            "Path of a scan catalog database, which can be shared by several BIDS datasets, in which the inventory"
+            " of the DICOM series of the study and their BIDS acquisitions is recorded. The catalog can be queried"
+            " and exported with mni7t_dcm2bids_catalog."
+        ))
+
+    parser.add_argument('--scratch-dir',
+        action='append',
+        metavar='PATH',
+        help=(
+            "Directory in which the temporary conversion files are written if the default temporary directory"
+            " does not have enough free space for the conversion. Can be given several times, in order of"
+            " preference."
+        ))
+
+    parser.add_argument('--no-disk-check',
+        action='store_true',
+        help=(
+            "Do not check that the scratch and output filesystems have enough free space before the conversion,"
+            " the temporary conversion files being always written in the default temporary directory."
+        ))
+
+    parser.add_argument('--no-qc',
+        action='store_true',
+        help=(
+            "Do not check the headers of the converted NIfTI files against their DICOM series and sidecar files"
+            " after the conversion, nor write the QC summary file of the session."
+        ))
+
+    parser.add_argument('--minimize-metadata-ops',
+        action='store_true',
+        help=(
+            "Minimize the metadata operations on the output directories for parallel filesystems such as Lustre or"
+            " NFS, by creating and listing each output directory once per session. Assumes that no other process"
+            " writes in the output directories of the session during the conversion."
+        ))
+
+    parser.add_argument('--profile',
+        metavar='PATH',
+        help=(
+            "Write a JSON report of the time and resources used by each stage of the conversion and each"
+            " converted DICOM series to this file path."
+        ))
+
+    parser.add_argument('--quiet',
+        action='store_true',
+        help="Only print the warnings and errors, and the dcm2niix output of the failed conversions.")
+
+    parser.add_argument('--events-fd',
+        type=int,
+        metavar='FD',
+        help=(
+            "Write structured JSON-lines events (session, stages, DICOM series, progress) to this open file"
+            " descriptor."
+        ))
+
+    parser.add_argument('--progress-interval',
+        type=float,
+        default=1.0,
+        metavar='SECONDS',
+        help="Minimum time between two progress updates in seconds (default: 1).")
+
+    parser.add_argument('--startup-profile',
+        action=StartupProfileAction,
+        help="Print the startup time of the converter and the import time of each of its stage modules, and exit.")
+
+    return parser
+
+
+def main():
+
+    # Parse CLI arguments
+
+    parser = get_argument_parser()
+
     # Process CLI arguments
 
     args = process_args(parser.parse_args())
@@ -64,11 +345,24 @@ def main():
         require_output_directory(args.unknowns.dir_path)
         require_empty_directory(args.unknowns.dir_path)
 
-    # Run the script.
+    if args.native_writer and importlib.util.find_spec('numpy') is None:
+        print_error_exit(
+            "Option --native-writer requires the 'numpy' package, which can be installed using"
+            " `pip install mni_7t_dicom_to_bids[native-writer]`."
+        )
+
+    # Run the script. The pipeline is imported lazily so that the help and argument errors are
+    # displayed without loading the DICOM and conversion modules.
+
+    from mni_7t_dicom_to_bids.pipeline import mni_7t_dicom_to_bids
 
-    mni_7t_dicom_to_bids(args)
+    try:
+        mni_7t_dicom_to_bids(args)
+    except ConversionError as error:
+        print_error_exit(str(error))
 
-    print('Success !')
+    if not args.quiet:
+        print('Success !')
 
 
 if __name__ == '__main__':
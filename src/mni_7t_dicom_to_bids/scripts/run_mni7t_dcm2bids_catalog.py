@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+import argparse
+import importlib.util
+
+from bic_util.print import print_error_exit
+
+from mni_7t_dicom_to_bids.args import process_catalog_args
+from mni_7t_dicom_to_bids.errors import ConversionError
+
+
+def get_argument_parser() -> argparse.ArgumentParser:
+    """
+    Get the command line argument parser of the MNI 7T DICOM to BIDS catalog command.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='mni7t_dcm2bids_catalog',
+        description=(
+            "Query or export a scan catalog recorded by the MNI 7T DICOM to BIDS converter with --catalog. Without"
+            " option, list all the sessions of the catalog."
+        ),
+    )
+
+    parser.add_argument('catalog_path',
+        help="Path of the scan catalog database.")
+
+    parser.add_argument('--with',
+        dest='with_patterns',
+        action='append',
+        metavar='PATTERN',
+        help=(
+            "Only list the sessions that have a DICOM series mapped to a BIDS acquisition matching this glob"
+            " pattern on '<data_type>/<acquisition>', such as 'anat/T1w' or 'dwi/*'. Can be given several times."
+        ))
+
+    parser.add_argument('--without',
+        dest='without_patterns',
+        action='append',
+        metavar='PATTERN',
+        help=(
+            "Only list the sessions that have no DICOM series mapped to a BIDS acquisition matching this glob"
+            " pattern. Can be given several times."
+        ))
+
+    parser.add_argument('--subjects',
+        action='store_true',
+        help=(
+            "List the subjects instead of the sessions, a subject matching --with if any of its sessions matches"
+            " and --without if none of its sessions has such a BIDS acquisition."
+        ))
+
+    parser.add_argument('--export',
+        metavar='PATH',
+        help=(
+            "Export all the DICOM series of the catalog to this '.csv' or '.parquet' file path. The Parquet export"
+            " requires the 'pyarrow' package."
+        ))
+
+    return parser
+
+
+def main():
+
+    # Parse CLI arguments
+
+    parser = get_argument_parser()
+
+    # Process CLI arguments
+
+    args = process_catalog_args(parser.parse_args())
+
+    if args.export_path is not None and args.export_path.endswith('.parquet') \
+            and importlib.util.find_spec('pyarrow') is None:
+        print_error_exit(
+            "Parquet exports require the 'pyarrow' package, which can be installed using"
+            " `pip install mni_7t_dicom_to_bids[parquet]`."
+        )
+
+    # Run the script
+
+    from mni_7t_dicom_to_bids.catalog import query_scan_catalog
+
+    try:
+        query_scan_catalog(args)
+    except ConversionError as error:
+        print_error_exit(str(error))
+
+
+if __name__ == '__main__':
+    main()
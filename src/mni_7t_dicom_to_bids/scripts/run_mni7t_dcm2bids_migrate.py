@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import argparse
+
+from bic_util.fs import require_readable_directory
+from bic_util.print import print_error_exit
+
+from mni_7t_dicom_to_bids.args import process_migrate_args
+from mni_7t_dicom_to_bids.errors import ConversionError
+
+
+def get_argument_parser() -> argparse.ArgumentParser:
+    """
+    Get the command line argument parser of the MNI 7T DICOM to BIDS migrate command.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='mni7t_dcm2bids_migrate',
+        description=(
+            "Migrate the files of a BIDS dataset converted by the MNI 7T DICOM to BIDS converter to the current BIDS"
+            " mappings, by renaming the files and patching the JSON sidecar files of the DICOM series whose BIDS name"
+            " changed. The DICOM series that cannot be renamed are listed to be converted again."
+        ),
+    )
+
+    parser.add_argument('bids_dataset_path',
+        help="Path of the BIDS dataset directory.")
+
+    parser.add_argument('--subject',
+        help="Only migrate the sessions of this BIDS subject label.")
+
+    parser.add_argument('--session',
+        help="Only migrate the sessions with this BIDS session label.")
+
+    parser.add_argument('--dry-run',
+        action='store_true',
+        help="Print the migration without changing any file.")
+
+    return parser
+
+
+def main():
+
+    # Parse CLI arguments
+
+    parser = get_argument_parser()
+
+    # Process CLI arguments
+
+    args = process_migrate_args(parser.parse_args())
+
+    require_readable_directory(args.bids_dataset_path)
+
+    # Run the script
+
+    from mni_7t_dicom_to_bids.migrate import migrate_bids_dataset
+
+    try:
+        migrate_bids_dataset(args)
+    except ConversionError as error:
+        print_error_exit(str(error))
+
+
+if __name__ == '__main__':
+    main()
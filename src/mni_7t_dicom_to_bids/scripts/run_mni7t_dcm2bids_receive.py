@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+import argparse
+import signal
+
+from bic_util.fs import require_output_directory
+from bic_util.print import print_error_exit
+
+from mni_7t_dicom_to_bids.args import process_receive_args
+from mni_7t_dicom_to_bids.scripts.run_mni7t_dcm2bids import get_argument_parser as get_converter_argument_parser
+
+
+def get_argument_parser() -> argparse.ArgumentParser:
+    """
+    Get the command line argument parser of the MNI 7T DICOM to BIDS receive command.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='mni7t_dcm2bids_receive',
+        description=(
+            "Receive DICOM studies as a DICOM storage SCP and convert each study to BIDS once its association is"
+            " released. Other options are passed to the converter (for instance --skip-unknowns or --dataset-files),"
+            " and must be given after the positional arguments."
+        ),
+    )
+
+    parser.add_argument('spool_dir_path',
+        help="Path of the directory in which the received DICOM files are written.")
+
+    parser.add_argument('bids_dataset_path',
+        help="Path of the output BIDS dataset directory.")
+
+    parser.add_argument('--address',
+        default='127.0.0.1',
+        help="Address on which the receiver listens (default: 127.0.0.1).")
+
+    parser.add_argument('--port',
+        type=int,
+        default=11112,
+        help="Port on which the receiver listens (default: 11112).")
+
+    parser.add_argument('--ae-title',
+        default='MNI7TDCM2BIDS',
+        help="Application entity title of the receiver (default: MNI7TDCM2BIDS).")
+
+    parser.add_argument('--subject-attribute',
+        default='PatientID',
+        metavar='KEYWORD',
+        help=(
+            "DICOM attribute keyword whose value, without its non-alphanumeric characters, is the BIDS subject label"
+            " of the received studies (default: PatientID)."
+        ))
+
+    parser.add_argument('--session-attribute',
+        default='StudyID',
+        metavar='KEYWORD',
+        help=(
+            "DICOM attribute keyword whose value, without its non-alphanumeric characters, is the BIDS session label"
+            " of the received studies (default: StudyID)."
+        ))
+
+    parser.add_argument('--stable-time',
+        type=float,
+        default=60.0,
+        metavar='SECONDS',
+        help=(
+            "Time during which no DICOM file of a DICOM study must be received, once all the associations in which"
+            " it was received are released, before it is converted (default: 60)."
+        ))
+
+    return parser
+
+
+def main():
+
+    # Parse CLI arguments, the unknown arguments being passed to the converter
+
+    parser = get_argument_parser()
+    parsed_args, converter_options = parser.parse_known_args()
+
+    # Process CLI arguments
+
+    args = process_receive_args(parsed_args, converter_options)
+
+    require_output_directory(args.spool_dir_path)
+    require_output_directory(args.bids_dataset_path)
+
+    # Check the converter options before receiving rather than at the first conversion.
+
+    get_converter_argument_parser().parse_args([
+        args.spool_dir_path,
+        args.bids_dataset_path,
+        '--subject', 'receive',
+        '--session', 'receive',
+        *args.converter_options,
+    ])
+
+    # Run the script. The receiver depends on the optional `pynetdicom` package.
+
+    try:
+        from mni_7t_dicom_to_bids.receive import DicomReceiver
+    except ModuleNotFoundError as error:
+        if error.name != 'pynetdicom':
+            raise
+
+        print_error_exit(
+            "The DICOM receiver requires the 'pynetdicom' package, which can be installed using"
+            " `pip install mni_7t_dicom_to_bids[receiver]`."
+        )
+
+    # Stop the receiver gracefully when it is terminated by a service manager.
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    DicomReceiver(args).serve()
+
+
+if __name__ == '__main__':
+    main()
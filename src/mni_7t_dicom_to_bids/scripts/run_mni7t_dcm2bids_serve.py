@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import argparse
+import multiprocessing
+import signal
+
+from bic_util.print import print_error_exit
+
+from mni_7t_dicom_to_bids.args import process_serve_args
+from mni_7t_dicom_to_bids.errors import ConversionError
+from mni_7t_dicom_to_bids.serve import ConversionDaemon
+
+
+def get_argument_parser() -> argparse.ArgumentParser:
+    """
+    Get the command line argument parser of the MNI 7T DICOM to BIDS serve command.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='mni7t_dcm2bids_serve',
+        description=(
+            "Run a conversion daemon that keeps a pool of warm converter processes and runs the conversion jobs"
+            " submitted with mni7t_dcm2bids_submit over a local UNIX socket, by priority and submission order."
+        ),
+    )
+
+    parser.add_argument('--socket',
+        metavar='PATH',
+        help=(
+            "Path of the UNIX socket of the daemon (default: mni_7t_dicom_to_bids/daemon.sock in the user runtime"
+            " directory)."
+        ))
+
+    parser.add_argument('--workers',
+        type=int,
+        default=1,
+        help=(
+            "Number of converter processes, which is the number of conversion jobs run at the same time. The jobs of"
+            " a same BIDS session are never run at the same time (default: 1)."
+        ))
+
+    return parser
+
+
+def main():
+
+    # Parse CLI arguments
+
+    parser = get_argument_parser()
+
+    # Process CLI arguments
+
+    args = process_serve_args(parser.parse_args())
+
+    # Stop the daemon gracefully when it is terminated by a service manager.
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    # Run the script
+
+    try:
+        ConversionDaemon(args).serve()
+    except ConversionError as error:
+        print_error_exit(str(error))
+
+
+if __name__ == '__main__':
+    # The worker processes of the daemon are spawned, which requires this call in frozen executables.
+    multiprocessing.freeze_support()
+    main()
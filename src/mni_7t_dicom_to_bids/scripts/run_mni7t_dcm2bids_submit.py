@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import sys
+from datetime import datetime
+from typing import Any
+
+from bic_util.print import print_error_exit
+
+from mni_7t_dicom_to_bids.args import SubmitArgs, process_submit_args
+from mni_7t_dicom_to_bids.errors import ConversionError
+from mni_7t_dicom_to_bids.serve import send_daemon_request
+
+
+def get_argument_parser() -> argparse.ArgumentParser:
+    """
+    Get the command line argument parser of the MNI 7T DICOM to BIDS submit command.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='mni7t_dcm2bids_submit',
+        description=(
+            "Submit a conversion job to the conversion daemon started with mni7t_dcm2bids_serve, and wait for its"
+            " result. The other arguments are the converter arguments of the job (for instance '<dicom_study_path>"
+            " <bids_dataset_path> --subject <subject> --session <session> --skip-unknowns')."
+        ),
+        # The converter options must not be taken as abbreviations of the options of this command.
+        allow_abbrev=False,
+    )
+
+    parser.add_argument('--socket',
+        metavar='PATH',
+        help=(
+            "Path of the UNIX socket of the daemon (default: mni_7t_dicom_to_bids/daemon.sock in the user runtime"
+            " directory)."
+        ))
+
+    parser.add_argument('--priority',
+        type=int,
+        default=0,
+        help="Priority of the job, the queued jobs with a higher priority being run first (default: 0).")
+
+    parser.add_argument('--no-wait',
+        action='store_true',
+        help="Print the identifier of the job and exit without waiting for its result.")
+
+    parser.add_argument('--status',
+        type=int,
+        metavar='JOB_ID',
+        help="Print the status of a job instead of submitting one.")
+
+    parser.add_argument('--cancel',
+        type=int,
+        metavar='JOB_ID',
+        help="Cancel a queued job instead of submitting one.")
+
+    parser.add_argument('--list',
+        action='store_true',
+        help="Print the status of the jobs of the daemon instead of submitting one.")
+
+    return parser
+
+
+def print_job(job: dict[str, Any]):
+    """
+    Print the status of a job of the conversion daemon, with the summary of its conversion if it has
+    finished.
+    """
+
+    submitted_at = datetime.fromtimestamp(job['submitted_at']).isoformat(sep=' ', timespec='seconds')
+    print(
+        f"Job {job['id']}: {job['state']}, BIDS session 'sub-{job['subject']}/ses-{job['session']}',"
+        f" priority {job['priority']}, submitted at {submitted_at}."
+    )
+
+    if job['error'] is not None:
+        print(f"  {job['error']}")
+
+    if job['result'] is None:
+        return
+
+    for series in job['result']['series']:
+        acquisition = series['acquisition'] or 'unknown'
+        status = 'error' if series['error'] is not None else 'success'
+        print(f"  - '{series['description']}' ({series['number']}) -> {acquisition}: {status}")
+        if series['error'] is not None:
+            print(f"    {series['error']}")
+
+        for qc_issue in series['qc_issues']:
+            print(f"    QC: {qc_issue}")
+
+    print(
+        f"  {job['result']['successes']} successes, {job['result']['errors']} errors,"
+        f" {job['result']['output_files_count']} output files."
+    )
+
+
+def run_command(args: SubmitArgs) -> bool:
+    """
+    Run the submit command, and return whether the queried or submitted job did not fail.
+    """
+
+    if args.list_jobs:
+        for job in send_daemon_request(args.socket_path, {'command': 'list'})['jobs']:
+            print_job(job)
+
+        return True
+
+    if args.status_job_id is not None:
+        job = send_daemon_request(args.socket_path, {'command': 'status', 'job_id': args.status_job_id})['job']
+        print_job(job)
+        return job['state'] != 'failed'
+
+    if args.cancel_job_id is not None:
+        job = send_daemon_request(args.socket_path, {'command': 'cancel', 'job_id': args.cancel_job_id})['job']
+        print_job(job)
+        return True
+
+    job = send_daemon_request(args.socket_path, {
+        'command':  'submit',
+        'options':  args.converter_options,
+        'cwd':      os.getcwd(),
+        'priority': args.priority,
+    })['job']
+
+    print(f"Submitted job {job['id']}.")
+
+    if not args.wait:
+        return True
+
+    job = send_daemon_request(args.socket_path, {'command': 'wait', 'job_id': job['id']})['job']
+    print_job(job)
+    return job['state'] == 'succeeded' and job['result']['errors'] == 0
+
+
+def main():
+
+    # Parse CLI arguments, the unknown arguments being the converter arguments of the job
+
+    parser = get_argument_parser()
+    parsed_args, converter_options = parser.parse_known_args()
+
+    # Process CLI arguments
+
+    args = process_submit_args(parsed_args, converter_options)
+
+    # Run the script
+
+    try:
+        success = run_command(args)
+    except ConversionError as error:
+        print_error_exit(str(error))
+
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
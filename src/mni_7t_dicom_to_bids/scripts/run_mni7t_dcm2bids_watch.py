@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+
+from bic_util.fs import require_output_directory, require_readable_directory
+from bic_util.print import print_error_exit
+
+from mni_7t_dicom_to_bids.args import process_watch_args
+from mni_7t_dicom_to_bids.scripts.run_mni7t_dcm2bids import get_argument_parser as get_converter_argument_parser
+
+
+def get_argument_parser() -> argparse.ArgumentParser:
+    """
+    Get the command line argument parser of the MNI 7T DICOM to BIDS watch command.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='mni7t_dcm2bids_watch',
+        description=(
+            "Watch a drop directory and convert each DICOM study directory to BIDS once its transfer is finished."
+            " Other options are passed to the converter (for instance --skip-unknowns or --dataset-files), and must be"
+            " given after the positional arguments."
+        ),
+    )
+
+    parser.add_argument('drop_dir_path',
+        help="Path of the drop directory in which the DICOM study directories land.")
+
+    parser.add_argument('bids_dataset_path',
+        help="Path of the output BIDS dataset directory.")
+
+    parser.add_argument('--study-pattern',
+        default=r'(?P<subject>[a-zA-Z0-9]+)_(?P<session>[a-zA-Z0-9]+)',
+        metavar='REGEX',
+        help=(
+            "Regular expression matched against the name of each DICOM study directory, whose 'subject' and"
+            " 'session' named groups give the BIDS labels of the study (default: '<subject>_<session>')."
+        ))
+
+    parser.add_argument('--stable-time',
+        type=float,
+        default=60.0,
+        metavar='SECONDS',
+        help=(
+            "Time during which the file count, size and modification times of a DICOM study directory must not"
+            " change before it is converted (default: 60)."
+        ))
+
+    parser.add_argument('--poll-interval',
+        type=float,
+        default=10.0,
+        metavar='SECONDS',
+        help="Time between two polls of the drop directory (default: 10).")
+
+    parser.add_argument('--once',
+        action='store_true',
+        help="Exit once the DICOM studies present in the drop directory have been processed.")
+
+    return parser
+
+
+def main():
+
+    # Parse CLI arguments, the unknown arguments being passed to the converter
+
+    parser = get_argument_parser()
+    parsed_args, converter_options = parser.parse_known_args()
+
+    # Process CLI arguments
+
+    args = process_watch_args(parsed_args, converter_options)
+
+    require_readable_directory(args.drop_dir_path)
+    require_output_directory(args.bids_dataset_path)
+
+    # Check the converter options before watching rather than at the first conversion.
+
+    get_converter_argument_parser().parse_args([
+        args.drop_dir_path,
+        args.bids_dataset_path,
+        '--subject', 'watch',
+        '--session', 'watch',
+        *args.converter_options,
+    ])
+
+    # Run the script
+
+    from mni_7t_dicom_to_bids.watch import get_converter_command, watch_drop_directory
+
+    converter_path = get_converter_command()[0]
+    if not os.access(converter_path, os.X_OK):
+        print_error_exit(
+            f"Converter executable '{converter_path}' not found, the compiled watch executable must be installed"
+            " in the same directory as the compiled converter executable."
+        )
+
+    try:
+        watch_drop_directory(args)
+    except KeyboardInterrupt:
+        print("Watch interrupted.")
+
+
+if __name__ == '__main__':
+    main()
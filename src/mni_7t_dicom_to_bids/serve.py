@@ -0,0 +1,633 @@
+"""
+Conversion daemon of the MNI 7T DICOM to BIDS converter, which keeps a pool of warm worker
+processes, that have already imported the converter modules, and accepts conversion jobs from the
+local tools over a UNIX socket. The jobs are queued by priority, and their status and results can be
+queried by the clients.
+
+The protocol is a single JSON request line per connection, answered with a single JSON response
+line. The requests are objects with a `command` field (`submit`, `status`, `wait`, `cancel` or
+`list`), and the responses have an `error` field if the request failed.
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from typing import Any, NoReturn, TypeGuard, cast
+
+from bic_util.print import print_warning
+
+from mni_7t_dicom_to_bids.args import Args, ConvertUnknownsArg, ServeArgs, get_converter_args
+from mni_7t_dicom_to_bids.errors import ConversionError, InvalidArgumentsError
+from mni_7t_dicom_to_bids.print import print_timestamped
+
+# Converter options that cannot be used in the jobs of the daemon.
+daemon_rejected_options = ('--events-fd', '--startup-profile')
+
+# Maximum number of finished jobs kept in memory to answer the status requests.
+finished_jobs_limit = 1000
+
+# Maximum size of a request line in bytes.
+request_size_limit = 1024 * 1024
+
+# Destinations of the converter options that are paths, which are resolved against the working
+# directory of the client.
+job_path_options = (
+    'dicom_study_path',
+    'bids_dataset_path',
+    'convert_unknowns',
+    'history',
+    'cache_dir',
+    'catalog',
+    'profile',
+)
+
+# Error of the `dcm2niix` check done when a worker process of the daemon starts, if there is one.
+_dicom_to_niix_error: ConversionError | None = None
+
+
+@dataclass
+class ConversionJob:
+    """
+    A conversion job submitted to the daemon.
+    """
+
+    id: int
+    """
+    The identifier of the job.
+    """
+
+    options: list[str]
+    """
+    The converter command line arguments of the job.
+    """
+
+    cwd: str
+    """
+    The working directory of the client, against which the relative paths of the options are resolved.
+    """
+
+    priority: int
+    """
+    The priority of the job, the jobs with a higher priority being run first.
+    """
+
+    subject: str
+    """
+    The BIDS subject label of the job.
+    """
+
+    session: str
+    """
+    The BIDS session label of the job.
+    """
+
+    bids_dataset_path: str
+    """
+    The absolute path of the BIDS dataset of the job.
+    """
+
+    state: str = 'queued'
+    """
+    The state of the job: `queued`, `running`, `succeeded`, `failed` or `cancelled`.
+    """
+
+    submitted_at: float = field(default_factory=time.time)
+    """
+    The submission time of the job as a UNIX timestamp.
+    """
+
+    started_at: float | None = None
+    """
+    The start time of the job as a UNIX timestamp if it has started.
+    """
+
+    finished_at: float | None = None
+    """
+    The end time of the job as a UNIX timestamp if it has finished.
+    """
+
+    error: str | None = None
+    """
+    The error that made the job fail if there is one.
+    """
+
+    result: dict[str, Any] | None = None
+    """
+    The summary of the conversion of the job if it has run to completion.
+    """
+
+    @property
+    def finished(self) -> bool:
+        """
+        Whether the job has finished, successfully or not, or was cancelled.
+        """
+
+        return self.state in ('succeeded', 'failed', 'cancelled')
+
+    @property
+    def session_key(self) -> tuple[str, str, str]:
+        """
+        The BIDS session written by the job, two jobs of the same BIDS session not being run at the
+        same time.
+        """
+
+        return self.bids_dataset_path, self.subject, self.session
+
+
+class JobArgumentParser(argparse.ArgumentParser):
+    """
+    Argument parser of the converter options of the jobs, which raises an invalid arguments error
+    instead of printing the error and exiting the process. The help option and the abbreviations of
+    the options are disabled, as they would bypass the rejected options.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs, add_help=False, allow_abbrev=False)
+
+    def error(self, message: str) -> NoReturn:
+        raise InvalidArgumentsError(message)
+
+    def exit(self, status: int = 0, message: str | None = None) -> NoReturn:
+        raise InvalidArgumentsError(message.strip() if message is not None else "Invalid converter options.")
+
+
+def get_job_args(options: list[str], cwd: str) -> Args:
+    """
+    Get the structured converter arguments of a job, the relative paths being resolved against the
+    absolute working directory of the client. Raise an invalid arguments error with the converter
+    error message if the options are incorrect.
+    """
+
+    # Imported lazily as the command line scripts import this module.
+    from mni_7t_dicom_to_bids.scripts.run_mni7t_dcm2bids import get_argument_parser
+
+    if not os.path.isabs(cwd):
+        raise InvalidArgumentsError(f"Working directory '{cwd}' is not an absolute path.")
+
+    for option in options:
+        if option.split('=')[0] in daemon_rejected_options:
+            raise InvalidArgumentsError(f"Option {option} cannot be used in a conversion job.")
+
+    namespace = get_argument_parser(JobArgumentParser).parse_args(options)
+
+    for path_option in job_path_options:
+        path = getattr(namespace, path_option)
+        if path is not None:
+            setattr(namespace, path_option, os.path.join(cwd, path))
+
+    if namespace.scratch_dir is not None:
+        namespace.scratch_dir = [os.path.join(cwd, scratch_dir_path) for scratch_dir_path in namespace.scratch_dir]
+
+    args = get_converter_args(namespace)
+
+    if not os.path.isdir(args.dicom_study_path):
+        raise InvalidArgumentsError(f"DICOM study directory '{args.dicom_study_path}' does not exist.")
+
+    return args
+
+
+def initialize_worker():
+    """
+    Import the converter modules in a worker process of the daemon and check that `dcm2niix` is
+    accessible, so that the jobs do not pay their import time nor the `dcm2niix` check.
+    """
+
+    global _dicom_to_niix_error
+
+    importlib.import_module('mni_7t_dicom_to_bids.pipeline')
+
+    from mni_7t_dicom_to_bids.convert_dicom_series import check_dicom_to_niix
+
+    try:
+        check_dicom_to_niix()
+    except ConversionError as error:
+        _dicom_to_niix_error = error
+
+
+def run_conversion_job(options: list[str], cwd: str) -> dict[str, Any]:
+    """
+    Run a conversion job in a worker process of the daemon, and return the summary of its
+    conversion. Raise a conversion error if the conversion cannot be done.
+    """
+
+    # The errors are sent back to the daemon as plain conversion errors, as the errors that have
+    # extra constructor arguments cannot be unpickled and would break the worker pool.
+    try:
+        return _run_conversion_job(options, cwd)
+    except ConversionError as error:
+        raise ConversionError(str(error)) from None
+    except Exception as error:
+        raise ConversionError(f"{type(error).__name__}: {error}") from None
+
+
+def _run_conversion_job(options: list[str], cwd: str) -> dict[str, Any]:
+    """
+    Run a conversion job in the current process and return the summary of its conversion.
+    """
+
+    from mni_7t_dicom_to_bids.pipeline import mni_7t_dicom_to_bids
+
+    args = get_job_args(options, cwd)
+
+    if _dicom_to_niix_error is not None:
+        raise _dicom_to_niix_error
+
+    os.makedirs(args.bids_dataset_path, exist_ok=True)
+
+    if isinstance(args.unknowns, ConvertUnknownsArg):
+        os.makedirs(args.unknowns.dir_path, exist_ok=True)
+        if os.listdir(args.unknowns.dir_path) != []:
+            raise InvalidArgumentsError(f"Unknown DICOM series directory '{args.unknowns.dir_path}' is not empty.")
+
+    result = mni_7t_dicom_to_bids(args, dicom_to_niix_checked=True)
+
+    return {
+        'successes':          result.successes,
+        'errors':             result.errors,
+        'output_files_count': len(result.output_file_paths),
+        'series':             [
+            {
+                'description': series_result.dicom_series.description,
+                'number':      series_result.dicom_series.number,
+                'acquisition': series_result.acquisition,
+                'run_number':  series_result.run_number,
+                'error':       str(series_result.error) if series_result.error is not None else None,
+                'qc_issues':   series_result.qc_issues,
+            }
+            for series_result in result.series_results
+        ],
+    }
+
+
+class ConversionDaemon:
+    """
+    Conversion daemon that accepts jobs over a UNIX socket and runs them in a pool of worker
+    processes. The queued jobs are run by decreasing priority and then by submission order, the
+    jobs of a BIDS session being delayed while another job of this session is running.
+    """
+
+    def __init__(self, args: ServeArgs):
+        self.args = args
+        self._jobs: dict[int, ConversionJob] = {}
+        self._next_job_id = 1
+        self._running_sessions: set[tuple[str, str, str]] = set()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._executor = self._create_executor()
+
+    def serve(self):
+        """
+        Accept jobs until the process is interrupted, and then wait for the queued and running jobs
+        to finish.
+        """
+
+        self._check_socket_path()
+
+        # Only the user running the daemon can connect to its socket.
+        previous_umask = os.umask(0o077)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.args.socket_path)), exist_ok=True)
+            server = _DaemonServer(self.args.socket_path, self)
+        except OSError as error:
+            raise ConversionError(f"Cannot listen on socket '{self.args.socket_path}': {error}")
+        finally:
+            os.umask(previous_umask)
+
+        scheduler = threading.Thread(target=self._run_scheduler, name='scheduler')
+        scheduler.start()
+
+        print_timestamped(f"Serving conversion jobs on '{self.args.socket_path}' (workers: {self.args.workers})...")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            with contextlib.suppress(OSError):
+                os.remove(self.args.socket_path)
+
+            print_timestamped("Daemon stopped, waiting for the queued and running jobs to finish...")
+
+            with self._condition:
+                self._stopping = True
+                self._condition.notify_all()
+
+            scheduler.join()
+            self._executor.shutdown()
+
+    def handle_request(self, request: dict[str, Any]) -> dict[str, Any]:
+        """
+        Handle a request of a client and return its response.
+        """
+
+        match request.get('command'):
+            case 'submit':
+                return self._submit(request)
+            case 'status':
+                return {'job': asdict(self._get_job(request))}
+            case 'wait':
+                return {'job': asdict(self._wait(request))}
+            case 'cancel':
+                return {'job': asdict(self._cancel(request))}
+            case 'list':
+                with self._condition:
+                    return {'jobs': [asdict(job) for job in self._jobs.values()]}
+            case command:
+                raise InvalidArgumentsError(f"Unknown command '{command}'.")
+
+    def _submit(self, request: dict[str, Any]) -> dict[str, Any]:
+        """
+        Queue a conversion job after checking its options.
+        """
+
+        options = request.get('options')
+        cwd = request.get('cwd')
+        priority = request.get('priority', 0)
+        if not _is_string_list(options) or not isinstance(cwd, str) or type(priority) is not int:
+            raise InvalidArgumentsError("Invalid submit request.")
+
+        args = get_job_args(options, cwd)
+
+        with self._condition:
+            if self._stopping:
+                raise ConversionError("The daemon is stopping and does not accept new jobs.")
+
+            job = ConversionJob(
+                id                = self._next_job_id,
+                options           = options,
+                cwd               = cwd,
+                priority          = priority,
+                subject           = args.subject,
+                session           = args.session,
+                bids_dataset_path = args.bids_dataset_path,
+            )
+
+            self._next_job_id += 1
+            self._jobs[job.id] = job
+
+            print_timestamped(f"Queued job {job.id} for BIDS session 'sub-{job.subject}/ses-{job.session}'.")
+
+            self._condition.notify_all()
+
+        return {'job': asdict(job)}
+
+    def _get_job(self, request: dict[str, Any]) -> ConversionJob:
+        """
+        Get the job of a request.
+        """
+
+        job_id = request.get('job_id')
+        if type(job_id) is not int:
+            raise InvalidArgumentsError(f"Invalid job identifier {job_id!r}.")
+
+        with self._condition:
+            job = self._jobs.get(job_id)
+
+        if job is None:
+            raise InvalidArgumentsError(f"Unknown job {job_id}.")
+
+        return job
+
+    def _wait(self, request: dict[str, Any]) -> ConversionJob:
+        """
+        Wait for the job of a request to finish.
+        """
+
+        job = self._get_job(request)
+        with self._condition:
+            self._condition.wait_for(lambda: job.finished)
+
+        return job
+
+    def _cancel(self, request: dict[str, Any]) -> ConversionJob:
+        """
+        Cancel the job of a request if it is still queued.
+        """
+
+        job = self._get_job(request)
+        with self._condition:
+            if job.state != 'queued':
+                raise InvalidArgumentsError(f"Job {job.id} is {job.state} and cannot be cancelled.")
+
+            self._finish_job(job, 'cancelled')
+
+        print_timestamped(f"Cancelled job {job.id}.")
+
+        return job
+
+    def _run_scheduler(self):
+        """
+        Run the queued jobs in the worker pool until the daemon is stopped and all the jobs are
+        finished.
+        """
+
+        with self._condition:
+            while True:
+                job = self._get_next_job()
+                if job is not None:
+                    self._start_job(job)
+                    continue
+
+                if self._stopping and all(job.finished for job in self._jobs.values()):
+                    return
+
+                self._condition.wait()
+
+    def _get_next_job(self) -> ConversionJob | None:
+        """
+        Get the next queued job to run if a worker is available, or `None` otherwise.
+        """
+
+        if len(self._running_sessions) >= self.args.workers:
+            return None
+
+        queued_jobs = [
+            job for job in self._jobs.values()
+            if job.state == 'queued' and job.session_key not in self._running_sessions
+        ]
+
+        return min(queued_jobs, key=lambda job: (-job.priority, job.id), default=None)
+
+    def _start_job(self, job: ConversionJob):
+        """
+        Start a job in the worker pool. Must be called with the condition held.
+        """
+
+        job.state = 'running'
+        job.started_at = time.time()
+        self._running_sessions.add(job.session_key)
+
+        print_timestamped(f"Starting job {job.id} for BIDS session 'sub-{job.subject}/ses-{job.session}'.")
+
+        try:
+            future = self._executor.submit(run_conversion_job, job.options, job.cwd)
+        except BrokenProcessPool:
+            self._executor = self._create_executor()
+            future = self._executor.submit(run_conversion_job, job.options, job.cwd)
+
+        future.add_done_callback(lambda future: self._handle_job_done(job, future))
+
+    def _handle_job_done(self, job: ConversionJob, future: Future[dict[str, Any]]):
+        """
+        Record the outcome of a job run in the worker pool.
+        """
+
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            state, result, error = 'failed', None, "The worker process of the job terminated abruptly."
+        except ConversionError as conversion_error:
+            state, result, error = 'failed', None, str(conversion_error)
+        except Exception as exception:
+            state, result, error = 'failed', None, f"{type(exception).__name__}: {exception}"
+        else:
+            state, error = 'succeeded', None
+
+        with self._condition:
+            print_timestamped(f"Job {job.id} {state}." + (f" {error}" if error is not None else ""))
+
+            job.result = result
+            job.error = error
+            self._running_sessions.discard(job.session_key)
+            self._finish_job(job, state)
+
+    def _finish_job(self, job: ConversionJob, state: str):
+        """
+        Mark a job as finished, forget the oldest finished jobs, and wake up the scheduler and the
+        clients waiting for the job. Must be called with the condition held.
+        """
+
+        job.state = state
+        job.finished_at = time.time()
+
+        finished_job_ids = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished_job_ids[:max(len(finished_job_ids) - finished_jobs_limit, 0)]:
+            del self._jobs[job_id]
+
+        self._condition.notify_all()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        """
+        Create the pool of worker processes, which are started at once so that they are warm when
+        the first job is submitted.
+        """
+
+        # The worker processes are spawned rather than forked as the daemon runs several threads.
+        executor = ProcessPoolExecutor(
+            max_workers  = self.args.workers,
+            mp_context   = multiprocessing.get_context('spawn'),
+            initializer  = initialize_worker,
+        )
+
+        executor.submit(time.time)
+
+        return executor
+
+    def _check_socket_path(self):
+        """
+        Remove the socket file left by a previous daemon, or raise an error if another daemon is
+        listening on it.
+        """
+
+        if not os.path.exists(self.args.socket_path):
+            return
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_socket:
+            try:
+                client_socket.connect(self.args.socket_path)
+            except OSError:
+                os.remove(self.args.socket_path)
+                return
+
+        raise ConversionError(f"Another daemon is already listening on socket '{self.args.socket_path}'.")
+
+
+class _DaemonServer(socketserver.ThreadingUnixStreamServer):
+    """
+    UNIX socket server of the conversion daemon, which handles each connection in its own thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, daemon: ConversionDaemon):
+        super().__init__(socket_path, _DaemonRequestHandler)
+        self.conversion_daemon = daemon
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handler of a client connection, which reads a JSON request line and writes a JSON response line.
+    """
+
+    def handle(self):
+        request_line = self.rfile.readline(request_size_limit)
+
+        # The connections without a request are only checking that the daemon is running.
+        if request_line == b'':
+            return
+
+        try:
+            request = json.loads(request_line)
+            if not isinstance(request, dict):
+                raise InvalidArgumentsError("The request must be a JSON object.")
+
+            server = cast(_DaemonServer, self.server)
+            response = server.conversion_daemon.handle_request(cast(dict[str, Any], request))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            response = {'error': "The request is not a valid JSON line."}
+        except ConversionError as error:
+            response = {'error': str(error)}
+        except Exception as error:
+            # An unexpected error must not leave the client without a response.
+            print_warning(f"Unexpected error while handling a request of a client of the daemon: {error!r}")
+            response = {'error': f"Unexpected daemon error: {type(error).__name__}: {error}"}
+
+        try:
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+        except OSError as error:
+            print_warning(f"Cannot send a response to a client of the daemon: {error}")
+
+
+def _is_string_list(value: Any) -> TypeGuard[list[str]]:
+    """
+    Check whether a value of a JSON request is a list of strings.
+    """
+
+    return isinstance(value, list) and all(isinstance(item, str) for item in cast(list[Any], value))
+
+
+def send_daemon_request(socket_path: str, request: dict[str, Any]) -> dict[str, Any]:
+    """
+    Send a request to the conversion daemon and return its response. Raise a conversion error if
+    the daemon cannot be reached or if the request failed.
+    """
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_socket:
+            client_socket.connect(socket_path)
+            client_socket.sendall(json.dumps(request).encode() + b'\n')
+            with client_socket.makefile('rb') as response_file:
+                response_line = response_file.readline()
+    except OSError as error:
+        raise ConversionError(f"Cannot reach the conversion daemon on socket '{socket_path}': {error}")
+
+    try:
+        response = json.loads(response_line)
+    except json.JSONDecodeError:
+        raise ConversionError("The conversion daemon closed the connection without a valid response.") from None
+
+    if 'error' in response:
+        raise ConversionError(response['error'])
+
+    return response
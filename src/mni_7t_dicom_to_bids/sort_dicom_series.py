@@ -1,71 +1,333 @@
+import hashlib
 import os
+from dataclasses import dataclass, field
 
-import pydicom
 from bic_util.fs import count_all_dir_files, iter_all_dir_files
-from bic_util.print import get_progress_printer, print_error_exit
-from bic_util.util import find
-from pydicom.errors import InvalidDicomError
 
-from mni_7t_dicom_to_bids.dataclass import DicomSeriesInfo
+from mni_7t_dicom_to_bids.dataclass import DicomFileHeader, DicomSeriesDuplicates, DicomSeriesInfo
+from mni_7t_dicom_to_bids.dicom_header import read_dicom_file_header
+from mni_7t_dicom_to_bids.events import ProgressReporter, end_progress_line
+from mni_7t_dicom_to_bids.file_paths import DicomFilePaths, DirectoryTable
+from mni_7t_dicom_to_bids.profiler import Profiler, StageProfile
 
 
-def sort_dicom_series(dicom_dir_path: str) -> list[DicomSeriesInfo]:
+def sort_dicom_series(
+    dicom_dir_path: str,
+    profiler: Profiler,
+    keep_duplicates: bool = False,
+    fast_headers: bool = False,
+) -> list[DicomSeriesInfo]:
     """
     Read a DICOM directory and sort all the DICOM files according to their series description and
-    series number.
+    series number. Unless duplicates are kept, the DICOM files whose instance was already found and
+    the DICOM series that duplicate another DICOM series are dropped. If fast headers are enabled,
+    the DICOM headers are read with the minimal DICOM tag reader when possible.
     """
 
-    files_count = count_all_dir_files(dicom_dir_path)
+    with profiler.stage('walk') as stage:
+        files_count = count_all_dir_files(dicom_dir_path)
+        stage.files_count = files_count
 
-    progress = get_progress_printer(files_count)
+    with profiler.stage('read_headers') as stage:
+        dicom_series_entries = _read_dicom_series(dicom_dir_path, files_count, keep_duplicates, fast_headers, stage)
+        stage.files_count = files_count
 
-    dicom_series_entries: list[DicomSeriesInfo] = []
+    return dicom_series_entries
+
+
+@dataclass
+class _SeriesInstanceFiles:
+    """
+    The DICOM files of a DICOM series instance UID found while reading a DICOM directory.
+    """
+
+    file_paths: DicomFilePaths
+    """
+    The paths of the DICOM files.
+    """
+
+    fingerprint: int = 0
+    """
+    Order-independent fingerprint of the instance numbers and acquisition times of the DICOM files,
+    used to detect DICOM series instances that duplicate each other.
+    """
+
+    comparable: bool = True
+    """
+    Whether all the DICOM files have an instance number, which is required to compare this DICOM
+    series instance with other ones.
+    """
 
-    for dicom_file_rel_path in iter_all_dir_files(dicom_dir_path):
-        next(progress)
+    instance_numbers: set[int] = field(default_factory=set[int])
+    """
+    The instance numbers of the DICOM files, used to detect the missing DICOM files.
+    """
 
-        dicom_file_path = os.path.join(dicom_dir_path, dicom_file_rel_path)
+    echo_files_counts: dict[int | None, int] = field(default_factory=dict[int | None, int])
+    """
+    The number of DICOM files of each echo number.
+    """
 
-        try:
-            dicom = pydicom.dcmread(dicom_file_path)  # type: ignore
-        except InvalidDicomError:
-            print_error_exit(f"Could not read file '{dicom_file_path}', this file may not be a DICOM file.")
+    images_in_acquisition: set[int | None] = field(default_factory=set[int | None])
+    """
+    The numbers of images in acquisition of the DICOM files.
+    """
 
-        try:
-            series_description = dicom.SeriesDescription
-        except AttributeError:
-            print_error_exit(
-                f"Could not read series description of DICOM file '{dicom_file_path}', this file may be incorrect."
-            )
+    mosaic: bool = False
+    """
+    Whether some DICOM files are Siemens mosaics.
+    """
 
-        try:
-            series_number = dicom.SeriesNumber
-        except AttributeError:
-            print_error_exit(
-                f"Could not read series number of DICOM file '{dicom_file_path}', this file may be incorrect."
-            )
 
-        dicom_series = find(
-            lambda dicom_series: (
-                dicom_series.description == series_description
-                and dicom_series.number == series_number
-            ),
-            dicom_series_entries,
+@dataclass
+class _DicomSeriesBuilder:
+    """
+    The DICOM files of a DICOM series found while reading a DICOM directory, grouped by DICOM series
+    instance UID.
+    """
+
+    description: str
+    number: int
+    instances: dict[str | None, _SeriesInstanceFiles] = field(default_factory=dict[str | None, _SeriesInstanceFiles])
+    duplicates: DicomSeriesDuplicates = field(default_factory=DicomSeriesDuplicates)
+    skip_reasons: set[str | None] = field(default_factory=set[str | None])
+    series_instance_uids: dict[str, None] = field(default_factory=dict[str, None])
+
+
+class DicomSeriesSorter:
+    """
+    Sorter of DICOM files according to their series description and series number, to which the
+    DICOM files are added one by one. Unless duplicates are kept, the DICOM files whose instance was
+    already added and the DICOM series instances that duplicate another DICOM series instance are
+    dropped.
+    """
+
+    def __init__(self, keep_duplicates: bool = False):
+        self.keep_duplicates = keep_duplicates
+
+        # Table of the DICOM directories shared by the file paths of all the DICOM series.
+        self._directory_table = DirectoryTable()
+
+        self._dicom_series_builders: dict[tuple[str, int], _DicomSeriesBuilder] = {}
+
+        # Digests of the SOP instance UIDs of the DICOM files already added, to drop the duplicate
+        # DICOM files. The digests have a fixed size that is smaller than most UIDs, which bounds
+        # the memory used on large DICOM studies.
+        self._instance_uid_digests: set[bytes] = set()
+
+    def add_file(self, dicom_file_path: str, header: DicomFileHeader):
+        """
+        Add a DICOM file to its DICOM series.
+        """
+
+        key = (header.series_description, header.series_number)
+        dicom_series_builder = self._dicom_series_builders.get(key)
+        if dicom_series_builder is None:
+            dicom_series_builder = _DicomSeriesBuilder(header.series_description, header.series_number)
+            self._dicom_series_builders[key] = dicom_series_builder
+
+        if not self.keep_duplicates and header.sop_instance_uid is not None:
+            instance_uid_digest = _get_uid_digest(header.sop_instance_uid)
+            if instance_uid_digest in self._instance_uid_digests:
+                dicom_series_builder.duplicates.instance_files_count += 1
+                return
+
+            self._instance_uid_digests.add(instance_uid_digest)
+
+        series_instance_key = header.series_instance_uid if not self.keep_duplicates else None
+        series_instance = dicom_series_builder.instances.get(series_instance_key)
+        if series_instance is None:
+            series_instance = _SeriesInstanceFiles(DicomFilePaths(self._directory_table))
+            dicom_series_builder.instances[series_instance_key] = series_instance
+
+        series_instance.file_paths.append(dicom_file_path)
+        _add_instance_fingerprint(series_instance, header)
+        _add_instance_counts(series_instance, header)
+        dicom_series_builder.skip_reasons.add(header.skip_reason)
+
+        # The series instance UIDs are also recorded when the DICOM files are not grouped by series
+        # instance, in the order in which they are found.
+        if header.series_instance_uid is not None:
+            dicom_series_builder.series_instance_uids[header.series_instance_uid] = None
+
+    def get_dicom_series(self) -> list[DicomSeriesInfo]:
+        """
+        Get the sorted DICOM series of the added DICOM files.
+        """
+
+        dicom_series_entries = [
+            _build_dicom_series(dicom_series_builder, self._directory_table)
+            for dicom_series_builder in self._dicom_series_builders.values()
+        ]
+
+        dicom_series_entries.sort()
+
+        return dicom_series_entries
+
+
+def _read_dicom_series(
+    dicom_dir_path: str,
+    files_count: int,
+    keep_duplicates: bool,
+    fast_headers: bool,
+    stage: StageProfile,
+) -> list[DicomSeriesInfo]:
+    """
+    Read the headers of the DICOM files of a DICOM directory and group these files by DICOM series.
+    The sizes of the DICOM files are added to the bytes read by the profiled stage.
+    """
+
+    progress = ProgressReporter('read_headers', files_count)
+
+    sorter = DicomSeriesSorter(keep_duplicates)
+
+    try:
+        for dicom_file_rel_path in iter_all_dir_files(dicom_dir_path):
+            progress.update()
+
+            dicom_file_path = os.path.join(dicom_dir_path, dicom_file_rel_path)
+            stage.bytes_read += os.path.getsize(dicom_file_path)
+
+            sorter.add_file(dicom_file_path, read_dicom_file_header(dicom_file_path, fast_headers))
+
+            # TODO: Handle session numbers.
+    except BaseException:
+        # The error is printed after the progress line.
+        end_progress_line()
+        raise
+
+    progress.close()
+
+    return sorter.get_dicom_series()
+
+
+def _get_uid_digest(uid: str) -> bytes:
+    """
+    Get a 16 bytes digest of a DICOM UID, whose collisions are negligible for any number of DICOM
+    files.
+    """
+
+    return hashlib.blake2b(uid.encode(), digest_size=16).digest()
+
+
+def _add_instance_fingerprint(series_instance: _SeriesInstanceFiles, header: DicomFileHeader):
+    """
+    Add the instance number and acquisition time of a DICOM file to the fingerprint of its DICOM
+    series instance.
+    """
+
+    if header.instance_number is None:
+        series_instance.comparable = False
+        return
+
+    instance_hash = hash((header.instance_number, header.acquisition_time))
+    series_instance.fingerprint = (series_instance.fingerprint + instance_hash) % 2**64
+
+
+def _add_instance_counts(series_instance: _SeriesInstanceFiles, header: DicomFileHeader):
+    """
+    Add the instance number, echo number and number of images in acquisition of a DICOM file to the
+    counts of its DICOM series instance.
+    """
+
+    if header.instance_number is not None:
+        series_instance.instance_numbers.add(header.instance_number)
+
+    echo_files_counts = series_instance.echo_files_counts
+    echo_files_counts[header.echo_number] = echo_files_counts.get(header.echo_number, 0) + 1
+    series_instance.images_in_acquisition.add(header.images_in_acquisition)
+    series_instance.mosaic |= header.mosaic
+
+
+def _get_incomplete_reason(series_instances: list[_SeriesInstanceFiles]) -> str | None:
+    """
+    Get the reason why some DICOM files seem to be missing from the kept DICOM series instances of a
+    DICOM series, or `None` if the DICOM series seems complete. A DICOM series is incomplete if the
+    instance numbers of a DICOM series instance have gaps, if its echoes do not have the same number
+    of DICOM files, or if the number of DICOM files of an echo is not a multiple of the number of
+    images in acquisition shared by the DICOM files, which is not checked for the mosaics.
+    """
+
+    echo_files_counts: dict[int | None, int] = {}
+    images_in_acquisition: set[int | None] = set()
+    mosaic = False
+
+    for series_instance in series_instances:
+        instance_numbers = series_instance.instance_numbers
+        if instance_numbers != set():
+            missing_count = max(instance_numbers) - min(instance_numbers) + 1 - len(instance_numbers)
+            if missing_count > 0:
+                return (
+                    f"{missing_count} missing instance numbers between {min(instance_numbers)} and"
+                    f" {max(instance_numbers)}"
+                )
+
+        for echo_number, files_count in series_instance.echo_files_counts.items():
+            echo_files_counts[echo_number] = echo_files_counts.get(echo_number, 0) + files_count
+
+        images_in_acquisition |= series_instance.images_in_acquisition
+        mosaic |= series_instance.mosaic
+
+    if len(set(echo_files_counts.values())) > 1:
+        counts = ', '.join(
+            f'echo {echo_number}: {files_count}'
+            for echo_number, files_count in sorted(echo_files_counts.items(), key=lambda item: item[0] or 0)
         )
 
-        if dicom_series is None:
-            dicom_series = DicomSeriesInfo(
-                description = series_description,
-                number      = series_number,
-                file_paths  = [],
-            )
+        return f"the echoes have different numbers of DICOM files ({counts})"
 
-            dicom_series_entries.append(dicom_series)
+    if len(images_in_acquisition) == 1 and not mosaic:
+        images_count = next(iter(images_in_acquisition))
+        files_count = next(iter(echo_files_counts.values()), 0)
+        if images_count is not None and images_count > 0 and files_count % images_count != 0:
+            return f"{files_count} DICOM files per echo are not a multiple of the {images_count} images in acquisition"
 
-        dicom_series.file_paths.append(dicom_file_path)
+    return None
 
-        # TODO: Handle session numbers.
 
-    dicom_series_entries.sort()
+def _build_dicom_series(dicom_series_builder: _DicomSeriesBuilder, directory_table: DirectoryTable) -> DicomSeriesInfo:
+    """
+    Build a DICOM series from the DICOM files found for it, dropping the DICOM series instances
+    that have the same DICOM files as a previous DICOM series instance.
+    """
 
-    return dicom_series_entries
+    duplicates = dicom_series_builder.duplicates
+
+    kept_fingerprints: set[tuple[int, int]] = set()
+    kept_series_instances: list[_SeriesInstanceFiles] = []
+    file_paths = DicomFilePaths(directory_table)
+
+    for series_instance_uid, series_instance in dicom_series_builder.instances.items():
+        fingerprint = (len(series_instance.file_paths), series_instance.fingerprint)
+        if series_instance.comparable and fingerprint in kept_fingerprints:
+            duplicates.series_instance_uids.append(str(series_instance_uid))
+            duplicates.series_files_count += len(series_instance.file_paths)
+            continue
+
+        if series_instance.comparable:
+            kept_fingerprints.add(fingerprint)
+
+        kept_series_instances.append(series_instance)
+
+        for file_path in series_instance.file_paths:
+            file_paths.append(file_path)
+
+    # A DICOM series is only skipped if all its DICOM files have the same skip reason.
+    skip_reasons = dicom_series_builder.skip_reasons
+    skip_reason = next(iter(skip_reasons)) if len(skip_reasons) == 1 else None
+
+    series_instance_uids = [
+        series_instance_uid
+        for series_instance_uid in dicom_series_builder.series_instance_uids
+        if series_instance_uid not in duplicates.series_instance_uids
+    ]
+
+    return DicomSeriesInfo(
+        description          = dicom_series_builder.description,
+        number               = dicom_series_builder.number,
+        file_paths           = file_paths,
+        duplicates           = duplicates,
+        skip_reason          = skip_reason,
+        series_instance_uids = series_instance_uids,
+        incomplete_reason    = _get_incomplete_reason(kept_series_instances),
+    )
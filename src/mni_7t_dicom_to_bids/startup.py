@@ -0,0 +1,88 @@
+import importlib
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+# The modules that are imported lazily by the MNI 7T DICOM to BIDS converter once its arguments
+# have been parsed, in the order in which they are imported.
+stage_module_names = [
+    'pydicom',
+    'mni_7t_dicom_to_bids.sort_dicom_series',
+    'mni_7t_dicom_to_bids.map_dicom_series',
+    'mni_7t_dicom_to_bids.post_process',
+    'mni_7t_dicom_to_bids.history',
+    'mni_7t_dicom_to_bids.convert_dicom_series',
+    'mni_7t_dicom_to_bids.catalog',
+    'mni_7t_dicom_to_bids.preflight',
+    'mni_7t_dicom_to_bids.provenance',
+    'mni_7t_dicom_to_bids.qc',
+    'mni_7t_dicom_to_bids.dataset_files',
+    'mni_7t_dicom_to_bids.pipeline',
+]
+
+
+@dataclass
+class ModuleImportTime:
+    """
+    The time taken to import a module and its not yet imported dependencies.
+    """
+
+    name: str
+    """
+    The name of the imported module.
+    """
+
+    duration: float
+    """
+    The import duration of the module in seconds.
+    """
+
+    modules_count: int
+    """
+    The number of modules that were loaded by the import, including the module itself.
+    """
+
+
+def get_startup_time() -> float | None:
+    """
+    Get the time elapsed since the start of the process in seconds, or `None` if this time is not
+    available on this system.
+    """
+
+    try:
+        with open('/proc/self/stat') as file:
+            stat = file.read()
+
+        with open('/proc/uptime') as file:
+            uptime = float(file.read().split()[0])
+    except OSError:
+        return None
+
+    # The process name may contain spaces, so the fields are read after its closing parenthesis,
+    # the start time being the 22nd field of the file.
+    start_ticks = int(stat[stat.rindex(')') + 2:].split()[19])
+    return max(uptime - start_ticks / os.sysconf('SC_CLK_TCK'), 0.0)
+
+
+def profile_stage_imports() -> list[ModuleImportTime]:
+    """
+    Import the stage modules of the MNI 7T DICOM to BIDS converter one by one and measure the time
+    taken by each import. Modules that are already imported are reported with a zero duration.
+    """
+
+    import_times: list[ModuleImportTime] = []
+
+    for module_name in stage_module_names:
+        modules_count = len(sys.modules)
+        start_time = time.perf_counter()
+        importlib.import_module(module_name)
+        duration = time.perf_counter() - start_time
+
+        import_times.append(ModuleImportTime(
+            name          = module_name,
+            duration      = duration,
+            modules_count = len(sys.modules) - modules_count,
+        ))
+
+    return import_times
@@ -1,6 +1,5 @@
 
 # MNI (MPN,MICA,JBL 7T Series) DICTIONARY
-=======
 # MNI DICOM2BIDS DICTIONARY   
 # Mapping DICOM series to BIDS information.
 # The first key if the BIDS data type name.
@@ -169,6 +168,36 @@ bids_dicom_ignores: list[str] = [
     'PhoenixZIPReport',
 ]
 
+# DICOM series that cannot or need not be converted to NIfTI are skipped if they are not mapped to
+# a BIDS acquisition, using the following DICOM header values. Each value is associated with the
+# reason displayed for the skipped DICOM series.
+
+# SOP class UIDs of the non-image DICOM objects, which also match their sub-classes.
+dicom_skip_sop_class_uids: dict[str, str] = {
+    '1.2.840.10008.5.1.4.1.1.7':   'secondary capture',
+    '1.2.840.10008.5.1.4.1.1.11':  'presentation state',
+    '1.2.840.10008.5.1.4.1.1.66':  'raw data',
+    '1.2.840.10008.5.1.4.1.1.88':  'structured report',
+    '1.2.840.10008.5.1.4.1.1.104': 'encapsulated document',
+    '1.3.12.2.1107.5.9.1':         'Siemens non-image object (PhoenixZIPReport)',
+}
+
+# Modalities of the non-image DICOM objects.
+dicom_skip_modalities: dict[str, str] = {
+    'DOC': 'encapsulated document',
+    'KO':  'key object selection',
+    'PR':  'presentation state',
+    'SR':  'structured report',
+}
+
+# Image type values of the localizers and reformatted DICOM images.
+dicom_skip_image_types: dict[str, str] = {
+    'LOCALIZER':   'localizer',
+    'MPR':         'MPR reformat',
+    'CSA MPR':     'MPR reformat',
+    'REFORMATTED': 'MPR reformat',
+}
+
 # The order in which the BIDS entities should appear in a BIDS file name.
 # This order is taken from the BIDS specification entity table:
 # https://bids-specification.readthedocs.io/en/stable/appendices/entity-table.html
@@ -188,3 +217,15 @@ bids_label_order = [
     'chunk',
     'desc',  # Note that 'desc' is not in the entity table.
 ]
+
+# List of DICOM series descriptions that can be converted by the in-process NIfTI writer when it is
+# enabled. These DICOM series are stacks of single-frame derived slices, and are still converted with
+# dcm2niix if their files turn out not to be a simple stack of slices.
+native_writer_dicom_series: list[str] = [
+    '*_MIP_COR',
+    '*_MIP_SAG',
+    '*_MIP_TRA',
+    '*Romeo_Mask_*',
+    '*_UNI-DEN',
+    '*_T1_Images',
+]
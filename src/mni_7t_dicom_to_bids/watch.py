@@ -0,0 +1,222 @@
+import os
+import re
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+from bic_util.print import print_warning
+
+from mni_7t_dicom_to_bids.args import WatchArgs
+from mni_7t_dicom_to_bids.print import print_timestamped
+
+# Pattern of the valid BIDS subject and session labels.
+bids_label_pattern = re.compile(r'[a-zA-Z0-9]+')
+
+# Name of the converter executable compiled with PyInstaller.
+frozen_converter_name = 'mni7t_dcm2bids'
+
+
+@dataclass(frozen=True)
+class StudySnapshot:
+    """
+    The state of the files of a DICOM study directory at a given time, which is used to detect
+    when a DICOM study has been fully transferred.
+    """
+
+    files_count: int
+    """
+    The number of files in the DICOM study directory.
+    """
+
+    size: int
+    """
+    The total size of the files in the DICOM study directory.
+    """
+
+    last_modification_time: float
+    """
+    The latest modification time of the files in the DICOM study directory.
+    """
+
+
+@dataclass
+class _WatchedStudy:
+    """
+    A DICOM study directory found in the drop directory.
+    """
+
+    snapshot: StudySnapshot
+    """
+    The latest snapshot of the DICOM study directory.
+    """
+
+    stable_since: float
+    """
+    The monotonic time since which the snapshot of the DICOM study directory has not changed.
+    """
+
+    done: bool = False
+    """
+    Whether the DICOM study has been processed, successfully or not, and is no longer watched.
+    """
+
+
+def watch_drop_directory(args: WatchArgs):
+    """
+    Poll a drop directory and convert each DICOM study directory that lands in it once its files
+    have stopped changing for the stable time. If the `once` argument is set, return once all the
+    DICOM studies present in the drop directory have been processed.
+    """
+
+    print_timestamped(f"Watching directory '{args.drop_dir_path}' for DICOM studies...")
+
+    watched_studies: dict[str, _WatchedStudy] = {}
+
+    while True:
+        study_names = _list_study_names(args.drop_dir_path)
+
+        # Forget the DICOM studies that were removed from the drop directory.
+        for study_name in list(watched_studies):
+            if study_name not in study_names:
+                del watched_studies[study_name]
+
+        for study_name in study_names:
+            watched_study = watched_studies.get(study_name)
+            if watched_study is not None and watched_study.done:
+                continue
+
+            study_path = os.path.join(args.drop_dir_path, study_name)
+            snapshot = get_study_snapshot(study_path)
+            now = time.monotonic()
+
+            if watched_study is None or watched_study.snapshot != snapshot:
+                watched_studies[study_name] = _WatchedStudy(snapshot, now)
+                continue
+
+            if snapshot.files_count == 0 or now - watched_study.stable_since < args.stable_time:
+                continue
+
+            watched_study.done = True
+            process_study(args, study_name)
+
+        if args.once and all(
+            watched_study.done or watched_study.snapshot.files_count == 0
+            for watched_study in watched_studies.values()
+        ):
+            return
+
+        time.sleep(args.poll_interval)
+
+
+def get_study_snapshot(study_path: str) -> StudySnapshot:
+    """
+    Get the current snapshot of the files of a DICOM study directory.
+    """
+
+    files_count = 0
+    size = 0
+    last_modification_time = 0.0
+    for dir_path, _, file_names in os.walk(study_path):
+        for file_name in file_names:
+            try:
+                stat = os.stat(os.path.join(dir_path, file_name))
+            except FileNotFoundError:
+                # The file was removed or renamed during the walk, the next poll will see it.
+                continue
+
+            files_count += 1
+            size += stat.st_size
+            last_modification_time = max(last_modification_time, stat.st_mtime)
+
+    return StudySnapshot(files_count, size, last_modification_time)
+
+
+def get_study_labels(study_pattern: re.Pattern[str], study_name: str) -> tuple[str, str] | None:
+    """
+    Get the BIDS subject and session labels of a DICOM study from the name of its directory, or
+    `None` if the name does not match the study pattern or does not give valid BIDS labels.
+    """
+
+    match = study_pattern.fullmatch(study_name)
+    if match is None:
+        return None
+
+    subject = match.group('subject')
+    session = match.group('session')
+    if bids_label_pattern.fullmatch(subject) is None or bids_label_pattern.fullmatch(session) is None:
+        return None
+
+    return subject, session
+
+
+def process_study(args: WatchArgs, study_name: str):
+    """
+    Convert a stable DICOM study of the drop directory to BIDS by running the converter in a
+    separate process, so that a failed conversion does not stop the watch.
+    """
+
+    labels = get_study_labels(args.study_pattern, study_name)
+    if labels is None:
+        print_warning(
+            f"Directory '{study_name}' does not match the study pattern or does not give valid BIDS labels, this"
+            " directory will be ignored."
+        )
+        return
+
+    subject, session = labels
+
+    session_path = os.path.join(args.bids_dataset_path, f'sub-{subject}', f'ses-{session}')
+    if os.path.exists(session_path) and '--overwrite' not in args.converter_options:
+        print_warning(
+            f"BIDS session 'sub-{subject}/ses-{session}' already exists, directory '{study_name}' will be ignored."
+        )
+        return
+
+    command = [
+        *get_converter_command(),
+        os.path.join(args.drop_dir_path, study_name),
+        args.bids_dataset_path,
+        '--subject', subject,
+        '--session', session,
+        *args.converter_options,
+    ]
+
+    print_timestamped(f"Converting directory '{study_name}' to BIDS session 'sub-{subject}/ses-{session}'...")
+
+    start_time = time.monotonic()
+    process = subprocess.run(command)
+    duration = time.monotonic() - start_time
+
+    if process.returncode == 0:
+        print_timestamped(f"Converted directory '{study_name}' in {duration:.0f}s.")
+    else:
+        print_warning(
+            f"Conversion of directory '{study_name}' failed with exit code {process.returncode} after"
+            f" {duration:.0f}s, this directory will not be converted again until the watch is restarted."
+        )
+
+
+def get_converter_command() -> list[str]:
+    """
+    Get the command that runs the converter in a separate process. If the watch is compiled with
+    PyInstaller, the Python interpreter is not available and the compiled converter executable of
+    the same directory is run instead.
+    """
+
+    if getattr(sys, 'frozen', False):
+        return [os.path.join(os.path.dirname(sys.executable), frozen_converter_name)]
+
+    return [sys.executable, '-m', 'mni_7t_dicom_to_bids.scripts.run_mni7t_dcm2bids']
+
+
+def _list_study_names(drop_dir_path: str) -> list[str]:
+    """
+    List the names of the DICOM study directories of the drop directory, ignoring hidden
+    directories which are commonly used for in-progress transfers.
+    """
+
+    return sorted(
+        dir_entry.name for dir_entry in os.scandir(drop_dir_path)
+        if dir_entry.is_dir() and not dir_entry.name.startswith('.')
+    )
@@ -0,0 +1,56 @@
+from collections.abc import Callable
+from typing import Any
+
+import pydicom
+import pytest
+from pydicom.dataset import Dataset, FileDataset, FileMetaDataset
+from pydicom.sequence import Sequence
+from pydicom.uid import UID, ExplicitVRLittleEndian, MRImageStorage, generate_uid
+
+
+def write_dicom_file(
+    file_path: str,
+    transfer_syntax_uid: UID = ExplicitVRLittleEndian,
+    undefined_length_sequence: bool = False,
+    **attributes: Any,
+) -> pydicom.Dataset:
+    """
+    Write a small MR DICOM file with the given attributes, which are added to default series and
+    instance attributes. An undefined length sequence can be added before the attributes read by
+    the fast DICOM header reader.
+    """
+
+    file_meta = FileMetaDataset()
+    file_meta.MediaStorageSOPClassUID = MRImageStorage
+    file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    file_meta.TransferSyntaxUID = transfer_syntax_uid
+
+    dataset = FileDataset(file_path, {}, file_meta=file_meta, preamble=b'\0' * 128)
+    dataset.SOPClassUID = MRImageStorage
+    dataset.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+    dataset.Modality = 'MR'
+    dataset.SeriesDescription = 'anat-flair_acq-0p7mm_UPAdia'
+    dataset.SeriesNumber = 1
+    dataset.SeriesInstanceUID = generate_uid()
+    dataset.InstanceNumber = 1
+
+    if undefined_length_sequence:
+        item = Dataset()
+        item.CodeValue = 'MNI'
+        dataset.InstitutionCodeSequence = Sequence([item])
+        dataset['InstitutionCodeSequence'].is_undefined_length = True
+
+    for keyword, value in attributes.items():
+        setattr(dataset, keyword, value)
+
+    pydicom.dcmwrite(file_path, dataset, enforce_file_format=True)
+    return dataset
+
+
+@pytest.fixture
+def dicom_file_writer() -> Callable[..., pydicom.Dataset]:
+    """
+    Get the function that writes the small DICOM files of the tests.
+    """
+
+    return write_dicom_file
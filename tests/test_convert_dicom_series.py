@@ -0,0 +1,56 @@
+from mni_7t_dicom_to_bids.args import ConversionFiltersArg
+from mni_7t_dicom_to_bids.convert_dicom_series import is_filtered_dicom_series
+from mni_7t_dicom_to_bids.dataclass import BidsAcquisitionInfo, DicomSeriesInfo
+from mni_7t_dicom_to_bids.map_dicom_series import find_bids_dicom_mapping
+
+flair_series = DicomSeriesInfo('anat-flair_acq-0p7mm_UPAdia', 6, [])
+flair_acquisition = BidsAcquisitionInfo('anat', 'FLAIR')
+unknown_series = DicomSeriesInfo('unknown_series', 7, [])
+
+
+def test_filter_without_filters():
+    """
+    All the DICOM series match the empty filters.
+    """
+
+    filters = ConversionFiltersArg()
+
+    assert is_filtered_dicom_series(filters, flair_series, flair_acquisition)
+    assert is_filtered_dicom_series(filters, unknown_series, None)
+
+
+def test_filter_series_numbers():
+    """
+    The DICOM series number filter applies to the mapped and unknown DICOM series.
+    """
+
+    filters = ConversionFiltersArg(series_numbers=[7])
+
+    assert not is_filtered_dicom_series(filters, flair_series, flair_acquisition)
+    assert is_filtered_dicom_series(filters, unknown_series, None)
+
+
+def test_filter_acquisitions():
+    """
+    The data type, acquisition and mapping filters only match the mapped DICOM series.
+    """
+
+    mapping = find_bids_dicom_mapping(flair_series.description)
+    assert mapping == (flair_acquisition, 'anat-flair_acq-0p7mm_UPAdia')
+
+    for filters in (
+        ConversionFiltersArg(data_types=['anat']),
+        ConversionFiltersArg(acquisition_patterns=['FLA*']),
+        ConversionFiltersArg(mapping_patterns=['anat-flair_acq-0p7mm_UPAdia']),
+        ConversionFiltersArg(data_types=['anat'], series_numbers=[6]),
+    ):
+        assert is_filtered_dicom_series(filters, flair_series, flair_acquisition)
+        assert not is_filtered_dicom_series(filters, unknown_series, None)
+
+    for filters in (
+        ConversionFiltersArg(data_types=['func']),
+        ConversionFiltersArg(acquisition_patterns=['T1w']),
+        ConversionFiltersArg(mapping_patterns=['anat-flair_acq-0p7iso_UPAdia']),
+        ConversionFiltersArg(data_types=['anat'], series_numbers=[7]),
+    ):
+        assert not is_filtered_dicom_series(filters, flair_series, flair_acquisition)
@@ -0,0 +1,120 @@
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+import pydicom
+import pytest
+from pydicom.uid import ExplicitVRBigEndian, ExplicitVRLittleEndian, ImplicitVRLittleEndian
+
+from mni_7t_dicom_to_bids.dicom_header import (
+    _fast_header_tags,
+    _images_in_acquisition_tag,
+    read_dicom_file_header,
+    read_fast_dicom_file_header,
+)
+from mni_7t_dicom_to_bids.dicom_tag_reader import read_dicom_tags
+
+# Attributes of the DICOM files of the tests, in addition to the default attributes.
+dicom_attributes_list = [
+    {},
+    {
+        'SpecificCharacterSet': 'ISO_IR 192',
+        'SeriesDescription':    'anat-flaïr_acq-0p7mm_UPAdia',
+        'ImageType':            ['ORIGINAL', 'PRIMARY', 'M', 'MOSAIC'],
+        'AcquisitionTime':      '101010.5',
+        'EchoNumbers':          2,
+        'ImagesInAcquisition':  40,
+    },
+    {
+        'ImageType':       ['DERIVED', 'SECONDARY', 'PHYSIO'],
+        'SeriesNumber':    12,
+        'InstanceNumber':  '',
+    },
+    {
+        'SOPClassUID': '1.2.840.10008.5.1.4.1.1.7',
+        'Modality':    'SR',
+    },
+]
+
+
+@pytest.mark.parametrize('transfer_syntax_uid', [ExplicitVRLittleEndian, ImplicitVRLittleEndian])
+@pytest.mark.parametrize('undefined_length_sequence', [False, True])
+@pytest.mark.parametrize('attributes', dicom_attributes_list)
+def test_same_header_as_pydicom(
+    tmp_path: Path,
+    dicom_file_writer: Callable[..., pydicom.Dataset],
+    transfer_syntax_uid: str,
+    undefined_length_sequence: bool,
+    attributes: dict[str, object],
+):
+    """
+    The fast DICOM header reader reads the same attributes and header fields as pydicom.
+    """
+
+    dicom_file_path = os.path.join(tmp_path, 'file.dcm')
+    dicom_file_writer(dicom_file_path, transfer_syntax_uid, undefined_length_sequence, **attributes)
+
+    values = read_dicom_tags(dicom_file_path, _fast_header_tags, _images_in_acquisition_tag)
+    assert values is not None
+
+    dicom = pydicom.dcmread(dicom_file_path, stop_before_pixels=True)
+    assert set(values) == {tag for tag in _fast_header_tags if tag in dicom}
+
+    fast_header = read_fast_dicom_file_header(dicom_file_path)
+    assert fast_header is not None
+    assert fast_header == read_dicom_file_header(dicom_file_path)
+
+
+def test_unsupported_transfer_syntax(tmp_path: Path, dicom_file_writer: Callable[..., pydicom.Dataset]):
+    """
+    The big-endian DICOM files are not read by the fast DICOM header reader, but are still read
+    with pydicom when the fast reader is requested.
+    """
+
+    dicom_file_path = os.path.join(tmp_path, 'file.dcm')
+    dicom_file_writer(dicom_file_path, ExplicitVRBigEndian)
+
+    assert read_dicom_tags(dicom_file_path, _fast_header_tags, _images_in_acquisition_tag) is None
+    assert read_fast_dicom_file_header(dicom_file_path) is None
+    assert read_dicom_file_header(dicom_file_path, fast=True) == read_dicom_file_header(dicom_file_path)
+
+
+def test_not_dicom_file(tmp_path: Path):
+    """
+    The files without a DICOM preamble are not read by the fast DICOM header reader.
+    """
+
+    file_path = os.path.join(tmp_path, 'file.txt')
+    with open(file_path, 'wb') as file:
+        file.write(b'not a DICOM file' * 20)
+
+    assert read_dicom_tags(file_path, _fast_header_tags, _images_in_acquisition_tag) is None
+
+
+@pytest.mark.filterwarnings('ignore:Unknown encoding')
+@pytest.mark.parametrize('value, non_ascii_value', [
+    (b'ORIGINAL', b'ORIGIN\xc1L'),
+    (b'ISO_IR 100', b'ISO_IR \xb100'),
+])
+def test_non_ascii_values(
+    tmp_path: Path,
+    dicom_file_writer: Callable[..., pydicom.Dataset],
+    value: bytes,
+    non_ascii_value: bytes,
+):
+    """
+    The DICOM files with non-ASCII bytes in an ASCII attribute are not read by the fast DICOM header
+    reader, but are still read with pydicom when the fast reader is requested.
+    """
+
+    dicom_file_path = os.path.join(tmp_path, 'file.dcm')
+    dicom_file_writer(dicom_file_path, SpecificCharacterSet='ISO_IR 100', ImageType=['ORIGINAL', 'PRIMARY', 'M'])
+
+    with open(dicom_file_path, 'rb') as file:
+        content = file.read()
+
+    with open(dicom_file_path, 'wb') as file:
+        file.write(content.replace(value, non_ascii_value))
+
+    assert read_fast_dicom_file_header(dicom_file_path) is None
+    assert read_dicom_file_header(dicom_file_path, fast=True) == read_dicom_file_header(dicom_file_path)
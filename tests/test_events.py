@@ -0,0 +1,65 @@
+import io
+import sys
+
+import pytest
+
+from mni_7t_dicom_to_bids.events import ProgressReporter, _config, print_info
+
+
+class TerminalOutput(io.StringIO):
+    """
+    Standard output that is seen as a terminal.
+    """
+
+    def isatty(self) -> bool:
+        return True
+
+
+def use_terminal_output(monkeypatch: pytest.MonkeyPatch) -> TerminalOutput:
+    """
+    Replace the standard output by a terminal output and report each progress update.
+    """
+
+    terminal_output = TerminalOutput()
+    monkeypatch.setattr(sys, 'stdout', terminal_output)
+    monkeypatch.setattr(_config, 'quiet', False)
+    monkeypatch.setattr(_config, 'progress_interval', 0)
+    return terminal_output
+
+
+def test_in_place_progress(monkeypatch: pytest.MonkeyPatch):
+    """
+    The progress line updated in place is ended before the other messages.
+    """
+
+    terminal_output = use_terminal_output(monkeypatch)
+
+    progress = ProgressReporter('read_headers', 2)
+    progress.update()
+    print_info("Message")
+    progress.update()
+    progress.close()
+    print_info("Done")
+
+    assert terminal_output.getvalue() == (
+        "\r\033[Kread_headers: 1 / 2 (ETA: 0s)\n"
+        "Message\n"
+        "\r\033[Kread_headers: 2 / 2 (ETA: 0s)"
+        "\r\033[Kread_headers: 2 / 2\n"
+        "Done\n"
+    )
+
+
+def test_line_progress(monkeypatch: pytest.MonkeyPatch):
+    """
+    The progress of the stages that print other output is printed one line per report.
+    """
+
+    terminal_output = use_terminal_output(monkeypatch)
+
+    progress = ProgressReporter('convert', 2, in_place=False)
+    progress.update()
+    print_info("Running dcm2niix")
+    progress.close()
+
+    assert terminal_output.getvalue() == "convert: 1 / 2 (ETA: 0s)\nRunning dcm2niix\nconvert: 1 / 2\n"
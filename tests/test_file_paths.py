@@ -0,0 +1,66 @@
+import pytest
+
+from mni_7t_dicom_to_bids.file_paths import DicomFilePaths, DirectoryTable
+
+file_paths = [
+    '/data/study/a/1.dcm',
+    '/data/study/a/2.dcm',
+    '/data/study/b/é.dcm',
+    'relative/3.dcm',
+    '4.dcm',
+]
+
+
+def get_dicom_file_paths(directory_table: DirectoryTable | None = None) -> DicomFilePaths:
+    """
+    Get a DICOM file path list with the test file paths.
+    """
+
+    dicom_file_paths = DicomFilePaths(directory_table or DirectoryTable())
+    for file_path in file_paths:
+        dicom_file_paths.append(file_path)
+
+    return dicom_file_paths
+
+
+def test_sequence():
+    """
+    The DICOM file path list behaves as a list of the appended file paths.
+    """
+
+    dicom_file_paths = get_dicom_file_paths()
+
+    assert len(dicom_file_paths) == len(file_paths)
+    assert list(dicom_file_paths) == file_paths
+    assert [dicom_file_paths[i] for i in range(len(file_paths))] == file_paths
+    assert dicom_file_paths[-1] == file_paths[-1]
+    assert dicom_file_paths[1:4] == file_paths[1:4]
+    assert dicom_file_paths[::-2] == file_paths[::-2]
+    assert '/data/study/b/é.dcm' in dicom_file_paths
+    assert dicom_file_paths.index('relative/3.dcm') == 3
+
+
+def test_index_out_of_range():
+    """
+    The indices outside the list raise an index error.
+    """
+
+    dicom_file_paths = get_dicom_file_paths()
+
+    with pytest.raises(IndexError):
+        dicom_file_paths[len(file_paths)]
+
+    with pytest.raises(IndexError):
+        dicom_file_paths[-len(file_paths) - 1]
+
+
+def test_shared_directory_table():
+    """
+    The directory paths are stored once in the directory table shared by several lists.
+    """
+
+    directory_table = DirectoryTable()
+    get_dicom_file_paths(directory_table)
+    get_dicom_file_paths(directory_table)
+
+    assert directory_table.dir_paths == ['/data/study/a', '/data/study/b', 'relative', '']
@@ -0,0 +1,178 @@
+import json
+from pathlib import Path
+
+from mni_7t_dicom_to_bids.migrate import apply_session_migration, get_series_migration, plan_session_migration
+from mni_7t_dicom_to_bids.provenance import (
+    OutputProvenance,
+    SeriesProvenance,
+    SessionProvenance,
+    get_provenance_file_path,
+    read_provenance_file,
+)
+
+
+def get_old_flair_series() -> SeriesProvenance:
+    """
+    Get the provenance of a FLAIR DICOM series converted with an older BIDS mapping.
+    """
+
+    return SeriesProvenance(
+        description          = 'anat-flair_acq-0p7mm_UPAdia',
+        number               = 6,
+        series_instance_uids = ['1.2.3.6'],
+        data_type            = 'anat',
+        mapping_name         = 'acq-old_FLAIR',
+        mapping_pattern      = 'anat-flair_acq-0p7mm_UPAdia',
+        base_name            = 'sub-01_ses-a_acq-old_FLAIR',
+        outputs              = [
+            OutputProvenance('anat/sub-01_ses-a_acq-old_FLAIR.json', 'sub-01_ses-a_acq-old_FLAIR.json'),
+            OutputProvenance('anat/sub-01_ses-a_acq-old_FLAIR.nii.gz', 'sub-01_ses-a_acq-old_FLAIR.nii.gz'),
+        ],
+    )
+
+
+def get_new_flair_series() -> SeriesProvenance:
+    """
+    Get the provenance of the FLAIR DICOM series with the current BIDS mapping.
+    """
+
+    return SeriesProvenance(
+        description          = 'anat-flair_acq-0p7mm_UPAdia',
+        number               = 6,
+        series_instance_uids = ['1.2.3.6'],
+        data_type            = 'anat',
+        mapping_name         = 'FLAIR',
+        mapping_pattern      = 'anat-flair_acq-0p7mm_UPAdia',
+        base_name            = 'sub-01_ses-a_FLAIR',
+    )
+
+
+def get_session_provenance() -> SessionProvenance:
+    """
+    Get the provenance of a session with a renamed, an orphan, an unchanged and a new DICOM series.
+    """
+
+    return SessionProvenance('01', 'a', [
+        get_old_flair_series(),
+        SeriesProvenance(
+            description          = 'unknown_series',
+            number               = 7,
+            series_instance_uids = ['1.2.3.7'],
+            data_type            = 'anat',
+            mapping_name         = 'T2w',
+            base_name            = 'sub-01_ses-a_T2w',
+            outputs              = [OutputProvenance('anat/sub-01_ses-a_T2w.nii.gz', 'sub-01_ses-a_T2w.nii.gz')],
+        ),
+        SeriesProvenance('unknown_series', 8, ['1.2.3.8'], None),
+        SeriesProvenance('func-audiobook2_acq-mbep2d_ME_19mm', 12, ['1.2.3.12'], None),
+    ])
+
+
+def write_session_files(bids_dataset_path: Path, provenance: SessionProvenance):
+    """
+    Write the output files of the converted DICOM series of a session.
+    """
+
+    session_dir_path = bids_dataset_path / 'sub-01' / 'ses-a'
+    for series in provenance.series:
+        for output in series.outputs:
+            output_file_path = session_dir_path / output.path
+            output_file_path.parent.mkdir(parents=True, exist_ok=True)
+            output_file_path.write_text(json.dumps({'Name': output_file_path.name}))
+
+
+def test_plan_session_migration(tmp_path: Path):
+    """
+    The DICOM series are renamed, left as orphans, unchanged or to convert according to the
+    current BIDS mappings.
+    """
+
+    provenance = get_session_provenance()
+    write_session_files(tmp_path, provenance)
+
+    migrations = plan_session_migration(str(tmp_path), provenance)
+
+    assert [(migration.series.number, migration.action) for migration in migrations] == [
+        (6, 'rename'),
+        (7, 'orphan'),
+        (8, 'unchanged'),
+        (12, 'convert'),
+    ]
+
+    assert [(file.old_path, file.new_path) for file in migrations[0].files] == [
+        ('anat/sub-01_ses-a_acq-old_FLAIR.json', 'anat/sub-01_ses-a_FLAIR.json'),
+        ('anat/sub-01_ses-a_acq-old_FLAIR.nii.gz', 'anat/sub-01_ses-a_FLAIR.nii.gz'),
+    ]
+
+    new_series = migrations[3].new_series
+    assert new_series is not None
+    assert (new_series.data_type, new_series.base_name) == ('func', 'sub-01_ses-a_task-audiobook2_bold')
+
+
+def test_migration_conflicts(tmp_path: Path):
+    """
+    The DICOM series whose files are missing or whose new files already exist are not renamed.
+    """
+
+    provenance = get_session_provenance()
+
+    migrations = plan_session_migration(str(tmp_path), provenance)
+    assert migrations[0].action == 'conflict'
+    assert migrations[0].reason == "File 'anat/sub-01_ses-a_acq-old_FLAIR.json' does not exist."
+
+    write_session_files(tmp_path, provenance)
+    (tmp_path / 'sub-01' / 'ses-a' / 'anat' / 'sub-01_ses-a_FLAIR.nii.gz').write_text('')
+
+    migrations = plan_session_migration(str(tmp_path), provenance)
+    assert migrations[0].action == 'conflict'
+    assert migrations[0].reason == "File 'anat/sub-01_ses-a_FLAIR.nii.gz' already exists."
+
+
+def test_unknown_converted_name():
+    """
+    The DICOM series whose converted file names are unknown must be converted again.
+    """
+
+    series = get_old_flair_series()
+    series.outputs[0].source_name = None
+    new_flair_series = get_new_flair_series()
+
+    migration = get_series_migration(series, new_flair_series)
+
+    assert migration.action == 'reconvert'
+    assert migration.reason == "The converted name of file 'sub-01_ses-a_acq-old_FLAIR.json' is unknown."
+
+
+def test_apply_session_migration(tmp_path: Path):
+    """
+    The files of the renamed DICOM series are renamed and the provenance file records their new
+    names.
+    """
+
+    provenance = get_session_provenance()
+    write_session_files(tmp_path, provenance)
+
+    migrations = plan_session_migration(str(tmp_path), provenance)
+    apply_session_migration(str(tmp_path), provenance, migrations)
+
+    anat_dir_path = tmp_path / 'sub-01' / 'ses-a' / 'anat'
+    assert sorted(path.name for path in anat_dir_path.iterdir()) == [
+        'sub-01_ses-a_FLAIR.json',
+        'sub-01_ses-a_FLAIR.nii.gz',
+        'sub-01_ses-a_T2w.nii.gz',
+    ]
+
+    assert json.loads((anat_dir_path / 'sub-01_ses-a_FLAIR.nii.gz').read_text()) == {
+        'Name': 'sub-01_ses-a_acq-old_FLAIR.nii.gz',
+    }
+
+    new_provenance = read_provenance_file(get_provenance_file_path(str(tmp_path), provenance.bids_session))
+    flair_series = new_provenance.series[0]
+    assert (flair_series.mapping_name, flair_series.base_name) == ('FLAIR', 'sub-01_ses-a_FLAIR')
+    assert [output.path for output in flair_series.outputs] == [
+        'anat/sub-01_ses-a_FLAIR.json',
+        'anat/sub-01_ses-a_FLAIR.nii.gz',
+    ]
+
+    # The series to convert keep their provenance until they are converted.
+    assert new_provenance.series[3].data_type is None
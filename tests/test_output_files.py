@@ -0,0 +1,116 @@
+import gzip
+import os
+from pathlib import Path
+
+from mni_7t_dicom_to_bids.convert_dicom_series import move_output_files
+from mni_7t_dicom_to_bids.dataclass import DicomSeriesInfo
+from mni_7t_dicom_to_bids.output_dirs import OutputDirectories
+from mni_7t_dicom_to_bids.output_files import digest_chunk_size, get_file_digest
+from mni_7t_dicom_to_bids.profiler import Profiler
+from mni_7t_dicom_to_bids.result import SeriesResult
+
+
+def test_same_content(tmp_path: Path):
+    """
+    The files with the same content have the same digest, and the other files a different digest.
+    """
+
+    content = bytes(range(256)) * (digest_chunk_size // 128)
+    (tmp_path / 'a.nii').write_bytes(content)
+    (tmp_path / 'b.nii').write_bytes(content)
+    (tmp_path / 'c.nii').write_bytes(content[:-1] + b'\1')
+
+    assert get_file_digest(str(tmp_path / 'a.nii')) == get_file_digest(str(tmp_path / 'b.nii'))
+    assert get_file_digest(str(tmp_path / 'a.nii')) != get_file_digest(str(tmp_path / 'c.nii'))
+
+
+def test_gzip_modification_time(tmp_path: Path):
+    """
+    The modification time in the header of the gzip files does not change their digest.
+    """
+
+    content = b'NIfTI image data' * 1000
+    (tmp_path / 'a.nii.gz').write_bytes(gzip.compress(content, mtime=1))
+    (tmp_path / 'b.nii.gz').write_bytes(gzip.compress(content, mtime=2))
+    (tmp_path / 'c.nii.gz').write_bytes(gzip.compress(content + b'\0', mtime=1))
+
+    assert get_file_digest(str(tmp_path / 'a.nii.gz')) == get_file_digest(str(tmp_path / 'b.nii.gz'))
+    assert get_file_digest(str(tmp_path / 'a.nii.gz')) != get_file_digest(str(tmp_path / 'c.nii.gz'))
+
+
+def test_modification_time_outside_gzip_files(tmp_path: Path):
+    """
+    The bytes of the gzip modification time are compared in the other files.
+    """
+
+    (tmp_path / 'a.nii').write_bytes(gzip.compress(b'NIfTI', mtime=1))
+    (tmp_path / 'b.nii').write_bytes(gzip.compress(b'NIfTI', mtime=2))
+
+    assert get_file_digest(str(tmp_path / 'a.nii')) != get_file_digest(str(tmp_path / 'b.nii'))
+
+
+def write_file(file_path: Path, content: bytes):
+    """
+    Write a file with some content.
+    """
+
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_bytes(content)
+
+
+def test_move_output_files_unchanged(tmp_path: Path):
+    """
+    When a DICOM series is converted again, the output files identical to the existing files are
+    left untouched, and the other output files replace the existing files.
+    """
+
+    tmp_output_dir_path = tmp_path / 'tmp'
+    output_dir_path = tmp_path / 'bids' / 'anat'
+
+    write_file(output_dir_path / 'sub-01_FLAIR.nii.gz', b'identical')
+    write_file(output_dir_path / 'sub-01_FLAIR.bval', b'old')
+    os.utime(output_dir_path / 'sub-01_FLAIR.nii.gz', (0, 0))
+    identical_inode = (output_dir_path / 'sub-01_FLAIR.nii.gz').stat().st_ino
+
+    write_file(tmp_output_dir_path / 'sub-01_FLAIR.nii.gz', b'identical')
+    write_file(tmp_output_dir_path / 'sub-01_FLAIR.bval', b'new')
+    write_file(tmp_output_dir_path / 'sub-01_FLAIR.bvec', b'new')
+
+    series_result = SeriesResult(DicomSeriesInfo('anat-flair_acq-0p7mm_UPAdia', 6, []), 'anat/FLAIR', None)
+    move_output_files(str(tmp_output_dir_path), str(output_dir_path), OutputDirectories(), series_result, Profiler())
+
+    assert sorted(series_result.output_file_paths) == [
+        str(output_dir_path / file_name)
+        for file_name in ('sub-01_FLAIR.bval', 'sub-01_FLAIR.bvec', 'sub-01_FLAIR.nii.gz')
+    ]
+
+    assert series_result.unchanged_file_paths == [str(output_dir_path / 'sub-01_FLAIR.nii.gz')]
+    assert (output_dir_path / 'sub-01_FLAIR.nii.gz').stat().st_mtime == 0
+    assert (output_dir_path / 'sub-01_FLAIR.nii.gz').stat().st_ino == identical_inode
+    assert (output_dir_path / 'sub-01_FLAIR.bval').read_bytes() == b'new'
+    assert (output_dir_path / 'sub-01_FLAIR.bvec').read_bytes() == b'new'
+
+
+def test_move_output_files_linked(tmp_path: Path):
+    """
+    The output files hard linked with other files, such as the files restored from the conversion
+    cache, are copied to their output directory rather than moved.
+    """
+
+    tmp_output_dir_path = tmp_path / 'tmp'
+    output_dir_path = tmp_path / 'bids' / 'anat'
+    cached_file_path = tmp_path / 'cache' / 'output.nii.gz'
+
+    write_file(cached_file_path, b'cached')
+    tmp_output_dir_path.mkdir()
+    os.link(cached_file_path, tmp_output_dir_path / 'sub-01_FLAIR.nii.gz')
+    write_file(output_dir_path / 'sub-01_FLAIR.nii.gz', b'old')
+
+    series_result = SeriesResult(DicomSeriesInfo('anat-flair_acq-0p7mm_UPAdia', 6, []), 'anat/FLAIR', None)
+    move_output_files(str(tmp_output_dir_path), str(output_dir_path), OutputDirectories(), series_result, Profiler())
+
+    assert os.listdir(tmp_output_dir_path) == []
+    assert os.listdir(output_dir_path) == ['sub-01_FLAIR.nii.gz']
+    assert (output_dir_path / 'sub-01_FLAIR.nii.gz').read_bytes() == b'cached'
+    assert not os.path.samefile(output_dir_path / 'sub-01_FLAIR.nii.gz', cached_file_path)
+    assert cached_file_path.stat().st_nlink == 1
@@ -0,0 +1,156 @@
+import gzip
+import json
+import struct
+from pathlib import Path
+
+import pytest
+
+from mni_7t_dicom_to_bids.qc import (
+    NiftiHeaderInfo,
+    check_dicom_instances_count,
+    check_nifti_file,
+    nifti_header_size,
+    read_nifti_header,
+)
+
+
+def get_nifti_file_content(shape: list[int], voxel_sizes: list[float], bits_per_voxel: int = 16) -> bytes:
+    """
+    Get the content of a NIfTI-1 file with a given shape, whose image data is zeroed.
+    """
+
+    header = bytearray(nifti_header_size)
+    struct.pack_into('<i', header, 0, 348)
+    struct.pack_into('<8h', header, 40, len(shape), *shape, *[1] * (7 - len(shape)))
+    struct.pack_into('<h', header, 72, bits_per_voxel)
+    struct.pack_into('<8f', header, 76, 1, *voxel_sizes, *[1] * (7 - len(voxel_sizes)))
+    struct.pack_into('<f', header, 108, nifti_header_size)
+    header[344:348] = b'n+1\0'
+
+    data_size = bits_per_voxel // 8
+    for dim_size in shape:
+        data_size *= dim_size
+
+    return bytes(header) + bytes(data_size)
+
+
+def write_nifti_file(file_path: Path, content: bytes):
+    """
+    Write a NIfTI file, which is compressed if its name ends with `.gz`.
+    """
+
+    file_path.write_bytes(gzip.compress(content) if file_path.name.endswith('.gz') else content)
+
+
+@pytest.mark.parametrize('file_name', ['image.nii', 'image.nii.gz'])
+def test_read_nifti_header(tmp_path: Path, file_name: str):
+    """
+    The NIfTI headers are read from the uncompressed and compressed NIfTI files.
+    """
+
+    write_nifti_file(tmp_path / file_name, get_nifti_file_content([4, 5, 6, 3], [0.7, 0.7, 1.5, 2]))
+
+    header = read_nifti_header(str(tmp_path / file_name))
+
+    assert header == NiftiHeaderInfo([4, 5, 6, 3], [pytest.approx(0.7), pytest.approx(0.7), 1.5, 2], 16, 352)
+    assert (header.slices_count, header.volumes_count) == (6, 3)
+    assert header.file_size == 352 + 4 * 5 * 6 * 3 * 2
+
+
+def test_invalid_nifti_header(tmp_path: Path):
+    """
+    The truncated or invalid NIfTI headers cannot be read.
+    """
+
+    content = get_nifti_file_content([4, 5, 6], [1, 1, 1])
+
+    write_nifti_file(tmp_path / 'truncated.nii', content[:300])
+    with pytest.raises(ValueError, match='truncated'):
+        read_nifti_header(str(tmp_path / 'truncated.nii'))
+
+    write_nifti_file(tmp_path / 'magic.nii', content[:344] + b'abc\0' + content[348:])
+    with pytest.raises(ValueError, match='magic'):
+        read_nifti_header(str(tmp_path / 'magic.nii'))
+
+
+def test_check_valid_nifti_file(tmp_path: Path):
+    """
+    A NIfTI file consistent with its sidecar files has no issues.
+    """
+
+    write_nifti_file(tmp_path / 'dwi.nii.gz', get_nifti_file_content([4, 5, 6, 3], [1, 1, 1, 2]))
+    (tmp_path / 'dwi.bval').write_text('0 1000 1000\n')
+    (tmp_path / 'dwi.bvec').write_text('0 1 0\n0 0 1\n0 0 0\n')
+    (tmp_path / 'dwi.json').write_text(json.dumps({'SliceTiming': [0, 0.5, 1, 1.5, 2, 2.5]}))
+
+    file_qc, header = check_nifti_file(str(tmp_path / 'dwi.nii.gz'))
+
+    assert file_qc.issues == []
+    assert file_qc.shape == [4, 5, 6, 3]
+    assert header is not None
+
+
+@pytest.mark.parametrize('file_name', ['bold.nii', 'bold.nii.gz'])
+def test_check_truncated_nifti_file(tmp_path: Path, file_name: str):
+    """
+    The NIfTI files whose image data is smaller than described by their header are truncated.
+    """
+
+    content = get_nifti_file_content([4, 5, 6, 3], [1, 1, 1, 2])
+    write_nifti_file(tmp_path / file_name, content[:-10])
+
+    file_qc, _ = check_nifti_file(str(tmp_path / file_name))
+
+    assert file_qc.issues == [
+        f"The image data has {len(content) - 10} bytes instead of the {len(content)} bytes described by its header,"
+        " the file may be truncated."
+    ]
+
+
+def test_check_sidecar_files(tmp_path: Path):
+    """
+    The gradient files and slice times that do not match the NIfTI image are reported.
+    """
+
+    write_nifti_file(tmp_path / 'dwi.nii', get_nifti_file_content([4, 5, 6, 3], [1, 1, 1, 2]))
+    (tmp_path / 'dwi.bval').write_text('0 1000\n')
+    (tmp_path / 'dwi.bvec').write_text('0 1 0\n0 0 1\n')
+    (tmp_path / 'dwi.json').write_text(json.dumps({'SliceTiming': [0, 0.5, 1]}))
+
+    file_qc, _ = check_nifti_file(str(tmp_path / 'dwi.nii'))
+
+    assert file_qc.issues == [
+        "The .bval file does not have 1 rows of 3 values, one for each volume of the image.",
+        "The .bvec file does not have 3 rows of 3 values, one for each volume of the image.",
+        "The JSON sidecar file has 3 slice times for an image with 6 slices.",
+    ]
+
+
+def test_check_unreadable_nifti_file(tmp_path: Path):
+    """
+    The NIfTI files whose header cannot be read are reported.
+    """
+
+    (tmp_path / 'image.nii.gz').write_bytes(b'not a gzip file')
+
+    file_qc, header = check_nifti_file(str(tmp_path / 'image.nii.gz'))
+
+    assert header is None
+    assert len(file_qc.issues) == 1
+    assert file_qc.issues[0].startswith("Cannot read the NIfTI header:")
+
+
+def test_check_dicom_instances_count():
+    """
+    The number of DICOM files of a DICOM series must match the number of volumes or slices of its
+    NIfTI files.
+    """
+
+    headers = [NiftiHeaderInfo([4, 5, 6, 3], [1, 1, 1, 2], 16, 352)]
+
+    assert check_dicom_instances_count(3, headers) == []
+    assert check_dicom_instances_count(18, headers) == []
+    assert check_dicom_instances_count(1, headers) == []
+    assert check_dicom_instances_count(17, headers) == [
+        "The DICOM series has 17 DICOM files, but its NIfTI files have 3 volumes and 18 slices."
+    ]
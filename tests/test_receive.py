@@ -0,0 +1,195 @@
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pydicom
+import pytest
+from pydicom.uid import generate_uid
+
+from mni_7t_dicom_to_bids.args import ReceiveArgs
+
+if TYPE_CHECKING:
+    from pynetdicom.association import Association
+
+    from mni_7t_dicom_to_bids.receive import DicomReceiver
+
+# The receiver depends on the optional `pynetdicom` package.
+pynetdicom = pytest.importorskip('pynetdicom')
+
+# Path of the stub `dcm2niix` executable of the benchmarks.
+fake_dcm2niix_path = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'fake_dcm2niix.py')
+
+# Time during which a received DICOM study must be stable before its conversion in the tests.
+stable_time = 0.2
+
+
+@pytest.fixture
+def receiver(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """
+    Run a DICOM receiver on a free local port with the stub `dcm2niix` executable, and stop it at
+    the end of the test.
+    """
+
+    from mni_7t_dicom_to_bids.receive import DicomReceiver
+
+    bin_dir_path = tmp_path / 'bin'
+    bin_dir_path.mkdir()
+    wrapper_path = bin_dir_path / 'dcm2niix'
+    wrapper_path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.abspath(fake_dcm2niix_path)}" "$@"\n')
+    wrapper_path.chmod(wrapper_path.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv('PATH', f'{bin_dir_path}{os.pathsep}{os.environ["PATH"]}')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+
+    with socket.socket() as probe_socket:
+        probe_socket.bind(('127.0.0.1', 0))
+        port = probe_socket.getsockname()[1]
+
+    receiver = DicomReceiver(ReceiveArgs(
+        spool_dir_path    = str(tmp_path / 'spool'),
+        bids_dataset_path = str(tmp_path / 'bids'),
+        address           = '127.0.0.1',
+        port              = port,
+        ae_title          = 'MNI7TDCM2BIDS',
+        subject_attribute = 'PatientID',
+        session_attribute = 'StudyID',
+        stable_time       = stable_time,
+        keep_duplicates   = False,
+        converter_options = ['--quiet'],
+    ))
+
+    thread = threading.Thread(target=receiver.serve)
+    thread.start()
+
+    yield receiver
+
+    receiver.stop()
+    thread.join(timeout=60)
+    assert not thread.is_alive()
+
+
+def write_study(
+    study_dir_path: Path,
+    dicom_file_writer: Callable[..., pydicom.Dataset],
+    session: str,
+) -> list[pydicom.Dataset]:
+    """
+    Write the DICOM files of a small synthetic DICOM study with one FLAIR DICOM series.
+    """
+
+    study_dir_path.mkdir(parents=True)
+    study_instance_uid = generate_uid()
+    series_instance_uid = generate_uid()
+
+    return [
+        dicom_file_writer(
+            str(study_dir_path / f'{instance_number}.dcm'),
+            StudyInstanceUID    = study_instance_uid,
+            SeriesInstanceUID   = series_instance_uid,
+            InstanceNumber      = instance_number,
+            PatientID           = '01',
+            PatientAge          = '035Y',
+            PatientBirthDate    = '19900101',
+            PatientSex          = 'O',
+            PatientSize         = '1.75',
+            PatientWeight       = '70',
+            StudyID             = session,
+            ImageType           = ['ORIGINAL', 'PRIMARY', 'M'],
+            Rows                = 2,
+            Columns             = 2,
+            BitsAllocated       = 16,
+            BitsStored          = 16,
+            HighBit             = 15,
+            PixelRepresentation = 0,
+            SamplesPerPixel     = 1,
+            PhotometricInterpretation = 'MONOCHROME2',
+            PixelData           = bytes(8),
+        )
+        for instance_number in range(1, 5)
+    ]
+
+
+def send_study(receiver: 'DicomReceiver', study_dir_path: Path) -> 'Association':
+    """
+    Send the DICOM files of a DICOM study to a receiver in a new association, which is returned
+    open.
+    """
+
+    ae = pynetdicom.AE()
+    ae.add_requested_context(pydicom.uid.MRImageStorage)
+    association = ae.associate(receiver.args.address, receiver.args.port, ae_title=receiver.args.ae_title)
+    assert association.is_established
+
+    for dicom_file_path in sorted(study_dir_path.iterdir()):
+        status = association.send_c_store(dicom_file_path)
+        assert status.Status == 0x0000
+
+    return association
+
+
+def wait_path(path: Path, timeout: float = 30) -> bool:
+    """
+    Wait for a path to exist and return whether it exists.
+    """
+
+    deadline = time.monotonic() + timeout
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    return path.exists()
+
+
+def test_receive_released_study(
+    tmp_path: Path,
+    receiver: 'DicomReceiver',
+    dicom_file_writer: Callable[..., pydicom.Dataset],
+):
+    """
+    The received DICOM files are written to the spool directory by study and series instance UID,
+    and the DICOM study is converted only once its association is released.
+    """
+
+    dicoms = write_study(tmp_path / 'study', dicom_file_writer, 'a')
+    session_path = tmp_path / 'bids' / 'sub-01' / 'ses-a'
+
+    association = send_study(receiver, tmp_path / 'study')
+
+    series_dir_path = tmp_path / 'spool' / dicoms[0].StudyInstanceUID / dicoms[0].SeriesInstanceUID
+    assert sorted(os.listdir(series_dir_path)) == sorted(f'{dicom.SOPInstanceUID}.dcm' for dicom in dicoms)
+
+    # The DICOM study is stable but its association is still open.
+    time.sleep(3 * stable_time)
+    assert not session_path.exists()
+
+    association.release()
+
+    assert wait_path(session_path / 'anat' / 'sub-01_ses-a_FLAIR.json')
+    assert (session_path / 'anat' / 'sub-01_ses-a_FLAIR.nii.gz').exists()
+
+
+def test_receive_aborted_study(
+    tmp_path: Path,
+    receiver: 'DicomReceiver',
+    dicom_file_writer: Callable[..., pydicom.Dataset],
+):
+    """
+    A DICOM study received in an aborted association is kept in the spool directory but is not
+    converted.
+    """
+
+    dicoms = write_study(tmp_path / 'study', dicom_file_writer, 'b')
+
+    association = send_study(receiver, tmp_path / 'study')
+    association.abort()
+
+    # The DICOM study is processed by the receiver once it is stable.
+    time.sleep(3 * stable_time)
+
+    series_dir_path = tmp_path / 'spool' / dicoms[0].StudyInstanceUID / dicoms[0].SeriesInstanceUID
+    assert len(os.listdir(series_dir_path)) == len(dicoms)
+    assert not (tmp_path / 'bids' / 'sub-01').exists()
@@ -0,0 +1,143 @@
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+import pydicom
+import pytest
+
+from mni_7t_dicom_to_bids.dataclass import DicomFileHeader, DicomSeriesInfo
+from mni_7t_dicom_to_bids.profiler import Profiler
+from mni_7t_dicom_to_bids.sort_dicom_series import DicomSeriesSorter, sort_dicom_series
+
+
+def get_header(
+    instance_number: int | None,
+    series_instance_uid: str = '1.2.3',
+    echo_number: int | None = None,
+    images_in_acquisition: int | None = None,
+    mosaic: bool = False,
+) -> DicomFileHeader:
+    """
+    Get the header of a DICOM file of the test DICOM series.
+    """
+
+    return DicomFileHeader(
+        series_description    = 'anat-flair_acq-0p7mm_UPAdia',
+        series_number         = 1,
+        series_instance_uid   = series_instance_uid,
+        sop_instance_uid      = f'{series_instance_uid}.{echo_number}.{instance_number}',
+        instance_number       = instance_number,
+        acquisition_time      = None,
+        echo_number           = echo_number,
+        images_in_acquisition = images_in_acquisition,
+        mosaic                = mosaic,
+    )
+
+
+def sort_headers(headers: list[DicomFileHeader]) -> DicomSeriesInfo:
+    """
+    Sort the DICOM files of the test DICOM series and return this DICOM series.
+    """
+
+    sorter = DicomSeriesSorter()
+    for i, header in enumerate(headers):
+        sorter.add_file(f'/dicom/{i}.dcm', header)
+
+    dicom_series_list = sorter.get_dicom_series()
+    assert len(dicom_series_list) == 1
+    return dicom_series_list[0]
+
+
+def test_complete_series():
+    """
+    A DICOM series without gaps nor differences between its echoes is complete.
+    """
+
+    dicom_series = sort_headers([
+        get_header(instance_number, echo_number=echo_number, images_in_acquisition=4)
+        for echo_number in (1, 2)
+        for instance_number in range(1, 9)
+    ])
+
+    assert dicom_series.incomplete_reason is None
+    assert len(dicom_series.file_paths) == 16
+
+
+def test_missing_instance_numbers():
+    """
+    The gaps in the instance numbers of a DICOM series make it incomplete.
+    """
+
+    dicom_series = sort_headers([get_header(instance_number) for instance_number in (1, 2, 5, 6)])
+
+    assert dicom_series.incomplete_reason == "2 missing instance numbers between 1 and 6"
+
+
+def test_different_echo_files_counts():
+    """
+    The echoes of a DICOM series with different numbers of DICOM files make it incomplete.
+    """
+
+    dicom_series = sort_headers([
+        *[get_header(instance_number, echo_number=1) for instance_number in range(1, 5)],
+        *[get_header(instance_number, echo_number=2) for instance_number in range(1, 4)],
+    ])
+
+    assert dicom_series.incomplete_reason == "the echoes have different numbers of DICOM files (echo 1: 4, echo 2: 3)"
+
+
+def test_images_in_acquisition():
+    """
+    A number of DICOM files that is not a multiple of the number of images in acquisition makes a
+    DICOM series incomplete, except for the mosaics.
+    """
+
+    dicom_series = sort_headers([
+        get_header(instance_number, images_in_acquisition=4) for instance_number in range(1, 7)
+    ])
+
+    assert dicom_series.incomplete_reason == "6 DICOM files per echo are not a multiple of the 4 images in acquisition"
+
+    dicom_series = sort_headers([
+        get_header(instance_number, images_in_acquisition=4, mosaic=True) for instance_number in range(1, 7)
+    ])
+
+    assert dicom_series.incomplete_reason is None
+
+
+def test_duplicate_series_instance():
+    """
+    The duplicate DICOM files and the duplicate DICOM series instances are dropped.
+    """
+
+    dicom_series = sort_headers([
+        *[get_header(instance_number, '1.2.3') for instance_number in range(1, 5)],
+        get_header(1, '1.2.3'),
+        *[get_header(instance_number, '1.2.4') for instance_number in range(1, 5)],
+    ])
+
+    assert len(dicom_series.file_paths) == 4
+    assert dicom_series.duplicates.instance_files_count == 1
+    assert dicom_series.duplicates.series_instance_uids == ['1.2.4']
+    assert dicom_series.incomplete_reason is None
+
+
+@pytest.mark.parametrize('fast_headers', [False, True])
+def test_read_headers_profile(
+    tmp_path: Path,
+    dicom_file_writer: Callable[..., pydicom.Dataset],
+    fast_headers: bool,
+):
+    """
+    The profile of the DICOM header reading stage records the number and size of the DICOM files.
+    """
+
+    for instance_number in range(1, 4):
+        dicom_file_writer(str(tmp_path / f'{instance_number}.dcm'), InstanceNumber=instance_number)
+
+    profiler = Profiler()
+    sort_dicom_series(str(tmp_path), profiler, fast_headers=fast_headers)
+
+    stage = next(stage for stage in profiler.stage_profiles if stage.name == 'read_headers')
+    assert stage.files_count == 3
+    assert stage.bytes_read == sum(os.path.getsize(dicom_file_path) for dicom_file_path in tmp_path.iterdir())
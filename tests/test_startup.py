@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+# Script that prints the help of the converter and then the names of the imported modules.
+help_imports_script = '''
+import runpy
+import sys
+
+sys.argv = ['mni7t_dcm2bids', '--help']
+try:
+    runpy.run_module('mni_7t_dicom_to_bids.scripts.run_mni7t_dcm2bids', run_name='__main__')
+except SystemExit:
+    pass
+
+print('\\n'.join(sys.modules), file=sys.stderr)
+'''
+
+
+def test_help_lazy_imports():
+    """
+    Printing the help of the converter does not import the heavy dependencies of the conversion.
+    """
+
+    process = subprocess.run(
+        [sys.executable, '-c', help_imports_script],
+        env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert 'usage: mni7t_dcm2bids' in process.stdout
+
+    imported_modules = {module_name.split('.')[0] for module_name in process.stderr.splitlines()}
+    assert 'pydicom' not in imported_modules
+    assert 'numpy' not in imported_modules
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+from mni_7t_dicom_to_bids.watch import get_converter_command
+
+
+def test_converter_command():
+    """
+    The watch runs the converter module with the current Python interpreter.
+    """
+
+    assert get_converter_command() == [sys.executable, '-m', 'mni_7t_dicom_to_bids.scripts.run_mni7t_dcm2bids']
+
+
+def test_frozen_converter_command(monkeypatch: pytest.MonkeyPatch):
+    """
+    The watch compiled with PyInstaller runs the compiled converter executable of its directory.
+    """
+
+    monkeypatch.setattr(sys, 'frozen', True, raising=False)
+    monkeypatch.setattr(sys, 'executable', '/opt/mni7t/mni7t_dcm2bids_watch')
+
+    assert get_converter_command() == [os.path.join('/opt/mni7t', 'mni7t_dcm2bids')]